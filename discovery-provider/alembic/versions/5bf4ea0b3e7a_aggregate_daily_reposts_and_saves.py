@@ -0,0 +1,71 @@
+"""aggregate daily reposts and saves
+
+Revision ID: 5bf4ea0b3e7a
+Revises: b40b074a75be
+Create Date: 2021-09-01 10:12:45.235197
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "5bf4ea0b3e7a"
+down_revision = "b40b074a75be"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "aggregate_daily_reposts",
+        sa.Column("repost_item_id", sa.Integer(), nullable=False),
+        sa.Column(
+            "repost_type",
+            postgresql.ENUM(
+                "track", "playlist", "album", name="reposttype", create_type=False
+            ),
+            nullable=False,
+        ),
+        sa.Column("timestamp", sa.Date(), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("repost_item_id", "repost_type", "timestamp"),
+    )
+    op.create_table(
+        "aggregate_daily_saves",
+        sa.Column("save_item_id", sa.Integer(), nullable=False),
+        sa.Column(
+            "save_type",
+            postgresql.ENUM(
+                "track", "playlist", "album", name="savetype", create_type=False
+            ),
+            nullable=False,
+        ),
+        sa.Column("timestamp", sa.Date(), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("save_item_id", "save_type", "timestamp"),
+    )
+
+    # Backfill the buckets from the current reposts and saves, after which
+    # the indexer keeps them up to date
+    op.get_bind().execute(
+        """
+        INSERT INTO aggregate_daily_reposts (repost_item_id, repost_type, timestamp, count)
+        SELECT repost_item_id, repost_type, created_at::date, count(*)
+        FROM reposts
+        WHERE is_current IS TRUE AND is_delete IS FALSE
+        GROUP BY repost_item_id, repost_type, created_at::date;
+
+        INSERT INTO aggregate_daily_saves (save_item_id, save_type, timestamp, count)
+        SELECT save_item_id, save_type, created_at::date, count(*)
+        FROM saves
+        WHERE is_current IS TRUE AND is_delete IS FALSE
+        GROUP BY save_item_id, save_type, created_at::date;
+        """
+    )
+
+
+def downgrade():
+    op.drop_table("aggregate_daily_saves")
+    op.drop_table("aggregate_daily_reposts")
@@ -0,0 +1,217 @@
+"""Replace search materialized views with indexer maintained tables
+
+Revision ID: 7693ca2f0ef4
+Revises: 5bf4ea0b3e7a
+Create Date: 2021-09-03 14:41:09.118532
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "7693ca2f0ef4"
+down_revision = "5bf4ea0b3e7a"
+branch_labels = None
+depends_on = None
+
+impersonator_filter = """
+    EXISTS (
+        SELECT 1 FROM users v
+        WHERE v.is_current = true AND v.is_verified = true
+        AND lower(v.handle) = lower(u.name) AND v.user_id != u.user_id
+    )
+"""
+
+user_lexeme_dict_select = f"""
+    SELECT
+        u.user_id,
+        lower(u.name) as user_name,
+        lower(u.handle) as handle,
+        coalesce(a.follower_count, 0) as follower_count,
+        unnest(
+            tsvector_to_array(
+                to_tsvector(
+                    'audius_ts_config',
+                    replace(COALESCE(u.name, ''), '&', 'and')
+                ) ||
+                to_tsvector(
+                    'audius_ts_config',
+                    COALESCE(u.handle, '')
+                )
+            ) || lower(COALESCE(u.name, ''))
+        ) as word
+    FROM
+        users u
+    LEFT OUTER JOIN aggregate_user a on a.user_id = u.user_id
+    WHERE u.is_current = true AND NOT {impersonator_filter}
+    GROUP BY u.user_id, u.name, u.handle, a.follower_count
+"""
+
+track_lexeme_dict_select = f"""
+    SELECT
+        t.track_id,
+        t.owner_id as owner_id,
+        lower(t.title) as track_title,
+        lower(u.handle) as handle,
+        lower(u.name) as user_name,
+        coalesce(a.repost_count, 0) as repost_count,
+        unnest(
+            tsvector_to_array(
+                to_tsvector(
+                    'audius_ts_config',
+                    replace(COALESCE(t."title", ''), '&', 'and')
+                )
+            ) || lower(COALESCE(t."title", ''))
+        ) as word
+    FROM
+        tracks t
+    INNER JOIN users u ON t.owner_id = u.user_id
+    LEFT OUTER JOIN aggregate_track a on a.track_id = t.track_id
+    WHERE t.is_current = true AND t.is_unlisted = false AND t.is_delete = false
+        AND t.stem_of IS NULL AND u.is_current = true
+        AND NOT {impersonator_filter}
+    GROUP BY t.track_id, t.title, t.owner_id, u.handle, u.name, a.repost_count
+"""
+
+playlist_lexeme_dict_select = f"""
+    SELECT
+        p.playlist_id,
+        lower(p.playlist_name) as playlist_name,
+        p.playlist_owner_id as owner_id,
+        lower(u.handle) as handle,
+        lower(u.name) as user_name,
+        coalesce(a.repost_count, 0) as repost_count,
+        unnest(
+            tsvector_to_array(
+                to_tsvector(
+                    'audius_ts_config',
+                    replace(COALESCE(p.playlist_name, ''), '&', 'and')
+                )
+            ) || lower(COALESCE(p.playlist_name, ''))
+        ) as word
+    FROM
+        playlists p
+    INNER JOIN users u ON p.playlist_owner_id = u.user_id
+    LEFT OUTER JOIN aggregate_playlist a on a.playlist_id = p.playlist_id
+    WHERE p.is_current = true AND p.is_album = {{is_album}} AND p.is_private = false
+        AND p.is_delete = false AND u.is_current = true
+        AND NOT {impersonator_filter}
+    GROUP BY p.playlist_id, p.playlist_name, p.playlist_owner_id, u.handle, u.name,
+        a.repost_count
+"""
+
+tag_track_user_select = """
+    SELECT
+        UNNEST(tags) AS tag,
+        track_id,
+        owner_id
+    FROM
+    (
+        SELECT
+            string_to_array(LOWER(tracks.tags), ',') AS tags,
+            track_id,
+            owner_id
+        FROM
+            tracks
+        WHERE
+            tags <> ''
+            AND tags IS NOT NULL
+            AND is_current IS TRUE
+            AND is_unlisted IS FALSE
+            AND stem_of IS NULL
+    ) AS t
+    GROUP BY
+        tag,
+        track_id,
+        owner_id
+"""
+
+
+playlist_select = playlist_lexeme_dict_select.format(is_album="false")
+album_select = playlist_lexeme_dict_select.format(is_album="true")
+
+
+def upgrade():
+    connection = op.get_bind()
+    connection.execute(
+        f"""
+    DROP MATERIALIZED VIEW IF EXISTS user_lexeme_dict;
+    CREATE TABLE user_lexeme_dict AS {user_lexeme_dict_select};
+    CREATE INDEX user_words_idx ON user_lexeme_dict USING gin(word gin_trgm_ops);
+    CREATE INDEX user_handles_idx ON user_lexeme_dict(handle);
+    CREATE INDEX user_lexeme_dict_user_id_idx ON user_lexeme_dict(user_id);
+
+    DROP MATERIALIZED VIEW IF EXISTS track_lexeme_dict;
+    CREATE TABLE track_lexeme_dict AS {track_lexeme_dict_select};
+    CREATE INDEX track_words_idx ON track_lexeme_dict USING gin(word gin_trgm_ops);
+    CREATE INDEX track_user_name_idx ON track_lexeme_dict USING gin(user_name gin_trgm_ops);
+    CREATE INDEX tracks_user_handle_idx ON track_lexeme_dict(handle);
+    CREATE INDEX track_lexeme_dict_track_id_idx ON track_lexeme_dict(track_id);
+    CREATE INDEX track_lexeme_dict_owner_id_idx ON track_lexeme_dict(owner_id);
+
+    DROP MATERIALIZED VIEW IF EXISTS playlist_lexeme_dict;
+    CREATE TABLE playlist_lexeme_dict AS {playlist_select};
+    CREATE INDEX playlist_words_idx ON playlist_lexeme_dict USING gin(word gin_trgm_ops);
+    CREATE INDEX playlist_user_name_idx ON playlist_lexeme_dict USING gin(user_name gin_trgm_ops);
+    CREATE INDEX playlist_user_handle_idx ON playlist_lexeme_dict(handle);
+    CREATE INDEX playlist_lexeme_dict_playlist_id_idx ON playlist_lexeme_dict(playlist_id);
+    CREATE INDEX playlist_lexeme_dict_owner_id_idx ON playlist_lexeme_dict(owner_id);
+
+    DROP MATERIALIZED VIEW IF EXISTS album_lexeme_dict;
+    CREATE TABLE album_lexeme_dict AS {album_select};
+    CREATE INDEX album_words_idx ON album_lexeme_dict USING gin(word gin_trgm_ops);
+    CREATE INDEX album_user_name_idx ON album_lexeme_dict USING gin(user_name gin_trgm_ops);
+    CREATE INDEX album_user_handle_idx ON album_lexeme_dict(handle);
+    CREATE INDEX album_lexeme_dict_playlist_id_idx ON album_lexeme_dict(playlist_id);
+    CREATE INDEX album_lexeme_dict_owner_id_idx ON album_lexeme_dict(owner_id);
+
+    DROP MATERIALIZED VIEW IF EXISTS tag_track_user;
+    CREATE TABLE tag_track_user AS {tag_track_user_select};
+    CREATE INDEX tag_track_user_tag_idx ON tag_track_user (tag);
+    CREATE UNIQUE INDEX tag_track_user_idx ON tag_track_user (tag, track_id, owner_id);
+    CREATE INDEX tag_track_user_track_id_idx ON tag_track_user (track_id);
+    """
+    )
+
+
+def downgrade():
+    connection = op.get_bind()
+    connection.execute(
+        f"""
+    DROP TABLE IF EXISTS user_lexeme_dict;
+    CREATE MATERIALIZED VIEW user_lexeme_dict as
+    SELECT row_number() OVER (PARTITION BY true), * FROM ({user_lexeme_dict_select}) AS words;
+    CREATE INDEX user_words_idx ON user_lexeme_dict USING gin(word gin_trgm_ops);
+    CREATE INDEX user_handles_idx ON user_lexeme_dict(handle);
+    CREATE UNIQUE INDEX user_row_number_idx ON user_lexeme_dict(row_number);
+
+    DROP TABLE IF EXISTS track_lexeme_dict;
+    CREATE MATERIALIZED VIEW track_lexeme_dict as
+    SELECT row_number() OVER (PARTITION BY true), * FROM ({track_lexeme_dict_select}) AS words;
+    CREATE INDEX track_words_idx ON track_lexeme_dict USING gin(word gin_trgm_ops);
+    CREATE INDEX track_user_name_idx ON track_lexeme_dict USING gin(user_name gin_trgm_ops);
+    CREATE INDEX tracks_user_handle_idx ON track_lexeme_dict(handle);
+    CREATE UNIQUE INDEX track_row_number_idx ON track_lexeme_dict(row_number);
+
+    DROP TABLE IF EXISTS playlist_lexeme_dict;
+    CREATE MATERIALIZED VIEW playlist_lexeme_dict as
+    SELECT row_number() OVER (PARTITION BY true), * FROM ({playlist_select}) AS words;
+    CREATE INDEX playlist_words_idx ON playlist_lexeme_dict USING gin(word gin_trgm_ops);
+    CREATE INDEX playlist_user_name_idx ON playlist_lexeme_dict USING gin(user_name gin_trgm_ops);
+    CREATE INDEX playlist_user_handle_idx ON playlist_lexeme_dict(handle);
+    CREATE UNIQUE INDEX playlist_row_number_idx ON playlist_lexeme_dict(row_number);
+
+    DROP TABLE IF EXISTS album_lexeme_dict;
+    CREATE MATERIALIZED VIEW album_lexeme_dict as
+    SELECT row_number() OVER (PARTITION BY true), * FROM ({album_select}) AS words;
+    CREATE INDEX album_words_idx ON album_lexeme_dict USING gin(word gin_trgm_ops);
+    CREATE INDEX album_user_name_idx ON album_lexeme_dict USING gin(user_name gin_trgm_ops);
+    CREATE INDEX album_user_handle_idx ON album_lexeme_dict(handle);
+    CREATE UNIQUE INDEX album_row_number_idx ON album_lexeme_dict(row_number);
+
+    DROP TABLE IF EXISTS tag_track_user;
+    CREATE MATERIALIZED VIEW tag_track_user AS {tag_track_user_select};
+    CREATE INDEX tag_track_user_tag_idx ON tag_track_user (tag);
+    CREATE UNIQUE INDEX tag_track_user_idx ON tag_track_user (tag, track_id, owner_id);
+    """
+    )
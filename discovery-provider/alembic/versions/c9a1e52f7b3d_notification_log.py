@@ -0,0 +1,38 @@
+"""Add indexer appended notification log partitioned by block number
+
+Revision ID: c9a1e52f7b3d
+Revises: 7693ca2f0ef4
+Create Date: 2021-09-10 11:02:31.416210
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "c9a1e52f7b3d"
+down_revision = "7693ca2f0ef4"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Partitions are created by the indexer as blocks reach them
+    op.execute(
+        """
+        CREATE TABLE notification_log (
+            blocknumber integer NOT NULL,
+            idx integer NOT NULL,
+            blockhash varchar NOT NULL,
+            type varchar NOT NULL,
+            timestamp timestamp NOT NULL,
+            initiator integer NOT NULL,
+            metadata jsonb,
+            milestone_count integer,
+            PRIMARY KEY (blocknumber, idx)
+        ) PARTITION BY RANGE (blocknumber);
+        """
+    )
+
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS notification_log CASCADE;")
@@ -0,0 +1,47 @@
+"""keyset_pagination_indexes
+
+Indexes the current follows of a user in both directions, and the current reposts
+and saves of an item, by block number then user id, for paging through followers,
+followees, reposters and savers by cursor most recent first
+
+Revision ID: d4b1e7a2c9f0
+Revises: c9a1e52f7b3d
+Create Date: 2021-09-02 11:20:14.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "d4b1e7a2c9f0"
+down_revision = "c9a1e52f7b3d"
+branch_labels = None
+depends_on = None
+
+
+INDEXES = {
+    "follows_followee_blocknumber_follower_idx": "follows (followee_user_id, blocknumber, follower_user_id)",
+    "follows_follower_blocknumber_followee_idx": "follows (follower_user_id, blocknumber, followee_user_id)",
+    "reposts_item_blocknumber_user_idx": "reposts (repost_item_id, repost_type, blocknumber, user_id)",
+    "saves_item_blocknumber_user_idx": "saves (save_item_id, save_type, blocknumber, user_id)",
+}
+
+
+def upgrade():
+    # Builds without locking writes to these tables, which can't run in a transaction
+    # https://alembic.sqlalchemy.org/en/latest/api/runtime.html#alembic.runtime.migration.MigrationContext.autocommit_block
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES.items():
+            op.execute(
+                f"""
+                CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {columns}
+                WHERE is_current = true AND is_delete = false
+                """
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name in INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
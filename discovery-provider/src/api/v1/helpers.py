@@ -308,6 +308,23 @@ def make_full_response(name, namespace, modelType):
     return namespace.clone(name, full_response, {"data": modelType})
 
 
+def make_cursor_response(name, namespace, modelType):
+    """Response of a route paged by cursor, with the cursor of the next page"""
+    return namespace.model(
+        name,
+        {
+            "data": modelType,
+            "next_cursor": fields.String,
+        },
+    )
+
+
+def make_full_cursor_response(name, namespace, modelType):
+    return namespace.clone(
+        name, full_response, {"data": modelType, "next_cursor": fields.String}
+    )
+
+
 def to_dict(multi_dict):
     """Converts a multi dict into a dict where only list entries are not flat"""
     return {
@@ -341,6 +358,20 @@ def success_response(entity):
     return api_helpers.success_response(entity, 200, False)
 
 
+def cursor_success_response(entity, next_cursor):
+    """Success response of a route paged by cursor, next_cursor is None on the last page"""
+    response = api_helpers.response_dict_with_metadata(
+        {"data": entity, "next_cursor": next_cursor}, True
+    )
+    return response, 200
+
+
+def get_cursor_args(args):
+    """Returns the cursor query arg to pass on, when the request pages by cursor"""
+    cursor = args.get("cursor")
+    return {} if cursor is None else {"cursor": cursor}
+
+
 DEFAULT_LIMIT = 100
 MIN_LIMIT = 1
 MAX_LIMIT = 500
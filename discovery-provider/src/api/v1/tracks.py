@@ -9,6 +9,7 @@ from src.api.v1.helpers import (
     decode_with_abort,
     extend_track,
     make_full_response,
+    make_full_cursor_response,
     make_response,
     search_parser,
     extend_user,
@@ -16,6 +17,8 @@ from src.api.v1.helpers import (
     trending_parser,
     full_trending_parser,
     success_response,
+    cursor_success_response,
+    get_cursor_args,
     abort_bad_request_param,
     to_dict,
     format_offset,
@@ -45,8 +48,8 @@ from src.trending_strategies.trending_type_and_version import (
 from flask.globals import request
 from src.utils.redis_metrics import record_metrics
 from src.api.v1.models.users import user_model_full
-from src.queries.get_reposters_for_track import get_reposters_for_track
-from src.queries.get_savers_for_track import get_savers_for_track
+from src.queries.get_reposters_for_track import get_reposters_for_track_page
+from src.queries.get_savers_for_track import get_savers_for_track_page
 from src.queries.get_tracks_including_unlisted import get_tracks_including_unlisted
 from src.queries.get_stems_of import get_stems_of
 from src.queries.get_remixable_tracks import get_remixable_tracks
@@ -579,7 +582,8 @@ track_favorites_route_parser = reqparse.RequestParser()
 track_favorites_route_parser.add_argument("user_id", required=False)
 track_favorites_route_parser.add_argument("limit", required=False, type=int)
 track_favorites_route_parser.add_argument("offset", required=False, type=int)
-track_favorites_response = make_full_response(
+track_favorites_route_parser.add_argument("cursor", required=False, type=str)
+track_favorites_response = make_full_cursor_response(
     "track_favorites_response_full",
     full_ns,
     fields.List(fields.Nested(user_model_full)),
@@ -591,7 +595,12 @@ class FullTrackFavorites(Resource):
     @full_ns.expect(track_favorites_route_parser)
     @full_ns.doc(
         id="""Get Users that Favorited a Track""",
-        params={"user_id": "A User ID", "limit": "Limit", "offset": "Offset"},
+        params={
+            "user_id": "A User ID",
+            "limit": "Limit",
+            "offset": "Offset",
+            "cursor": "Cursor of the page to get, empty for the first page. Pages by cursor are ordered most recent first",
+        },
         responses={200: "Success", 400: "Bad request", 500: "Server error"},
     )
     @full_ns.marshal_with(track_favorites_response)
@@ -603,23 +612,26 @@ class FullTrackFavorites(Resource):
         offset = get_default_max(args.get("offset"), 0)
         current_user_id = get_current_user_id(args)
 
+        cursor_args = get_cursor_args(args)
         args = {
             "save_track_id": decoded_id,
             "current_user_id": current_user_id,
             "limit": limit,
             "offset": offset,
+            **cursor_args,
         }
-        users = get_savers_for_track(args)
+        users, next_cursor = get_savers_for_track_page(args)
         users = list(map(extend_user, users))
 
-        return success_response(users)
+        return cursor_success_response(users, next_cursor)
 
 
 track_reposts_route_parser = reqparse.RequestParser()
 track_reposts_route_parser.add_argument("user_id", required=False)
 track_reposts_route_parser.add_argument("limit", required=False, type=int)
 track_reposts_route_parser.add_argument("offset", required=False, type=int)
-track_reposts_response = make_full_response(
+track_reposts_route_parser.add_argument("cursor", required=False, type=str)
+track_reposts_response = make_full_cursor_response(
     "track_reposts_response_full", full_ns, fields.List(fields.Nested(user_model_full))
 )
 
@@ -629,7 +641,12 @@ class FullTrackReposts(Resource):
     @full_ns.expect(track_reposts_route_parser)
     @full_ns.doc(
         id="""Get Users that Reposted a Track""",
-        params={"user_id": "A User ID", "limit": "Limit", "offset": "Offset"},
+        params={
+            "user_id": "A User ID",
+            "limit": "Limit",
+            "offset": "Offset",
+            "cursor": "Cursor of the page to get, empty for the first page. Pages by cursor are ordered most recent first",
+        },
         responses={200: "Success", 400: "Bad request", 500: "Server error"},
     )
     @full_ns.marshal_with(track_reposts_response)
@@ -641,15 +658,17 @@ class FullTrackReposts(Resource):
         offset = get_default_max(args.get("offset"), 0)
         current_user_id = get_current_user_id(args)
 
+        cursor_args = get_cursor_args(args)
         args = {
             "repost_track_id": decoded_id,
             "current_user_id": current_user_id,
             "limit": limit,
             "offset": offset,
+            **cursor_args,
         }
-        users = get_reposters_for_track(args)
+        users, next_cursor = get_reposters_for_track_page(args)
         users = list(map(extend_user, users))
-        return success_response(users)
+        return cursor_success_response(users, next_cursor)
 
 
 track_stems_response = make_full_response(
@@ -18,10 +18,10 @@ from src.api.v1.models.users import (
 from src.queries.get_saves import get_saves
 from src.queries.get_users import get_users
 from src.queries.search_queries import SearchKind, search
-from src.queries.get_tracks import get_tracks
+from src.queries.get_tracks import get_tracks_page
 from src.queries.get_save_tracks import get_save_tracks
-from src.queries.get_followees_for_user import get_followees_for_user
-from src.queries.get_followers_for_user import get_followers_for_user
+from src.queries.get_followees_for_user import get_followees_for_user_page
+from src.queries.get_followers_for_user import get_followers_for_user_page
 from src.queries.get_top_user_track_tags import get_top_user_track_tags
 from src.queries.get_associated_user_wallet import get_associated_user_wallet
 from src.queries.get_associated_user_id import get_associated_user_id
@@ -37,10 +37,14 @@ from src.api.v1.helpers import (
     format_limit,
     format_offset,
     get_current_user_id,
+    make_cursor_response,
+    make_full_cursor_response,
     make_full_response,
     make_response,
     search_parser,
     success_response,
+    cursor_success_response,
+    get_cursor_args,
     abort_bad_request_param,
     get_default_max,
     extend_challenge_response,
@@ -135,11 +139,12 @@ user_tracks_route_parser = reqparse.RequestParser()
 user_tracks_route_parser.add_argument("user_id", required=False)
 user_tracks_route_parser.add_argument("limit", required=False, type=int)
 user_tracks_route_parser.add_argument("offset", required=False, type=int)
+user_tracks_route_parser.add_argument("cursor", required=False, type=str)
 user_tracks_route_parser.add_argument(
     "sort", required=False, type=str, default="date", choices=("date", "plays")
 )
 
-tracks_response = make_response(
+tracks_response = make_cursor_response(
     "tracks_response", ns, fields.List(fields.Nested(track))
 )
 
@@ -154,6 +159,7 @@ class TrackList(Resource):
             "limit": "Limit",
             "offset": "Offset",
             "sort": "Sort mode",
+            "cursor": "Cursor of the page to get, empty for the first page",
         },
         responses={200: "Success", 400: "Bad request", 500: "Server error"},
     )
@@ -170,6 +176,7 @@ class TrackList(Resource):
         offset = format_offset(args)
         limit = format_limit(args)
 
+        cursor_args = get_cursor_args(args)
         args = {
             "user_id": decoded_id,
             "current_user_id": current_user_id,
@@ -178,13 +185,14 @@ class TrackList(Resource):
             "sort": sort,
             "limit": limit,
             "offset": offset,
+            **cursor_args,
         }
-        tracks = get_tracks(args)
+        tracks, next_cursor = get_tracks_page(args)
         tracks = list(map(extend_track, tracks))
-        return success_response(tracks)
+        return cursor_success_response(tracks, next_cursor)
 
 
-full_tracks_response = make_full_response(
+full_tracks_response = make_full_cursor_response(
     "full_tracks", full_ns, fields.List(fields.Nested(track_full))
 )
 
@@ -199,6 +207,7 @@ class FullTrackList(Resource):
             "limit": "Limit",
             "offset": "Offset",
             "sort": "Sort mode",
+            "cursor": "Cursor of the page to get, empty for the first page",
         },
         responses={200: "Success", 400: "Bad request", 500: "Server error"},
     )
@@ -215,6 +224,7 @@ class FullTrackList(Resource):
         offset = format_offset(args)
         limit = format_limit(args)
 
+        cursor_args = get_cursor_args(args)
         args = {
             "user_id": decoded_id,
             "current_user_id": current_user_id,
@@ -223,10 +233,11 @@ class FullTrackList(Resource):
             "sort": sort,
             "limit": limit,
             "offset": offset,
+            **cursor_args,
         }
-        tracks = get_tracks(args)
+        tracks, next_cursor = get_tracks_page(args)
         tracks = list(map(extend_track, tracks))
-        return success_response(tracks)
+        return cursor_success_response(tracks, next_cursor)
 
 
 @full_ns.route("/handle/<string:handle>/tracks")
@@ -239,6 +250,7 @@ class HandleFullTrackList(Resource):
             "limit": "Limit",
             "offset": "Offset",
             "sort": "Sort mode",
+            "cursor": "Cursor of the page to get, empty for the first page",
         },
         responses={200: "Success", 400: "Bad request", 500: "Server error"},
     )
@@ -254,6 +266,7 @@ class HandleFullTrackList(Resource):
         offset = format_offset(args)
         limit = format_limit(args)
 
+        cursor_args = get_cursor_args(args)
         args = {
             "handle": handle,
             "current_user_id": current_user_id,
@@ -262,10 +275,11 @@ class HandleFullTrackList(Resource):
             "sort": sort,
             "limit": limit,
             "offset": offset,
+            **cursor_args,
         }
-        tracks = get_tracks(args)
+        tracks, next_cursor = get_tracks_page(args)
         tracks = list(map(extend_track, tracks))
-        return success_response(tracks)
+        return cursor_success_response(tracks, next_cursor)
 
 
 USER_REPOSTS_ROUTE = "/<string:user_id>/reposts"
@@ -533,8 +547,9 @@ followers_route_parser = reqparse.RequestParser()
 followers_route_parser.add_argument("user_id", required=False)
 followers_route_parser.add_argument("limit", required=False, type=int)
 followers_route_parser.add_argument("offset", required=False, type=int)
+followers_route_parser.add_argument("cursor", required=False, type=str)
 
-followers_response = make_full_response(
+followers_response = make_full_cursor_response(
     "followers_response", full_ns, fields.List(fields.Nested(user_model_full))
 )
 
@@ -545,7 +560,12 @@ class FollowerUsers(Resource):
     @ns.expect(followers_route_parser)
     @ns.doc(
         id="""All users that follow the provided user""",
-        params={"user_id": "A User ID", "limit": "Limit", "offset": "Offset"},
+        params={
+            "user_id": "A User ID",
+            "limit": "Limit",
+            "offset": "Offset",
+            "cursor": "Cursor of the page to get, empty for the first page. Pages by cursor are ordered most recent first",
+        },
         responses={200: "Success", 400: "Bad request", 500: "Server error"},
     )
     @full_ns.marshal_with(followers_response)
@@ -556,22 +576,25 @@ class FollowerUsers(Resource):
         limit = get_default_max(args.get("limit"), 10, 100)
         offset = get_default_max(args.get("offset"), 0)
         current_user_id = get_current_user_id(args)
+        cursor_args = get_cursor_args(args)
         args = {
             "followee_user_id": decoded_id,
             "current_user_id": current_user_id,
             "limit": limit,
             "offset": offset,
+            **cursor_args,
         }
-        users = get_followers_for_user(args)
+        users, next_cursor = get_followers_for_user_page(args)
         users = list(map(extend_user, users))
-        return success_response(users)
+        return cursor_success_response(users, next_cursor)
 
 
 following_route_parser = reqparse.RequestParser()
 following_route_parser.add_argument("user_id", required=False)
 following_route_parser.add_argument("limit", required=False, type=int)
 following_route_parser.add_argument("offset", required=False, type=int)
-following_response = make_full_response(
+following_route_parser.add_argument("cursor", required=False, type=str)
+following_response = make_full_cursor_response(
     "following_response", full_ns, fields.List(fields.Nested(user_model_full))
 )
 
@@ -582,7 +605,12 @@ class FollowingUsers(Resource):
     @full_ns.expect(following_route_parser)
     @full_ns.doc(
         id="""All users that the provided user follows""",
-        params={"user_id": "A User ID", "limit": "Limit", "offset": "Offset"},
+        params={
+            "user_id": "A User ID",
+            "limit": "Limit",
+            "offset": "Offset",
+            "cursor": "Cursor of the page to get, empty for the first page. Pages by cursor are ordered most recent first",
+        },
         responses={200: "Success", 400: "Bad request", 500: "Server error"},
     )
     @full_ns.marshal_with(following_response)
@@ -593,15 +621,17 @@ class FollowingUsers(Resource):
         limit = get_default_max(args.get("limit"), 10, 100)
         offset = get_default_max(args.get("offset"), 0)
         current_user_id = get_current_user_id(args)
+        cursor_args = get_cursor_args(args)
         args = {
             "follower_user_id": decoded_id,
             "current_user_id": current_user_id,
             "limit": limit,
             "offset": offset,
+            **cursor_args,
         }
-        users = get_followees_for_user(args)
+        users, next_cursor = get_followees_for_user_page(args)
         users = list(map(extend_user, users))
-        return success_response(users)
+        return cursor_success_response(users, next_cursor)
 
 
 related_artist_route_parser = reqparse.RequestParser()
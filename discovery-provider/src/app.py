@@ -348,7 +348,10 @@ def configure_celery(flask_app, celery, test_config=None):
             "src.tasks.index_blacklist",
             "src.tasks.index_plays",
             "src.tasks.index_metrics",
-            "src.tasks.index_materialized_views",
+            "src.tasks.index_search_dicts",
+            "src.tasks.index_autocomplete",
+            "src.tasks.index_social_graph",
+            "src.tasks.index_feeds",
             "src.tasks.index_aggregate_plays",
             "src.tasks.vacuum_db",
             "src.tasks.index_network_peers",
@@ -390,10 +393,22 @@ def configure_celery(flask_app, celery, test_config=None):
                 "task": "synchronize_metrics",
                 "schedule": timedelta(minutes=SYNCHRONIZE_METRICS_INTERVAL),
             },
-            "update_materialized_views": {
-                "task": "update_materialized_views",
+            "compact_search_dicts": {
+                "task": "compact_search_dicts",
                 "schedule": timedelta(seconds=300),
             },
+            "index_autocomplete": {
+                "task": "index_autocomplete",
+                "schedule": timedelta(seconds=30),
+            },
+            "index_social_graph": {
+                "task": "index_social_graph",
+                "schedule": timedelta(seconds=5),
+            },
+            "index_feeds": {
+                "task": "index_feeds",
+                "schedule": timedelta(seconds=5),
+            },
             "update_aggregate_plays": {
                 "task": "update_aggregate_plays",
                 "schedule": timedelta(seconds=15),
@@ -412,7 +427,7 @@ def configure_celery(flask_app, celery, test_config=None):
             },
             "update_user_balances": {
                 "task": "update_user_balances",
-                "schedule": timedelta(seconds=60),
+                "schedule": timedelta(seconds=10),
             },
             "monitoring_queue": {
                 "task": "monitoring_queue",
@@ -462,6 +477,10 @@ def configure_celery(flask_app, celery, test_config=None):
                 "task": "index_related_artists",
                 "schedule": timedelta(seconds=60),
             },
+            "calculate_related_artists": {
+                "task": "calculate_related_artists",
+                "schedule": timedelta(hours=1),
+            },
         },
         task_serializer="json",
         accept_content=["json"],
@@ -494,6 +513,7 @@ def configure_celery(flask_app, celery, test_config=None):
     redis_inst.delete("index_eth")
     redis_inst.delete("index_oracles")
     redis_inst.delete("solana_rewards_manager")
+    redis_inst.delete("compact_search_dicts_lock")
     logger.info("Redis instance initialized!")
 
     # Initialize custom task context with database object
@@ -1,8 +1,12 @@
 from contextlib import contextmanager
 import json
 import logging
+import threading
+import time
 from collections import defaultdict
-from typing import Any, DefaultDict, Dict, List, Tuple, TypedDict
+from typing import Any, DefaultDict, Dict, List, Optional, Set, Tuple, TypedDict
+
+from redis.exceptions import ResponseError
 
 from sqlalchemy.orm.session import Session
 from src.challenges.challenge import ChallengeManager, EventMetadata
@@ -19,7 +23,20 @@ from src.challenges.track_upload_challenge import track_upload_challenge_manager
 from src.utils.redis_connection import get_redis
 
 logger = logging.getLogger(__name__)
+# Redis list events were queued in before the stream, moved into it before the
+# bus adds or reads any event
 REDIS_QUEUE_PREFIX = "challenges-event-queue"
+# Lock held while moving the list's events, so they're moved once
+REDIS_QUEUE_MIGRATION_LOCK = "challenges-event-queue:migration-lock"
+# Redis stream events are queued in, read by a consumer group per challenge
+REDIS_STREAM_KEY = "challenges-event-stream"
+# Approximate number of events kept in the stream
+STREAM_MAX_LENGTH = 100000
+# Each challenge's events are processed by one worker at a time, which holds the
+# challenge's lock, so a single consumer per group is enough
+CONSUMER_NAME = "challenge-worker"
+# Maximum number of undelivered events counted per challenge for health
+MAX_COUNTED_EVENTS = 1000
 
 
 class InternalEvent(TypedDict):
@@ -31,22 +48,33 @@ class InternalEvent(TypedDict):
 
 class ChallengeEventBus:
     """`ChallengeEventBus` supports:
-    - dispatching challenge events to a Redis queue
+    - dispatching challenge events to a Redis stream
     - registering challenge managers to listen to the events.
-    - consuming items from the Redis queue
+    - consuming items from the Redis stream, in a consumer group per challenge
     - fetching the manager for a given challenge
+
+    Each challenge's consumer group reads every event and acks them once its
+    manager's processing is committed, so the challenges can be processed in
+    parallel and events read by a worker that dies, or whose manager errors, are
+    delivered again.
     """
 
     _listeners: DefaultDict[ChallengeEvent, List[ChallengeManager]]
     _redis: Any
     _managers: Dict[str, ChallengeManager]
     _in_memory_queue: List[InternalEvent]
+    _created_groups: Set[str]
+    _did_migrate_queue: bool
+    _setup_lock: Any
 
     def __init__(self, redis):
         self._listeners = defaultdict(lambda: [])
         self._redis = redis
         self._managers = {}
         self._in_memory_queue: List[Dict] = []
+        self._created_groups = set()
+        self._did_migrate_queue = False
+        self._setup_lock = threading.RLock()
 
     def register_listener(self, event: ChallengeEvent, listener: ChallengeManager):
         """Registers a listener (`ChallengeManager`) to listen for a particular event type."""
@@ -58,6 +86,10 @@ class ChallengeEventBus:
         """Gets a manager for a given challenge_id"""
         return self._managers[challenge_id]
 
+    def get_challenge_ids(self) -> List[str]:
+        """Gets the ids of the challenges listening for events"""
+        return list(self._managers.keys())
+
     @contextmanager
     def use_scoped_dispatch_queue(self):
         """Makes the bus only dispatch the events once out of the new scope created with 'with'"""
@@ -102,10 +134,11 @@ class ChallengeEventBus:
         )
 
     def flush(self):
-        """Flushes the in-memory queue of events and enqueues them to Redis"""
+        """Flushes the in-memory queue of events and adds them to the Redis stream"""
         logger.info(
             f"ChallengeEventBus: Flushing {len(self._in_memory_queue)} events from in-memory queue"
         )
+        events_json = []
         for event in self._in_memory_queue:
             try:
                 event_json = self._event_to_json(
@@ -115,62 +148,247 @@ class ChallengeEventBus:
                     event.get("extra", {}),
                 )
                 logger.info(f"ChallengeEventBus: dispatch {event_json}")
-                self._redis.rpush(REDIS_QUEUE_PREFIX, event_json)
+                events_json.append(event_json)
+            except Exception as e:
+                logger.warning(f"ChallengeEventBus: error serializing event: {e}")
+        if events_json:
+            # Enqueue every event in a single round trip
+            try:
+                self._add_to_stream(events_json)
             except Exception as e:
                 logger.warning(f"ChallengeEventBus: error enqueuing to Redis: {e}")
         self._in_memory_queue.clear()
 
-    def process_events(self, session: Session, max_events=1000) -> Tuple[int, bool]:
-        """Dequeues `max_events` from Redis queue and processes them, forwarding to listening ChallengeManagers.
+    def process_events(
+        self,
+        session: Session,
+        max_events=1000,
+        challenge_ids: Optional[List[str]] = None,
+        block_ms: Optional[int] = None,
+    ) -> Tuple[int, bool]:
+        """Processes events like `process_events_unacked`, acking them right away.
+        Callers committing the session themselves should use `process_events_unacked`
+        and `ack_events` once committed.
         Returns (num_processed_events, did_error).
+        """
+        num_processed, did_error, event_ids = self.process_events_unacked(
+            session, max_events, challenge_ids, block_ms
+        )
+        if not self.ack_events(event_ids):
+            did_error = True
+        return (num_processed, did_error)
+
+    def process_events_unacked(
+        self,
+        session: Session,
+        max_events=1000,
+        challenge_ids: Optional[List[str]] = None,
+        block_ms: Optional[int] = None,
+    ) -> Tuple[int, bool, Dict[str, List[bytes]]]:
+        """Reads up to `max_events` per challenge from the Redis stream and processes them,
+        forwarding to the listening ChallengeManagers of `challenge_ids`, all by default.
+        Waits up to `block_ms` for new events if there are none.
+        Returns (num_processed_events, did_error, event ids to ack by challenge id),
+        leaving out the events of a manager that errored so they're delivered again.
         Will return -1 as num_processed_events if an error prevented any events from
-        being processed (i.e. some error deserializing from Redis)
+        being processed (i.e. some error reading from Redis)
         """
+        if challenge_ids is None:
+            challenge_ids = self.get_challenge_ids()
         try:
-            # get the first max_events elements.
-            events_json = self._redis.lrange(REDIS_QUEUE_PREFIX, 0, max_events)
-            logger.info(f"ChallengeEventBus: dequeued {len(events_json)} events")
-            # trim the first from the front of the list
-            self._redis.ltrim(REDIS_QUEUE_PREFIX, len(events_json), -1)
-            events_dicts = list(map(self._json_to_event, events_json))
-
-            # Consolidate event types for processing
-            # map of {"event_type": [{ user_id: number, block_number: number, extra: {} }]}}
-            event_user_dict: DefaultDict[
-                ChallengeEvent, List[EventMetadata]
-            ] = defaultdict(lambda: [])
-            for event_dict in events_dicts:
-                event_type = event_dict["event"]
-                event_user_dict[event_type].append(
-                    {
-                        "user_id": event_dict["user_id"],
-                        "block_number": event_dict["block_number"],
-                        "extra": event_dict.get(  # use .get to be safe since prior versions didn't have `extra`
-                            "extra", {}
-                        ),
-                    }
-                )
+            self._setup()
         except Exception as e:
             logger.warning(f"ChallengeEventBus: error processing from Redis: {e}")
-            return (-1, True)
+            return (-1, True, {})
 
+        processed_event_ids: Set[bytes] = set()
+        event_ids_to_ack: Dict[str, List[bytes]] = {}
         did_error = False
-        for (event_type, event_dicts) in event_user_dict.items():
-            listeners = self._listeners[event_type]
-            for listener in listeners:
+        for challenge_id in challenge_ids:
+            try:
+                entries = self._read_events(challenge_id, max_events, block_ms)
+            except Exception as e:
+                logger.warning(f"ChallengeEventBus: error processing from Redis: {e}")
+                did_error = True
+                continue
+            if not entries:
+                continue
+            logger.info(
+                f"ChallengeEventBus: dequeued {len(entries)} events for challenge [{challenge_id}]"
+            )
+            failed_event_ids, did_challenge_error = self._process_challenge_events(
+                session, challenge_id, entries
+            )
+            if did_challenge_error:
+                did_error = True
+            event_ids_to_ack[challenge_id] = [
+                event_id for event_id, _ in entries if event_id not in failed_event_ids
+            ]
+            processed_event_ids.update(event_ids_to_ack[challenge_id])
+
+        return (len(processed_event_ids), did_error, event_ids_to_ack)
+
+    def ack_events(self, event_ids: Dict[str, List[bytes]]) -> bool:
+        """Acks the processed event ids of each challenge id, once their processing is
+        committed. Returns False if there was an error"""
+        did_error = False
+        for challenge_id, challenge_event_ids in event_ids.items():
+            if not challenge_event_ids:
+                continue
+            try:
+                self._redis.xack(REDIS_STREAM_KEY, challenge_id, *challenge_event_ids)
+            except Exception as e:
+                logger.warning(f"ChallengeEventBus: error acking events: {e}")
+                did_error = True
+        return not did_error
+
+    # Helpers
+
+    def _setup(self):
+        """Creates the consumer groups and moves the events left in the Redis list
+        queue, before any event is added to or read from the stream"""
+        with self._setup_lock:
+            self._ensure_groups()
+            self._migrate_queue()
+
+    def _add_to_stream(self, events_json: List[str]):
+        self._setup()
+        self._xadd(events_json)
+
+    def _xadd(self, events_json: List[str]):
+        pipe = self._redis.pipeline(transaction=False)
+        for event_json in events_json:
+            pipe.xadd(
+                REDIS_STREAM_KEY,
+                {"event": event_json},
+                maxlen=STREAM_MAX_LENGTH,
+                approximate=True,
+            )
+        pipe.execute()
+
+    def _ensure_groups(self):
+        """Creates the consumer groups of the registered challenges, which read
+        the events added from then on"""
+        with self._setup_lock:
+            for challenge_id in self._managers:
+                if challenge_id in self._created_groups:
+                    continue
                 try:
-                    listener.process(session, event_type, event_dicts)
-                except Exception as e:
-                    # We really shouldn't see errors from a ChallengeManager (they should handle on their own),
-                    # but in case we do, swallow it and continue on
-                    logger.warning(
-                        f"ChallengeEventBus: manager [{listener.challenge_id} unexpectedly propogated error: [{e}]"
+                    self._redis.xgroup_create(
+                        REDIS_STREAM_KEY, challenge_id, id="$", mkstream=True
                     )
-                    did_error = True
+                except ResponseError as e:
+                    if "BUSYGROUP" not in str(e):
+                        raise
+                self._created_groups.add(challenge_id)
 
-        return (len(events_json), did_error)
+    def _migrate_queue(self):
+        """Moves events left in the Redis list queue to the stream, once per bus"""
+        if self._did_migrate_queue:
+            return
+        with self._redis.lock(REDIS_QUEUE_MIGRATION_LOCK, timeout=60):
+            events_json = [
+                event_json.decode("utf-8")
+                if isinstance(event_json, bytes)
+                else event_json
+                for event_json in self._redis.lrange(REDIS_QUEUE_PREFIX, 0, -1)
+            ]
+            if events_json:
+                logger.info(
+                    f"ChallengeEventBus: moving {len(events_json)} events from the queue to the stream"
+                )
+                self._xadd(events_json)
+                # Only removed once in the stream, a failed move is retried
+                self._redis.ltrim(REDIS_QUEUE_PREFIX, len(events_json), -1)
+        self._did_migrate_queue = True
 
-    # Helpers
+    def _read_events(
+        self, challenge_id: str, max_events: int, block_ms: Optional[int]
+    ) -> List[Tuple[bytes, Optional[Dict]]]:
+        # Events delivered before but never acked, i.e. by a worker that died
+        entries = self._read_group(challenge_id, "0", max_events, None)
+        if len(entries) < max_events:
+            entries += self._read_group(
+                challenge_id,
+                ">",
+                max_events - len(entries),
+                None if entries else block_ms,
+            )
+        return entries
+
+    def _read_group(
+        self, challenge_id: str, event_id: str, count: int, block_ms: Optional[int]
+    ) -> List[Tuple[bytes, Optional[Dict]]]:
+        response = self._redis.xreadgroup(
+            challenge_id,
+            CONSUMER_NAME,
+            {REDIS_STREAM_KEY: event_id},
+            count=count,
+            block=block_ms,
+        )
+        if not response:
+            return []
+        return list(response[0][1])
+
+    def _process_challenge_events(
+        self,
+        session: Session,
+        challenge_id: str,
+        entries: List[Tuple[bytes, Optional[Dict]]],
+    ) -> Tuple[Set[bytes], bool]:
+        """Forwards the events a challenge listens to to its manager.
+        Returns (ids of the events the manager errored on, whether there was an error)"""
+        manager = self._managers[challenge_id]
+        did_error = False
+        # Consolidate event types for processing
+        # map of {"event_type": [{ user_id: number, block_number: number, extra: {} }]}}
+        event_user_dict: DefaultDict[ChallengeEvent, List[EventMetadata]] = defaultdict(
+            lambda: []
+        )
+        event_ids_by_type: DefaultDict[ChallengeEvent, List[bytes]] = defaultdict(
+            lambda: []
+        )
+        failed_event_ids: Set[bytes] = set()
+        for event_id, fields in entries:
+            # Events trimmed from the stream before they were processed have no fields
+            if not fields:
+                logger.warning(
+                    f"ChallengeEventBus: event {event_id.decode('utf-8')} was trimmed"
+                )
+                continue
+            try:
+                event_dict = self._json_to_event(fields[b"event"])
+            except Exception as e:
+                logger.warning(f"ChallengeEventBus: error deserializing event: {e}")
+                did_error = True
+                continue
+            event_type = event_dict["event"]
+            if manager not in self._listeners[event_type]:
+                continue
+            event_user_dict[event_type].append(
+                {
+                    "user_id": event_dict["user_id"],
+                    "block_number": event_dict["block_number"],
+                    "extra": event_dict.get(  # use .get to be safe since prior versions didn't have `extra`
+                        "extra", {}
+                    ),
+                }
+            )
+            event_ids_by_type[event_type].append(event_id)
+
+        for (event_type, event_dicts) in event_user_dict.items():
+            try:
+                manager.process(session, event_type, event_dicts)
+            except Exception as e:
+                # We really shouldn't see errors from a ChallengeManager (they should handle on their own),
+                # but in case we do, swallow it and continue on
+                logger.warning(
+                    f"ChallengeEventBus: manager [{manager.challenge_id} unexpectedly propogated error: [{e}]"
+                )
+                did_error = True
+                # Left unacked to be delivered again
+                failed_event_ids.update(event_ids_by_type[event_type])
+        return (failed_event_ids, did_error)
 
     def _event_to_json(self, event: str, block_number: int, user_id: int, extra: Dict):
         event_dict = {
@@ -185,6 +403,53 @@ class ChallengeEventBus:
         return json.loads(event_json)
 
 
+def _get_event_age_sec(event_id) -> float:
+    """Returns the seconds since an event was added, from its stream id"""
+    if isinstance(event_id, bytes):
+        event_id = event_id.decode("utf-8")
+    return time.time() - int(event_id.split("-")[0]) / 1000
+
+
+def get_challenge_event_queue_stats(redis) -> Dict[str, Dict[str, Any]]:
+    """
+    Returns the number of events each challenge has left to process, counted up to
+    MAX_COUNTED_EVENTS, of which `pending` were read but not processed yet, and the
+    age of its oldest event left in seconds
+    """
+    try:
+        groups = redis.xinfo_groups(REDIS_STREAM_KEY)
+    except ResponseError:
+        # No event was ever dispatched
+        return {}
+    stats = {}
+    for group in groups:
+        challenge_id = group["name"]
+        if isinstance(challenge_id, bytes):
+            challenge_id = challenge_id.decode("utf-8")
+        pending = redis.xpending(REDIS_STREAM_KEY, challenge_id)
+        # last-delivered-id is inclusive, skip it
+        undelivered = [
+            event_id
+            for event_id, _ in redis.xrange(
+                REDIS_STREAM_KEY,
+                min=group["last-delivered-id"],
+                count=MAX_COUNTED_EVENTS + 1,
+            )
+            if event_id != group["last-delivered-id"]
+        ][:MAX_COUNTED_EVENTS]
+        oldest_event_id = pending["min"] if pending["pending"] else None
+        if oldest_event_id is None and undelivered:
+            oldest_event_id = undelivered[0]
+        stats[challenge_id] = {
+            "depth": pending["pending"] + len(undelivered),
+            "pending": pending["pending"],
+            "oldest_event_age_sec": _get_event_age_sec(oldest_event_id)
+            if oldest_event_id is not None
+            else None,
+        }
+    return stats
+
+
 def setup_challenge_bus():
     redis = get_redis()
     bus = ChallengeEventBus(redis)
@@ -1,8 +1,9 @@
+import concurrent.futures
 import datetime
+import threading
 import time
 import logging
-from typing import Tuple, Iterable, Union, Type, TypedDict, Any
-from sqlalchemy import or_
+from typing import Dict, List, Optional, Tuple, Iterable, Union, Type, TypedDict, Any
 
 from web3 import Web3
 from web3.contract import Contract, ContractEvent
@@ -16,6 +17,7 @@ from web3._utils.events import get_event_data
 from eth_abi.codec import ABICodec
 
 from src.models.models import AssociatedWallet, EthBlock, User
+from src.utils.block_cache import BlockCache
 from src.utils.helpers import redis_set_and_dump, redis_get_or_restore
 from src.queries.get_balances import enqueue_immediate_balance_refresh
 
@@ -33,8 +35,20 @@ MIN_SCAN_CHUNK_SIZE = 10
 # How many maximum blocks at the time we request from JSON-RPC
 # and we are unlikely to exceed the response size limit of the JSON-RPC server
 MAX_CHUNK_SCAN_SIZE = 10000
-# Factor how was we increase chunk size if no results found
+# Factor by which we increase or decrease the chunk size
 CHUNK_SIZE_INCREASE = 2
+# Chunks are sized for eth_get_logs responses to take about this many seconds
+TARGET_CHUNK_SCAN_SECONDS = 2
+# Chunks are sized to return at most about this many events
+TARGET_CHUNK_EVENTS = 500
+# How many eth_get_logs requests for consecutive block ranges are in flight at once
+MAX_CONCURRENT_REQUESTS = 4
+# How many eth_get_logs requests are sent per second at most
+MAX_REQUESTS_PER_SECOND = 10
+# How often the scanned events are processed and the last scanned block saved
+CHECKPOINT_INTERVAL_SECONDS = 30
+# Scanned events are also processed once this many are pending
+MAX_PENDING_EVENTS = 5000
 # initial number of blocks to scan, this number will increase/decrease as a function of whether transfer events have been found within the range of blocks scanned
 START_CHUNK_SIZE = 20
 # how many blocks from tail of chain we want to scan to
@@ -47,10 +61,28 @@ MIN_SCAN_START_BLOCK = 11103292
 class TransferEvent(TypedDict):
     logIndex: int
     transactionHash: Any
+    blockHash: Any
     blockNumber: int
+    event: str
     args: Any
 
 
+class RequestRateLimiter:
+    """Spaces the starts of requests at least 1 / max_requests_per_second apart"""
+
+    def __init__(self, max_requests_per_second: float):
+        self._interval = 1 / max_requests_per_second
+        self._next_request_time = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            request_time = max(now, self._next_request_time)
+            self._next_request_time = request_time + self._interval
+        time.sleep(request_time - now)
+
+
 class EventScanner:
     """Scan blockchain for events and try not to abuse JSON-RPC API too much.
 
@@ -70,6 +102,10 @@ class EventScanner:
         contract: Type[Contract],
         event_type: Type[ContractEvent],
         filters: dict,
+        max_concurrent_requests: int = MAX_CONCURRENT_REQUESTS,
+        max_requests_per_second: float = MAX_REQUESTS_PER_SECOND,
+        checkpoint_interval_seconds: float = CHECKPOINT_INTERVAL_SECONDS,
+        block_cache: Optional[BlockCache] = None,
     ):
         """
         :param db: database handle
@@ -79,6 +115,10 @@ class EventScanner:
         :param state: state manager to keep tracks of last scanned block and persisting events to db
         :param event_type: web3 Event we scan
         :param filters: Filters passed to get_logs e.g. { "address": <token-address> }
+        :param max_concurrent_requests: How many block ranges are fetched at once
+        :param max_requests_per_second: Rate limit of the eth_get_logs requests sent
+        :param checkpoint_interval_seconds: How often scanned events are processed and progress saved
+        :param block_cache: Cache of the chain's blocks, shared across scans
         """
 
         self.logger = logger
@@ -88,6 +128,10 @@ class EventScanner:
         self.web3 = web3
         self.event_type = event_type
         self.filters = filters
+        self.max_concurrent_requests = max_concurrent_requests
+        self.rate_limiter = RequestRateLimiter(max_requests_per_second)
+        self.checkpoint_interval_seconds = checkpoint_interval_seconds
+        self.block_cache = block_cache or BlockCache()
         self.last_scanned_block = MIN_SCAN_START_BLOCK
         self.latest_chain_block = self.web3.eth.blockNumber
 
@@ -105,7 +149,7 @@ class EventScanner:
         )
 
     def save(self, block_number: int):
-        """Save at the end of each chunk of blocks, so we can resume in the case of a crash or CTRL+C
+        """Save at each checkpoint, so we can resume in the case of a crash or CTRL+C
         Next time the scanner is started we will resume from this block
         """
         self.last_scanned_block = block_number
@@ -125,10 +169,12 @@ class EventScanner:
                 record = EthBlock(last_scanned_block=self.last_scanned_block)
             session.add(record)
 
-    def get_block_timestamp(self, block_num) -> Union[datetime.datetime, None]:
-        """Get Ethereum block timestamp"""
+    def get_block_timestamp(
+        self, block_identifier: BlockIdentifier
+    ) -> Union[datetime.datetime, None]:
+        """Get Ethereum block timestamp of a block number or hash"""
         try:
-            block_info = self.web3.eth.getBlock(block_num)
+            block_info = self.block_cache.get_block(self.web3, block_identifier)
         except BlockNotFound:
             # Block was not mined yet,
             # minor chain reorganisation?
@@ -148,9 +194,9 @@ class EventScanner:
         return self.last_scanned_block
 
     def process_event(
-        self, block_timestamp: datetime.datetime, event: TransferEvent
-    ) -> str:
-        """Record a ERC-20 transfer in our database."""
+        self, block_timestamp: Optional[datetime.datetime], event: TransferEvent
+    ) -> Dict[str, Any]:
+        """Convert a ERC-20 transfer to our internal format."""
         # Events are keyed by their transaction hash and log index
         # One transaction may contain multiple events
         # and each one of those gets their own log index
@@ -160,60 +206,87 @@ class EventScanner:
         txhash = event["transactionHash"].hex()  # Transaction hash
         block_number = event["blockNumber"]
 
-        # Convert ERC-20 Transfer event to our internal format
         args = event["args"]
-        transfer = {
+        return {
             "from": args["from"],
             "to": args["to"],
             "value": args["value"],
             "timestamp": block_timestamp,
+            # A pointer that allows us to look up this event later if needed
+            "id": f"{block_number}-{txhash}-{log_index}",
         }
 
-        # add user ids from the transfer event into the balance refresh queue
-        transfer_event_wallets = [transfer["from"].lower(), transfer["to"].lower()]
-        with self.db.scoped_session() as session:
-            result = (
-                session.query(User.user_id)
-                .outerjoin(AssociatedWallet, User.user_id == AssociatedWallet.user_id)
-                .filter(User.is_current == True)
-                .filter(AssociatedWallet.is_current == True)
-                .filter(AssociatedWallet.is_delete == False)
-                .filter(
-                    or_(
-                        User.wallet.in_(transfer_event_wallets),
-                        AssociatedWallet.wallet.in_(transfer_event_wallets),
-                    )
+    def process_events(self, events: List[TransferEvent]) -> List[str]:
+        """Record the ERC-20 transfers of `events`, enqueueing balance refreshes
+        for the users of every wallet involved at once.
+
+        :return: The pointers of the processed events
+        """
+        transfers = []
+        for evt in events:
+            # We cannot avoid minor chain reorganisations, but
+            # at least we must avoid blocks that are not mined yet
+            assert evt["logIndex"] is not None, "Somehow tried to scan a pending block"
+
+            # Get UTC time when this event happened (block mined timestamp).
+            # Blocks are looked up by hash, which stays valid through chain
+            # reorganisations, and are cached as many events share a block
+            block_timestamp = self.get_block_timestamp(evt["blockHash"])
+            if block_timestamp is None:
+                # The balances are refreshed from the chain either way
+                logger.warning(
+                    f'event_scanner.py | Block {evt["blockHash"].hex()} of event {evt["event"]} not found'
                 )
-                .all()
+
+            logger.debug(
+                f'event_scanner.py | Processing event {evt["event"]}, block:{evt["blockNumber"]}'
             )
+            transfers.append(self.process_event(block_timestamp, evt))
+
+        # add user ids from the transfer events into the balance refresh queue
+        wallets = list(
+            {
+                wallet.lower()
+                for transfer in transfers
+                for wallet in (transfer["from"], transfer["to"])
+            }
+        )
+        if wallets:
+            with self.db.scoped_session() as session:
+                user_wallet_query = session.query(User.user_id).filter(
+                    User.is_current == True, User.wallet.in_(wallets)
+                )
+                associated_wallet_query = session.query(
+                    AssociatedWallet.user_id
+                ).filter(
+                    AssociatedWallet.is_current == True,
+                    AssociatedWallet.is_delete == False,
+                    AssociatedWallet.wallet.in_(wallets),
+                )
+                result = user_wallet_query.union(associated_wallet_query).all()
             user_ids = [user_id for [user_id] in result]
             enqueue_immediate_balance_refresh(self.redis, user_ids)
 
-        # Return a pointer that allows us to look up this event later if needed
-        return f"{block_number}-{txhash}-{log_index}"
+        return [transfer["id"] for transfer in transfers]
+
+    def checkpoint(self, events: List[TransferEvent], block_number: int) -> List[str]:
+        """Process the events scanned up to `block_number` and save it as scanned"""
+        processed = self.process_events(events)
+        self.save(min(block_number, self.get_suggested_scan_end_block()))
+        return processed
 
     def scan_chunk(self, start_block, end_block) -> Tuple[int, list]:
-        """Read and process events between to block numbers.
+        """Read the events between two block numbers.
 
-        Dynamically decrease the size of the chunk in case the JSON-RPC server pukes out.
+        Dynamically decrease the size of the requests in case the JSON-RPC server
+        pukes out, until the whole range is read.
 
-        :return: tuple(actual end block number, when this block was mined, processed events)
+        :return: tuple(end block number, events)
         """
 
-        block_timestamps = {}
-        get_block_timestamp = self.get_block_timestamp
-
-        # Cache block timestamps to reduce some RPC overhead
-        # Real solution might include smarter models around block
-        def get_block_mined_timestamp(block_num):
-            if block_num not in block_timestamps:
-                block_timestamps[block_num] = get_block_timestamp(block_num)
-            return block_timestamps[block_num]
-
-        all_processed = []
-
         # Callable that takes care of the underlying web3 call
         def _fetch_events(from_block, to_block):
+            self.rate_limiter.wait()
             return _fetch_events_for_all_contracts(
                 self.web3,
                 self.event_type,
@@ -222,56 +295,51 @@ class EventScanner:
                 to_block=to_block,
             )
 
-        # Do `n` retries on `eth_get_logs`,
-        # throttle down block range if needed
-        end_block, events = _retry_web3_call(
-            _fetch_events, start_block=start_block, end_block=end_block
-        )
-
-        for evt in events:
-            idx = evt[
-                "logIndex"
-            ]  # Integer of the log index position in the block, null when its pending
-
-            # We cannot avoid minor chain reorganisations, but
-            # at least we must avoid blocks that are not mined yet
-            assert idx is not None, "Somehow tried to scan a pending block"
-
-            block_number = evt["blockNumber"]
-
-            # Get UTC time when this event happened (block mined timestamp)
-            # from our in-memory cache
-            block_timestamp = get_block_mined_timestamp(block_number)
-
-            logger.debug(
-                f'event_scanner.py | Processing event {evt["event"]}, block:{evt["blockNumber"]}'
+        events: list = []
+        current_block = start_block
+        while current_block <= end_block:
+            # Do `n` retries on `eth_get_logs`,
+            # throttle down block range if needed
+            actual_end_block, new_events = _retry_web3_call(
+                _fetch_events, start_block=current_block, end_block=end_block
             )
-            processed = self.process_event(block_timestamp, evt)
-            all_processed.append(processed)
+            events += new_events
+            current_block = actual_end_block + 1
+        return end_block, events
 
-        return end_block, all_processed
+    def _scan_chunk_timed(self, start_block, end_block) -> Tuple[int, list, float]:
+        start = time.time()
+        actual_end_block, events = self.scan_chunk(start_block, end_block)
+        return actual_end_block, events, time.time() - start
 
-    def estimate_next_chunk_size(self, current_chuck_size: int, event_found_count: int):
+    def estimate_next_chunk_size(
+        self, current_chuck_size: int, event_found_count: int, scan_duration: float
+    ):
         """Try to figure out optimal chunk size
 
         Our scanner might need to scan the whole blockchain for all events
 
         * We want to minimize API calls over empty blocks
-        * We want to make sure that one scan chunk does not try to process too many entries once, as we try to control commit buffer size and potentially asynchronous busy loop
-        * Do not overload node serving JSON-RPC API by asking data for too many events at a time
+        * We want to make sure that one scan chunk does not return too many entries at once
+        * Do not overload node serving JSON-RPC API by asking data for too many blocks at a time
 
         Currently Ethereum JSON-API does not have an API to tell when a first event occured in a blockchain
-        and our heuristics try to accelerate block fetching (chunk size) until we see the first event.
+        and our heuristics try to accelerate block fetching (chunk size) while responses are quick and small.
 
-        These heurestics exponentially increase the scan chunk size depending on if we are seeing events or not.
-        When any transfers are encountered, we are back to scanning only a few blocks at a time.
-        It does not make sense to do a full chain scan starting from block 1, doing one JSON-RPC call per 20 blocks.
+        These heurestics exponentially increase the scan chunk size while chunks take well under
+        TARGET_CHUNK_SCAN_SECONDS and return well under TARGET_CHUNK_EVENTS, and decrease it when
+        either is exceeded.
         """
 
-        if event_found_count > 0:
-            # When we encounter first events, reset the chunk size window
-            current_chuck_size = MIN_SCAN_CHUNK_SIZE
-        else:
+        if (
+            scan_duration > TARGET_CHUNK_SCAN_SECONDS
+            or event_found_count > TARGET_CHUNK_EVENTS
+        ):
+            current_chuck_size //= CHUNK_SIZE_INCREASE
+        elif (
+            scan_duration * CHUNK_SIZE_INCREASE < TARGET_CHUNK_SCAN_SECONDS
+            and event_found_count * CHUNK_SIZE_INCREASE < TARGET_CHUNK_EVENTS
+        ):
             current_chuck_size *= CHUNK_SIZE_INCREASE
 
         current_chuck_size = max(MIN_SCAN_CHUNK_SIZE, current_chuck_size)
@@ -286,6 +354,10 @@ class EventScanner:
     ) -> Tuple[list, int]:
         """Perform a token events scan.
 
+        Up to `max_concurrent_requests` consecutive chunks are fetched at once. Events
+        are processed and the last scanned block saved at each checkpoint, covering
+        the chunks scanned without gaps since the previous one.
+
         :param start_block: The first block included in the scan
         :param end_block: The last block included in the scan
         :param start_chunk_size: How many blocks we try to fetch over JSON-RPC on the first attempt
@@ -293,49 +365,81 @@ class EventScanner:
         :return: [All processed events, number of chunks used]
         """
 
-        current_block = start_block
+        # The first block not scanned yet, and the first not requested yet
+        current_block = next_block = start_block
 
-        # Scan in chunks, commit between
         chunk_size = start_chunk_size
-        last_scan_duration = last_logs_found = 0
         total_chunks_scanned = 0
 
+        # Chunks scanned ahead of current_block, by start block
+        scanned_chunks: Dict[int, Tuple[int, list]] = {}
+        # Events scanned since the last checkpoint
+        pending_events: list = []
+        last_checkpoint_time = time.time()
+        last_checkpoint_block = start_block - 1
+
         # All processed entries we got on this scan cycle
         all_processed = []
 
-        while current_block <= end_block:
-
-            # Print some diagnostics to logs to try to fiddle with real world JSON-RPC API performance
-            estimated_end_block = min(
-                current_block + chunk_size, self.get_suggested_scan_end_block()
-            )
-            logger.debug(
-                "event_scanner.py | Scanning token transfers for blocks: %d - %d, chunk size %d, last chunk scan took %f, last logs found %d",
-                current_block,
-                estimated_end_block,
-                chunk_size,
-                last_scan_duration,
-                last_logs_found,
-            )
-
-            start = time.time()
-            actual_end_block, new_entries = self.scan_chunk(
-                current_block, estimated_end_block
-            )
-
-            # Where does our current chunk scan ends - are we out of chain yet?
-            current_end = actual_end_block
-
-            last_scan_duration = int(time.time() - start)
-            all_processed += new_entries
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.max_concurrent_requests
+        ) as executor:
+            requests: Dict[concurrent.futures.Future, int] = {}
+            while current_block <= end_block:
+                while (
+                    next_block <= end_block
+                    and len(requests) < self.max_concurrent_requests
+                ):
+                    chunk_end_block = min(next_block + chunk_size - 1, end_block)
+                    logger.debug(
+                        "event_scanner.py | Scanning token transfers for blocks: %d - %d, chunk size %d",
+                        next_block,
+                        chunk_end_block,
+                        chunk_size,
+                    )
+                    future = executor.submit(
+                        self._scan_chunk_timed, next_block, chunk_end_block
+                    )
+                    requests[future] = next_block
+                    next_block = chunk_end_block + 1
 
-            # Try to guess how many blocks to fetch over `eth_get_logs` API next time
-            chunk_size = self.estimate_next_chunk_size(chunk_size, len(new_entries))
+                done, _ = concurrent.futures.wait(
+                    requests, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    chunk_start_block = requests.pop(future)
+                    chunk_end_block, events, scan_duration = future.result()
+                    scanned_chunks[chunk_start_block] = (chunk_end_block, events)
+                    total_chunks_scanned += 1
+
+                    # Try to guess how many blocks to fetch over `eth_get_logs` API next time
+                    chunk_size = self.estimate_next_chunk_size(
+                        chunk_size, len(events), scan_duration
+                    )
+                    logger.debug(
+                        "event_scanner.py | Scanned blocks %d - %d in %f seconds, logs found %d",
+                        chunk_start_block,
+                        chunk_end_block,
+                        scan_duration,
+                        len(events),
+                    )
 
-            # Set where the next chunk starts
-            current_block = current_end + 1
-            total_chunks_scanned += 1
-            self.save(min(current_end, self.get_suggested_scan_end_block()))
+                # Move past the chunks scanned without gaps
+                while current_block in scanned_chunks:
+                    chunk_end_block, events = scanned_chunks.pop(current_block)
+                    pending_events += events
+                    current_block = chunk_end_block + 1
+
+                if current_block - 1 > last_checkpoint_block and (
+                    current_block > end_block
+                    or len(pending_events) >= MAX_PENDING_EVENTS
+                    or time.time() - last_checkpoint_time
+                    >= self.checkpoint_interval_seconds
+                ):
+                    all_processed += self.checkpoint(pending_events, current_block - 1)
+                    pending_events = []
+                    last_checkpoint_time = time.time()
+                    last_checkpoint_block = current_block - 1
 
         return all_processed, total_chunks_scanned
 
@@ -0,0 +1,94 @@
+import random
+import time
+from unittest import mock
+
+from src.eth_indexing.event_scanner import (
+    MAX_CHUNK_SCAN_SIZE,
+    MIN_SCAN_CHUNK_SIZE,
+    TARGET_CHUNK_EVENTS,
+    TARGET_CHUNK_SCAN_SECONDS,
+    EventScanner,
+)
+
+
+def make_scanner(**kwargs):
+    web3 = mock.Mock()
+    web3.eth.blockNumber = 1001
+    scanner = EventScanner(
+        db=None,
+        redis=None,
+        web3=web3,
+        contract=None,
+        event_type=None,
+        filters={},
+        **kwargs,
+    )
+    scanner.process_events = mock.Mock(
+        side_effect=lambda events: [evt["blockNumber"] for evt in events]
+    )
+    scanner.save = mock.Mock()
+    return scanner
+
+
+@mock.patch("src.eth_indexing.event_scanner._fetch_events_for_all_contracts")
+def test_scan(fetch_events):
+    """Test that concurrently scanned chunks are checkpointed in block order"""
+    event_blocks = [100, 150, 151, 420, 999, 1000]
+
+    def get_events(*_, from_block, to_block):
+        # respond out of order
+        time.sleep(random.random() / 100)
+        return [
+            {"blockNumber": block, "logIndex": 0}
+            for block in event_blocks
+            if from_block <= block <= to_block
+        ]
+
+    fetch_events.side_effect = get_events
+    scanner = make_scanner(max_concurrent_requests=4, max_requests_per_second=1000)
+    processed, total_chunks_scanned = scanner.scan(100, 1000, start_chunk_size=20)
+
+    assert processed == event_blocks
+    assert total_chunks_scanned == fetch_events.call_count
+    requested_blocks = sorted(
+        (call.kwargs["from_block"], call.kwargs["to_block"])
+        for call in fetch_events.call_args_list
+    )
+    assert requested_blocks[0][0] == 100
+    assert requested_blocks[-1][1] == 1000
+    for (_, end_block), (start_block, _) in zip(requested_blocks, requested_blocks[1:]):
+        assert start_block == end_block + 1
+    scanner.save.assert_called_with(1000)
+
+
+@mock.patch("src.eth_indexing.event_scanner._fetch_events_for_all_contracts")
+def test_scan_checkpoints(fetch_events):
+    """Test that progress is saved at the checkpoint interval"""
+    fetch_events.return_value = []
+    scanner = make_scanner(max_concurrent_requests=1, checkpoint_interval_seconds=0)
+    scanner.scan(0, 99, start_chunk_size=MIN_SCAN_CHUNK_SIZE)
+
+    saved_blocks = [call.args[0] for call in scanner.save.call_args_list]
+    assert saved_blocks == sorted(saved_blocks)
+    assert len(saved_blocks) == fetch_events.call_count
+    assert saved_blocks[-1] == 99
+
+
+def test_estimate_next_chunk_size():
+    scanner = make_scanner()
+    # fast, empty chunks grow
+    assert scanner.estimate_next_chunk_size(100, 0, 0.1) == 200
+    # slow or busy chunks shrink
+    assert scanner.estimate_next_chunk_size(100, 0, TARGET_CHUNK_SCAN_SECONDS + 1) == 50
+    assert scanner.estimate_next_chunk_size(100, TARGET_CHUNK_EVENTS + 1, 0.1) == 50
+    # chunks near the targets are kept
+    assert scanner.estimate_next_chunk_size(100, TARGET_CHUNK_EVENTS - 1, 0.1) == 100
+    # chunk sizes are bounded
+    assert (
+        scanner.estimate_next_chunk_size(MAX_CHUNK_SCAN_SIZE, 0, 0)
+        == MAX_CHUNK_SCAN_SIZE
+    )
+    assert (
+        scanner.estimate_next_chunk_size(MIN_SCAN_CHUNK_SIZE, 0, 10)
+        == MIN_SCAN_CHUNK_SIZE
+    )
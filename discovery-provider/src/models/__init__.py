@@ -1,5 +1,7 @@
 from .models import (
     AggregateDailyAppNameMetrics,
+    AggregateDailyReposts,
+    AggregateDailySaves,
     AggregateDailyTotalUsersMetrics,
     AggregateDailyUniqueUsersMetrics,
     AggregateMonthlyAppNameMetrics,
@@ -46,6 +48,7 @@ from .models import (
     UserBalance,
     UserChallenge,
 )
+from .notification_log import NotificationLog
 from .related_artist import RelatedArtist
 from .track_route import TrackRoute
 from .user_bank import UserBankTransaction
@@ -54,6 +57,8 @@ from .user_events import UserEvents
 
 __all__ = [
     "AggregateDailyAppNameMetrics",
+    "AggregateDailyReposts",
+    "AggregateDailySaves",
     "AggregateDailyTotalUsersMetrics",
     "AggregateDailyUniqueUsersMetrics",
     "AggregateMonthlyAppNameMetrics",
@@ -77,6 +82,7 @@ __all__ = [
     "ChallengeType",
     "Follow",
     "IPLDBlacklistBlock",
+    "NotificationLog",
     "Play",
     "Playlist",
     "ProfileCompletionChallenge",
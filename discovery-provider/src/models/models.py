@@ -978,6 +978,42 @@ repost_count={self.repost_count},\
 save_count={self.save_count}>"
 
 
+class AggregateDailyReposts(Base):
+    __tablename__ = "aggregate_daily_reposts"
+
+    repost_item_id = Column(Integer, nullable=False)
+    repost_type = Column(Enum(RepostType), nullable=False)
+    timestamp = Column(Date, nullable=False)  # zeroed out to the day
+    count = Column(Integer, nullable=False)
+
+    PrimaryKeyConstraint(repost_item_id, repost_type, timestamp)
+
+    def __repr__(self):
+        return f"<AggregateDailyReposts(\
+repost_item_id={self.repost_item_id},\
+repost_type={self.repost_type},\
+timestamp={self.timestamp},\
+count={self.count}>"
+
+
+class AggregateDailySaves(Base):
+    __tablename__ = "aggregate_daily_saves"
+
+    save_item_id = Column(Integer, nullable=False)
+    save_type = Column(Enum(SaveType), nullable=False)
+    timestamp = Column(Date, nullable=False)  # zeroed out to the day
+    count = Column(Integer, nullable=False)
+
+    PrimaryKeyConstraint(save_item_id, save_type, timestamp)
+
+    def __repr__(self):
+        return f"<AggregateDailySaves(\
+save_item_id={self.save_item_id},\
+save_type={self.save_type},\
+timestamp={self.timestamp},\
+count={self.count}>"
+
+
 class SkippedTransaction(Base):
     __tablename__ = "skipped_transactions"
 
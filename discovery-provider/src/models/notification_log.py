@@ -0,0 +1,40 @@
+from sqlalchemy import Column, DateTime, Integer, PrimaryKeyConstraint, String
+from sqlalchemy.dialects import postgresql
+from .models import Base
+
+
+class NotificationLog(Base):
+    """
+    Notifications appended by the indexer as each block is indexed, in the shape
+    served by the notifications route, so it can read a block range instead of
+    deriving them from the follows, saves, reposts, tracks and playlists.
+
+    The table is partitioned by range of blocknumber, see src/tasks/notification_log.py.
+    milestone_count is the follower, favorite or repost count of the notification's
+    target as of its block.
+    """
+
+    __tablename__ = "notification_log"
+
+    blocknumber = Column(Integer, nullable=False)
+    # Position of the notification within its block
+    idx = Column(Integer, nullable=False)
+    blockhash = Column(String, nullable=False)
+    type = Column(String, nullable=False)
+    timestamp = Column(DateTime, nullable=False)
+    initiator = Column(Integer, nullable=False)
+    notification_metadata = Column("metadata", postgresql.JSONB, nullable=True)
+    milestone_count = Column(Integer, nullable=True)
+
+    PrimaryKeyConstraint(blocknumber, idx)
+
+    def __repr__(self):
+        return f"<NotificationLog(\
+blocknumber={self.blocknumber},\
+idx={self.idx},\
+blockhash={self.blockhash},\
+type={self.type},\
+timestamp={self.timestamp},\
+initiator={self.initiator},\
+notification_metadata={self.notification_metadata},\
+milestone_count={self.milestone_count}>"
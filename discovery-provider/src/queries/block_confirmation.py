@@ -2,6 +2,7 @@ import logging
 from flask import Blueprint, request
 from src.queries.get_block_confirmation import get_block_confirmation
 from src.api_helpers import success_response, error_response
+from src.utils.indexed_block_watcher import get_indexed_block_watcher
 
 logger = logging.getLogger(__name__)
 
@@ -12,12 +13,16 @@ bp = Blueprint("block_confirmation", __name__)
 def block_confirmation():
     blockhash = request.args.get("blockhash")
     blocknumber = request.args.get("blocknumber", type=int)
+    # Optional seconds to wait for the block to be indexed before responding
+    timeout = request.args.get("timeout", type=int)
     response = {"block_found": False, "block_passed": False}
     bad_request = True
     if blockhash is not None and blocknumber is not None:
         bad_request = False
         logger.info(f"block_confirmation | ARGS: {blockhash, blocknumber}")
         try:
+            if timeout:
+                get_indexed_block_watcher().wait_for_block(blocknumber, timeout)
             response = get_block_confirmation(blockhash, blocknumber)
         except Exception as e:
             return error_response(e)
@@ -1,6 +1,8 @@
 import logging
+import threading
+import time
 from datetime import datetime, timedelta
-from typing import List
+from typing import Dict, List
 from redis import Redis
 from sqlalchemy.orm.session import Session
 from src.models import UserBalance
@@ -10,8 +12,49 @@ logger = logging.getLogger(__name__)
 # How stale of a zero user balance we tolerate before refreshing
 BALANCE_REFRESH = 12 * 60 * 60
 
-LAZY_REFRESH_REDIS_PREFIX = "USER_BALANCE_REFRESH_LAZY"
-IMMEDIATE_REFRESH_REDIS_PREFIX = "USER_BALANCE_REFRESH_IMMEDIATE"
+# Redis Key Convention:
+# user_balances:refresh:lazy - sorted set of user ids scored by when their
+#   balance refresh is due
+# user_balances:refresh:immediate - sorted set of user ids scored by when their
+#   balance refresh was last requested, refreshed ahead of the lazy queue
+LAZY_REFRESH_REDIS_PREFIX = "user_balances:refresh:lazy"
+IMMEDIATE_REFRESH_REDIS_PREFIX = "user_balances:refresh:immediate"
+# Sets of user ids the refreshes were queued in before the sorted sets, drained
+# into them by the balance refresh task
+LEGACY_LAZY_REFRESH_REDIS_KEY = "USER_BALANCE_REFRESH_LAZY"
+LEGACY_IMMEDIATE_REFRESH_REDIS_KEY = "USER_BALANCE_REFRESH_IMMEDIATE"
+
+# A stale balance read while it needs a refresh is refreshed at most this many
+# seconds later, bounding how stale a served balance can be. Balances never
+# fetched before are due as soon as they're read.
+LAZY_REFRESH_MAX_DELAY_SEC = 10 * 60
+# Each further read of a balance awaiting refresh moves its refresh this many
+# seconds earlier, so frequently read balances are refreshed first
+LAZY_REFRESH_READ_WEIGHT_SEC = 60
+
+# Users this process enqueued for a lazy refresh within this many seconds
+# aren't enqueued again, so every read of a user doesn't write to redis
+LAZY_REFRESH_DEDUPE_SEC = 60
+_lazy_refresh_enqueued_until: Dict[int, float] = {}
+_lazy_refresh_lock = threading.Lock()
+
+# Schedules the user ids in ARGV[4:] in the KEYS[1] lazy refresh queue. New users
+# are due ARGV[2] seconds after ARGV[1] (now), queued users are moved ARGV[3]
+# seconds earlier, and no later than ARGV[2] seconds after now, but not before now.
+_ENQUEUE_LAZY_REFRESH_SCRIPT = """
+local now = tonumber(ARGV[1])
+for i = 4, #ARGV do
+    local due = redis.call('zscore', KEYS[1], ARGV[i])
+    if due then
+        due = math.min(tonumber(due) - tonumber(ARGV[3]), now + tonumber(ARGV[2]))
+        due = math.max(now, due)
+    else
+        due = now + tonumber(ARGV[2])
+    end
+    redis.call('zadd', KEYS[1], due, ARGV[i])
+end
+return #ARGV - 3
+"""
 
 
 def does_user_balance_need_refresh(user_balance: UserBalance) -> bool:
@@ -20,27 +63,72 @@ def does_user_balance_need_refresh(user_balance: UserBalance) -> bool:
         - If we've never updated before (new balance entry), update now
         - If the balance has not been updated in BALANCE_REFRESH seconds
     """
+    return does_balance_need_refresh(user_balance.created_at, user_balance.updated_at)
 
-    if user_balance.updated_at == user_balance.created_at:
+
+def does_balance_need_refresh(created_at: datetime, updated_at: datetime) -> bool:
+    if updated_at == created_at:
         return True
 
     delta = timedelta(seconds=BALANCE_REFRESH)
-    needs_refresh = user_balance.updated_at < (datetime.now() - delta)
+    needs_refresh = updated_at < (datetime.now() - delta)
     return needs_refresh
 
 
-def enqueue_lazy_balance_refresh(redis: Redis, user_ids: List[int]):
-    # unsafe to call redis.sadd w/ empty array
+def to_balance_dict(
+    balance, associated_wallets_balance, associated_sol_wallets_balance
+):
+    return {
+        "owner_wallet_balance": balance,
+        "associated_wallets_balance": associated_wallets_balance,
+        "associated_sol_wallets_balance": associated_sol_wallets_balance,
+        "total_balance": str(
+            int(balance)
+            + int(associated_wallets_balance)
+            + (int(associated_sol_wallets_balance) * 10**9)
+        ),
+    }
+
+
+def enqueue_lazy_balance_refresh(
+    redis: Redis, user_ids: List[int], max_delay_sec: int = LAZY_REFRESH_MAX_DELAY_SEC
+):
+    now = time.monotonic()
+    with _lazy_refresh_lock:
+        user_ids = [
+            user_id
+            for user_id in set(user_ids)
+            if _lazy_refresh_enqueued_until.get(user_id, 0) <= now
+        ]
+        # Forget expired entries once in a while rather than on every call
+        if len(_lazy_refresh_enqueued_until) > 100000:
+            for user_id, until in list(_lazy_refresh_enqueued_until.items()):
+                if until <= now:
+                    del _lazy_refresh_enqueued_until[user_id]
+        for user_id in user_ids:
+            _lazy_refresh_enqueued_until[user_id] = now + LAZY_REFRESH_DEDUPE_SEC
+
     if not user_ids:
         return
-    redis.sadd(LAZY_REFRESH_REDIS_PREFIX, *user_ids)
+    redis.eval(
+        _ENQUEUE_LAZY_REFRESH_SCRIPT,
+        1,
+        LAZY_REFRESH_REDIS_PREFIX,
+        time.time(),
+        max_delay_sec,
+        LAZY_REFRESH_READ_WEIGHT_SEC,
+        *user_ids,
+    )
 
 
 def enqueue_immediate_balance_refresh(redis: Redis, user_ids: List[int]):
-    # unsafe to call redis.sadd w/ empty array
+    # unsafe to call redis.zadd w/ empty mapping
     if not user_ids:
         return
-    redis.sadd(IMMEDIATE_REFRESH_REDIS_PREFIX, *user_ids)
+    now = time.time()
+    redis.zadd(
+        IMMEDIATE_REFRESH_REDIS_PREFIX, {str(user_id): now for user_id in user_ids}
+    )
 
 
 def get_balances(session: Session, redis: Redis, user_ids: List[int]):
@@ -55,16 +143,11 @@ def get_balances(session: Session, redis: Redis, user_ids: List[int]):
 
     # Construct result dict from query result
     result = {
-        user_balance.user_id: {
-            "owner_wallet_balance": user_balance.balance,
-            "associated_wallets_balance": user_balance.associated_wallets_balance,
-            "associated_sol_wallets_balance": user_balance.associated_sol_wallets_balance,
-            "total_balance": str(
-                int(user_balance.balance)
-                + int(user_balance.associated_wallets_balance)
-                + (int(user_balance.associated_sol_wallets_balance) * 10 ** 9)
-            ),
-        }
+        user_balance.user_id: to_balance_dict(
+            user_balance.balance,
+            user_balance.associated_wallets_balance,
+            user_balance.associated_sol_wallets_balance,
+        )
         for user_balance in query
     }
 
@@ -85,16 +168,25 @@ def get_balances(session: Session, redis: Redis, user_ids: List[int]):
     }
     result.update(no_balance_dict)
 
-    # Get old balances that need refresh
+    # Get balances that were never fetched and old balances that need refresh
+    never_refreshed = [
+        user_balance.user_id
+        for user_balance in query
+        if user_balance.updated_at == user_balance.created_at
+    ]
     needs_refresh = [
         user_balance.user_id
         for user_balance in query
-        if does_user_balance_need_refresh(user_balance)
+        if user_balance.updated_at != user_balance.created_at
+        and does_user_balance_need_refresh(user_balance)
     ]
 
-    # Enqueue new balances to Redis refresh queue
-    # 1. All users who need a new balance
-    # 2. All users who need a balance refresh
-    enqueue_lazy_balance_refresh(redis, list(needs_balance_set) + needs_refresh)
+    # Enqueue balances to Redis refresh queue
+    # 1. All users who need a new balance are due now, they're served as 0 until then
+    # 2. All users who need a balance refresh are due by how often they're read
+    enqueue_lazy_balance_refresh(
+        redis, list(needs_balance_set) + never_refreshed, max_delay_sec=0
+    )
+    enqueue_lazy_balance_refresh(redis, needs_refresh)
 
     return result
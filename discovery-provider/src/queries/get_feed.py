@@ -3,10 +3,11 @@ from sqlalchemy import func, desc, or_, and_
 
 from src import api_helpers
 from src.models import Track, Repost, RepostType, Follow, Playlist, SaveType
-from src.utils import helpers
 from src.utils.db_session import get_db_read_replica
 from src.queries import response_name_constants
+from src.queries.get_unpopulated_playlists import get_unpopulated_playlists
 from src.queries.get_unpopulated_tracks import get_unpopulated_tracks
+from src.queries.projection_profiles import feed_playlist_columns, feed_track_columns
 from src.queries.query_helpers import (
     get_current_user_id,
     populate_track_metadata,
@@ -16,11 +17,513 @@ from src.queries.query_helpers import (
     get_users_by_id,
     get_users_ids,
 )
+from src.utils.feed_store import (
+    ORIGINAL,
+    PLAYLIST,
+    REPOST,
+    TRACK,
+    MAX_FEED_ENTRIES,
+    feed_entry,
+    get_playlist_tracks,
+    is_feed_store_enabled,
+    parse_feed_entry,
+    queue_feed_warmup,
+    read_feed,
+    set_playlist_tracks,
+    to_score,
+    write_feed,
+)
+from src.utils.redis_connection import get_redis
 
 
 trackDedupeMaxMinutes = 10
 
 
+def is_released_with_playlist(
+    track_owner_id, track_created_at, playlist_owner_id, playlist_created_at
+):
+    """Whether a track was created by the playlist owner in the "same action" as the playlist,
+    i.e. within trackDedupeMaxMinutes before it, in which case the feed only shows the playlist
+    """
+    max_timedelta = datetime.timedelta(minutes=trackDedupeMaxMinutes)
+    return (
+        track_owner_id == playlist_owner_id
+        and track_created_at <= playlist_created_at
+        and playlist_created_at - track_created_at <= max_timedelta
+    )
+
+
+def get_feed_entries(session, followee_user_ids, feed_filter, tracks_only):
+    """Queries the tracks and playlists created or reposted by followees, along with the
+    oldest followee repost of each reposted item. Returns None if a playlist track is missing.
+    """
+    # track_id / playlist_id -> oldest followee repost timestamp
+    track_repost_timestamp_dict = {}
+    playlist_repost_timestamp_dict = {}
+
+    # Fetch followee creations if requested
+    if feed_filter in ["original", "all"]:
+        if not tracks_only:
+            # Query playlists posted by followees, sorted and paginated by created_at desc
+            created_playlists_query = (
+                session.query(*feed_playlist_columns)
+                .filter(
+                    Playlist.is_current == True,
+                    Playlist.is_delete == False,
+                    Playlist.is_private == False,
+                    Playlist.playlist_owner_id.in_(followee_user_ids),
+                )
+                .order_by(desc(Playlist.created_at))
+            )
+            created_playlists = paginate_query(created_playlists_query, False).all()
+
+            # get track ids for all tracks in playlists
+            playlist_track_ids = set()
+            for playlist in created_playlists:
+                for track in playlist.playlist_contents["track_ids"]:
+                    playlist_track_ids.add(track["track"])
+
+            # get all track objects for track ids
+            playlist_tracks = get_unpopulated_tracks(session, playlist_track_ids)
+            playlist_tracks_dict = {
+                track["track_id"]: track for track in playlist_tracks
+            }
+
+            # get all track ids that have same owner as playlist and created in "same action"
+            # "same action": track created within [x time] before playlist creation
+            tracks_to_dedupe = set()
+            for playlist in created_playlists:
+                for track_entry in playlist.playlist_contents["track_ids"]:
+                    track = playlist_tracks_dict.get(track_entry["track"])
+                    if not track:
+                        return None
+                    if is_released_with_playlist(
+                        track["owner_id"],
+                        track["created_at"],
+                        playlist.playlist_owner_id,
+                        playlist.created_at,
+                    ):
+                        tracks_to_dedupe.add(track["track_id"])
+            tracks_to_dedupe = list(tracks_to_dedupe)
+        else:
+            # No playlists to consider
+            tracks_to_dedupe = []
+            created_playlists = []
+
+        # Query tracks posted by followees, sorted & paginated by created_at desc
+        # exclude tracks that were posted in "same action" as playlist
+        created_tracks_query = (
+            session.query(*feed_track_columns)
+            .filter(
+                Track.is_current == True,
+                Track.is_delete == False,
+                Track.is_unlisted == False,
+                Track.stem_of == None,
+                Track.owner_id.in_(followee_user_ids),
+                Track.track_id.notin_(tracks_to_dedupe),
+            )
+            .order_by(desc(Track.created_at))
+        )
+        created_tracks = paginate_query(created_tracks_query, False).all()
+
+        # extract created_track_ids and created_playlist_ids
+        created_track_ids = [track.track_id for track in created_tracks]
+        created_playlist_ids = [playlist.playlist_id for playlist in created_playlists]
+
+    # Fetch followee reposts if requested
+    if feed_filter in ["repost", "all"]:
+        # query items reposted by followees, sorted by oldest followee repost of item;
+        # paginated by most recent repost timestamp
+        repost_subquery = session.query(Repost).filter(
+            Repost.is_current == True,
+            Repost.is_delete == False,
+            Repost.user_id.in_(followee_user_ids),
+        )
+        # exclude items also created by followees to guarantee order determinism, in case of "all" filter
+        if feed_filter == "all":
+            repost_subquery = repost_subquery.filter(
+                or_(
+                    and_(
+                        Repost.repost_type == RepostType.track,
+                        Repost.repost_item_id.notin_(created_track_ids),
+                    ),
+                    and_(
+                        Repost.repost_type != RepostType.track,
+                        Repost.repost_item_id.notin_(created_playlist_ids),
+                    ),
+                )
+            )
+        repost_subquery = repost_subquery.subquery()
+
+        repost_query = (
+            session.query(
+                repost_subquery.c.repost_item_id,
+                repost_subquery.c.repost_type,
+                func.min(repost_subquery.c.created_at).label("min_created_at"),
+            )
+            .group_by(repost_subquery.c.repost_item_id, repost_subquery.c.repost_type)
+            .order_by(desc("min_created_at"))
+        )
+        followee_reposts = paginate_query(repost_query, False).all()
+
+        # build dict of track_id / playlist_id -> oldest followee repost timestamp from followee_reposts above
+        for (
+            repost_item_id,
+            repost_type,
+            oldest_followee_repost_timestamp,
+        ) in followee_reposts:
+            if repost_type == RepostType.track:
+                track_repost_timestamp_dict[
+                    repost_item_id
+                ] = oldest_followee_repost_timestamp
+            elif repost_type in (RepostType.playlist, RepostType.album):
+                playlist_repost_timestamp_dict[
+                    repost_item_id
+                ] = oldest_followee_repost_timestamp
+
+        # extract reposted_track_ids and reposted_playlist_ids
+        reposted_track_ids = list(track_repost_timestamp_dict.keys())
+        reposted_playlist_ids = list(playlist_repost_timestamp_dict.keys())
+
+        # Query tracks reposted by followees
+        reposted_tracks = session.query(*feed_track_columns).filter(
+            Track.is_current == True,
+            Track.is_delete == False,
+            Track.is_unlisted == False,
+            Track.stem_of == None,
+            Track.track_id.in_(reposted_track_ids),
+        )
+        # exclude tracks already fetched from above, in case of "all" filter
+        if feed_filter == "all":
+            reposted_tracks = reposted_tracks.filter(
+                Track.track_id.notin_(created_track_ids)
+            )
+        reposted_tracks = reposted_tracks.order_by(desc(Track.created_at)).all()
+
+        if not tracks_only:
+            # Query playlists reposted by followees, excluding playlists already fetched from above
+            reposted_playlists = session.query(*feed_playlist_columns).filter(
+                Playlist.is_current == True,
+                Playlist.is_delete == False,
+                Playlist.is_private == False,
+                Playlist.playlist_id.in_(reposted_playlist_ids),
+            )
+            # exclude playlists already fetched from above, in case of "all" filter
+            if feed_filter == "all":
+                reposted_playlists = reposted_playlists.filter(
+                    Playlist.playlist_id.notin_(created_playlist_ids)
+                )
+            reposted_playlists = reposted_playlists.order_by(
+                desc(Playlist.created_at)
+            ).all()
+        else:
+            reposted_playlists = []
+
+    if feed_filter == "original":
+        tracks_to_process = created_tracks
+        playlists_to_process = created_playlists
+    elif feed_filter == "repost":
+        tracks_to_process = reposted_tracks
+        playlists_to_process = reposted_playlists
+    else:
+        tracks_to_process = created_tracks + reposted_tracks
+        playlists_to_process = created_playlists + reposted_playlists
+
+    return (
+        tracks_to_process,
+        playlists_to_process,
+        track_repost_timestamp_dict,
+        playlist_repost_timestamp_dict,
+    )
+
+
+def get_playlist_release_tracks(session, playlists):
+    """Returns track_id -> playlist_id of the tracks released alongside `playlists`,
+    given as (playlist_id, playlist_owner_id, created_at, playlist_contents) rows
+    """
+    playlist_track_ids = {
+        track["track"]
+        for playlist in playlists
+        for track in playlist.playlist_contents["track_ids"]
+    }
+    if not playlist_track_ids:
+        return {}
+    tracks = (
+        session.query(Track.track_id, Track.owner_id, Track.created_at)
+        .filter(Track.is_current == True, Track.track_id.in_(playlist_track_ids))
+        .all()
+    )
+    tracks_dict = {track.track_id: track for track in tracks}
+
+    release_tracks = {}
+    for playlist in playlists:
+        for track_entry in playlist.playlist_contents["track_ids"]:
+            track = tracks_dict.get(track_entry["track"])
+            if track and is_released_with_playlist(
+                track.owner_id,
+                track.created_at,
+                playlist.playlist_owner_id,
+                playlist.created_at,
+            ):
+                release_tracks[track.track_id] = playlist.playlist_id
+    return release_tracks
+
+
+def build_stored_feed(session, redis, user_id, followee_user_ids):
+    """Writes the latest MAX_FEED_ENTRIES items created or reposted by followees to the user's feed"""
+    entries = {}
+    if followee_user_ids:
+        created_tracks = (
+            session.query(Track.track_id, Track.created_at)
+            .filter(
+                Track.is_current == True,
+                Track.is_delete == False,
+                Track.is_unlisted == False,
+                Track.stem_of == None,
+                Track.owner_id.in_(followee_user_ids),
+            )
+            .order_by(desc(Track.created_at))
+            .limit(MAX_FEED_ENTRIES)
+            .all()
+        )
+        for track_id, created_at in created_tracks:
+            entries[feed_entry(ORIGINAL, TRACK, track_id)] = to_score(created_at)
+
+        created_playlists = (
+            session.query(
+                Playlist.playlist_id,
+                Playlist.playlist_owner_id,
+                Playlist.created_at,
+                Playlist.playlist_contents,
+            )
+            .filter(
+                Playlist.is_current == True,
+                Playlist.is_delete == False,
+                Playlist.is_private == False,
+                Playlist.playlist_owner_id.in_(followee_user_ids),
+            )
+            .order_by(desc(Playlist.created_at))
+            .limit(MAX_FEED_ENTRIES)
+            .all()
+        )
+        for playlist in created_playlists:
+            entries[feed_entry(ORIGINAL, PLAYLIST, playlist.playlist_id)] = to_score(
+                playlist.created_at
+            )
+        set_playlist_tracks(
+            redis, get_playlist_release_tracks(session, created_playlists)
+        )
+
+        followee_reposts = (
+            session.query(
+                Repost.repost_item_id,
+                Repost.repost_type,
+                func.min(Repost.created_at).label("min_created_at"),
+            )
+            .filter(
+                Repost.is_current == True,
+                Repost.is_delete == False,
+                Repost.user_id.in_(followee_user_ids),
+            )
+            .group_by(Repost.repost_item_id, Repost.repost_type)
+            .order_by(desc("min_created_at"))
+            .limit(MAX_FEED_ENTRIES)
+            .all()
+        )
+        for repost_item_id, repost_type, min_created_at in followee_reposts:
+            kind = TRACK if repost_type == RepostType.track else PLAYLIST
+            entries[feed_entry(REPOST, kind, repost_item_id)] = to_score(min_created_at)
+
+    write_feed(redis, user_id, entries)
+
+
+def _load_stored_feed_entries(session, entries, followee_user_ids):
+    track_ids = [item_id for _, kind, item_id in entries if kind == TRACK]
+    playlist_ids = [item_id for _, kind, item_id in entries if kind == PLAYLIST]
+    tracks = (
+        session.query(*feed_track_columns)
+        .filter(
+            Track.is_current == True,
+            Track.is_delete == False,
+            Track.is_unlisted == False,
+            Track.stem_of == None,
+            Track.track_id.in_(track_ids),
+        )
+        .all()
+        if track_ids
+        else []
+    )
+    playlists = (
+        session.query(*feed_playlist_columns)
+        .filter(
+            Playlist.is_current == True,
+            Playlist.is_delete == False,
+            Playlist.is_private == False,
+            Playlist.playlist_id.in_(playlist_ids),
+        )
+        .all()
+        if playlist_ids
+        else []
+    )
+
+    # oldest followee repost of each reposted item, items no followee still reposts are dropped
+    reposted_track_ids = [
+        item_id
+        for source, kind, item_id in entries
+        if source == REPOST and kind == TRACK
+    ]
+    reposted_playlist_ids = [
+        item_id
+        for source, kind, item_id in entries
+        if source == REPOST and kind == PLAYLIST
+    ]
+    track_repost_timestamp_dict = {}
+    playlist_repost_timestamp_dict = {}
+    if reposted_track_ids or reposted_playlist_ids:
+        followee_reposts = (
+            session.query(
+                Repost.repost_item_id,
+                Repost.repost_type,
+                func.min(Repost.created_at),
+            )
+            .filter(
+                Repost.is_current == True,
+                Repost.is_delete == False,
+                Repost.user_id.in_(followee_user_ids),
+                or_(
+                    and_(
+                        Repost.repost_type == RepostType.track,
+                        Repost.repost_item_id.in_(reposted_track_ids),
+                    ),
+                    and_(
+                        Repost.repost_type != RepostType.track,
+                        Repost.repost_item_id.in_(reposted_playlist_ids),
+                    ),
+                ),
+            )
+            .group_by(Repost.repost_item_id, Repost.repost_type)
+            .all()
+        )
+        for repost_item_id, repost_type, min_created_at in followee_reposts:
+            if repost_type == RepostType.track:
+                track_repost_timestamp_dict[repost_item_id] = min_created_at
+            else:
+                playlist_repost_timestamp_dict[repost_item_id] = min_created_at
+
+    tracks_dict = {track.track_id: track for track in tracks}
+    playlists_dict = {playlist.playlist_id: playlist for playlist in playlists}
+    valid_tracks = []
+    valid_playlists = []
+    for source, kind, item_id in entries:
+        if kind == TRACK:
+            item = tracks_dict.get(item_id)
+            owner_id = item and item.owner_id
+            repost_timestamps, valid_items = track_repost_timestamp_dict, valid_tracks
+        else:
+            item = playlists_dict.get(item_id)
+            owner_id = item and item.playlist_owner_id
+            repost_timestamps, valid_items = (
+                playlist_repost_timestamp_dict,
+                valid_playlists,
+            )
+        if item is None:
+            continue
+        if source == ORIGINAL and owner_id not in followee_user_ids:
+            continue
+        if source == REPOST and item_id not in repost_timestamps:
+            continue
+        valid_items.append(item)
+
+    return (
+        valid_tracks,
+        valid_playlists,
+        track_repost_timestamp_dict,
+        playlist_repost_timestamp_dict,
+    )
+
+
+def get_stored_feed_entries(
+    session, redis, user_id, followee_user_ids, feed_filter, tracks_only, limit
+):
+    """Reads the first `limit` feed entries from the user's stored feed, in the same
+    form as get_feed_entries. Returns None if the user has no stored feed.
+
+    The stored feed may lag the database, so its items are checked against the current
+    follows, reposts and item visibility before being returned.
+    """
+    stored_entries = read_feed(redis, user_id)
+    if stored_entries is None:
+        return None
+    entries = [parse_feed_entry(entry) for entry, _ in stored_entries]
+    originals = {
+        (kind, item_id) for source, kind, item_id in entries if source == ORIGINAL
+    }
+
+    sources = []
+    if feed_filter in ["original", "all"]:
+        sources.append(ORIGINAL)
+    if feed_filter in ["repost", "all"]:
+        sources.append(REPOST)
+    entries = [
+        (source, kind, item_id)
+        for source, kind, item_id in entries
+        if source in sources and not (tracks_only and kind == PLAYLIST)
+        # items created by followees are only shown as created, in case of "all" filter
+        and not (
+            feed_filter == "all" and source == REPOST and (kind, item_id) in originals
+        )
+    ]
+
+    # exclude tracks released in the "same action" as a playlist in the feed
+    if ORIGINAL in sources and not tracks_only:
+        playlist_tracks = get_playlist_tracks(
+            redis,
+            [
+                item_id
+                for source, kind, item_id in entries
+                if source == ORIGINAL and kind == TRACK
+            ],
+        )
+        entries = [
+            (source, kind, item_id)
+            for source, kind, item_id in entries
+            if not (
+                source == ORIGINAL
+                and kind == TRACK
+                and (PLAYLIST, playlist_tracks.get(item_id)) in originals
+            )
+        ]
+
+    followee_user_ids = set(followee_user_ids)
+    tracks = []
+    playlists = []
+    track_repost_timestamp_dict = {}
+    playlist_repost_timestamp_dict = {}
+    # Load a page at a time until enough entries are still valid
+    for i in range(0, len(entries), limit):
+        (
+            page_tracks,
+            page_playlists,
+            page_track_repost_timestamps,
+            page_playlist_repost_timestamps,
+        ) = _load_stored_feed_entries(
+            session, entries[i : i + limit], followee_user_ids
+        )
+        tracks.extend(page_tracks)
+        playlists.extend(page_playlists)
+        track_repost_timestamp_dict.update(page_track_repost_timestamps)
+        playlist_repost_timestamp_dict.update(page_playlist_repost_timestamps)
+        if len(tracks) + len(playlists) >= limit:
+            break
+
+    return (
+        tracks,
+        playlists,
+        track_repost_timestamp_dict,
+        playlist_repost_timestamp_dict,
+    )
+
+
 def get_feed(args):
     feed_results = []
     db = get_db_read_replica()
@@ -43,209 +546,75 @@ def get_feed(args):
             .all()
         )
         followee_user_ids = [f[0] for f in followee_user_ids]
+        (limit, _) = get_pagination_vars()
 
-        # Fetch followee creations if requested
-        if feed_filter in ["original", "all"]:
-            if not tracks_only:
-                # Query playlists posted by followees, sorted and paginated by created_at desc
-                created_playlists_query = (
-                    session.query(Playlist)
-                    .filter(
-                        Playlist.is_current == True,
-                        Playlist.is_delete == False,
-                        Playlist.is_private == False,
-                        Playlist.playlist_owner_id.in_(followee_user_ids),
-                    )
-                    .order_by(desc(Playlist.created_at))
-                )
-                created_playlists = paginate_query(created_playlists_query, False).all()
-
-                # get track ids for all tracks in playlists
-                playlist_track_ids = set()
-                for playlist in created_playlists:
-                    for track in playlist.playlist_contents["track_ids"]:
-                        playlist_track_ids.add(track["track"])
-
-                # get all track objects for track ids
-                playlist_tracks = get_unpopulated_tracks(session, playlist_track_ids)
-                playlist_tracks_dict = {
-                    track["track_id"]: track for track in playlist_tracks
-                }
-
-                # get all track ids that have same owner as playlist and created in "same action"
-                # "same action": track created within [x time] before playlist creation
-                tracks_to_dedupe = set()
-                for playlist in created_playlists:
-                    for track_entry in playlist.playlist_contents["track_ids"]:
-                        track = playlist_tracks_dict.get(track_entry["track"])
-                        if not track:
-                            return api_helpers.error_response(
-                                "Something caused the server to crash."
-                            )
-                        max_timedelta = datetime.timedelta(
-                            minutes=trackDedupeMaxMinutes
-                        )
-                        if (
-                            (track["owner_id"] == playlist.playlist_owner_id)
-                            and (track["created_at"] <= playlist.created_at)
-                            and (
-                                playlist.created_at - track["created_at"]
-                                <= max_timedelta
-                            )
-                        ):
-                            tracks_to_dedupe.add(track["track_id"])
-                tracks_to_dedupe = list(tracks_to_dedupe)
-            else:
-                # No playlists to consider
-                tracks_to_dedupe = []
-                created_playlists = []
-
-            # Query tracks posted by followees, sorted & paginated by created_at desc
-            # exclude tracks that were posted in "same action" as playlist
-            created_tracks_query = (
-                session.query(Track)
-                .filter(
-                    Track.is_current == True,
-                    Track.is_delete == False,
-                    Track.is_unlisted == False,
-                    Track.stem_of == None,
-                    Track.owner_id.in_(followee_user_ids),
-                    Track.track_id.notin_(tracks_to_dedupe),
-                )
-                .order_by(desc(Track.created_at))
-            )
-            created_tracks = paginate_query(created_tracks_query, False).all()
-
-            # extract created_track_ids and created_playlist_ids
-            created_track_ids = [track.track_id for track in created_tracks]
-            created_playlist_ids = [
-                playlist.playlist_id for playlist in created_playlists
-            ]
-
-        # Fetch followee reposts if requested
-        if feed_filter in ["repost", "all"]:
-            # query items reposted by followees, sorted by oldest followee repost of item;
-            # paginated by most recent repost timestamp
-            repost_subquery = session.query(Repost).filter(
-                Repost.is_current == True,
-                Repost.is_delete == False,
-                Repost.user_id.in_(followee_user_ids),
-            )
-            # exclude items also created by followees to guarantee order determinism, in case of "all" filter
-            if feed_filter == "all":
-                repost_subquery = repost_subquery.filter(
-                    or_(
-                        and_(
-                            Repost.repost_type == RepostType.track,
-                            Repost.repost_item_id.notin_(created_track_ids),
-                        ),
-                        and_(
-                            Repost.repost_type != RepostType.track,
-                            Repost.repost_item_id.notin_(created_playlist_ids),
-                        ),
-                    )
-                )
-            repost_subquery = repost_subquery.subquery()
-
-            repost_query = (
-                session.query(
-                    repost_subquery.c.repost_item_id,
-                    repost_subquery.c.repost_type,
-                    func.min(repost_subquery.c.created_at).label("min_created_at"),
-                )
-                .group_by(
-                    repost_subquery.c.repost_item_id, repost_subquery.c.repost_type
-                )
-                .order_by(desc("min_created_at"))
+        feed_entries = None
+        if is_feed_store_enabled():
+            redis = get_redis()
+            feed_entries = get_stored_feed_entries(
+                session,
+                redis,
+                current_user_id,
+                followee_user_ids,
+                feed_filter,
+                tracks_only,
+                limit,
             )
-            followee_reposts = paginate_query(repost_query, False).all()
-
-            # build dict of track_id / playlist_id -> oldest followee repost timestamp from followee_reposts above
-            track_repost_timestamp_dict = {}
-            playlist_repost_timestamp_dict = {}
-            for (
-                repost_item_id,
-                repost_type,
-                oldest_followee_repost_timestamp,
-            ) in followee_reposts:
-                if repost_type == RepostType.track:
-                    track_repost_timestamp_dict[
-                        repost_item_id
-                    ] = oldest_followee_repost_timestamp
-                elif repost_type in (RepostType.playlist, RepostType.album):
-                    playlist_repost_timestamp_dict[
-                        repost_item_id
-                    ] = oldest_followee_repost_timestamp
-
-            # extract reposted_track_ids and reposted_playlist_ids
-            reposted_track_ids = list(track_repost_timestamp_dict.keys())
-            reposted_playlist_ids = list(playlist_repost_timestamp_dict.keys())
-
-            # Query tracks reposted by followees
-            reposted_tracks = session.query(Track).filter(
-                Track.is_current == True,
-                Track.is_delete == False,
-                Track.is_unlisted == False,
-                Track.stem_of == None,
-                Track.track_id.in_(reposted_track_ids),
+            if feed_entries is None:
+                # Build the user's feed for their next read
+                queue_feed_warmup(redis, current_user_id)
+        if feed_entries is None:
+            feed_entries = get_feed_entries(
+                session, followee_user_ids, feed_filter, tracks_only
             )
-            # exclude tracks already fetched from above, in case of "all" filter
-            if feed_filter == "all":
-                reposted_tracks = reposted_tracks.filter(
-                    Track.track_id.notin_(created_track_ids)
-                )
-            reposted_tracks = reposted_tracks.order_by(desc(Track.created_at)).all()
-
-            if not tracks_only:
-                # Query playlists reposted by followees, excluding playlists already fetched from above
-                reposted_playlists = session.query(Playlist).filter(
-                    Playlist.is_current == True,
-                    Playlist.is_delete == False,
-                    Playlist.is_private == False,
-                    Playlist.playlist_id.in_(reposted_playlist_ids),
+            if feed_entries is None:
+                return api_helpers.error_response(
+                    "Something caused the server to crash."
                 )
-                # exclude playlists already fetched from above, in case of "all" filter
-                if feed_filter == "all":
-                    reposted_playlists = reposted_playlists.filter(
-                        Playlist.playlist_id.notin_(created_playlist_ids)
-                    )
-                reposted_playlists = reposted_playlists.order_by(
-                    desc(Playlist.created_at)
-                ).all()
-            else:
-                reposted_playlists = []
-
-        if feed_filter == "original":
-            tracks_to_process = created_tracks
-            playlists_to_process = created_playlists
-        elif feed_filter == "repost":
-            tracks_to_process = reposted_tracks
-            playlists_to_process = reposted_playlists
-        else:
-            tracks_to_process = created_tracks + reposted_tracks
-            playlists_to_process = created_playlists + reposted_playlists
-
-        tracks = helpers.query_result_to_list(tracks_to_process)
-        playlists = helpers.query_result_to_list(playlists_to_process)
+        (
+            tracks_to_process,
+            playlists_to_process,
+            track_repost_timestamp_dict,
+            playlist_repost_timestamp_dict,
+        ) = feed_entries
 
         # define top level feed activity_timestamp to enable sorting
         # activity_timestamp: created_at if item created by followee, else reposted_at
-        for track in tracks:
-            if track["owner_id"] in followee_user_ids:
-                track[response_name_constants.activity_timestamp] = track["created_at"]
+        activity_timestamps = {}
+        for track in tracks_to_process:
+            if track.owner_id in followee_user_ids:
+                timestamp = track.created_at
             else:
-                track[
-                    response_name_constants.activity_timestamp
-                ] = track_repost_timestamp_dict[track["track_id"]]
-        for playlist in playlists:
-            if playlist["playlist_owner_id"] in followee_user_ids:
-                playlist[response_name_constants.activity_timestamp] = playlist[
-                    "created_at"
-                ]
+                timestamp = track_repost_timestamp_dict[track.track_id]
+            activity_timestamps[(TRACK, track.track_id)] = timestamp
+        for playlist in playlists_to_process:
+            if playlist.playlist_owner_id in followee_user_ids:
+                timestamp = playlist.created_at
             else:
-                playlist[
-                    response_name_constants.activity_timestamp
-                ] = playlist_repost_timestamp_dict[playlist["playlist_id"]]
+                timestamp = playlist_repost_timestamp_dict[playlist.playlist_id]
+            activity_timestamps[(PLAYLIST, playlist.playlist_id)] = timestamp
+
+        # sort feed based on activity_timestamp and truncate it to requested limit
+        # before loading and bundling peripheral info into its items
+        sorted_feed_items = sorted(
+            activity_timestamps.keys(),
+            key=lambda item: activity_timestamps[item],
+            reverse=True,
+        )[0:limit]
+        track_ids = [item_id for kind, item_id in sorted_feed_items if kind == TRACK]
+        playlist_ids = [
+            item_id for kind, item_id in sorted_feed_items if kind == PLAYLIST
+        ]
+        tracks = get_unpopulated_tracks(session, track_ids, True)
+        playlists = get_unpopulated_playlists(session, playlist_ids, True)
+        for track in tracks:
+            track[response_name_constants.activity_timestamp] = activity_timestamps[
+                (TRACK, track["track_id"])
+            ]
+        for playlist in playlists:
+            playlist[response_name_constants.activity_timestamp] = activity_timestamps[
+                (PLAYLIST, playlist["playlist_id"])
+            ]
 
         # bundle peripheral info into track and playlist objects
         track_ids = list(map(lambda track: track["track_id"], tracks))
@@ -260,19 +629,13 @@ def get_feed(args):
             current_user_id,
         )
 
-        # build combined feed of tracks and playlists
-        unsorted_feed = tracks + playlists
-
-        # sort feed based on activity_timestamp
-        sorted_feed = sorted(
-            unsorted_feed,
-            key=lambda entry: entry[response_name_constants.activity_timestamp],
-            reverse=True,
+        feed_items = {(TRACK, track["track_id"]): track for track in tracks}
+        feed_items.update(
+            {(PLAYLIST, playlist["playlist_id"]): playlist for playlist in playlists}
         )
-
-        # truncate feed to requested limit
-        (limit, _) = get_pagination_vars()
-        feed_results = sorted_feed[0:limit]
+        feed_results = [
+            feed_items[item] for item in sorted_feed_items if item in feed_items
+        ]
 
         if "with_users" in args and args.get("with_users") != "false":
             user_id_list = get_users_ids(feed_results)
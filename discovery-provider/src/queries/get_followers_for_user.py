@@ -4,12 +4,45 @@ from sqlalchemy.orm import aliased
 from src.models import Follow
 from src.utils.db_session import get_db_read_replica
 from src.queries import response_name_constants
-from src.queries.query_helpers import populate_user_metadata, add_query_pagination
+from src.queries.query_helpers import (
+    populate_user_metadata,
+    add_keyset_pagination,
+    add_query_pagination,
+    get_next_cursor,
+    populate_users_in_order,
+)
 from src.queries.get_unpopulated_users import get_unpopulated_users
 
 
 def get_followers_for_user(args):
+    users, _ = get_followers_for_user_page(args)
+    return users
+
+
+def _get_follower_user_ids_after_cursor(session, followee_user_id, cursor, limit):
+    """Pages through the followers most recently followed first, in the followee's index"""
+    query = session.query(Follow.follower_user_id, Follow.blocknumber).filter(
+        Follow.followee_user_id == followee_user_id,
+        Follow.is_current == True,
+        Follow.is_delete == False,
+    )
+    rows = add_keyset_pagination(
+        query,
+        [(Follow.blocknumber, True), (Follow.follower_user_id, True)],
+        cursor,
+        limit,
+    ).all()
+    next_cursor = get_next_cursor(rows, limit, lambda row: [row[1], row[0]])
+    return [user_id for (user_id, _) in rows], next_cursor
+
+
+def get_followers_for_user_page(args):
+    """
+    Returns the followers of args["followee_user_id"] and the cursor of the next
+    page. Pages by args["cursor"] when given, otherwise by args["offset"].
+    """
     users = []
+    next_cursor = None
     followee_user_id = args.get("followee_user_id")
     current_user_id = args.get("current_user_id")
     limit = args.get("limit")
@@ -17,6 +50,13 @@ def get_followers_for_user(args):
 
     db = get_db_read_replica()
     with db.scoped_session() as session:
+        if "cursor" in args:
+            user_ids, next_cursor = _get_follower_user_ids_after_cursor(
+                session, followee_user_id, args["cursor"], limit
+            )
+            users = populate_users_in_order(session, user_ids, current_user_id)
+            return users, next_cursor
+
         # correlated subquery sqlalchemy code:
         # https://groups.google.com/forum/#!topic/sqlalchemy/WLIy8jxD7qg
         inner_follow = aliased(Follow)
@@ -60,19 +100,24 @@ def get_followers_for_user(args):
             user_id for (user_id, follower_count) in follower_user_ids_by_follower_count
         ]
 
-        # get all users for above user_ids
-        users = get_unpopulated_users(session, user_ids)
+        users = _populate_followers(session, user_ids, current_user_id)
+    return users, next_cursor
 
-        # bundle peripheral info into user results
-        users = populate_user_metadata(session, user_ids, users, current_user_id)
 
-        # order by (follower_count desc, user_id asc) to match query sorting
-        # tuple key syntax from: https://stackoverflow.com/a/4233482/8414360
-        users.sort(
-            key=lambda user: (
-                user[response_name_constants.follower_count],
-                (user["user_id"]) * (-1),
-            ),
-            reverse=True,
-        )
+def _populate_followers(session, user_ids, current_user_id):
+    # get all users for above user_ids
+    users = get_unpopulated_users(session, user_ids)
+
+    # bundle peripheral info into user results
+    users = populate_user_metadata(session, user_ids, users, current_user_id)
+
+    # order by (follower_count desc, user_id asc) to match query sorting
+    # tuple key syntax from: https://stackoverflow.com/a/4233482/8414360
+    users.sort(
+        key=lambda user: (
+            user[response_name_constants.follower_count],
+            (user["user_id"]) * (-1),
+        ),
+        reverse=True,
+    )
     return users
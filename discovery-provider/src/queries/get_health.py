@@ -1,3 +1,4 @@
+import json
 import logging
 import os
 import time
@@ -6,6 +7,7 @@ from typing import Dict, Optional, Tuple, TypedDict, cast
 from src.models import Block, IPLDBlacklistBlock
 from src.monitors import monitors, monitor_names
 from src.utils import helpers, redis_connection, web3_provider, db_session
+from src.utils.block_cache import poa_block_cache
 from src.utils.config import shared_config
 from src.utils.redis_constants import (
     latest_block_redis_key,
@@ -19,7 +21,11 @@ from src.utils.redis_constants import (
     challenges_last_processed_event_redis_key,
     user_balances_refresh_last_completion_redis_key,
     index_eth_last_completion_redis_key,
+    index_plays_last_completion_redis_key,
+    index_plays_last_run_timings_redis_key,
+    eth_provider_stats_redis_key,
 )
+from src.challenges.challenge_event_bus import get_challenge_event_queue_stats
 from src.queries.get_balances import (
     LAZY_REFRESH_REDIS_PREFIX,
     IMMEDIATE_REFRESH_REDIS_PREFIX,
@@ -186,7 +192,7 @@ def get_health(args: GetHealthArgs, use_redis_cache: bool = True) -> Tuple[Dict,
     # value from redis cache is None
     if not use_redis_cache or latest_block_num is None or latest_block_hash is None:
         # get latest blockchain state from web3
-        latest_block = web3.eth.getBlock("latest", True)
+        latest_block = poa_block_cache.get_block(web3, "latest", True)
         latest_block_num = latest_block.number
         latest_block_hash = latest_block.hash.hex()
 
@@ -211,14 +217,13 @@ def get_health(args: GetHealthArgs, use_redis_cache: bool = True) -> Tuple[Dict,
     challenge_events_age_sec = get_elapsed_time_redis(
         redis, challenges_last_processed_event_redis_key
     )
+    challenge_event_queue = get_challenge_event_queue_stats(redis)
     user_balances_age_sec = get_elapsed_time_redis(
         redis, user_balances_refresh_last_completion_redis_key
     )
-    num_users_in_lazy_balance_refresh_queue = len(
-        redis.smembers(LAZY_REFRESH_REDIS_PREFIX)
-    )
-    num_users_in_immediate_balance_refresh_queue = len(
-        redis.smembers(IMMEDIATE_REFRESH_REDIS_PREFIX)
+    num_users_in_lazy_balance_refresh_queue = redis.zcard(LAZY_REFRESH_REDIS_PREFIX)
+    num_users_in_immediate_balance_refresh_queue = redis.zcard(
+        IMMEDIATE_REFRESH_REDIS_PREFIX
     )
     last_scanned_block_for_balance_refresh = redis_get_or_restore(
         redis, eth_indexing_last_scanned_block_key
@@ -226,6 +231,11 @@ def get_health(args: GetHealthArgs, use_redis_cache: bool = True) -> Tuple[Dict,
     index_eth_age_sec = get_elapsed_time_redis(
         redis, index_eth_last_completion_redis_key
     )
+    index_plays_age_sec = get_elapsed_time_redis(
+        redis, index_plays_last_completion_redis_key
+    )
+    index_plays_timings = redis.get(index_plays_last_run_timings_redis_key)
+    eth_provider_stats = redis.get(eth_provider_stats_redis_key)
     last_scanned_block_for_balance_refresh = (
         int(last_scanned_block_for_balance_refresh)
         if last_scanned_block_for_balance_refresh
@@ -259,11 +269,19 @@ def get_health(args: GetHealthArgs, use_redis_cache: bool = True) -> Tuple[Dict,
         "trending_tracks_age_sec": trending_tracks_age_sec,
         "trending_playlists_age_sec": trending_playlists_age_sec,
         "challenge_last_event_age_sec": challenge_events_age_sec,
+        "challenge_event_queue": challenge_event_queue,
         "user_balances_age_sec": user_balances_age_sec,
         "num_users_in_lazy_balance_refresh_queue": num_users_in_lazy_balance_refresh_queue,
         "num_users_in_immediate_balance_refresh_queue": num_users_in_immediate_balance_refresh_queue,
         "last_scanned_block_for_balance_refresh": last_scanned_block_for_balance_refresh,
         "index_eth_age_sec": index_eth_age_sec,
+        "index_plays_age_sec": index_plays_age_sec,
+        "index_plays_timings": json.loads(index_plays_timings)
+        if index_plays_timings
+        else None,
+        "eth_provider_endpoints": json.loads(eth_provider_stats)
+        if eth_provider_stats
+        else None,
         "number_of_cpus": number_of_cpus,
         **sys_info,
     }
@@ -339,7 +357,7 @@ def get_latest_chain_block_set_if_nx(redis=None, web3=None):
         latest_block_hash = stored_latest_blockhash.decode("utf-8")
 
     if latest_block_num is None or latest_block_hash is None:
-        latest_block = web3.eth.getBlock("latest", True)
+        latest_block = poa_block_cache.get_block(web3, "latest", True)
         latest_block_num = latest_block.number
         latest_block_hash = latest_block.hash.hex()
 
@@ -8,6 +8,7 @@ from src.utils.redis_constants import (
     most_recent_indexed_block_hash_redis_key,
     most_recent_indexed_block_redis_key,
     challenges_last_processed_event_redis_key,
+    eth_provider_stats_redis_key,
 )
 from src.models import Block
 from src.queries.get_health import get_health
@@ -68,6 +69,9 @@ def test_get_health_using_redis(web3_mock, redis_mock, db_mock):
     redis_mock.set(latest_block_hash_redis_key, "0x3")
     redis_mock.set(most_recent_indexed_block_redis_key, "2")
     redis_mock.set(most_recent_indexed_block_hash_redis_key, "0x02")
+    redis_mock.set(
+        eth_provider_stats_redis_key, '{"http://eth": {"circuit_open": false}}'
+    )
 
     # Set up db state
     with db_mock.scoped_session() as session:
@@ -91,6 +95,9 @@ def test_get_health_using_redis(web3_mock, redis_mock, db_mock):
     assert health_results["db"]["number"] == 2
     assert health_results["db"]["blockhash"] == "0x02"
     assert health_results["block_difference"] == 1
+    assert health_results["eth_provider_endpoints"] == {
+        "http://eth": {"circuit_open": False}
+    }
 
     assert "maximum_healthy_block_difference" in health_results
     assert "version" in health_results
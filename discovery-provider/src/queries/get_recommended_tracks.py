@@ -19,8 +19,6 @@ def get_recommended_tracks(args, strategy):
         "time": time,
         "genre": args.get("genre", None),
         "with_users": True,
-        "limit": args.get("limit"),
-        "offset": 0,
     }
 
     # decode and add user_id if necessary
@@ -1,5 +1,6 @@
+import logging
 from datetime import datetime, timedelta
-from typing import List, Tuple, cast
+from typing import Dict, List, Tuple, cast
 
 from sqlalchemy.orm import Session, aliased
 from sqlalchemy.sql.expression import column, desc, tablesample
@@ -10,6 +11,9 @@ from src.models.models import AggregateUser, Follow, User
 from src.queries.query_helpers import helpers, populate_user_metadata
 from src.utils.db_session import get_db_read_replica
 from src.utils.helpers import time_method
+from src.utils.session_manager import SessionManager
+
+logger = logging.getLogger(__name__)
 
 # Let calculations sit for this long before requiring recalculating
 CALCULATION_TTL = timedelta(weeks=2)
@@ -21,6 +25,8 @@ MAX_FOLLOWERS_WITHOUT_SAMPLE = 10000
 SAMPLE_SIZE_ROWS = 3000000
 # Maximum number of related artists to have precalculated
 MAX_RELATED_ARTIST_COUNT = 100
+# Number of artists scored and written per transaction by the batch calculation
+BATCH_CHUNK_SIZE = 500
 
 
 @time_method
@@ -169,6 +175,147 @@ def update_related_artist_scores_if_needed(
     return False, "No results"
 
 
+def _calculate_related_artists_scores_batch(
+    session: Session, user_ids: List[int], limit=MAX_RELATED_ARTIST_COUNT
+) -> List[Tuple[int, int, float]]:
+    """Calculates the scores of the related artists of each of `user_ids` as
+    _calculate_related_artists_scores does, counting the mutual followers of every
+    user in one query without sampling.
+
+    Returns:
+        the top (user_id, related_artist_user_id, score) rows of each user
+    """
+    artist_followers = aliased(Follow)
+    followers_followees = aliased(Follow)
+
+    # Find out who the followers of each user are following
+    mutual_followers_subquery = (
+        session.query(
+            artist_followers.followee_user_id.label("user_id"),
+            followers_followees.followee_user_id.label("suggested_artist_id"),
+            func.count(artist_followers.follower_user_id).label(
+                "mutual_follower_count"
+            ),
+        )
+        .join(
+            followers_followees,
+            artist_followers.follower_user_id == followers_followees.follower_user_id,
+        )
+        .filter(
+            artist_followers.followee_user_id.in_(user_ids),
+            artist_followers.is_current,
+            artist_followers.is_delete == False,
+            followers_followees.is_current,
+            followers_followees.is_delete == False,
+            followers_followees.followee_user_id != artist_followers.followee_user_id,
+        )
+        .group_by(
+            artist_followers.followee_user_id, followers_followees.followee_user_id
+        )
+        .subquery(name="mutual_followers")
+    )
+
+    # Score the artists as in _calculate_related_artists_scores, ranking them per user
+    score = func.round(
+        1.0
+        * mutual_followers_subquery.c.mutual_follower_count
+        * mutual_followers_subquery.c.mutual_follower_count
+        / AggregateUser.follower_count,
+        3,
+    )
+    scores_subquery = (
+        session.query(
+            mutual_followers_subquery.c.user_id,
+            mutual_followers_subquery.c.suggested_artist_id.label(
+                "related_artist_user_id"
+            ),
+            score.label("score"),
+            func.row_number()
+            .over(
+                partition_by=mutual_followers_subquery.c.user_id,
+                order_by=(desc(score), mutual_followers_subquery.c.suggested_artist_id),
+            )
+            .label("rank"),
+        )
+        .select_from(mutual_followers_subquery)
+        .join(
+            AggregateUser,
+            AggregateUser.user_id == mutual_followers_subquery.c.suggested_artist_id,
+        )
+        .join(User, User.user_id == mutual_followers_subquery.c.suggested_artist_id)
+        .filter(
+            User.is_current,
+            AggregateUser.track_count > 0,
+            AggregateUser.follower_count > 0,
+        )
+        .subquery(name="scores")
+    )
+    return (
+        session.query(
+            scores_subquery.c.user_id,
+            scores_subquery.c.related_artist_user_id,
+            scores_subquery.c.score,
+        )
+        .filter(scores_subquery.c.rank <= limit)
+        .all()
+    )
+
+
+@time_method
+def calculate_all_related_artists(
+    db: SessionManager, chunk_size=BATCH_CHUNK_SIZE
+) -> int:
+    """Recalculates the related artists of every user with enough followers.
+
+    The mutual followers of a chunk of users are counted and scored by the database
+    in one query, exact for every artist rather than sampled for the largest ones.
+    Users are scored and written in chunks to bound memory and transaction size.
+
+    Returns:
+        int: the number of users whose related artists were updated
+    """
+    with db.scoped_session() as session:
+        user_ids = [
+            user_id
+            for (user_id,) in session.query(AggregateUser.user_id)
+            .join(User, User.user_id == AggregateUser.user_id)
+            .filter(
+                User.is_current,
+                AggregateUser.follower_count >= MIN_FOLLOWER_REQUIREMENT,
+            )
+            .order_by(AggregateUser.user_id)
+        ]
+
+    updated_count = 0
+    for i in range(0, len(user_ids), chunk_size):
+        created_at = datetime.utcnow()
+        with db.scoped_session() as session:
+            rows = _calculate_related_artists_scores_batch(
+                session, user_ids[i : i + chunk_size]
+            )
+            related_artists: List[Dict] = [
+                {
+                    "user_id": user_id,
+                    "related_artist_user_id": related_artist_user_id,
+                    "score": score,
+                    "created_at": created_at,
+                }
+                for user_id, related_artist_user_id, score in rows
+            ]
+            updated_user_ids = {user_id for user_id, _, _ in rows}
+            if updated_user_ids:
+                session.query(RelatedArtist).filter(
+                    RelatedArtist.user_id.in_(updated_user_ids)
+                ).delete(synchronize_session=False)
+                session.execute(RelatedArtist.__table__.insert(), related_artists)
+        updated_count += len(updated_user_ids)
+        logger.info(
+            f"get_related_artists.py | Calculated related artists for "
+            f"{min(i + chunk_size, len(user_ids))}/{len(user_ids)} users"
+        )
+    return updated_count
+
+
 def _get_related_artists(session: Session, user_id: int, limit=100):
     related_artists = (
         session.query(User)
@@ -5,11 +5,27 @@ from src.models import User, Track, Save, SaveType, AggregateUser
 from src.utils import helpers
 from src.utils.db_session import get_db_read_replica
 from src.queries import response_name_constants
-from src.queries.query_helpers import populate_user_metadata, add_query_pagination
+from src.queries.query_helpers import (
+    populate_user_metadata,
+    add_keyset_pagination,
+    add_query_pagination,
+    get_next_cursor,
+    populate_users_in_order,
+)
 
 
 def get_savers_for_track(args):
+    user_results, _ = get_savers_for_track_page(args)
+    return user_results
+
+
+def get_savers_for_track_page(args):
+    """
+    Returns the users who saved the track and the cursor of the next page.
+    Pages by args["cursor"] when given, otherwise by args["offset"].
+    """
     user_results = []
+    next_cursor = None
     current_user_id = args.get("current_user_id")
     save_track_id = args.get("save_track_id")
     limit = args.get("limit")
@@ -27,13 +43,12 @@ def get_savers_for_track(args):
             raise exceptions.NotFoundError("Resource not found for provided track id")
 
         # Get all Users that saved track, ordered by follower_count desc & paginated.
+        # Replace null values from left outer join with 0 to ensure sort works correctly.
+        follower_count = func.coalesce(AggregateUser.follower_count, 0)
         query = (
             session.query(
                 User,
-                # Replace null values from left outer join with 0 to ensure sort works correctly.
-                (func.coalesce(AggregateUser.follower_count, 0)).label(
-                    response_name_constants.follower_count
-                ),
+                follower_count.label(response_name_constants.follower_count),
             )
             # Left outer join to associate users with their follower count.
             .outerjoin(AggregateUser, AggregateUser.user_id == User.user_id)
@@ -51,6 +66,26 @@ def get_savers_for_track(args):
             )
             .order_by(desc(response_name_constants.follower_count))
         )
+        if "cursor" in args:
+            # Most recently saved first, in the track's index
+            rows = add_keyset_pagination(
+                session.query(Save.user_id, Save.blocknumber).filter(
+                    Save.save_item_id == save_track_id,
+                    Save.save_type == SaveType.track,
+                    Save.is_current == True,
+                    Save.is_delete == False,
+                ),
+                [(Save.blocknumber, True), (Save.user_id, True)],
+                args["cursor"],
+                limit,
+            ).all()
+            next_cursor = get_next_cursor(rows, limit, lambda row: [row[1], row[0]])
+            user_ids = [user_id for (user_id, _) in rows]
+            return (
+                populate_users_in_order(session, user_ids, current_user_id),
+                next_cursor,
+            )
+
         user_results = add_query_pagination(query, limit, offset).all()
 
         # Fix format to return only Users objects with follower_count field.
@@ -63,4 +98,4 @@ def get_savers_for_track(args):
                 session, user_ids, user_results, current_user_id
             )
 
-    return user_results
+    return user_results, next_cursor
@@ -6,8 +6,10 @@ from src.models import AggregatePlays, Track, TrackRoute, User
 from src.utils import helpers, redis_connection
 from src.utils.db_session import get_db_read_replica
 from src.queries.query_helpers import (
+    add_keyset_pagination,
     add_query_pagination,
     add_users_to_tracks,
+    get_next_cursor,
     get_pagination_vars,
     parse_sort_param,
     populate_track_metadata,
@@ -19,7 +21,44 @@ logger = logging.getLogger(__name__)
 redis = redis_connection.get_redis()
 
 
+def _get_release_date():
+    return coalesce(
+        # This func is defined in alembic migrations
+        func.to_date_safe(Track.release_date, "Dy Mon DD YYYY HH24:MI:SS"),
+        Track.created_at,
+    )
+
+
+def _get_tracks_after_cursor(base_query, args):
+    sort = args.get("sort")
+    if sort == "plays":
+        base_query = base_query.join(
+            AggregatePlays, AggregatePlays.play_item_id == Track.track_id
+        )
+        sort_key = AggregatePlays.count
+    elif sort == "date":
+        sort_key = _get_release_date()
+    else:
+        sort_key = Track.created_at
+
+    limit = args["limit"]
+    rows = add_keyset_pagination(
+        base_query.add_columns(sort_key),
+        [(sort_key, True), (Track.track_id, True)],
+        args["cursor"],
+        limit,
+    ).all()
+    next_cursor = get_next_cursor(rows, limit, lambda row: [row[1], row[0].track_id])
+    tracks = helpers.query_result_to_list([track for (track, _) in rows])
+    return tracks, next_cursor
+
+
 def _get_tracks(session, args):
+    tracks, _ = _get_tracks_page(session, args)
+    return tracks
+
+
+def _get_tracks_page(session, args):
     # Create initial query
     base_query = session.query(Track)
     base_query = base_query.filter(Track.is_current == True, Track.stem_of == None)
@@ -61,14 +100,14 @@ def _get_tracks(session, args):
         min_block_number = args.get("min_block_number")
         base_query = base_query.filter(Track.blocknumber >= min_block_number)
 
+    # Pages by cursor when given, sorted by created_at unless sorted by date or plays
+    if "cursor" in args:
+        return _get_tracks_after_cursor(base_query, args)
+
     if "sort" in args:
         if args["sort"] == "date":
             base_query = base_query.order_by(
-                coalesce(
-                    # This func is defined in alembic migrations
-                    func.to_date_safe(Track.release_date, "Dy Mon DD YYYY HH24:MI:SS"),
-                    Track.created_at,
-                ).desc(),
+                _get_release_date().desc(),
                 Track.track_id.desc(),
             )
         elif args["sort"] == "plays":
@@ -87,12 +126,17 @@ def _get_tracks(session, args):
 
     query_results = add_query_pagination(base_query, args["limit"], args["offset"])
     tracks = helpers.query_result_to_list(query_results.all())
-    return tracks
+    return tracks, None
 
 
 def get_tracks(args):
+    tracks, _ = get_tracks_page(args)
+    return tracks
+
+
+def get_tracks_page(args):
     """
-    Gets tracks.
+    Gets tracks, and the cursor of the next page when paged by args["cursor"].
     A note on caching strategy:
         - This method is cached at two layers: at the API via the @cache decorator,
         and within this method using the shared get_unpopulated_tracks cache.
@@ -130,19 +174,19 @@ def get_tracks(args):
                     session, args["id"], should_filter_deleted
                 )
                 track_ids = list(map(lambda track: track["track_id"], tracks))
-                return (tracks, track_ids)
+                return (tracks, track_ids, None)
 
             (limit, offset) = get_pagination_vars()
             args["limit"] = limit
             args["offset"] = offset
 
-            tracks = _get_tracks(session, args)
+            tracks, next_cursor = _get_tracks_page(session, args)
 
             track_ids = list(map(lambda track: track["track_id"], tracks))
 
-            return (tracks, track_ids)
+            return (tracks, track_ids, next_cursor)
 
-        (tracks, track_ids) = get_tracks_and_ids()
+        (tracks, track_ids, next_cursor) = get_tracks_and_ids()
 
         # bundle peripheral info into track results
         current_user_id = args.get("current_user_id")
@@ -157,4 +201,4 @@ def get_tracks(args):
                 {key: val for key, val in dict.items() if key != "user"}
                 for dict in tracks
             ]
-    return tracks
+    return tracks, next_cursor
@@ -12,8 +12,9 @@ from src.utils.redis_cache import use_redis_cache, get_trending_cache_key
 logger = logging.getLogger(__name__)
 
 
-def get_trending(args, strategy):
-    """Get Trending, shared between full and regular endpoints."""
+def get_trending(args, strategy, offset=0, limit=TRENDING_LIMIT):
+    """Get Trending, shared between full and regular endpoints, populating only the
+    tracks from `offset` up to `limit`"""
     # construct args
     time = args.get("time") if args.get("time") is not None else "week"
     current_user_id = args.get("user_id")
@@ -21,8 +22,8 @@ def get_trending(args, strategy):
         "time": time,
         "genre": args.get("genre", None),
         "with_users": True,
-        "limit": TRENDING_LIMIT,
-        "offset": 0,
+        "limit": limit,
+        "offset": offset,
     }
 
     # decode and add user_id if necessary
@@ -41,10 +42,9 @@ def get_full_trending(request, args, strategy):
 
     # Attempt to use the cached tracks list
     if args["user_id"] is not None:
-        full_trending = get_trending(args, strategy)
-    else:
-        full_trending = use_redis_cache(
-            key, TRENDING_TTL_SEC, lambda: get_trending(args, strategy)
-        )
+        return get_trending(args, strategy, offset, limit)
+    full_trending = use_redis_cache(
+        key, TRENDING_TTL_SEC, lambda: get_trending(args, strategy)
+    )
     trending_tracks = full_trending[offset : limit + offset]
     return trending_tracks
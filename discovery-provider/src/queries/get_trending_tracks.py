@@ -56,7 +56,10 @@ def make_generate_unpopulated_trending(session, genre, time_range, strategy):
 
 
 def get_trending_tracks(args, strategy):
-    """Gets trending by getting the currently cached tracks and then populating them."""
+    """
+    Gets trending by getting the currently cached track ids and then populating the
+    tracks on the page of `args.offset` and `args.limit`, or all of them without a limit
+    """
     db = get_db_read_replica()
     with db.scoped_session() as session:
         current_user_id, genre, time = (
@@ -75,6 +78,13 @@ def get_trending_tracks(args, strategy):
             make_generate_unpopulated_trending(session, genre, time_range, strategy),
         )
 
+        # Only populate the tracks on the page
+        offset, limit = args.get("offset") or 0, args.get("limit")
+        if offset or limit is not None:
+            track_ids = track_ids[offset : None if limit is None else offset + limit]
+            page_track_ids = set(track_ids)
+            tracks = [track for track in tracks if track["track_id"] in page_track_ids]
+
         # populate track metadata
         tracks = populate_track_metadata(session, track_ids, tracks, current_user_id)
         tracks_map = {track["track_id"]: track for track in tracks}
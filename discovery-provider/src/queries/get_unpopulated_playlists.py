@@ -74,7 +74,7 @@ def get_unpopulated_playlists(session, playlist_ids, filter_deleted=False):
     )
 
     playlists_query = (
-        session.query(Playlist)
+        session.query(*helpers.model_columns(Playlist))
         .filter(Playlist.is_current == True)
         .filter(Playlist.playlist_id.in_(playlist_ids_to_fetch))
     )
@@ -82,7 +82,7 @@ def get_unpopulated_playlists(session, playlist_ids, filter_deleted=False):
         playlists_query = playlists_query.filter(Playlist.is_delete == False)
 
     playlists = playlists_query.all()
-    playlists = helpers.query_result_to_list(playlists)
+    playlists = helpers.query_tuples_to_list(playlists, Playlist)
     queried_playlists = {playlist["playlist_id"]: playlist for playlist in playlists}
 
     # cache playlists for future use
@@ -64,12 +64,12 @@ def get_unpopulated_users(session, user_ids):
     user_ids_to_fetch = filter(lambda user_id: user_id not in cached_users, user_ids)
 
     users = (
-        session.query(User)
+        session.query(*helpers.model_columns(User))
         .filter(User.is_current == True, User.wallet != None, User.handle != None)
         .filter(User.user_id.in_(user_ids_to_fetch))
         .all()
     )
-    users = helpers.query_result_to_list(users)
+    users = helpers.query_tuples_to_list(users, User)
     queried_users = {user["user_id"]: user for user in users}
 
     set_users_in_cache(users)
@@ -0,0 +1,173 @@
+import logging
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional
+
+from src.models import Repost, RepostType, Save, SaveType
+from src.utils.config import shared_config
+
+logger = logging.getLogger(__name__)
+
+# Redis Key Convention:
+# engagement:{user_id} - hash of "{save|repost}:{type}" -> sorted int32 item ids
+# engagement:{user_id}:stale - set while the user's engagement may still be
+#   missing from the read replicas
+
+# Engagement not read for this long expires and is reloaded on its next read
+ttl_sec = 24 * 60 * 60
+
+# After a user saves or reposts, their engagement is neither read from nor
+# written to the cache for this long, so it can't be refilled from a replica
+# that hasn't replicated the change yet
+stale_sec = 60
+
+# Marks engagement as loaded even when the user has no saves or reposts
+_LOADED_FIELD = "loaded"
+
+_SAVE = "save"
+_REPOST = "repost"
+
+# Replaces KEYS[1] with the field/value pairs in ARGV[2:] expiring after ARGV[1]
+# seconds, unless the engagement was marked stale by KEYS[2]
+_SET_ENGAGEMENT_SCRIPT = """
+if redis.call('exists', KEYS[2]) == 1 then
+    return 0
+end
+redis.call('del', KEYS[1])
+redis.call('hset', KEYS[1], unpack(ARGV, 2))
+redis.call('expire', KEYS[1], ARGV[1])
+return 1
+"""
+
+_EMPTY = array("i")
+
+
+def is_engagement_cache_enabled():
+    return shared_config["discprov"].getboolean("engagement_cache", fallback=False)
+
+
+def get_user_engagement_cache_key(user_id):
+    return f"engagement:{user_id}"
+
+
+def get_user_engagement_stale_key(user_id):
+    return f"engagement:{user_id}:stale"
+
+
+def _field(action, item_type):
+    return f"{action}:{item_type}"
+
+
+class UserEngagement:
+    """
+    The items a user currently has saved and reposted, as sorted arrays of
+    item ids per save and repost type.
+    """
+
+    def __init__(self, items: Dict[str, array]):
+        self._items = items
+
+    def _has(self, action, item_types, item_id):
+        for item_type in item_types:
+            ids = self._items.get(_field(action, item_type), _EMPTY)
+            i = bisect_left(ids, item_id)
+            if i < len(ids) and ids[i] == item_id:
+                return True
+        return False
+
+    def has_saved(self, save_types: Iterable[SaveType], item_id):
+        return self._has(_SAVE, [SaveType(t).value for t in save_types], item_id)
+
+    def has_reposted(self, repost_types: Iterable[RepostType], item_id):
+        return self._has(_REPOST, [RepostType(t).value for t in repost_types], item_id)
+
+    def to_cache_fields(self):
+        return [(field, ids.tobytes()) for field, ids in self._items.items()]
+
+
+def load_user_engagement(session, user_id) -> UserEngagement:
+    saves = session.query(Save.save_type, Save.save_item_id).filter(
+        Save.is_current == True,
+        Save.is_delete == False,
+        Save.user_id == user_id,
+    )
+    reposts = session.query(Repost.repost_type, Repost.repost_item_id).filter(
+        Repost.is_current == True,
+        Repost.is_delete == False,
+        Repost.user_id == user_id,
+    )
+    item_ids: Dict[str, List[int]] = {}
+    for action, rows in ((_SAVE, saves), (_REPOST, reposts)):
+        for item_type, item_id in rows:
+            item_ids.setdefault(_field(action, item_type.value), []).append(item_id)
+    return UserEngagement(
+        {field: array("i", sorted(ids)) for field, ids in item_ids.items()}
+    )
+
+
+def _get_cached_user_engagement(redis, user_id):
+    pipe = redis.pipeline()
+    pipe.hgetall(get_user_engagement_cache_key(user_id))
+    pipe.exists(get_user_engagement_stale_key(user_id))
+    fields, is_stale = pipe.execute()
+    if not fields:
+        return None, bool(is_stale)
+    items = {}
+    for field, value in fields.items():
+        field = field.decode("utf-8")
+        if field != _LOADED_FIELD:
+            ids = array("i")
+            ids.frombytes(value)
+            items[field] = ids
+    return UserEngagement(items), bool(is_stale)
+
+
+def set_user_engagement_in_cache(redis, user_id, engagement: UserEngagement):
+    values = [ttl_sec, _LOADED_FIELD, 1]
+    for field, value in engagement.to_cache_fields():
+        values.extend((field, value))
+    redis.eval(
+        _SET_ENGAGEMENT_SCRIPT,
+        2,
+        get_user_engagement_cache_key(user_id),
+        get_user_engagement_stale_key(user_id),
+        *values,
+    )
+
+
+def get_user_engagement(session, redis, user_id) -> Optional[UserEngagement]:
+    """
+    Returns the items `user_id` has saved and reposted, from the cache when
+    present and otherwise from the database, caching them for the next read.
+
+    Returns None while the user's engagement is stale or the cache can't be read,
+    the requested items should then be queried for directly.
+    """
+    try:
+        engagement, is_stale = _get_cached_user_engagement(redis, user_id)
+    except Exception as e:
+        logger.warning(f"Unable to read cached engagement of user {user_id}: {e}")
+        return None
+    if is_stale:
+        return None
+    if engagement is not None:
+        return engagement
+
+    engagement = load_user_engagement(session, user_id)
+    try:
+        set_user_engagement_in_cache(redis, user_id, engagement)
+    except Exception as e:
+        logger.warning(f"Unable to cache engagement of user {user_id}: {e}")
+    return engagement
+
+
+def remove_cached_user_engagements(redis, user_ids):
+    """Drops the cached engagement of users whose saves or reposts changed"""
+    try:
+        pipe = redis.pipeline()
+        for user_id in user_ids:
+            pipe.delete(get_user_engagement_cache_key(user_id))
+            pipe.set(get_user_engagement_stale_key(user_id), 1, stale_sec)
+        pipe.execute()
+    except Exception as e:
+        logger.error("Unable to remove cached engagements: %s", e, exc_info=True)
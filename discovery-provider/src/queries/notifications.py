@@ -2,7 +2,7 @@ import logging  # pylint: disable=C0302
 import functools as ft
 from datetime import date, datetime, timedelta
 from flask import Blueprint, request
-from sqlalchemy import desc
+from sqlalchemy import desc, func
 
 from src import api_helpers
 from src.queries import response_name_constants as const
@@ -22,8 +22,12 @@ from src.models import (
     RepostType,
     Remix,
     AggregateUser,
+    NotificationLog,
 )
 from src.utils.db_session import get_db_read_replica
+from src.utils.redis_connection import get_redis
+from src.utils.redis_constants import notification_log_gap_redis_key
+from src.utils.indexed_block_watcher import get_indexed_block_watcher
 from src.utils.config import shared_config
 
 logger = logging.getLogger(__name__)
@@ -31,6 +35,13 @@ bp = Blueprint("notifications", __name__)
 
 max_block_diff = int(shared_config["discprov"]["notifications_max_block_diff"])
 
+# Notification entity types to their key in the milestones and owners
+notification_entity_keys = {
+    "track": const.tracks,
+    "album": const.albums,
+    "playlist": const.playlists,
+}
+
 
 # pylint: disable=R0911
 def get_owner_id(session, entity_type, entity_id):
@@ -182,6 +193,718 @@ def get_cosign_remix_notifications(session, max_block_number, remix_tracks):
     return remix_notifications
 
 
+def get_notifications(session, min_block_number, max_block_number):
+    """
+    Derives the notifications of blocks (min_block_number, max_block_number] from the
+    indexed follows, saves, reposts, tracks and playlists
+
+    Returns:
+        (notifications, milestones, owners) as described in the notifications route,
+        with the notifications unsorted and without the owners of requested track ids
+    """
+    # Retrieve milestones statistics
+    milestone_info = {}
+
+    # Cache owner info for network entities and pass in w/results
+    owner_info = {const.tracks: {}, const.albums: {}, const.playlists: {}}
+
+    # List of notifications generated from current protocol state
+    notifications_unsorted = []
+
+    # Query relevant follow information
+    follow_query = session.query(Follow)
+
+    # Impose min block number restriction
+    follow_query = follow_query.filter(
+        Follow.is_current == True,
+        Follow.is_delete == False,
+        Follow.blocknumber > min_block_number,
+        Follow.blocknumber <= max_block_number,
+    )
+
+    follow_results = follow_query.all()
+    # Used to retrieve follower counts for this window
+    followed_users = []
+    # Represents all follow notifications
+    follow_notifications = []
+    for entry in follow_results:
+        follow_notif = {
+            const.notification_type: const.notification_type_follow,
+            const.notification_blocknumber: entry.blocknumber,
+            const.notification_timestamp: entry.created_at,
+            const.notification_initiator: entry.follower_user_id,
+            const.notification_metadata: {
+                const.notification_follower_id: entry.follower_user_id,
+                const.notification_followee_id: entry.followee_user_id,
+            },
+        }
+        follow_notifications.append(follow_notif)
+        # Add every user who gained a new follower
+        followed_users.append(entry.followee_user_id)
+
+    # Query count for any user w/new followers
+    follower_counts = get_follower_count_dict(session, followed_users, max_block_number)
+    milestone_info["follower_counts"] = follower_counts
+
+    notifications_unsorted.extend(follow_notifications)
+
+    # Query relevant favorite information
+    favorites_query = session.query(Save)
+    favorites_query = favorites_query.filter(
+        Save.is_current == True,
+        Save.is_delete == False,
+        Save.blocknumber > min_block_number,
+        Save.blocknumber <= max_block_number,
+    )
+    favorite_results = favorites_query.all()
+
+    # ID lists to query count aggregates
+    favorited_track_ids = []
+    favorited_album_ids = []
+    favorited_playlist_ids = []
+
+    # List of favorite notifications
+    favorite_notifications = []
+    favorite_remix_tracks = []
+
+    for entry in favorite_results:
+        favorite_notif = {
+            const.notification_type: const.notification_type_favorite,
+            const.notification_blocknumber: entry.blocknumber,
+            const.notification_timestamp: entry.created_at,
+            const.notification_initiator: entry.user_id,
+        }
+        save_type = entry.save_type
+        save_item_id = entry.save_item_id
+        metadata = {
+            const.notification_entity_type: save_type,
+            const.notification_entity_id: save_item_id,
+        }
+
+        # NOTE if deleted, the favorite can still exist
+        # TODO: Can we aggregate all owner queries and perform at once...?
+        if save_type == SaveType.track:
+            owner_id = get_owner_id(session, "track", save_item_id)
+            if not owner_id:
+                continue
+            metadata[const.notification_entity_owner_id] = owner_id
+            favorited_track_ids.append(save_item_id)
+            owner_info[const.tracks][save_item_id] = owner_id
+
+            favorite_remix_tracks.append(
+                {
+                    const.notification_blocknumber: entry.blocknumber,
+                    const.notification_timestamp: entry.created_at,
+                    "user_id": entry.user_id,
+                    "item_owner_id": owner_id,
+                    "item_id": save_item_id,
+                }
+            )
+
+        elif save_type == SaveType.album:
+            owner_id = get_owner_id(session, "album", save_item_id)
+            if not owner_id:
+                continue
+            metadata[const.notification_entity_owner_id] = owner_id
+            favorited_album_ids.append(save_item_id)
+            owner_info[const.albums][save_item_id] = owner_id
+
+        elif save_type == SaveType.playlist:
+            owner_id = get_owner_id(session, "playlist", save_item_id)
+            if not owner_id:
+                continue
+            metadata[const.notification_entity_owner_id] = owner_id
+            favorited_playlist_ids.append(save_item_id)
+            owner_info[const.playlists][save_item_id] = owner_id
+
+        favorite_notif[const.notification_metadata] = metadata
+        favorite_notifications.append(favorite_notif)
+    notifications_unsorted.extend(favorite_notifications)
+
+    track_favorite_dict = {}
+    album_favorite_dict = {}
+    playlist_favorite_dict = {}
+
+    if favorited_track_ids:
+        track_favorite_counts = get_save_counts(
+            session,
+            False,
+            False,
+            favorited_track_ids,
+            [SaveType.track],
+            max_block_number,
+        )
+        track_favorite_dict = dict(track_favorite_counts)
+
+        favorite_remix_notifications = get_cosign_remix_notifications(
+            session, max_block_number, favorite_remix_tracks
+        )
+        notifications_unsorted.extend(favorite_remix_notifications)
+
+    if favorited_album_ids:
+        album_favorite_counts = get_save_counts(
+            session,
+            False,
+            False,
+            favorited_album_ids,
+            [SaveType.album],
+            max_block_number,
+        )
+        album_favorite_dict = dict(album_favorite_counts)
+
+    if favorited_playlist_ids:
+        playlist_favorite_counts = get_save_counts(
+            session,
+            False,
+            False,
+            favorited_playlist_ids,
+            [SaveType.playlist],
+            max_block_number,
+        )
+        playlist_favorite_dict = dict(playlist_favorite_counts)
+
+    milestone_info[const.notification_favorite_counts] = {}
+    milestone_info[const.notification_favorite_counts][
+        const.tracks
+    ] = track_favorite_dict
+    milestone_info[const.notification_favorite_counts][
+        const.albums
+    ] = album_favorite_dict
+    milestone_info[const.notification_favorite_counts][
+        const.playlists
+    ] = playlist_favorite_dict
+
+    #
+    # Query relevant repost information
+    #
+    repost_query = session.query(Repost)
+    repost_query = repost_query.filter(
+        Repost.is_current == True,
+        Repost.is_delete == False,
+        Repost.blocknumber > min_block_number,
+        Repost.blocknumber <= max_block_number,
+    )
+    repost_results = repost_query.all()
+
+    # ID lists to query counts
+    reposted_track_ids = []
+    reposted_album_ids = []
+    reposted_playlist_ids = []
+
+    # List of repost notifications
+    repost_notifications = []
+
+    # List of repost notifications
+    repost_remix_notifications = []
+    repost_remix_tracks = []
+
+    for entry in repost_results:
+        repost_notif = {
+            const.notification_type: const.notification_type_repost,
+            const.notification_blocknumber: entry.blocknumber,
+            const.notification_timestamp: entry.created_at,
+            const.notification_initiator: entry.user_id,
+        }
+        repost_type = entry.repost_type
+        repost_item_id = entry.repost_item_id
+        metadata = {
+            const.notification_entity_type: repost_type,
+            const.notification_entity_id: repost_item_id,
+        }
+        if repost_type == RepostType.track:
+            owner_id = get_owner_id(session, "track", repost_item_id)
+            if not owner_id:
+                continue
+            metadata[const.notification_entity_owner_id] = owner_id
+            reposted_track_ids.append(repost_item_id)
+            owner_info[const.tracks][repost_item_id] = owner_id
+            repost_remix_tracks.append(
+                {
+                    const.notification_blocknumber: entry.blocknumber,
+                    const.notification_timestamp: entry.created_at,
+                    "user_id": entry.user_id,
+                    "item_owner_id": owner_id,
+                    "item_id": repost_item_id,
+                }
+            )
+
+        elif repost_type == RepostType.album:
+            owner_id = get_owner_id(session, "album", repost_item_id)
+            if not owner_id:
+                continue
+            metadata[const.notification_entity_owner_id] = owner_id
+            reposted_album_ids.append(repost_item_id)
+            owner_info[const.albums][repost_item_id] = owner_id
+
+        elif repost_type == RepostType.playlist:
+            owner_id = get_owner_id(session, "playlist", repost_item_id)
+            if not owner_id:
+                continue
+            metadata[const.notification_entity_owner_id] = owner_id
+            reposted_playlist_ids.append(repost_item_id)
+            owner_info[const.playlists][repost_item_id] = owner_id
+
+        repost_notif[const.notification_metadata] = metadata
+        repost_notifications.append(repost_notif)
+
+    # Append repost notifications
+    notifications_unsorted.extend(repost_notifications)
+
+    track_repost_count_dict = {}
+    album_repost_count_dict = {}
+    playlist_repost_count_dict = {}
+
+    # Aggregate repost counts for relevant fields
+    # Used to notify users of entity-specific milestones
+    if reposted_track_ids:
+        track_repost_counts = get_repost_counts(
+            session,
+            False,
+            False,
+            reposted_track_ids,
+            [RepostType.track],
+            max_block_number,
+        )
+        track_repost_count_dict = dict(track_repost_counts)
+
+        repost_remix_notifications = get_cosign_remix_notifications(
+            session, max_block_number, repost_remix_tracks
+        )
+        notifications_unsorted.extend(repost_remix_notifications)
+
+    if reposted_album_ids:
+        album_repost_counts = get_repost_counts(
+            session,
+            False,
+            False,
+            reposted_album_ids,
+            [RepostType.album],
+            max_block_number,
+        )
+        album_repost_count_dict = dict(album_repost_counts)
+
+    if reposted_playlist_ids:
+        playlist_repost_counts = get_repost_counts(
+            session,
+            False,
+            False,
+            reposted_playlist_ids,
+            [RepostType.playlist],
+            max_block_number,
+        )
+        playlist_repost_count_dict = dict(playlist_repost_counts)
+
+    milestone_info[const.notification_repost_counts] = {}
+    milestone_info[const.notification_repost_counts][
+        const.tracks
+    ] = track_repost_count_dict
+    milestone_info[const.notification_repost_counts][
+        const.albums
+    ] = album_repost_count_dict
+    milestone_info[const.notification_repost_counts][
+        const.playlists
+    ] = playlist_repost_count_dict
+
+    # Query relevant created entity notification - tracks/albums/playlists
+    created_notifications = []
+
+    # Query relevant created tracks for remix information
+    remix_created_notifications = []
+
+    # Aggregate track notifs
+    tracks_query = session.query(Track)
+    # TODO: Is it valid to use Track.is_current here? Might not be the right info...
+    tracks_query = tracks_query.filter(
+        Track.is_unlisted == False,
+        Track.is_delete == False,
+        Track.stem_of == None,
+        Track.blocknumber > min_block_number,
+        Track.blocknumber <= max_block_number,
+    )
+    tracks_query = tracks_query.filter(Track.created_at == Track.updated_at)
+    track_results = tracks_query.all()
+    for entry in track_results:
+        track_notif = {
+            const.notification_type: const.notification_type_create,
+            const.notification_blocknumber: entry.blocknumber,
+            const.notification_timestamp: entry.created_at,
+            const.notification_initiator: entry.owner_id,
+            # TODO: is entity owner id necessary for tracks?
+            const.notification_metadata: {
+                const.notification_entity_type: "track",
+                const.notification_entity_id: entry.track_id,
+                const.notification_entity_owner_id: entry.owner_id,
+            },
+        }
+        created_notifications.append(track_notif)
+
+        if entry.remix_of:
+            # Add notification to remix track owner
+            parent_remix_tracks = [
+                t["parent_track_id"] for t in entry.remix_of["tracks"]
+            ]
+            remix_track_parents = (
+                session.query(Track.owner_id, Track.track_id)
+                .filter(
+                    Track.track_id.in_(parent_remix_tracks),
+                    Track.is_unlisted == False,
+                    Track.is_delete == False,
+                    Track.is_current == True,
+                )
+                .all()
+            )
+            for remix_track_parent in remix_track_parents:
+                [
+                    remix_track_parent_owner,
+                    remix_track_parent_id,
+                ] = remix_track_parent
+                remix_notif = {
+                    const.notification_type: const.notification_type_remix_create,
+                    const.notification_blocknumber: entry.blocknumber,
+                    const.notification_timestamp: entry.created_at,
+                    const.notification_initiator: entry.owner_id,
+                    # TODO: is entity owner id necessary for tracks?
+                    const.notification_metadata: {
+                        const.notification_entity_type: "track",
+                        const.notification_entity_id: entry.track_id,
+                        const.notification_entity_owner_id: entry.owner_id,
+                        const.notification_remix_parent_track_user_id: remix_track_parent_owner,
+                        const.notification_remix_parent_track_id: remix_track_parent_id,
+                    },
+                }
+                remix_created_notifications.append(remix_notif)
+
+    # Handle track update notifications
+    # TODO: Consider switching blocknumber for updated at?
+    updated_tracks_query = session.query(Track)
+    updated_tracks_query = updated_tracks_query.filter(
+        Track.is_unlisted == False,
+        Track.stem_of == None,
+        Track.created_at != Track.updated_at,
+        Track.blocknumber > min_block_number,
+        Track.blocknumber <= max_block_number,
+    )
+    updated_tracks = updated_tracks_query.all()
+    for entry in updated_tracks:
+        prev_entry_query = (
+            session.query(Track)
+            .filter(
+                Track.track_id == entry.track_id,
+                Track.blocknumber < entry.blocknumber,
+            )
+            .order_by(desc(Track.blocknumber))
+        )
+        # Previous unlisted entry indicates transition to public, triggering a notification
+        prev_entry = prev_entry_query.first()
+
+        # Tracks that were unlisted and turned to public
+        if prev_entry.is_unlisted == True:
+            track_notif = {
+                const.notification_type: const.notification_type_create,
+                const.notification_blocknumber: entry.blocknumber,
+                const.notification_timestamp: entry.created_at,
+                const.notification_initiator: entry.owner_id,
+                # TODO: is entity owner id necessary for tracks?
+                const.notification_metadata: {
+                    const.notification_entity_type: "track",
+                    const.notification_entity_id: entry.track_id,
+                    const.notification_entity_owner_id: entry.owner_id,
+                },
+            }
+            created_notifications.append(track_notif)
+
+        # Tracks that were not remixes and turned into remixes
+        if not prev_entry.remix_of and entry.remix_of:
+            # Add notification to remix track owner
+            parent_remix_tracks = [
+                t["parent_track_id"] for t in entry.remix_of["tracks"]
+            ]
+            remix_track_parents = (
+                session.query(Track.owner_id, Track.track_id)
+                .filter(
+                    Track.track_id.in_(parent_remix_tracks),
+                    Track.is_unlisted == False,
+                    Track.is_delete == False,
+                    Track.is_current == True,
+                )
+                .all()
+            )
+            for remix_track_parent in remix_track_parents:
+                [
+                    remix_track_parent_owner,
+                    remix_track_parent_id,
+                ] = remix_track_parent
+                remix_notif = {
+                    const.notification_type: const.notification_type_remix_create,
+                    const.notification_blocknumber: entry.blocknumber,
+                    const.notification_timestamp: entry.created_at,
+                    const.notification_initiator: entry.owner_id,
+                    # TODO: is entity owner id necessary for tracks?
+                    const.notification_metadata: {
+                        const.notification_entity_type: "track",
+                        const.notification_entity_id: entry.track_id,
+                        const.notification_entity_owner_id: entry.owner_id,
+                        const.notification_remix_parent_track_user_id: remix_track_parent_owner,
+                        const.notification_remix_parent_track_id: remix_track_parent_id,
+                    },
+                }
+                remix_created_notifications.append(remix_notif)
+
+    notifications_unsorted.extend(remix_created_notifications)
+
+    # Aggregate playlist/album notifs
+    collection_query = session.query(Playlist)
+    # TODO: Is it valid to use is_current here? Might not be the right info...
+    collection_query = collection_query.filter(
+        Playlist.is_delete == False,
+        Playlist.is_private == False,
+        Playlist.blocknumber > min_block_number,
+        Playlist.blocknumber <= max_block_number,
+    )
+    collection_query = collection_query.filter(
+        Playlist.created_at == Playlist.updated_at
+    )
+    collection_results = collection_query.all()
+
+    for entry in collection_results:
+        collection_notif = {
+            const.notification_type: const.notification_type_create,
+            const.notification_blocknumber: entry.blocknumber,
+            const.notification_timestamp: entry.created_at,
+            const.notification_initiator: entry.playlist_owner_id,
+        }
+        metadata = {
+            const.notification_entity_id: entry.playlist_id,
+            const.notification_entity_owner_id: entry.playlist_owner_id,
+            const.notification_collection_content: entry.playlist_contents,
+        }
+
+        if entry.is_album:
+            metadata[const.notification_entity_type] = "album"
+        else:
+            metadata[const.notification_entity_type] = "playlist"
+        collection_notif[const.notification_metadata] = metadata
+        created_notifications.append(collection_notif)
+
+    # Playlists that were private and turned to public aka 'published'
+    # TODO: Consider switching blocknumber for updated at?
+    publish_playlists_query = session.query(Playlist)
+    publish_playlists_query = publish_playlists_query.filter(
+        Playlist.is_private == False,
+        Playlist.created_at != Playlist.updated_at,
+        Playlist.blocknumber > min_block_number,
+        Playlist.blocknumber <= max_block_number,
+    )
+    publish_playlist_results = publish_playlists_query.all()
+    for entry in publish_playlist_results:
+        prev_entry_query = (
+            session.query(Playlist)
+            .filter(
+                Playlist.playlist_id == entry.playlist_id,
+                Playlist.blocknumber < entry.blocknumber,
+            )
+            .order_by(desc(Playlist.blocknumber))
+        )
+        # Previous private entry indicates transition to public, triggering a notification
+        prev_entry = prev_entry_query.first()
+        if prev_entry.is_private == True:
+            publish_playlist_notif = {
+                const.notification_type: const.notification_type_create,
+                const.notification_blocknumber: entry.blocknumber,
+                const.notification_timestamp: entry.created_at,
+                const.notification_initiator: entry.playlist_owner_id,
+            }
+            metadata = {
+                const.notification_entity_id: entry.playlist_id,
+                const.notification_entity_owner_id: entry.playlist_owner_id,
+                const.notification_collection_content: entry.playlist_contents,
+                const.notification_entity_type: "playlist",
+            }
+            publish_playlist_notif[const.notification_metadata] = metadata
+            created_notifications.append(publish_playlist_notif)
+
+    notifications_unsorted.extend(created_notifications)
+
+    # Get playlist updates
+    today = date.today()
+    thirty_days_ago = today - timedelta(days=30)
+    thirty_days_ago_time = datetime(
+        thirty_days_ago.year, thirty_days_ago.month, thirty_days_ago.day, 0, 0, 0
+    )
+    playlist_update_query = session.query(Playlist)
+    playlist_update_query = playlist_update_query.filter(
+        Playlist.is_current == True,
+        Playlist.is_delete == False,
+        Playlist.last_added_to >= thirty_days_ago_time,
+        Playlist.blocknumber > min_block_number,
+        Playlist.blocknumber <= max_block_number,
+    )
+
+    playlist_update_results = playlist_update_query.all()
+
+    # Represents all playlist update notifications
+    playlist_update_notifications = []
+    playlist_update_notifs_by_playlist_id = {}
+    for entry in playlist_update_results:
+        playlist_update_notifs_by_playlist_id[entry.playlist_id] = {
+            const.notification_type: const.notification_type_playlist_update,
+            const.notification_blocknumber: entry.blocknumber,
+            const.notification_timestamp: entry.created_at,
+            const.notification_initiator: entry.playlist_owner_id,
+            const.notification_metadata: {
+                const.notification_entity_id: entry.playlist_id,
+                const.notification_entity_type: "playlist",
+                const.notification_playlist_update_timestamp: entry.last_added_to,
+            },
+        }
+
+    # get all favorites of the updated playlists
+    # playlists may have been favorited outside the blocknumber bounds
+    # e.g. before the min_block_number
+    playlist_favorites_results = []
+    if playlist_update_notifs_by_playlist_id:
+        playlist_favorites_query = session.query(Save)
+        playlist_favorites_query = playlist_favorites_query.filter(
+            Save.is_current == True,
+            Save.is_delete == False,
+            Save.save_type == SaveType.playlist,
+            Save.save_item_id.in_(list(playlist_update_notifs_by_playlist_id.keys())),
+        )
+        playlist_favorites_results = playlist_favorites_query.all()
+
+    # dictionary of playlist id => users that favorited said playlist
+    # e.g. { playlist1: [user1, user2, ...], ... }
+    # we need this dictionary to know which users need to be notified of a playlist update
+    users_that_favorited_playlists_dict = ft.reduce(
+        lambda accumulator, current: accumulator.update(
+            {
+                current.save_item_id: accumulator[current.save_item_id]
+                + [current.user_id]
+                if current.save_item_id in accumulator
+                else [current.user_id]
+            }
+        )
+        or accumulator,
+        playlist_favorites_results,
+        {},
+    )
+
+    for playlist_id in users_that_favorited_playlists_dict:
+        if playlist_id not in playlist_update_notifs_by_playlist_id:
+            continue
+        playlist_update_notif = playlist_update_notifs_by_playlist_id[playlist_id]
+        playlist_update_notif[const.notification_metadata].update(
+            {
+                const.notification_playlist_update_users: users_that_favorited_playlists_dict[
+                    playlist_id
+                ]
+            }
+        )
+        playlist_update_notifications.append(playlist_update_notif)
+
+    notifications_unsorted.extend(playlist_update_notifications)
+
+    return notifications_unsorted, milestone_info, owner_info
+
+
+def get_notification_milestone(notification):
+    """
+    Returns where the milestone count of the notification's target is found
+    in the milestones, as (milestone, entity key or None, id), or None if the
+    notification has no milestone
+    """
+    notification_type = notification[const.notification_type]
+    metadata = notification.get(const.notification_metadata, {})
+    if notification_type == const.notification_type_follow:
+        return "follower_counts", None, metadata[const.notification_followee_id]
+    if notification_type in (
+        const.notification_type_favorite,
+        const.notification_type_repost,
+    ):
+        milestone = (
+            const.notification_favorite_counts
+            if notification_type == const.notification_type_favorite
+            else const.notification_repost_counts
+        )
+        return (
+            milestone,
+            notification_entity_keys[metadata[const.notification_entity_type]],
+            metadata[const.notification_entity_id],
+        )
+    return None
+
+
+def is_notification_log_complete(session, redis, min_block_number):
+    """
+    Whether the notification log holds every notification after min_block_number.
+    The log starts at the first block indexed with it, any block before its
+    earliest notification may predate it, and restarts after a block it failed to append.
+    """
+    gap_blocknumber = redis.get(notification_log_gap_redis_key)
+    if gap_blocknumber is not None and min_block_number < int(gap_blocknumber):
+        return False
+    first_blocknumber = session.query(func.min(NotificationLog.blocknumber)).scalar()
+    return first_blocknumber is not None and min_block_number >= first_blocknumber
+
+
+def get_logged_notifications(session, min_block_number, max_block_number):
+    """
+    Reads the notifications of blocks (min_block_number, max_block_number] from the
+    notification log, in the same form as get_notifications. Milestones are the counts
+    as of the latest notification of each target within the blocks.
+    """
+    milestone_info = {
+        "follower_counts": {},
+        const.notification_favorite_counts: {
+            const.tracks: {},
+            const.albums: {},
+            const.playlists: {},
+        },
+        const.notification_repost_counts: {
+            const.tracks: {},
+            const.albums: {},
+            const.playlists: {},
+        },
+    }
+    owner_info = {const.tracks: {}, const.albums: {}, const.playlists: {}}
+
+    logged_notifications = (
+        session.query(NotificationLog)
+        .filter(
+            NotificationLog.blocknumber > min_block_number,
+            NotificationLog.blocknumber <= max_block_number,
+        )
+        .order_by(NotificationLog.blocknumber, NotificationLog.idx)
+        .all()
+    )
+
+    notification_list = []
+    for entry in logged_notifications:
+        notification = {
+            const.notification_type: entry.type,
+            const.notification_blocknumber: entry.blocknumber,
+            const.notification_timestamp: entry.timestamp,
+            const.notification_initiator: entry.initiator,
+        }
+        if entry.notification_metadata is not None:
+            notification[const.notification_metadata] = entry.notification_metadata
+        notification_list.append(notification)
+
+        milestone = get_notification_milestone(notification)
+        if milestone is not None:
+            milestone_name, entity_key, entity_id = milestone
+            counts = milestone_info[milestone_name]
+            if entity_key is not None:
+                counts = counts[entity_key]
+                owner_info[entity_key][entity_id] = entry.notification_metadata[
+                    const.notification_entity_owner_id
+                ]
+            if entry.milestone_count is not None:
+                counts[entity_id] = entry.milestone_count
+
+    return notification_list, milestone_info, owner_info
+
+
 @bp.route("/notifications", methods=("GET",))
 # pylint: disable=R0915
 def notifications():
@@ -194,6 +917,8 @@ def notifications():
         track_id?: (Array<int>) Array of track id for fetching the track's owner id
             and adding the track id to owner user id mapping to the `owners` response field
             NOTE: this is added for notification for listen counts
+        timeout?: (int) Seconds to wait, up to 30, for a block after min_block_number
+            to be indexed before responding
 
     Response - Json object w/ the following fields
         notifications: Array of notifications of shape:
@@ -235,6 +960,10 @@ def notifications():
     if not min_block_number and min_block_number != 0:
         return api_helpers.error_response({"msg": "Missing min block number"}, 500)
 
+    timeout = request.args.get("timeout", type=int)
+    if timeout:
+        get_indexed_block_watcher().wait_for_block(min_block_number + 1, timeout)
+
     if not max_block_number:
         max_block_number = min_block_number + max_block_diff
     elif (max_block_number - min_block_number) > max_block_diff:
@@ -253,530 +982,17 @@ def notifications():
         "max_block_number": max_block_number,
     }
 
-    # Retrieve milestones statistics
-    milestone_info = {}
-
-    # Cache owner info for network entities and pass in w/results
-    owner_info = {const.tracks: {}, const.albums: {}, const.playlists: {}}
-
-    # List of notifications generated from current protocol state
-    notifications_unsorted = []
     with db.scoped_session() as session:
-        # Query relevant follow information
-        follow_query = session.query(Follow)
-
-        # Impose min block number restriction
-        follow_query = follow_query.filter(
-            Follow.is_current == True,
-            Follow.is_delete == False,
-            Follow.blocknumber > min_block_number,
-            Follow.blocknumber <= max_block_number,
-        )
-
-        follow_results = follow_query.all()
-        # Used to retrieve follower counts for this window
-        followed_users = []
-        # Represents all follow notifications
-        follow_notifications = []
-        for entry in follow_results:
-            follow_notif = {
-                const.notification_type: const.notification_type_follow,
-                const.notification_blocknumber: entry.blocknumber,
-                const.notification_timestamp: entry.created_at,
-                const.notification_initiator: entry.follower_user_id,
-                const.notification_metadata: {
-                    const.notification_follower_id: entry.follower_user_id,
-                    const.notification_followee_id: entry.followee_user_id,
-                },
-            }
-            follow_notifications.append(follow_notif)
-            # Add every user who gained a new follower
-            followed_users.append(entry.followee_user_id)
-
-        # Query count for any user w/new followers
-        follower_counts = get_follower_count_dict(
-            session, followed_users, max_block_number
-        )
-        milestone_info["follower_counts"] = follower_counts
-
-        notifications_unsorted.extend(follow_notifications)
-
-        # Query relevant favorite information
-        favorites_query = session.query(Save)
-        favorites_query = favorites_query.filter(
-            Save.is_current == True,
-            Save.is_delete == False,
-            Save.blocknumber > min_block_number,
-            Save.blocknumber <= max_block_number,
-        )
-        favorite_results = favorites_query.all()
-
-        # ID lists to query count aggregates
-        favorited_track_ids = []
-        favorited_album_ids = []
-        favorited_playlist_ids = []
-
-        # List of favorite notifications
-        favorite_notifications = []
-        favorite_remix_tracks = []
-
-        for entry in favorite_results:
-            favorite_notif = {
-                const.notification_type: const.notification_type_favorite,
-                const.notification_blocknumber: entry.blocknumber,
-                const.notification_timestamp: entry.created_at,
-                const.notification_initiator: entry.user_id,
-            }
-            save_type = entry.save_type
-            save_item_id = entry.save_item_id
-            metadata = {
-                const.notification_entity_type: save_type,
-                const.notification_entity_id: save_item_id,
-            }
-
-            # NOTE if deleted, the favorite can still exist
-            # TODO: Can we aggregate all owner queries and perform at once...?
-            if save_type == SaveType.track:
-                owner_id = get_owner_id(session, "track", save_item_id)
-                if not owner_id:
-                    continue
-                metadata[const.notification_entity_owner_id] = owner_id
-                favorited_track_ids.append(save_item_id)
-                owner_info[const.tracks][save_item_id] = owner_id
-
-                favorite_remix_tracks.append(
-                    {
-                        const.notification_blocknumber: entry.blocknumber,
-                        const.notification_timestamp: entry.created_at,
-                        "user_id": entry.user_id,
-                        "item_owner_id": owner_id,
-                        "item_id": save_item_id,
-                    }
-                )
-
-            elif save_type == SaveType.album:
-                owner_id = get_owner_id(session, "album", save_item_id)
-                if not owner_id:
-                    continue
-                metadata[const.notification_entity_owner_id] = owner_id
-                favorited_album_ids.append(save_item_id)
-                owner_info[const.albums][save_item_id] = owner_id
-
-            elif save_type == SaveType.playlist:
-                owner_id = get_owner_id(session, "playlist", save_item_id)
-                if not owner_id:
-                    continue
-                metadata[const.notification_entity_owner_id] = owner_id
-                favorited_playlist_ids.append(save_item_id)
-                owner_info[const.playlists][save_item_id] = owner_id
-
-            favorite_notif[const.notification_metadata] = metadata
-            favorite_notifications.append(favorite_notif)
-        notifications_unsorted.extend(favorite_notifications)
-
-        track_favorite_dict = {}
-        album_favorite_dict = {}
-        playlist_favorite_dict = {}
-
-        if favorited_track_ids:
-            track_favorite_counts = get_save_counts(
-                session,
-                False,
-                False,
-                favorited_track_ids,
-                [SaveType.track],
-                max_block_number,
-            )
-            track_favorite_dict = dict(track_favorite_counts)
-
-            favorite_remix_notifications = get_cosign_remix_notifications(
-                session, max_block_number, favorite_remix_tracks
-            )
-            notifications_unsorted.extend(favorite_remix_notifications)
-
-        if favorited_album_ids:
-            album_favorite_counts = get_save_counts(
-                session,
-                False,
-                False,
-                favorited_album_ids,
-                [SaveType.album],
-                max_block_number,
-            )
-            album_favorite_dict = dict(album_favorite_counts)
-
-        if favorited_playlist_ids:
-            playlist_favorite_counts = get_save_counts(
-                session,
-                False,
-                False,
-                favorited_playlist_ids,
-                [SaveType.playlist],
-                max_block_number,
-            )
-            playlist_favorite_dict = dict(playlist_favorite_counts)
-
-        milestone_info[const.notification_favorite_counts] = {}
-        milestone_info[const.notification_favorite_counts][
-            const.tracks
-        ] = track_favorite_dict
-        milestone_info[const.notification_favorite_counts][
-            const.albums
-        ] = album_favorite_dict
-        milestone_info[const.notification_favorite_counts][
-            const.playlists
-        ] = playlist_favorite_dict
-
-        #
-        # Query relevant repost information
-        #
-        repost_query = session.query(Repost)
-        repost_query = repost_query.filter(
-            Repost.is_current == True,
-            Repost.is_delete == False,
-            Repost.blocknumber > min_block_number,
-            Repost.blocknumber <= max_block_number,
-        )
-        repost_results = repost_query.all()
-
-        # ID lists to query counts
-        reposted_track_ids = []
-        reposted_album_ids = []
-        reposted_playlist_ids = []
-
-        # List of repost notifications
-        repost_notifications = []
-
-        # List of repost notifications
-        repost_remix_notifications = []
-        repost_remix_tracks = []
-
-        for entry in repost_results:
-            repost_notif = {
-                const.notification_type: const.notification_type_repost,
-                const.notification_blocknumber: entry.blocknumber,
-                const.notification_timestamp: entry.created_at,
-                const.notification_initiator: entry.user_id,
-            }
-            repost_type = entry.repost_type
-            repost_item_id = entry.repost_item_id
-            metadata = {
-                const.notification_entity_type: repost_type,
-                const.notification_entity_id: repost_item_id,
-            }
-            if repost_type == RepostType.track:
-                owner_id = get_owner_id(session, "track", repost_item_id)
-                if not owner_id:
-                    continue
-                metadata[const.notification_entity_owner_id] = owner_id
-                reposted_track_ids.append(repost_item_id)
-                owner_info[const.tracks][repost_item_id] = owner_id
-                repost_remix_tracks.append(
-                    {
-                        const.notification_blocknumber: entry.blocknumber,
-                        const.notification_timestamp: entry.created_at,
-                        "user_id": entry.user_id,
-                        "item_owner_id": owner_id,
-                        "item_id": repost_item_id,
-                    }
-                )
-
-            elif repost_type == RepostType.album:
-                owner_id = get_owner_id(session, "album", repost_item_id)
-                if not owner_id:
-                    continue
-                metadata[const.notification_entity_owner_id] = owner_id
-                reposted_album_ids.append(repost_item_id)
-                owner_info[const.albums][repost_item_id] = owner_id
-
-            elif repost_type == RepostType.playlist:
-                owner_id = get_owner_id(session, "playlist", repost_item_id)
-                if not owner_id:
-                    continue
-                metadata[const.notification_entity_owner_id] = owner_id
-                reposted_playlist_ids.append(repost_item_id)
-                owner_info[const.playlists][repost_item_id] = owner_id
-
-            repost_notif[const.notification_metadata] = metadata
-            repost_notifications.append(repost_notif)
-
-        # Append repost notifications
-        notifications_unsorted.extend(repost_notifications)
-
-        track_repost_count_dict = {}
-        album_repost_count_dict = {}
-        playlist_repost_count_dict = {}
-
-        # Aggregate repost counts for relevant fields
-        # Used to notify users of entity-specific milestones
-        if reposted_track_ids:
-            track_repost_counts = get_repost_counts(
-                session,
-                False,
-                False,
-                reposted_track_ids,
-                [RepostType.track],
-                max_block_number,
-            )
-            track_repost_count_dict = dict(track_repost_counts)
-
-            repost_remix_notifications = get_cosign_remix_notifications(
-                session, max_block_number, repost_remix_tracks
-            )
-            notifications_unsorted.extend(repost_remix_notifications)
-
-        if reposted_album_ids:
-            album_repost_counts = get_repost_counts(
-                session,
-                False,
-                False,
-                reposted_album_ids,
-                [RepostType.album],
-                max_block_number,
-            )
-            album_repost_count_dict = dict(album_repost_counts)
-
-        if reposted_playlist_ids:
-            playlist_repost_counts = get_repost_counts(
-                session,
-                False,
-                False,
-                reposted_playlist_ids,
-                [RepostType.playlist],
-                max_block_number,
-            )
-            playlist_repost_count_dict = dict(playlist_repost_counts)
-
-        milestone_info[const.notification_repost_counts] = {}
-        milestone_info[const.notification_repost_counts][
-            const.tracks
-        ] = track_repost_count_dict
-        milestone_info[const.notification_repost_counts][
-            const.albums
-        ] = album_repost_count_dict
-        milestone_info[const.notification_repost_counts][
-            const.playlists
-        ] = playlist_repost_count_dict
-
-        # Query relevant created entity notification - tracks/albums/playlists
-        created_notifications = []
-
-        # Query relevant created tracks for remix information
-        remix_created_notifications = []
-
-        # Aggregate track notifs
-        tracks_query = session.query(Track)
-        # TODO: Is it valid to use Track.is_current here? Might not be the right info...
-        tracks_query = tracks_query.filter(
-            Track.is_unlisted == False,
-            Track.is_delete == False,
-            Track.stem_of == None,
-            Track.blocknumber > min_block_number,
-            Track.blocknumber <= max_block_number,
-        )
-        tracks_query = tracks_query.filter(Track.created_at == Track.updated_at)
-        track_results = tracks_query.all()
-        for entry in track_results:
-            track_notif = {
-                const.notification_type: const.notification_type_create,
-                const.notification_blocknumber: entry.blocknumber,
-                const.notification_timestamp: entry.created_at,
-                const.notification_initiator: entry.owner_id,
-                # TODO: is entity owner id necessary for tracks?
-                const.notification_metadata: {
-                    const.notification_entity_type: "track",
-                    const.notification_entity_id: entry.track_id,
-                    const.notification_entity_owner_id: entry.owner_id,
-                },
-            }
-            created_notifications.append(track_notif)
-
-            if entry.remix_of:
-                # Add notification to remix track owner
-                parent_remix_tracks = [
-                    t["parent_track_id"] for t in entry.remix_of["tracks"]
-                ]
-                remix_track_parents = (
-                    session.query(Track.owner_id, Track.track_id)
-                    .filter(
-                        Track.track_id.in_(parent_remix_tracks),
-                        Track.is_unlisted == False,
-                        Track.is_delete == False,
-                        Track.is_current == True,
-                    )
-                    .all()
-                )
-                for remix_track_parent in remix_track_parents:
-                    [
-                        remix_track_parent_owner,
-                        remix_track_parent_id,
-                    ] = remix_track_parent
-                    remix_notif = {
-                        const.notification_type: const.notification_type_remix_create,
-                        const.notification_blocknumber: entry.blocknumber,
-                        const.notification_timestamp: entry.created_at,
-                        const.notification_initiator: entry.owner_id,
-                        # TODO: is entity owner id necessary for tracks?
-                        const.notification_metadata: {
-                            const.notification_entity_type: "track",
-                            const.notification_entity_id: entry.track_id,
-                            const.notification_entity_owner_id: entry.owner_id,
-                            const.notification_remix_parent_track_user_id: remix_track_parent_owner,
-                            const.notification_remix_parent_track_id: remix_track_parent_id,
-                        },
-                    }
-                    remix_created_notifications.append(remix_notif)
-
-        # Handle track update notifications
-        # TODO: Consider switching blocknumber for updated at?
-        updated_tracks_query = session.query(Track)
-        updated_tracks_query = updated_tracks_query.filter(
-            Track.is_unlisted == False,
-            Track.stem_of == None,
-            Track.created_at != Track.updated_at,
-            Track.blocknumber > min_block_number,
-            Track.blocknumber <= max_block_number,
-        )
-        updated_tracks = updated_tracks_query.all()
-        for entry in updated_tracks:
-            prev_entry_query = (
-                session.query(Track)
-                .filter(
-                    Track.track_id == entry.track_id,
-                    Track.blocknumber < entry.blocknumber,
-                )
-                .order_by(desc(Track.blocknumber))
-            )
-            # Previous unlisted entry indicates transition to public, triggering a notification
-            prev_entry = prev_entry_query.first()
-
-            # Tracks that were unlisted and turned to public
-            if prev_entry.is_unlisted == True:
-                track_notif = {
-                    const.notification_type: const.notification_type_create,
-                    const.notification_blocknumber: entry.blocknumber,
-                    const.notification_timestamp: entry.created_at,
-                    const.notification_initiator: entry.owner_id,
-                    # TODO: is entity owner id necessary for tracks?
-                    const.notification_metadata: {
-                        const.notification_entity_type: "track",
-                        const.notification_entity_id: entry.track_id,
-                        const.notification_entity_owner_id: entry.owner_id,
-                    },
-                }
-                created_notifications.append(track_notif)
-
-            # Tracks that were not remixes and turned into remixes
-            if not prev_entry.remix_of and entry.remix_of:
-                # Add notification to remix track owner
-                parent_remix_tracks = [
-                    t["parent_track_id"] for t in entry.remix_of["tracks"]
-                ]
-                remix_track_parents = (
-                    session.query(Track.owner_id, Track.track_id)
-                    .filter(
-                        Track.track_id.in_(parent_remix_tracks),
-                        Track.is_unlisted == False,
-                        Track.is_delete == False,
-                        Track.is_current == True,
-                    )
-                    .all()
-                )
-                for remix_track_parent in remix_track_parents:
-                    [
-                        remix_track_parent_owner,
-                        remix_track_parent_id,
-                    ] = remix_track_parent
-                    remix_notif = {
-                        const.notification_type: const.notification_type_remix_create,
-                        const.notification_blocknumber: entry.blocknumber,
-                        const.notification_timestamp: entry.created_at,
-                        const.notification_initiator: entry.owner_id,
-                        # TODO: is entity owner id necessary for tracks?
-                        const.notification_metadata: {
-                            const.notification_entity_type: "track",
-                            const.notification_entity_id: entry.track_id,
-                            const.notification_entity_owner_id: entry.owner_id,
-                            const.notification_remix_parent_track_user_id: remix_track_parent_owner,
-                            const.notification_remix_parent_track_id: remix_track_parent_id,
-                        },
-                    }
-                    remix_created_notifications.append(remix_notif)
-
-        notifications_unsorted.extend(remix_created_notifications)
-
-        # Aggregate playlist/album notifs
-        collection_query = session.query(Playlist)
-        # TODO: Is it valid to use is_current here? Might not be the right info...
-        collection_query = collection_query.filter(
-            Playlist.is_delete == False,
-            Playlist.is_private == False,
-            Playlist.blocknumber > min_block_number,
-            Playlist.blocknumber <= max_block_number,
-        )
-        collection_query = collection_query.filter(
-            Playlist.created_at == Playlist.updated_at
-        )
-        collection_results = collection_query.all()
-
-        for entry in collection_results:
-            collection_notif = {
-                const.notification_type: const.notification_type_create,
-                const.notification_blocknumber: entry.blocknumber,
-                const.notification_timestamp: entry.created_at,
-                const.notification_initiator: entry.playlist_owner_id,
-            }
-            metadata = {
-                const.notification_entity_id: entry.playlist_id,
-                const.notification_entity_owner_id: entry.playlist_owner_id,
-                const.notification_collection_content: entry.playlist_contents,
-            }
-
-            if entry.is_album:
-                metadata[const.notification_entity_type] = "album"
-            else:
-                metadata[const.notification_entity_type] = "playlist"
-            collection_notif[const.notification_metadata] = metadata
-            created_notifications.append(collection_notif)
-
-        # Playlists that were private and turned to public aka 'published'
-        # TODO: Consider switching blocknumber for updated at?
-        publish_playlists_query = session.query(Playlist)
-        publish_playlists_query = publish_playlists_query.filter(
-            Playlist.is_private == False,
-            Playlist.created_at != Playlist.updated_at,
-            Playlist.blocknumber > min_block_number,
-            Playlist.blocknumber <= max_block_number,
-        )
-        publish_playlist_results = publish_playlists_query.all()
-        for entry in publish_playlist_results:
-            prev_entry_query = (
-                session.query(Playlist)
-                .filter(
-                    Playlist.playlist_id == entry.playlist_id,
-                    Playlist.blocknumber < entry.blocknumber,
-                )
-                .order_by(desc(Playlist.blocknumber))
+        if is_notification_log_complete(session, get_redis(), min_block_number):
+            (
+                notifications_unsorted,
+                milestone_info,
+                owner_info,
+            ) = get_logged_notifications(session, min_block_number, max_block_number)
+        else:
+            notifications_unsorted, milestone_info, owner_info = get_notifications(
+                session, min_block_number, max_block_number
             )
-            # Previous private entry indicates transition to public, triggering a notification
-            prev_entry = prev_entry_query.first()
-            if prev_entry.is_private == True:
-                publish_playlist_notif = {
-                    const.notification_type: const.notification_type_create,
-                    const.notification_blocknumber: entry.blocknumber,
-                    const.notification_timestamp: entry.created_at,
-                    const.notification_initiator: entry.playlist_owner_id,
-                }
-                metadata = {
-                    const.notification_entity_id: entry.playlist_id,
-                    const.notification_entity_owner_id: entry.playlist_owner_id,
-                    const.notification_collection_content: entry.playlist_contents,
-                    const.notification_entity_type: "playlist",
-                }
-                publish_playlist_notif[const.notification_metadata] = metadata
-                created_notifications.append(publish_playlist_notif)
-
-        notifications_unsorted.extend(created_notifications)
 
         # Get additional owner info as requested for listen counts
         tracks_owner_query = session.query(Track).filter(
@@ -788,82 +1004,6 @@ def notifications():
             track_id = entry.track_id
             owner_info[const.tracks][track_id] = owner
 
-        # Get playlist updates
-        today = date.today()
-        thirty_days_ago = today - timedelta(days=30)
-        thirty_days_ago_time = datetime(
-            thirty_days_ago.year, thirty_days_ago.month, thirty_days_ago.day, 0, 0, 0
-        )
-        playlist_update_query = session.query(Playlist)
-        playlist_update_query = playlist_update_query.filter(
-            Playlist.is_current == True,
-            Playlist.is_delete == False,
-            Playlist.last_added_to >= thirty_days_ago_time,
-            Playlist.blocknumber > min_block_number,
-            Playlist.blocknumber <= max_block_number,
-        )
-
-        playlist_update_results = playlist_update_query.all()
-
-        # Represents all playlist update notifications
-        playlist_update_notifications = []
-        playlist_update_notifs_by_playlist_id = {}
-        for entry in playlist_update_results:
-            playlist_update_notifs_by_playlist_id[entry.playlist_id] = {
-                const.notification_type: const.notification_type_playlist_update,
-                const.notification_blocknumber: entry.blocknumber,
-                const.notification_timestamp: entry.created_at,
-                const.notification_initiator: entry.playlist_owner_id,
-                const.notification_metadata: {
-                    const.notification_entity_id: entry.playlist_id,
-                    const.notification_entity_type: "playlist",
-                    const.notification_playlist_update_timestamp: entry.last_added_to,
-                },
-            }
-
-        # get all favorited playlists
-        # playlists may have been favorited outside the blocknumber bounds
-        # e.g. before the min_block_number
-        playlist_favorites_query = session.query(Save)
-        playlist_favorites_query = playlist_favorites_query.filter(
-            Save.is_current == True,
-            Save.is_delete == False,
-            Save.save_type == SaveType.playlist,
-        )
-        playlist_favorites_results = playlist_favorites_query.all()
-
-        # dictionary of playlist id => users that favorited said playlist
-        # e.g. { playlist1: [user1, user2, ...], ... }
-        # we need this dictionary to know which users need to be notified of a playlist update
-        users_that_favorited_playlists_dict = ft.reduce(
-            lambda accumulator, current: accumulator.update(
-                {
-                    current.save_item_id: accumulator[current.save_item_id]
-                    + [current.user_id]
-                    if current.save_item_id in accumulator
-                    else [current.user_id]
-                }
-            )
-            or accumulator,
-            playlist_favorites_results,
-            {},
-        )
-
-        for playlist_id in users_that_favorited_playlists_dict:
-            if playlist_id not in playlist_update_notifs_by_playlist_id:
-                continue
-            playlist_update_notif = playlist_update_notifs_by_playlist_id[playlist_id]
-            playlist_update_notif[const.notification_metadata].update(
-                {
-                    const.notification_playlist_update_users: users_that_favorited_playlists_dict[
-                        playlist_id
-                    ]
-                }
-            )
-            playlist_update_notifications.append(playlist_update_notif)
-
-        notifications_unsorted.extend(playlist_update_notifications)
-
     # Final sort - TODO: can we sort by timestamp?
     sorted_notifications = sorted(
         notifications_unsorted,
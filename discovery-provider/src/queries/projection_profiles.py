@@ -0,0 +1,17 @@
+from src.models import Track, Playlist
+
+# Columns each list route selects and ranks its candidates by. Only the items on
+# the requested page are then loaded in full, from the track and playlist caches.
+
+# Feed: followee tracks and playlists, ranked by created_at and deduped against
+# the playlists their tracks were released with
+feed_track_columns = (Track.track_id, Track.owner_id, Track.created_at)
+feed_playlist_columns = (
+    Playlist.playlist_id,
+    Playlist.playlist_owner_id,
+    Playlist.created_at,
+    Playlist.playlist_contents,
+)
+
+# Tag search: the listed tracks with the tag, ranked by play count
+tag_search_track_columns = (Track.track_id,)
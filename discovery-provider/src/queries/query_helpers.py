@@ -1,6 +1,9 @@
 # pylint: disable=too-many-lines
+import base64
+import json
 import logging
-from sqlalchemy import func, desc, text, Integer, and_, bindparam
+from datetime import datetime
+from sqlalchemy import func, desc, text, Integer, and_, or_, tuple_, bindparam
 
 from flask import request
 
@@ -17,13 +20,23 @@ from src.models import (
     SaveType,
     Remix,
     AggregatePlays,
-    AggregateUser,
     AggregateTrack,
     AggregatePlaylist,
+    AggregateDailyReposts,
+    AggregateDailySaves,
 )
 from src.utils import helpers, redis_connection
 from src.queries.get_unpopulated_users import get_unpopulated_users, set_users_in_cache
-from src.queries.get_balances import get_balances
+from src.queries.get_balances import (
+    does_balance_need_refresh,
+    enqueue_lazy_balance_refresh,
+    to_balance_dict,
+)
+from src.queries.get_user_engagement import (
+    get_user_engagement,
+    is_engagement_cache_enabled,
+)
+from src.utils.social_graph import get_social_graph
 
 logger = logging.getLogger(__name__)
 
@@ -105,108 +118,169 @@ def parse_sort_param(base_query, model, whitelist_sort_params):
     return base_query.order_by(*order_bys)
 
 
+def get_followee_user_ids(session, user_id):
+    """
+    Returns the users `user_id` follows, for use with in_().
+    Read from the social graph when it is available, otherwise a subquery.
+    """
+    social_graph = get_social_graph()
+    if social_graph is not None:
+        return social_graph.followees(user_id)
+    return session.query(Follow.followee_user_id).filter(
+        Follow.follower_user_id == user_id,
+        Follow.is_current == True,
+        Follow.is_delete == False,
+    )
+
+
+def _get_current_user_engagement(session, current_user_id):
+    """
+    Returns the current user's cached saves and reposts for computing the
+    has_current_user_* fields in memory, or None to query for them.
+    """
+    if not is_engagement_cache_enabled():
+        return None
+    return get_user_engagement(session, redis, current_user_id)
+
+
+def user_metadata_sql(with_current_user_follows):
+    """
+    Returns the query for the per user fields of populate_user_metadata, one row
+    per distinct id in :user_ids. With `with_current_user_follows` it also reads
+    whether :current_user_id follows each user and how many of their followees do.
+    """
+    current_user_followees = ""
+    current_user_follows = ""
+    if with_current_user_follows:
+        current_user_followees = """,
+        current_user_followees AS (
+            SELECT followee_user_id
+            FROM follows
+            WHERE
+                follower_user_id = :current_user_id
+                AND is_current IS TRUE
+                AND is_delete IS FALSE
+        )"""
+        current_user_follows = """,
+            requested_users.user_id IN (
+                SELECT followee_user_id FROM current_user_followees
+            ) AS does_current_user_follow,
+            (
+                SELECT count(*)
+                FROM follows
+                WHERE
+                    follows.followee_user_id = requested_users.user_id
+                    AND follows.is_current IS TRUE
+                    AND follows.is_delete IS FALSE
+                    AND follows.follower_user_id IN (
+                        SELECT followee_user_id FROM current_user_followees
+                    )
+            ) AS current_user_followee_follow_count"""
+    return f"""
+        WITH requested_users AS (
+            SELECT DISTINCT unnest(CAST(:user_ids AS integer[])) AS user_id
+        ){current_user_followees}
+        SELECT
+            requested_users.user_id,
+            aggregate_user.track_count,
+            aggregate_user.playlist_count,
+            aggregate_user.album_count,
+            aggregate_user.follower_count,
+            aggregate_user.following_count,
+            aggregate_user.repost_count,
+            aggregate_user.track_save_count,
+            (
+                SELECT max(tracks.blocknumber)
+                FROM tracks
+                WHERE
+                    tracks.owner_id = requested_users.user_id
+                    AND tracks.is_current IS TRUE
+                    AND tracks.is_delete IS FALSE
+            ) AS track_blocknumber,
+            user_balances.balance,
+            user_balances.associated_wallets_balance,
+            user_balances.associated_sol_wallets_balance,
+            user_balances.created_at AS balance_created_at,
+            user_balances.updated_at AS balance_updated_at{current_user_follows}
+        FROM requested_users
+        LEFT JOIN aggregate_user ON aggregate_user.user_id = requested_users.user_id
+        LEFT JOIN user_balances ON user_balances.user_id = requested_users.user_id
+    """
+
+
 # given list of user ids and corresponding users, populates each user object with:
 #   track_count, playlist_count, album_count, follower_count, followee_count, repost_count
 #   if current_user_id available, populates does_current_user_follow, followee_follows
 def populate_user_metadata(
     session, user_ids, users, current_user_id, with_track_save_count=False
 ):
-    aggregate_user = (
-        session.query(
-            AggregateUser.user_id,
-            AggregateUser.track_count,
-            AggregateUser.playlist_count,
-            AggregateUser.album_count,
-            AggregateUser.follower_count,
-            AggregateUser.following_count,
-            AggregateUser.repost_count,
-            AggregateUser.track_save_count,
-        )
-        .filter(AggregateUser.user_id.in_(user_ids))
-        .all()
-    )
-
-    # build dict of user id --> track/playlist/album/follower/followee/repost/track save counts
-    count_dict = {
-        user_id: {
-            response_name_constants.track_count: track_count,
-            response_name_constants.playlist_count: playlist_count,
-            response_name_constants.album_count: album_count,
-            response_name_constants.follower_count: follower_count,
-            response_name_constants.followee_count: following_count,
-            response_name_constants.repost_count: repost_count,
-            response_name_constants.track_save_count: track_save_count,
-        }
-        for (
-            user_id,
-            track_count,
-            playlist_count,
-            album_count,
-            follower_count,
-            following_count,
-            repost_count,
-            track_save_count,
-        ) in aggregate_user
-    }
-
-    # build dict of user id --> track blocknumber
-    track_blocknumbers = (
-        session.query(Track.owner_id, func.max(Track.blocknumber))
-        .filter(
-            Track.is_current == True,
-            Track.is_delete == False,
-            Track.owner_id.in_(user_ids),
-        )
-        .group_by(Track.owner_id)
-        .all()
-    )
-    track_blocknumber_dict = dict(track_blocknumbers)
-
+    social_graph = get_social_graph() if current_user_id else None
+    # Read the current user's follows with the rest when there's no social graph
+    query_current_user_follows = bool(current_user_id) and social_graph is None
+    rows = session.execute(
+        text(user_metadata_sql(query_current_user_follows)),
+        {"user_ids": list(user_ids), "current_user_id": current_user_id},
+    ).fetchall()
+
+    count_dict = {}
+    track_blocknumber_dict = {}
+    balance_dict = {}
+    needs_balance_refresh = []
     current_user_followed_user_ids = {}
     current_user_followee_follow_count_dict = {}
-    if current_user_id:
-        # does current user follow any of requested user ids
-        current_user_followed_user_ids = (
-            session.query(Follow.followee_user_id)
-            .filter(
-                Follow.is_current == True,
-                Follow.is_delete == False,
-                Follow.followee_user_id.in_(user_ids),
-                Follow.follower_user_id == current_user_id,
+    for row in rows:
+        user_id = row["user_id"]
+        # build dict of user id --> track/playlist/album/follower/followee/repost/track save counts
+        if row["track_count"] is not None:
+            count_dict[user_id] = {
+                response_name_constants.track_count: row["track_count"],
+                response_name_constants.playlist_count: row["playlist_count"],
+                response_name_constants.album_count: row["album_count"],
+                response_name_constants.follower_count: row["follower_count"],
+                response_name_constants.followee_count: row["following_count"],
+                response_name_constants.repost_count: row["repost_count"],
+                response_name_constants.track_save_count: row["track_save_count"],
+            }
+        # build dict of user id --> track blocknumber
+        if row["track_blocknumber"] is not None:
+            track_blocknumber_dict[user_id] = row["track_blocknumber"]
+        # build dict of user id --> balance, queueing missing and stale balances
+        if row["balance"] is None:
+            needs_balance_refresh.append(user_id)
+        else:
+            balance_dict[user_id] = to_balance_dict(
+                row["balance"],
+                row["associated_wallets_balance"],
+                row["associated_sol_wallets_balance"],
             )
-            .all()
-        )
+            if does_balance_need_refresh(
+                row["balance_created_at"], row["balance_updated_at"]
+            ):
+                needs_balance_refresh.append(user_id)
+        if query_current_user_follows:
+            # does current user follow any of requested user ids
+            if row["does_current_user_follow"]:
+                current_user_followed_user_ids[user_id] = True
+            # build dict of user id --> followee follow count
+            if row["current_user_followee_follow_count"]:
+                current_user_followee_follow_count_dict[user_id] = row[
+                    "current_user_followee_follow_count"
+                ]
+
+    if social_graph is not None:
+        # does current user follow any of requested user ids
         current_user_followed_user_ids = {
-            r[0]: True for r in current_user_followed_user_ids
+            user_id: True
+            for user_id in user_ids
+            if social_graph.is_following(current_user_id, user_id)
         }
 
         # build dict of user id --> followee follow count
-        current_user_followees = (
-            session.query(Follow.followee_user_id)
-            .filter(
-                Follow.is_current == True,
-                Follow.is_delete == False,
-                Follow.follower_user_id == current_user_id,
-            )
-            .subquery()
+        current_user_followee_follow_count_dict = social_graph.followee_follow_counts(
+            current_user_id, user_ids
         )
 
-        current_user_followee_follow_counts = (
-            session.query(Follow.followee_user_id, func.count(Follow.followee_user_id))
-            .filter(
-                Follow.is_current == True,
-                Follow.is_delete == False,
-                Follow.follower_user_id.in_(current_user_followees),
-                Follow.followee_user_id.in_(user_ids),
-            )
-            .group_by(Follow.followee_user_id)
-            .all()
-        )
-        current_user_followee_follow_count_dict = dict(
-            current_user_followee_follow_counts
-        )
-
-    balance_dict = get_balances(session, redis, user_ids)
+    enqueue_lazy_balance_refresh(redis, needs_balance_refresh)
 
     for user in users:
         user_id = user["user_id"]
@@ -311,40 +385,49 @@ def populate_track_metadata(session, track_ids, tracks, current_user_id):
     followee_track_repost_dict = {}
     followee_track_save_dict = {}
     if current_user_id:
-        # has current user reposted any of requested track ids
-        user_reposted = (
-            session.query(Repost.repost_item_id)
-            .filter(
-                Repost.is_current == True,
-                Repost.is_delete == False,
-                Repost.repost_item_id.in_(track_ids),
-                Repost.repost_type == RepostType.track,
-                Repost.user_id == current_user_id,
+        engagement = _get_current_user_engagement(session, current_user_id)
+        if engagement is not None:
+            user_reposted_track_dict = {
+                track_id: True
+                for track_id in track_ids
+                if engagement.has_reposted([RepostType.track], track_id)
+            }
+            user_saved_track_dict = {
+                track_id: True
+                for track_id in track_ids
+                if engagement.has_saved([SaveType.track], track_id)
+            }
+        else:
+            # has current user reposted any of requested track ids
+            user_reposted = (
+                session.query(Repost.repost_item_id)
+                .filter(
+                    Repost.is_current == True,
+                    Repost.is_delete == False,
+                    Repost.repost_item_id.in_(track_ids),
+                    Repost.repost_type == RepostType.track,
+                    Repost.user_id == current_user_id,
+                )
+                .all()
             )
-            .all()
-        )
-        user_reposted_track_dict = {repost[0]: True for repost in user_reposted}
+            user_reposted_track_dict = {repost[0]: True for repost in user_reposted}
 
-        # has current user saved any of requested track ids
-        user_saved_tracks_query = (
-            session.query(Save.save_item_id)
-            .filter(
-                Save.is_current == True,
-                Save.is_delete == False,
-                Save.user_id == current_user_id,
-                Save.save_item_id.in_(track_ids),
-                Save.save_type == SaveType.track,
+            # has current user saved any of requested track ids
+            user_saved_tracks_query = (
+                session.query(Save.save_item_id)
+                .filter(
+                    Save.is_current == True,
+                    Save.is_delete == False,
+                    Save.user_id == current_user_id,
+                    Save.save_item_id.in_(track_ids),
+                    Save.save_type == SaveType.track,
+                )
+                .all()
             )
-            .all()
-        )
-        user_saved_track_dict = {save[0]: True for save in user_saved_tracks_query}
+            user_saved_track_dict = {save[0]: True for save in user_saved_tracks_query}
 
         # Get current user's followees.
-        followees = session.query(Follow.followee_user_id).filter(
-            Follow.follower_user_id == current_user_id,
-            Follow.is_current == True,
-            Follow.is_delete == False,
-        )
+        followees = get_followee_user_ids(session, current_user_id)
 
         # build dict of track id --> followee reposts
         followee_track_reposts = session.query(Repost).filter(
@@ -585,48 +668,53 @@ def populate_playlist_metadata(
     followee_playlist_repost_dict = {}
     followee_playlist_save_dict = {}
     if current_user_id:
-        # has current user reposted any of requested playlist ids
-        current_user_playlist_reposts = (
-            session.query(Repost.repost_item_id)
-            .filter(
-                Repost.is_current == True,
-                Repost.is_delete == False,
-                Repost.repost_item_id.in_(playlist_ids),
-                Repost.repost_type.in_(repost_types),
-                Repost.user_id == current_user_id,
+        engagement = _get_current_user_engagement(session, current_user_id)
+        if engagement is not None:
+            user_reposted_playlist_dict = {
+                playlist_id: True
+                for playlist_id in playlist_ids
+                if engagement.has_reposted(repost_types, playlist_id)
+            }
+            user_saved_playlist_dict = {
+                playlist_id: True
+                for playlist_id in playlist_ids
+                if engagement.has_saved(save_types, playlist_id)
+            }
+        else:
+            # has current user reposted any of requested playlist ids
+            current_user_playlist_reposts = (
+                session.query(Repost.repost_item_id)
+                .filter(
+                    Repost.is_current == True,
+                    Repost.is_delete == False,
+                    Repost.repost_item_id.in_(playlist_ids),
+                    Repost.repost_type.in_(repost_types),
+                    Repost.user_id == current_user_id,
+                )
+                .all()
             )
-            .all()
-        )
-        user_reposted_playlist_dict = {
-            r[0]: True for r in current_user_playlist_reposts
-        }
+            user_reposted_playlist_dict = {
+                r[0]: True for r in current_user_playlist_reposts
+            }
 
-        # has current user saved any of requested playlist ids
-        user_saved_playlists_query = (
-            session.query(Save.save_item_id)
-            .filter(
-                Save.is_current == True,
-                Save.is_delete == False,
-                Save.user_id == current_user_id,
-                Save.save_item_id.in_(playlist_ids),
-                Save.save_type.in_(save_types),
+            # has current user saved any of requested playlist ids
+            user_saved_playlists_query = (
+                session.query(Save.save_item_id)
+                .filter(
+                    Save.is_current == True,
+                    Save.is_delete == False,
+                    Save.user_id == current_user_id,
+                    Save.save_item_id.in_(playlist_ids),
+                    Save.save_type.in_(save_types),
+                )
+                .all()
             )
-            .all()
-        )
-        user_saved_playlist_dict = {
-            save[0]: True for save in user_saved_playlists_query
-        }
+            user_saved_playlist_dict = {
+                save[0]: True for save in user_saved_playlists_query
+            }
 
         # Get current user's followees.
-        followee_user_ids = (
-            session.query(Follow.followee_user_id)
-            .filter(
-                Follow.follower_user_id == current_user_id,
-                Follow.is_current == True,
-                Follow.is_delete == False,
-            )
-            .all()
-        )
+        followee_user_ids = get_followee_user_ids(session, current_user_id)
 
         # Build dict of playlist id --> followee reposts.
         followee_playlist_reposts = (
@@ -754,6 +842,51 @@ def get_repost_counts_query(
     return repost_counts_query
 
 
+def get_windowed_repost_counts_query(
+    session, query_repost_type_flag, filter_ids, repost_types, time
+):
+    """
+    Sums the aggregate_daily_reposts buckets for the given items over the
+    time window {day, week, month, year}, accurate to the day.
+    Returns rows shaped like get_repost_counts_query for items
+    """
+    count_col = func.sum(AggregateDailyReposts.count)
+    if query_repost_type_flag:
+        repost_counts_query = session.query(
+            AggregateDailyReposts.repost_item_id,
+            count_col,
+            AggregateDailyReposts.repost_type,
+        )
+    else:
+        repost_counts_query = session.query(
+            AggregateDailyReposts.repost_item_id, count_col
+        )
+
+    interval = "(NOW() - interval '1 {}')::date".format(time)
+    repost_counts_query = repost_counts_query.filter(
+        AggregateDailyReposts.timestamp >= text(interval)
+    )
+    if filter_ids is not None:
+        repost_counts_query = repost_counts_query.filter(
+            AggregateDailyReposts.repost_item_id.in_(filter_ids)
+        )
+    if repost_types:
+        repost_counts_query = repost_counts_query.filter(
+            AggregateDailyReposts.repost_type.in_(repost_types)
+        )
+
+    if query_repost_type_flag:
+        repost_counts_query = repost_counts_query.group_by(
+            AggregateDailyReposts.repost_item_id, AggregateDailyReposts.repost_type
+        )
+    else:
+        repost_counts_query = repost_counts_query.group_by(
+            AggregateDailyReposts.repost_item_id
+        )
+
+    return repost_counts_query.having(count_col > 0)
+
+
 # Gets the repost count for users or tracks with the filters specified in the params.
 # The time param {day, week, month, year} is used in generate_trending to create a windowed time frame for repost counts
 
@@ -767,6 +900,12 @@ def get_repost_counts(
     max_block_number=None,
     time=None,
 ):
+    # Windowed item counts are summed from the daily buckets the indexer maintains
+    if time is not None and not query_by_user_flag and not max_block_number:
+        return get_windowed_repost_counts_query(
+            session, query_repost_type_flag, filter_ids, repost_types, time
+        ).all()
+
     repost_counts_query = get_repost_counts_query(
         session,
         query_by_user_flag,
@@ -882,6 +1021,47 @@ def get_save_counts_query(
     return save_counts_query
 
 
+def get_windowed_save_counts_query(
+    session, query_save_type_flag, filter_ids, save_types, time
+):
+    """
+    Sums the aggregate_daily_saves buckets for the given items over the
+    time window {day, week, month, year}, accurate to the day.
+    Returns rows shaped like get_save_counts_query for items
+    """
+    count_col = func.sum(AggregateDailySaves.count)
+    if query_save_type_flag:
+        save_counts_query = session.query(
+            AggregateDailySaves.save_item_id,
+            count_col,
+            AggregateDailySaves.save_type,
+        )
+    else:
+        save_counts_query = session.query(AggregateDailySaves.save_item_id, count_col)
+
+    interval = "(NOW() - interval '1 {}')::date".format(time)
+    save_counts_query = save_counts_query.filter(
+        AggregateDailySaves.timestamp >= text(interval)
+    )
+    if filter_ids is not None:
+        save_counts_query = save_counts_query.filter(
+            AggregateDailySaves.save_item_id.in_(filter_ids)
+        )
+    if save_types:
+        save_counts_query = save_counts_query.filter(
+            AggregateDailySaves.save_type.in_(save_types)
+        )
+
+    if query_save_type_flag:
+        save_counts_query = save_counts_query.group_by(
+            AggregateDailySaves.save_item_id, AggregateDailySaves.save_type
+        )
+    else:
+        save_counts_query = save_counts_query.group_by(AggregateDailySaves.save_item_id)
+
+    return save_counts_query.having(count_col > 0)
+
+
 # Gets the save count for users or tracks with the filters specified in the params.
 # The time param {day, week, month, year} is used in generate_trending to create a windowed time frame for save counts
 def get_save_counts(
@@ -893,6 +1073,12 @@ def get_save_counts(
     max_block_number=None,
     time=None,
 ):
+    # Windowed item counts are summed from the daily buckets the indexer maintains
+    if time is not None and not query_by_user_flag and not max_block_number:
+        return get_windowed_save_counts_query(
+            session, query_save_type_flag, filter_ids, save_types, time
+        ).all()
+
     save_counts_query = get_save_counts_query(
         session,
         query_by_user_flag,
@@ -985,6 +1171,77 @@ def add_query_pagination(
     return modified_query
 
 
+def encode_cursor(values):
+    """Returns an opaque cursor for the sort key values of the last row of a page"""
+    values = [
+        value.isoformat() if isinstance(value, datetime) else value for value in values
+    ]
+    return base64.urlsafe_b64encode(json.dumps(values).encode("utf-8")).decode("utf-8")
+
+
+def decode_cursor(cursor):
+    """Returns the sort key values of a cursor, or None for the first page"""
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("utf-8")))
+    except (ValueError, TypeError) as e:
+        raise exceptions.ArgumentError("Invalid cursor") from e
+    if not isinstance(values, list):
+        raise exceptions.ArgumentError("Invalid cursor")
+    return values
+
+
+def add_keyset_pagination(query_obj, sort_keys, cursor, limit):
+    """
+    Orders `query_obj` by `sort_keys`, a list of (column, is_desc) ending in a
+    unique column, and returns the `limit` rows after the row `cursor` was made from.
+    Unlike an offset, the rows before the cursor are never read when an index
+    matches the sort keys.
+    """
+    values = decode_cursor(cursor)
+    if values is not None:
+        if len(values) != len(sort_keys):
+            raise exceptions.ArgumentError("Invalid cursor")
+        columns = [column for column, _ in sort_keys]
+        directions = {is_desc for _, is_desc in sort_keys}
+        if len(directions) == 1:
+            # Row comparison, matched by a composite index
+            after = tuple_(*columns) < tuple_(*values)
+            if not directions.pop():
+                after = tuple_(*columns) > tuple_(*values)
+        else:
+            after = or_(
+                *[
+                    and_(
+                        *[columns[j] == values[j] for j in range(i)],
+                        columns[i] < values[i] if is_desc else columns[i] > values[i],
+                    )
+                    for i, (_, is_desc) in enumerate(sort_keys)
+                ]
+            )
+        query_obj = query_obj.filter(after)
+    order_bys = [
+        column.desc() if is_desc else column.asc() for column, is_desc in sort_keys
+    ]
+    return query_obj.order_by(*order_bys).limit(limit)
+
+
+def get_next_cursor(rows, limit, get_sort_values):
+    """Returns the cursor for the page after `rows`, None when it was the last page"""
+    if len(rows) < limit:
+        return None
+    return encode_cursor(get_sort_values(rows[-1]))
+
+
+def populate_users_in_order(session, user_ids, current_user_id):
+    """Returns the populated users of `user_ids`, in the same order"""
+    users = get_unpopulated_users(session, user_ids)
+    users = populate_user_metadata(session, user_ids, users, current_user_id)
+    users_by_id = {user["user_id"]: user for user in users}
+    return [users_by_id[user_id] for user_id in user_ids if user_id in users_by_id]
+
+
 def get_genre_list(genre):
     genre_list = []
     genre_list.append(genre)
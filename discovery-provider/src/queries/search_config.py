@@ -30,6 +30,15 @@ user_follower_weight = 0.5
 # Boost for exact handle match
 user_handle_exact_match_boost = 10
 
+# Search execution
+
+# Search kind queries a process runs at once across every search, each holds
+# a db connection while its query runs
+search_max_concurrent_queries = 16
+# Seconds a search's queries may run, postgres cancels the queries of kinds
+# that haven't finished by then and those are returned empty
+search_deadline_sec = 5
+
 logger = logging.getLogger(__name__)
 
 
@@ -1,9 +1,11 @@
 from enum import Enum
 import concurrent.futures
 import logging  # pylint: disable=C0302
+import time
 from functools import cmp_to_key
 from flask import Blueprint, request
 import sqlalchemy
+from psycopg2.extensions import QueryCanceledError
 
 from src import api_helpers, exceptions
 from src.queries.search_config import (
@@ -17,9 +19,12 @@ from src.queries.search_config import (
     search_handle_exact_match_boost,
     search_user_name_exact_match_boost,
     user_handle_exact_match_boost,
+    search_max_concurrent_queries,
+    search_deadline_sec,
 )
-from src.models import Track, RepostType, Save, SaveType, Follow
-from src.utils import helpers
+from src.models import RepostType, Save, SaveType, Follow, UserBalance
+from src.utils.autocomplete_index import get_autocomplete_index
+from src.utils.config import shared_config
 from src.utils.db_session import get_db_read_replica
 from src.queries import response_name_constants
 from src.queries.get_unpopulated_users import get_unpopulated_users
@@ -40,6 +45,23 @@ from src.queries.query_helpers import (
 logger = logging.getLogger(__name__)
 bp = Blueprint("search_tags", __name__)
 
+# Query all search kinds in a single statement instead of one query per kind
+search_combined_query = shared_config["discprov"].getboolean(
+    "search_combined_query", fallback=False
+)
+
+# Shared by every search in the process so the threads and db connections used to
+# query the search kinds in parallel stay bounded under load. Queries still running
+# at their search's deadline are canceled by postgres, freeing their worker.
+# Lives as long as the process, so it isn't used in a with block
+search_executor = concurrent.futures.ThreadPoolExecutor(  # pylint: disable=R1732
+    max_workers=search_max_concurrent_queries, thread_name_prefix="search"
+)
+
+
+class SearchDeadlineExceeded(Exception):
+    """Raised when a search kind could not be queried before the search deadline"""
+
 
 ######## VARS ########
 
@@ -123,12 +145,9 @@ def search_tags():
     # Add personalized results for a given user
     if current_user_id:
         if searchKind in [SearchKind.all, SearchKind.tracks]:
-            # Query saved tracks for the current user that contain this tag
+            # Query saved tracks for the current user that contain this tag, which are
+            # already loaded and populated in the track results
             track_ids = [track["track_id"] for track in results["tracks"]]
-            track_play_counts = {
-                track["track_id"]: track[response_name_constants.play_count]
-                for track in results["tracks"]
-            }
 
             saves_query = (
                 session.query(Save.save_item_id)
@@ -141,27 +160,12 @@ def search_tags():
                 )
                 .all()
             )
-            saved_track_ids = [i[0] for i in saves_query]
-            saved_tracks = (
-                session.query(Track)
-                .filter(
-                    Track.is_current == True,
-                    Track.is_delete == False,
-                    Track.is_unlisted == False,
-                    Track.stem_of == None,
-                    Track.track_id.in_(saved_track_ids),
-                )
-                .all()
-            )
-            saved_tracks = helpers.query_result_to_list(saved_tracks)
-            for saved_track in saved_tracks:
-                saved_track_id = saved_track["track_id"]
-                saved_track[response_name_constants.play_count] = track_play_counts.get(
-                    saved_track_id, 0
-                )
-            saved_tracks = populate_track_metadata(
-                session, saved_track_ids, saved_tracks, current_user_id
-            )
+            saved_track_ids = {i[0] for i in saves_query}
+            saved_tracks = [
+                track
+                for track in results["tracks"]
+                if track["track_id"] in saved_track_ids
+            ]
 
             # Sort and paginate
             play_count_sorted_saved_tracks = sorted(
@@ -226,9 +230,28 @@ def add_users(session, results):
     return results
 
 
-def perform_search_query(db, search_type, args):
-    """Performs a search query of a given `search_type`. Handles it's own session. Used concurrently."""
+def set_search_statement_timeout(session, deadline):
+    """Has postgres cancel the statements of the session's transaction still running at `deadline`"""
+    timeout_ms = int((deadline - time.time()) * 1000)
+    if timeout_ms <= 0:
+        raise SearchDeadlineExceeded()
+    session.execute(f"SET LOCAL statement_timeout = {timeout_ms}")
+
+
+def is_search_truncated(error):
+    """Returns whether `error` was raised by a search kind cut off at the search deadline"""
+    return isinstance(error, SearchDeadlineExceeded) or (
+        isinstance(error, sqlalchemy.exc.OperationalError)
+        and isinstance(error.orig, QueryCanceledError)
+    )
+
+
+def perform_search_query(db, search_type, args, deadline=None):
+    """Performs a search query of a given `search_type`. Handles it's own session. Used concurrently.
+    Statements still running at `deadline` are canceled by postgres."""
     with db.scoped_session() as session:
+        if deadline is not None:
+            set_search_statement_timeout(session, deadline)
         search_str = args.get("search_str")
         limit = args.get("limit")
         offset = args.get("offset")
@@ -326,6 +349,165 @@ def perform_search_query(db, search_type, args):
         return results
 
 
+def get_search_params(search_str, limit, offset, current_user_id):
+    """Bind params of the search queries, shared so they can run as a single statement"""
+    return {
+        "query": search_str,
+        "limit": limit,
+        "offset": offset,
+        "current_user_id": current_user_id,
+        # tracks and playlists
+        "title_weight": search_title_weight,
+        "repost_weight": search_repost_weight,
+        "similarity_weight": search_similarity_weight,
+        "user_name_weight": search_user_name_weight,
+        "title_match_boost": search_title_exact_match_boost,
+        "handle_match_boost": search_handle_exact_match_boost,
+        "user_name_match_boost": search_user_name_exact_match_boost,
+        # users
+        "name_weight": user_name_weight,
+        "follower_weight": user_follower_weight,
+        "user_handle_match_boost": user_handle_exact_match_boost,
+    }
+
+
+PERSONALIZED_SEARCH_TYPES = [
+    "saved_tracks",
+    "followed_users",
+    "saved_playlists",
+    "saved_albums",
+]
+
+
+def combined_search_query(session, search_types, args):
+    """
+    Performs the searches of `search_types` in a single statement, each limited
+    and ordered as when queried on its own. `args` are the perform_search_query args.
+    """
+    search_str = args.get("search_str")
+    limit = args.get("limit")
+    offset = args.get("offset")
+    is_auto_complete = args.get("is_auto_complete")
+    current_user_id = args.get("current_user_id")
+    only_downloadable = args.get("only_downloadable")
+
+    search_rows = {}
+    statements = []
+    for search_type in search_types:
+        personalized = search_type in PERSONALIZED_SEARCH_TYPES
+        if personalized and not current_user_id:
+            search_rows[search_type] = []
+            continue
+
+        if search_type in ["tracks", "saved_tracks"]:
+            sql = track_search_sql(personalized, current_user_id, only_downloadable)
+            id_column = "track_id"
+        elif search_type in ["users", "followed_users"]:
+            sql = user_search_sql()
+            id_column = "user_id"
+        else:
+            is_album = search_type in ["albums", "saved_albums"]
+            sql = playlist_search_sql(is_album, personalized, current_user_id)
+            id_column = "playlist_id"
+
+        search_rows[search_type] = []
+        # search_type is not user-specified so it is safe to substitute.
+        # Positions follow the same order as the kind's own query.
+        statements.append(
+            f"""(
+                select '{search_type}' as search_type,
+                    row_number() over (order by r.total_score desc, r.{id_column} asc) as position,
+                    r.*
+                from ({sql}) as r
+            )"""
+        )
+
+    if statements:
+        rows = session.execute(
+            sqlalchemy.text(" union all ".join(statements)),
+            get_search_params(search_str, limit, offset, current_user_id),
+        ).fetchall()
+        for row in rows:
+            search_rows[row[0]].append(tuple(row))
+
+    results = {}
+    for search_type, rows in search_rows.items():
+        # (id, balance, associated_wallets_balance, total_score) in search order
+        rows.sort(key=lambda row: row[1])
+        data = [row[2:] for row in rows]
+
+        if search_type in ["tracks", "saved_tracks"]:
+            results[search_type] = populate_track_search_results(
+                session, data, limit, is_auto_complete, current_user_id
+            )
+        elif search_type in ["users", "followed_users"]:
+            results[search_type] = populate_user_search_results(
+                session, data, limit, is_auto_complete, current_user_id
+            )
+        else:
+            results[search_type] = populate_playlist_search_results(
+                session,
+                data,
+                limit,
+                search_type in ["albums", "saved_albums"],
+                is_auto_complete,
+                current_user_id,
+            )
+    return results
+
+
+# Search types that can be served from the autocomplete index
+AUTOCOMPLETE_INDEX_SEARCH_TYPES = ["tracks", "users", "playlists", "albums"]
+
+
+def autocomplete_index_query(session, search_type, search_str, limit, offset):
+    """
+    Serves an autocomplete search of a given `search_type` by prefix from the
+    in-memory autocomplete index, ranked by popularity.
+    Returns None if the index can't answer it, in which case the lexeme
+    dictionaries are queried instead.
+    """
+    index = get_autocomplete_index()
+    if index is None:
+        return None
+    ids = index.search(search_type, search_str, limit, offset)
+    if ids is None:
+        return None
+
+    if search_type == "tracks":
+        results = get_unpopulated_tracks(session, ids, True)
+        id_key = "track_id"
+    elif search_type == "users":
+        results = get_unpopulated_users(session, ids)
+        id_key = "user_id"
+        balances = {
+            balance.user_id: balance
+            for balance in session.query(UserBalance).filter(
+                UserBalance.user_id.in_(ids)
+            )
+        }
+        for user in results:
+            balance = balances.get(user["user_id"])
+            user[response_name_constants.balance] = balance and balance.balance
+            user[response_name_constants.associated_wallets_balance] = (
+                balance and balance.associated_wallets_balance
+            )
+    else:
+        results = get_unpopulated_playlists(session, ids, True)
+        id_key = "playlist_id"
+
+    # Preserve order from the index, entities removed since the snapshot was
+    # written are skipped
+    results_map = {result[id_key]: result for result in results}
+    results = [results_map[i] for i in ids if i in results_map]
+
+    if search_type == "users":
+        # Sort users by extra criteria for "best match"
+        results.sort(key=cmp_to_key(compare_users))
+
+    return results
+
+
 # SEARCH QUERIES
 # We chose to use the raw SQL instead of SQLAlchemy because we're pushing SQLAlchemy to it's
 # limit to do this query by creating new wrappers for pg functions that do not exist like
@@ -350,6 +532,7 @@ def search(args):
     """Perform a search. `args` should contain `is_auto_complete`,
     `query`, `kind`, `current_user_id`, and `only_downloadable`
     """
+    deadline = time.time() + search_deadline_sec
     search_str = args.get("query")
 
     # when creating query table, we substitute this too
@@ -381,47 +564,97 @@ def search(args):
 
     if search_str:
         db = get_db_read_replica()
-        # Concurrency approach:
-        # Spin up a ThreadPoolExecutor for each request to perform_search_query
-        # to perform the different search types in parallel.
-        # After each future resolves, we then add users for each entity in a single
-        # db round trip.
-        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
-            # Keep a mapping of future -> search_type
-            futures_map = {}
-            futures = []
-
-            # Helper fn to submit a future and add it to bookkeeping data structures
-            def submit_and_add(search_type):
-                future = executor.submit(
-                    perform_search_query, db, search_type, search_args
-                )
-                futures.append(future)
-                futures_map[future] = search_type
-
-            if searchKind in [SearchKind.all, SearchKind.tracks]:
-                submit_and_add("tracks")
-                if current_user_id:
-                    submit_and_add("saved_tracks")
-
-            if searchKind in [SearchKind.all, SearchKind.users]:
-                submit_and_add("users")
-                if current_user_id:
-                    submit_and_add("followed_users")
 
-            if searchKind in [SearchKind.all, SearchKind.playlists]:
-                submit_and_add("playlists")
-                if current_user_id:
-                    submit_and_add("saved_playlists")
+        search_types = []
+        if searchKind in [SearchKind.all, SearchKind.tracks]:
+            search_types.append("tracks")
+            if current_user_id:
+                search_types.append("saved_tracks")
 
-            if searchKind in [SearchKind.all, SearchKind.albums]:
-                submit_and_add("albums")
-                if current_user_id:
-                    submit_and_add("saved_albums")
+        if searchKind in [SearchKind.all, SearchKind.users]:
+            search_types.append("users")
+            if current_user_id:
+                search_types.append("followed_users")
+
+        if searchKind in [SearchKind.all, SearchKind.playlists]:
+            search_types.append("playlists")
+            if current_user_id:
+                search_types.append("saved_playlists")
+
+        if searchKind in [SearchKind.all, SearchKind.albums]:
+            search_types.append("albums")
+            if current_user_id:
+                search_types.append("saved_albums")
+
+        # Autocomplete searches are served from the in-memory prefix index
+        # where possible, personalized searches always query the database
+        if is_auto_complete:
+            with db.scoped_session() as session:
+                for search_type in search_types:
+                    if search_type not in AUTOCOMPLETE_INDEX_SEARCH_TYPES:
+                        continue
+                    search_result = autocomplete_index_query(
+                        session, search_type, search_str, limit, offset
+                    )
+                    if search_result is not None:
+                        results[search_type] = search_result
+                        user_ids.update(get_users_ids(search_result))
+
+        remaining_search_types = [t for t in search_types if t not in results]
+
+        if remaining_search_types and search_combined_query:
+            try:
+                with db.scoped_session() as session:
+                    set_search_statement_timeout(session, deadline)
+                    combined_results = combined_search_query(
+                        session, remaining_search_types, search_args
+                    )
+            except Exception as e:
+                if not is_search_truncated(e):
+                    raise e
+                logger.warning(
+                    f"search_queries.py | {remaining_search_types} search exceeded the "
+                    f"{search_deadline_sec} sec deadline"
+                )
+                combined_results = {t: [] for t in remaining_search_types}
+            for search_type, search_result in combined_results.items():
+                results[search_type] = search_result
+                user_ids.update(get_users_ids(search_result))
 
-            for future in concurrent.futures.as_completed(futures):
-                search_result = future.result()
-                future_type = futures_map[future]
+        elif remaining_search_types:
+            # Concurrency approach:
+            # Submit each search type to the process' search executor to perform
+            # them in parallel. Search types not done by the request deadline,
+            # still queued or canceled by postgres, are returned empty.
+            # After the futures resolve, we then add users for each entity in a
+            # single db round trip.
+            futures_map = {
+                search_executor.submit(
+                    perform_search_query,
+                    db,
+                    search_type,
+                    search_args,
+                    deadline,
+                ): search_type
+                for search_type in remaining_search_types
+            }
+            concurrent.futures.wait(futures_map, timeout=max(deadline - time.time(), 0))
+
+            for future, future_type in futures_map.items():
+                try:
+                    if not future.done():
+                        # Skipped if still queued, or canceled by its statement timeout
+                        future.cancel()
+                        raise SearchDeadlineExceeded()
+                    search_result = future.result()
+                except Exception as e:
+                    if not is_search_truncated(e):
+                        raise e
+                    logger.warning(
+                        f"search_queries.py | {future_type} search exceeded the "
+                        f"{search_deadline_sec} sec deadline"
+                    )
+                    search_result = []
 
                 # Add to the final results
                 results[future_type] = search_result
@@ -429,41 +662,28 @@ def search(args):
                 # Add to user_ids
                 user_ids.update(get_users_ids(search_result))
 
-            with db.scoped_session() as session:
-                # Add users back
-                users = get_users_by_id(session, list(user_ids), current_user_id)
-
-                for (_, result_list) in results.items():
-                    for result in result_list:
-                        user_id = None
-                        if "playlist_owner_id" in result:
-                            user_id = result["playlist_owner_id"]
-                        elif "owner_id" in result:
-                            user_id = result["owner_id"]
-
-                        if user_id is not None:
-                            user = users[user_id]
-                            result["user"] = user
+        with db.scoped_session() as session:
+            # Add users back
+            users = get_users_by_id(session, list(user_ids), current_user_id)
+
+            for (_, result_list) in results.items():
+                for result in result_list:
+                    user_id = None
+                    if "playlist_owner_id" in result:
+                        user_id = result["playlist_owner_id"]
+                    elif "owner_id" in result:
+                        user_id = result["owner_id"]
+
+                    if user_id is not None:
+                        user = users[user_id]
+                        result["user"] = user
     return results
 
 
-def track_search_query(
-    session,
-    search_str,
-    limit,
-    offset,
-    personalized,
-    is_auto_complete,
-    current_user_id,
-    only_downloadable,
-):
-    if personalized and not current_user_id:
-        return []
-
-    res = sqlalchemy.text(
-        # pylint: disable=C0301
-        f"""
-        select track_id, b.balance, b.associated_wallets_balance from (
+def track_search_sql(personalized, current_user_id, only_downloadable):
+    # pylint: disable=C0301
+    return f"""
+        select track_id, b.balance, b.associated_wallets_balance, total_score from (
             select distinct on (owner_id) track_id, owner_id, total_score from (
                 select track_id, owner_id,
                     (
@@ -508,29 +728,40 @@ def track_search_query(
             ) as results2
             order by owner_id, total_score desc
         ) as u left join user_balances b on u.owner_id = b.user_id
-        order by total_score desc
+        order by total_score desc, track_id asc
         limit :limit
-        offset :offset;
-        """
-    )
+        offset :offset
+    """
+
+
+def track_search_query(
+    session,
+    search_str,
+    limit,
+    offset,
+    personalized,
+    is_auto_complete,
+    current_user_id,
+    only_downloadable,
+):
+    if personalized and not current_user_id:
+        return []
 
     track_data = session.execute(
-        res,
-        {
-            "query": search_str,
-            "limit": limit,
-            "offset": offset,
-            "title_weight": search_title_weight,
-            "repost_weight": search_repost_weight,
-            "similarity_weight": search_similarity_weight,
-            "current_user_id": current_user_id,
-            "user_name_weight": search_user_name_weight,
-            "title_match_boost": search_title_exact_match_boost,
-            "handle_match_boost": search_handle_exact_match_boost,
-            "user_name_match_boost": search_user_name_exact_match_boost,
-        },
+        sqlalchemy.text(
+            track_search_sql(personalized, current_user_id, only_downloadable)
+        ),
+        get_search_params(search_str, limit, offset, current_user_id),
     ).fetchall()
 
+    return populate_track_search_results(
+        session, track_data, limit, is_auto_complete, current_user_id
+    )
+
+
+def populate_track_search_results(
+    session, track_data, limit, is_auto_complete, current_user_id
+):
     # track_ids is list of tuples - simplify to 1-D list
     track_ids = [i[0] for i in track_data]
     tracks = get_unpopulated_tracks(session, track_ids, True)
@@ -567,20 +798,14 @@ def track_search_query(
     return tracks[0:limit]
 
 
-def user_search_query(
-    session, search_str, limit, offset, personalized, is_auto_complete, current_user_id
-):
-    if personalized and not current_user_id:
-        return []
-
-    res = sqlalchemy.text(
-        """
-        select u.user_id, b.balance, b.associated_wallets_balance from (
-            select user_id from (
+def user_search_sql():
+    return """
+        select u.user_id, b.balance, b.associated_wallets_balance, u.total_score from (
+            select user_id, total_score from (
                 select user_id, (
                     sum(score) +
                     (:follower_weight * log(case when (follower_count = 0) then 1 else follower_count end)) +
-                    (case when (handle=query) then :handle_match_boost else 0 end) +
+                    (case when (handle=query) then :user_handle_match_boost else 0 end) +
                     (:name_weight * similarity(coalesce(name, ''), query))) as total_score from (
                         select
                                 d."user_id" as user_id,
@@ -601,22 +826,29 @@ def user_search_query(
             limit :limit
             offset :offset
         ) as u left join user_balances b on u.user_id = b.user_id
-        """
-    )
+        order by u.total_score desc, u.user_id asc
+    """
+
+
+def user_search_query(
+    session, search_str, limit, offset, personalized, is_auto_complete, current_user_id
+):
+    if personalized and not current_user_id:
+        return []
 
     user_info = session.execute(
-        res,
-        {
-            "query": search_str,
-            "limit": limit,
-            "offset": offset,
-            "name_weight": user_name_weight,
-            "follower_weight": user_follower_weight,
-            "current_user_id": current_user_id,
-            "handle_match_boost": user_handle_exact_match_boost,
-        },
+        sqlalchemy.text(user_search_sql()),
+        get_search_params(search_str, limit, offset, current_user_id),
     ).fetchall()
 
+    return populate_user_search_results(
+        session, user_info, limit, is_auto_complete, current_user_id
+    )
+
+
+def populate_user_search_results(
+    session, user_info, limit, is_auto_complete, current_user_id
+):
     # user_ids is list of tuples - simplify to 1-D list
     user_ids = [i[0] for i in user_info]
 
@@ -646,30 +878,16 @@ def user_search_query(
     return users[0:limit]
 
 
-def playlist_search_query(
-    session,
-    search_str,
-    limit,
-    offset,
-    is_album,
-    personalized,
-    is_auto_complete,
-    current_user_id,
-):
-    if personalized and not current_user_id:
-        return []
-
+def playlist_search_sql(is_album, personalized, current_user_id):
     table_name = "album_lexeme_dict" if is_album else "playlist_lexeme_dict"
-    repost_type = RepostType.album if is_album else RepostType.playlist
     save_type = SaveType.album if is_album else SaveType.playlist
 
     # SQLAlchemy doesn't expose a way to escape a string with double-quotes instead of
     # single-quotes, so we have to use traditional string substitution. This is safe
     # because the value is not user-specified.
-    res = sqlalchemy.text(
-        # pylint: disable=C0301
-        f"""
-        select p.playlist_id, b.balance, b.associated_wallets_balance from (
+    # pylint: disable=C0301
+    return f"""
+        select p.playlist_id, b.balance, b.associated_wallets_balance, total_score from (
             select distinct on (owner_id) playlist_id, owner_id, total_score from (
                 select playlist_id, owner_id, (
                     (:similarity_weight * sum(score)) +
@@ -703,29 +921,41 @@ def playlist_search_query(
             ) as results2
             order by owner_id, total_score desc
         ) as p left join user_balances b on p.owner_id = b.user_id
-        order by total_score desc
+        order by total_score desc, playlist_id asc
         limit :limit
-        offset :offset;
-        """
-    )
+        offset :offset
+    """
+
+
+def playlist_search_query(
+    session,
+    search_str,
+    limit,
+    offset,
+    is_album,
+    personalized,
+    is_auto_complete,
+    current_user_id,
+):
+    if personalized and not current_user_id:
+        return []
 
     playlist_data = session.execute(
-        res,
-        {
-            "query": search_str,
-            "limit": limit,
-            "offset": offset,
-            "title_weight": search_title_weight,
-            "repost_weight": search_repost_weight,
-            "similarity_weight": search_similarity_weight,
-            "current_user_id": current_user_id,
-            "user_name_weight": search_user_name_weight,
-            "title_match_boost": search_title_exact_match_boost,
-            "handle_match_boost": search_handle_exact_match_boost,
-            "user_name_match_boost": search_user_name_exact_match_boost,
-        },
+        sqlalchemy.text(playlist_search_sql(is_album, personalized, current_user_id)),
+        get_search_params(search_str, limit, offset, current_user_id),
     ).fetchall()
 
+    return populate_playlist_search_results(
+        session, playlist_data, limit, is_album, is_auto_complete, current_user_id
+    )
+
+
+def populate_playlist_search_results(
+    session, playlist_data, limit, is_album, is_auto_complete, current_user_id
+):
+    repost_type = RepostType.album if is_album else RepostType.playlist
+    save_type = SaveType.album if is_album else SaveType.playlist
+
     # playlist_ids is list of tuples - simplify to 1-D list
     playlist_ids = [i[0] for i in playlist_data]
     playlists = get_unpopulated_playlists(session, playlist_ids, True)
@@ -1,10 +1,15 @@
+import concurrent.futures
 import random
+import threading
 import time
 import logging
-from typing import Optional, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
+import requests
 from solana.account import Account
 from solana.publickey import PublicKey
 from solana.rpc.api import Client
+from solana.rpc.types import RPCMethod
+from src.solana.solana_tx_cache import get_solana_tx_cache
 from src.utils.config import shared_config
 
 logger = logging.getLogger(__name__)
@@ -15,12 +20,58 @@ SOLANA_ENDPOINTS = shared_config["solana"]["endpoint"]
 DEFAULT_MAX_RETRIES = 5
 # number of seconds to wait between calls to get_confirmed_transaction
 DELAY_SECONDS = 0.2
+# maximum number of accounts a getMultipleAccounts call accepts
+MAX_MULTIPLE_ACCOUNTS = 100
+
+# maximum number of transactions fetched in a single JSON-RPC batch request
+MAX_TX_BATCH_SIZE = 50
+# maximum number of transaction batch requests in flight at once
+MAX_CONCURRENT_TX_BATCHES = 5
+# number of seconds to wait on an endpoint before also sending a request to the next
+HEDGE_DELAY_SECONDS = 1
+# number of seconds before a batch request times out
+REQUEST_TIMEOUT_SECONDS = 30
+# weight of the latest request in the moving averages endpoints are ranked by
+ENDPOINT_HEALTH_DECAY = 0.2
+# number of seconds a failed request counts for when ranking endpoints
+ENDPOINT_ERROR_PENALTY_SECONDS = 10
+
+
+class EndpointHealth:
+    """Moving averages of the latency and error rate of an endpoint's requests"""
+
+    def __init__(self) -> None:
+        self.latency = 0.0
+        self.error_rate = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, is_error: bool):
+        with self._lock:
+            self.latency += ENDPOINT_HEALTH_DECAY * (latency - self.latency)
+            self.error_rate += ENDPOINT_HEALTH_DECAY * (
+                float(is_error) - self.error_rate
+            )
+
+    def score(self) -> float:
+        """Expected cost of a request in seconds, healthier endpoints score lower"""
+        return self.latency + self.error_rate * ENDPOINT_ERROR_PENALTY_SECONDS
 
 
 class SolanaClientManager:
     def __init__(self) -> None:
         self.endpoints = SOLANA_ENDPOINTS.split(",")
         self.clients = [Client(endpoint) for endpoint in self.endpoints]
+        # keep-alive connections for the batch requests made to each endpoint
+        self.sessions = [_create_session() for _ in self.endpoints]
+        self.endpoint_health = [EndpointHealth() for _ in self.endpoints]
+        self._request_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=MAX_CONCURRENT_TX_BATCHES * len(self.endpoints)
+        )
+        self._batch_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=MAX_CONCURRENT_TX_BATCHES
+        )
+        # transactions already fetched, consulted before the endpoints
+        self.tx_cache = get_solana_tx_cache()
 
     def get_client(self, randomize=False) -> Client:
         if not self.clients:
@@ -34,6 +85,10 @@ class SolanaClientManager:
 
     def get_sol_tx_info(self, tx_sig: str, retries=DEFAULT_MAX_RETRIES):
         """Fetches a solana transaction by signature with retries and a delay."""
+        if self.tx_cache:
+            tx_info = self.tx_cache.get(tx_sig)
+            if tx_info is not None:
+                return tx_info
 
         def handle_get_sol_tx_info(client, index):
             endpoint = self.endpoints[index]
@@ -58,11 +113,135 @@ class SolanaClientManager:
                 f"solana_client_manager.py | get_sol_tx_info | Failed to fetch {tx_sig} with endpoint {endpoint}"
             )
 
-        return _try_all(
+        tx_info = _try_all(
             self.clients,
             handle_get_sol_tx_info,
             "solana_client_manager.py | get_sol_tx_info | All requests failed to fetch {tx_sig}",
         )
+        if self.tx_cache:
+            self.tx_cache.put(tx_sig, tx_info)
+        return tx_info
+
+    def get_sol_tx_infos(
+        self, tx_sigs: List[str], retries=DEFAULT_MAX_RETRIES
+    ) -> Dict[str, Any]:
+        """Fetches solana transactions by signature in JSON-RPC batches, retrying
+        transactions not found with a delay.
+
+        Returns signature -> transaction response, in the form returned by
+        get_sol_tx_info, omitting transactions that couldn't be fetched."""
+        tx_infos: Dict[str, Any] = (
+            self.tx_cache.get_many(tx_sigs) if self.tx_cache else {}
+        )
+        remaining_tx_sigs = [
+            tx_sig for tx_sig in dict.fromkeys(tx_sigs) if tx_sig not in tx_infos
+        ]
+        fetched_tx_infos: Dict[str, Any] = {}
+        for _ in range(retries):
+            tx_sig_batches = [
+                remaining_tx_sigs[i : i + MAX_TX_BATCH_SIZE]
+                for i in range(0, len(remaining_tx_sigs), MAX_TX_BATCH_SIZE)
+            ]
+            batch_futures = {
+                self._batch_executor.submit(
+                    self._make_hedged_batch_request,
+                    [("getConfirmedTransaction", [tx_sig, "json"]) for tx_sig in batch],
+                ): batch
+                for batch in tx_sig_batches
+            }
+            for future in concurrent.futures.as_completed(batch_futures):
+                batch = batch_futures[future]
+                try:
+                    responses = future.result()
+                except Exception as e:
+                    logger.error(
+                        f"solana_client_manager.py | get_sol_tx_infos | \
+                            Error fetching {len(batch)} txs, {e}"
+                    )
+                    continue
+                for tx_sig, response in zip(batch, responses):
+                    if response and response.get("result") is not None:
+                        fetched_tx_infos[tx_sig] = response
+
+            remaining_tx_sigs = [
+                tx_sig for tx_sig in remaining_tx_sigs if tx_sig not in fetched_tx_infos
+            ]
+            if not remaining_tx_sigs:
+                break
+            time.sleep(DELAY_SECONDS)
+            logger.info(
+                f"solana_client_manager.py | get_sol_tx_infos | Retrying {len(remaining_tx_sigs)} tx fetches"
+            )
+        if self.tx_cache:
+            self.tx_cache.put_many(fetched_tx_infos)
+        tx_infos.update(fetched_tx_infos)
+        return tx_infos
+
+    def _get_endpoints_by_health(self) -> List[int]:
+        return sorted(
+            range(len(self.endpoints)),
+            key=lambda index: self.endpoint_health[index].score(),
+        )
+
+    def _make_batch_request(self, index: int, batch: List[Tuple[str, list]]):
+        """Sends the (method, params) requests in `batch` to the endpoint at `index`
+        in one HTTP request, returning their responses in the same order"""
+        start_time = time.time()
+        try:
+            response = self.sessions[index].post(
+                self.endpoints[index],
+                json=[
+                    {
+                        "jsonrpc": "2.0",
+                        "id": request_id,
+                        "method": method,
+                        "params": params,
+                    }
+                    for request_id, (method, params) in enumerate(batch)
+                ],
+                timeout=REQUEST_TIMEOUT_SECONDS,
+            )
+            response.raise_for_status()
+            responses = response.json()
+            if not isinstance(responses, list):
+                # The whole batch was rejected
+                raise Exception(f"Batch request failed: {responses}")
+        except Exception:
+            self.endpoint_health[index].record(time.time() - start_time, True)
+            raise
+        self.endpoint_health[index].record(time.time() - start_time, False)
+        responses_by_id = {response.get("id"): response for response in responses}
+        return [responses_by_id.get(request_id) for request_id in range(len(batch))]
+
+    def _make_hedged_batch_request(self, batch: List[Tuple[str, list]]):
+        """Sends `batch` to the healthiest endpoint, also sending it to the next
+        healthiest each time HEDGE_DELAY_SECONDS pass without a successful response
+        or a request fails. Returns the first successful response."""
+        pending = set()
+        for index in self._get_endpoints_by_health():
+            pending.add(
+                self._request_executor.submit(self._make_batch_request, index, batch)
+            )
+            # Wait until a request completes or the hedge delay passes, moving on to
+            # the next endpoint unless a request succeeded
+            done, pending = concurrent.futures.wait(
+                pending,
+                timeout=HEDGE_DELAY_SECONDS,
+                return_when=concurrent.futures.FIRST_COMPLETED,
+            )
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+            if not done:
+                # Rank the endpoint as slow until its request completes
+                self.endpoint_health[index].record(HEDGE_DELAY_SECONDS, False)
+
+        for future in concurrent.futures.as_completed(pending):
+            if future.exception() is None:
+                return future.result()
+        raise Exception(
+            "solana_client_manager.py | _make_hedged_batch_request | All requests failed"
+        )
 
     def get_confirmed_signature_for_address2(
         self,
@@ -81,6 +260,36 @@ class SolanaClientManager:
             "solana_client_manager.py | get_confirmed_signature_for_address2 | All requests failed",
         )
 
+    def get_multiple_accounts(
+        self, pubkeys: List[Union[str, PublicKey]], encoding: str = "jsonParsed"
+    ):
+        """Fetches the info of up to MAX_MULTIPLE_ACCOUNTS accounts in one request.
+        Returns the info of each account in the order of `pubkeys`, None for accounts
+        that don't exist."""
+
+        def handle_get_multiple_accounts(client, _):
+            # getMultipleAccounts is not wrapped by this version of solana.rpc.api.Client
+            response = client._provider.make_request(  # pylint: disable=W0212
+                RPCMethod("getMultipleAccounts"),
+                [str(pubkey) for pubkey in pubkeys],
+                {"encoding": encoding},
+            )
+            return response["result"]["value"]
+
+        return _try_all(
+            self.clients,
+            handle_get_multiple_accounts,
+            "solana_client_manager.py | get_multiple_accounts | All requests failed",
+        )
+
+
+def _create_session() -> requests.Session:
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=MAX_CONCURRENT_TX_BATCHES)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
 
 def _try_all(iterable, func, message, randomize=False):
     """Executes a function with retries across the iterable.
@@ -1,8 +1,12 @@
+import time
 import pytest
-from src.solana.solana_client_manager import SolanaClientManager
+from src.solana.solana_client_manager import EndpointHealth, SolanaClientManager
+from src.solana.solana_tx_cache import SolanaTxCache
 from unittest import mock
 
 solana_client_manager = SolanaClientManager()
+# fetches are mocked, keep them out of the transaction cache
+solana_client_manager.tx_cache = None
 
 
 @mock.patch("solana.rpc.api.Client")
@@ -114,3 +118,83 @@ def test_get_confirmed_signature_for_address2(_):
         solana_client_manager.get_confirmed_signature_for_address2(
             "account", "before", "limit"
         )
+
+
+@mock.patch("solana.rpc.api.Client")
+def test_get_multiple_accounts(_):
+    client_mocks = [
+        mock.Mock(name="first"),
+        mock.Mock(name="second"),
+    ]
+    solana_client_manager.clients = client_mocks
+
+    accounts = [{"data": "first account"}, None]
+
+    # test that it returns the accounts from the first client that responds
+    client_mocks[0]._provider.make_request.return_value = {"error": "failed"}
+    client_mocks[1]._provider.make_request.return_value = {
+        "result": {"value": accounts}
+    }
+    assert solana_client_manager.get_multiple_accounts(["first", "second"]) == accounts
+    client_mocks[1]._provider.make_request.assert_called_with(
+        "getMultipleAccounts", ["first", "second"], {"encoding": "jsonParsed"}
+    )
+
+    # test exception raised if all requests fail
+    client_mocks[1]._provider.make_request.side_effect = Exception()
+    with pytest.raises(Exception):
+        solana_client_manager.get_multiple_accounts(["first", "second"])
+
+
+def mock_session(tx_infos, delay=0, error=None):
+    def post(endpoint, json, timeout):
+        time.sleep(delay)
+        if error:
+            raise error
+        response = mock.Mock()
+        response.json.return_value = [
+            {
+                "jsonrpc": "2.0",
+                "id": request["id"],
+                "result": tx_infos.get(request["params"][0]),
+            }
+            for request in reversed(json)
+        ]
+        return response
+
+    session = mock.Mock()
+    session.post.side_effect = post
+    return session
+
+
+@mock.patch("src.solana.solana_client_manager.HEDGE_DELAY_SECONDS", 0.1)
+@mock.patch("src.solana.solana_client_manager.DELAY_SECONDS", 0)
+def test_get_sol_tx_infos(tmp_path):
+    manager = SolanaClientManager()
+    manager.tx_cache = SolanaTxCache(str(tmp_path / "txs.db"), 1024 * 1024)
+    manager.endpoints = ["first", "second", "third"]
+    manager.endpoint_health = [EndpointHealth() for _ in manager.endpoints]
+
+    # test that a slow endpoint is hedged and a failing one skipped
+    tx_infos = {"one": {"slot": 1}, "two": {"slot": 2}}
+    manager.sessions = [
+        mock_session(tx_infos, delay=1),
+        mock_session({}, error=Exception()),
+        mock_session(tx_infos),
+    ]
+    assert manager.get_sol_tx_infos(["one", "two", "missing"], 2) == {
+        "one": {"jsonrpc": "2.0", "id": 0, "result": {"slot": 1}},
+        "two": {"jsonrpc": "2.0", "id": 1, "result": {"slot": 2}},
+    }
+    assert manager.sessions[2].post.call_count == 2
+
+    # test that requests are routed to the healthiest endpoint
+    assert manager._get_endpoints_by_health()[0] == 2
+
+    # test that fetched transactions are served from the cache
+    manager.sessions = [mock_session({}, error=Exception()) for _ in range(3)]
+    assert manager.get_sol_tx_infos(["one", "two"], 1) == {
+        "one": {"jsonrpc": "2.0", "id": 0, "result": {"slot": 1}},
+        "two": {"jsonrpc": "2.0", "id": 1, "result": {"slot": 2}},
+    }
+    assert all(session.post.call_count == 0 for session in manager.sessions)
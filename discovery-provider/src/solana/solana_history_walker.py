@@ -0,0 +1,255 @@
+import concurrent.futures
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, List, Optional, Set
+
+from redis import Redis
+from sqlalchemy.orm.session import Session
+from src.solana.solana_client_manager import SolanaClientManager
+from src.utils.session_manager import SessionManager
+
+logger = logging.getLogger(__name__)
+
+# Number of signatures fetched per get_confirmed_signature_for_address2 page
+SIGNATURES_PAGE_SIZE = 100
+# Number of signatures processed per batch
+PROCESS_BATCH_SIZE = 100
+# Maximum number of batches processed per run, the rest stay in the backlog
+DEFAULT_MAX_BATCHES_PER_RUN = 50
+# Number of recently walked signatures kept in memory to detect where a walk
+# reaches the known history
+MAX_KNOWN_SIGNATURES = 10000
+
+
+class SolanaHistoryWalker:
+    """
+    Walks the transaction history of a solana program and processes its new
+    transactions oldest first, keeping its progress in redis so runs that are
+    interrupted or cut short resume where they stopped without losing history.
+
+    Each run walks back from the newest transaction until it reaches the known
+    history, while the transactions walked by previous runs are processed. Walked
+    signatures are saved with the walk's cursor after every page, then appended to
+    the backlog of signatures to process once the walk reaches the known history.
+
+    The known history starts at the newest signature of the last finished walk,
+    and the signatures walked recently are also kept in memory. Before the first
+    walk, it starts at the newest transaction found in the database at or below
+    the highest processed slot.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        program: str,
+        get_latest_slot: Callable[[Session], int],
+        get_tx_sigs_in_db: Callable[[Session, List[str]], Set[str]],
+        min_slot: Optional[int] = None,
+    ):
+        """
+        :param name: Name the walker's state is kept under in redis
+        :param program: Address of the program whose transactions are walked
+        :param get_latest_slot: Returns the highest slot processed in the database
+        :param get_tx_sigs_in_db: Returns which of the signatures are processed in the database
+        :param min_slot: Transactions at or below this slot are not walked
+        """
+        self.name = name
+        self.program = program
+        self.get_latest_slot = get_latest_slot
+        self.get_tx_sigs_in_db = get_tx_sigs_in_db
+        self.min_slot = min_slot
+        # Signatures to process, oldest first
+        self.backlog_key = f"solana-history:{name}:backlog"
+        # Signatures of the walk in progress, newest first
+        self.walk_key = f"solana-history:{name}:walk"
+        # The walk's cursor and the newest signature of the last finished walk
+        self.state_key = f"solana-history:{name}:state"
+        self._known_sigs: Set[str] = set()
+        self._known_sig_queue: deque = deque()
+        self._lock = threading.Lock()
+
+    def run(
+        self,
+        solana_client_manager: SolanaClientManager,
+        db: SessionManager,
+        redis: Redis,
+        process_batch: Callable[[List[str]], None],
+        max_batches: int = DEFAULT_MAX_BATCHES_PER_RUN,
+        on_latest_tx: Optional[Callable[[dict], None]] = None,
+    ) -> int:
+        """
+        Walks the new history, processing the backlog left by previous runs
+        meanwhile, then processes what was walked. Processes at most `max_batches`
+        batches of signatures, each once `process_batch` returns, skipping the
+        signatures already in the database.
+
+        Returns the number of transactions processed.
+        """
+        num_processed = 0
+        num_batches = 0
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            walk_future: Optional[concurrent.futures.Future] = executor.submit(
+                self.walk, solana_client_manager, db, redis, on_latest_tx
+            )
+            while num_batches < max_batches:
+                tx_sig_batch = self._get_next_batch(redis)
+                if not tx_sig_batch:
+                    if walk_future is None:
+                        break
+                    # Wait for the walk to add the new history to the backlog
+                    walk_future.result()
+                    walk_future = None
+                    continue
+
+                batch_start_time = time.time()
+                # A batch processed by a run interrupted before trimming it from the
+                # backlog is only processed again for the transactions not in the db
+                with db.scoped_session() as session:
+                    processed_tx_sigs = self.get_tx_sigs_in_db(session, tx_sig_batch)
+                new_tx_sigs = [
+                    tx_sig for tx_sig in tx_sig_batch if tx_sig not in processed_tx_sigs
+                ]
+                if new_tx_sigs:
+                    process_batch(new_tx_sigs)
+                redis.ltrim(self.backlog_key, len(tx_sig_batch), -1)
+                num_processed += len(new_tx_sigs)
+                num_batches += 1
+                logger.info(
+                    f"solana_history_walker.py | {self.name} | processed batch of {len(new_tx_sigs)} txs "
+                    f"in {time.time() - batch_start_time}s"
+                )
+
+            if walk_future is not None:
+                walk_future.result()
+
+        logger.info(
+            f"solana_history_walker.py | {self.name} | processed {num_processed} txs, "
+            f"{redis.llen(self.backlog_key)} txs left in backlog"
+        )
+        return num_processed
+
+    def walk(
+        self,
+        solana_client_manager: SolanaClientManager,
+        db: SessionManager,
+        redis: Redis,
+        on_latest_tx: Optional[Callable[[dict], None]] = None,
+    ) -> int:
+        """
+        Walks back from the newest transaction, or the cursor of an interrupted walk,
+        until the known history and adds the signatures walked to the backlog.
+
+        Returns the number of signatures walked.
+        """
+        state = redis.hgetall(self.state_key)
+        last_walked_sig = _decode(state.get(b"last_walked_sig"))
+        before = _decode(state.get(b"walk_before"))
+        if before is None:
+            # Drop the signatures of a walk that never saved a cursor
+            redis.delete(self.walk_key)
+
+        latest_processed_slot = None
+        num_walked = 0
+        reached_known_history = False
+        while not reached_known_history:
+            transactions_array = (
+                solana_client_manager.get_confirmed_signature_for_address2(
+                    self.program, before=before, limit=SIGNATURES_PAGE_SIZE
+                )["result"]
+            )
+            if before is None and transactions_array and on_latest_tx:
+                on_latest_tx(transactions_array[0])
+            if not transactions_array:
+                logger.info(
+                    f"solana_history_walker.py | {self.name} | No transactions found before {before}"
+                )
+                break
+
+            if last_walked_sig is None:
+                # Find where the history was processed up to from the database
+                if latest_processed_slot is None:
+                    with db.scoped_session() as session:
+                        latest_processed_slot = self.get_latest_slot(session)
+                retraversed_tx_sigs = [
+                    tx["signature"]
+                    for tx in transactions_array
+                    if tx["slot"] <= latest_processed_slot
+                ]
+                if retraversed_tx_sigs:
+                    with db.scoped_session() as session:
+                        processed_tx_sigs = self.get_tx_sigs_in_db(
+                            session, retraversed_tx_sigs
+                        )
+                else:
+                    processed_tx_sigs = set()
+            else:
+                processed_tx_sigs = set()
+
+            walked_tx_sigs = []
+            for tx in transactions_array:
+                tx_sig = tx["signature"]
+                if (
+                    tx_sig == last_walked_sig
+                    or tx_sig in processed_tx_sigs
+                    or self._is_known(tx_sig)
+                    or (self.min_slot is not None and tx["slot"] <= self.min_slot)
+                ):
+                    # Transactions are returned most recent first, so the rest of
+                    # the history is known
+                    reached_known_history = True
+                    break
+                walked_tx_sigs.append(tx_sig)
+
+            before = transactions_array[-1]["signature"]
+            pipe = redis.pipeline()
+            if walked_tx_sigs:
+                pipe.rpush(self.walk_key, *walked_tx_sigs)
+            pipe.hset(self.state_key, "walk_before", before)
+            pipe.execute()
+            self._add_known(walked_tx_sigs)
+            num_walked += len(walked_tx_sigs)
+
+        self._finish_walk(redis)
+        logger.info(
+            f"solana_history_walker.py | {self.name} | walked {num_walked} new txs"
+        )
+        return num_walked
+
+    def _finish_walk(self, redis: Redis):
+        """Moves the signatures of the finished walk to the end of the backlog"""
+        walked_tx_sigs = [
+            _decode(tx_sig) for tx_sig in redis.lrange(self.walk_key, 0, -1)
+        ]
+        pipe = redis.pipeline()
+        if walked_tx_sigs:
+            pipe.rpush(self.backlog_key, *reversed(walked_tx_sigs))
+            pipe.hset(self.state_key, "last_walked_sig", walked_tx_sigs[0])
+        pipe.delete(self.walk_key)
+        pipe.hdel(self.state_key, "walk_before")
+        pipe.execute()
+
+    def _get_next_batch(self, redis: Redis) -> List[str]:
+        return [
+            _decode(tx_sig)
+            for tx_sig in redis.lrange(self.backlog_key, 0, PROCESS_BATCH_SIZE - 1)
+        ]
+
+    def _is_known(self, tx_sig: str) -> bool:
+        with self._lock:
+            return tx_sig in self._known_sigs
+
+    def _add_known(self, tx_sigs: List[str]):
+        with self._lock:
+            for tx_sig in tx_sigs:
+                if tx_sig in self._known_sigs:
+                    continue
+                self._known_sigs.add(tx_sig)
+                self._known_sig_queue.append(tx_sig)
+            while len(self._known_sig_queue) > MAX_KNOWN_SIGNATURES:
+                self._known_sigs.discard(self._known_sig_queue.popleft())
+
+
+def _decode(value):
+    return value.decode("utf-8") if isinstance(value, bytes) else value
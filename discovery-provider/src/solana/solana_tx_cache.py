@@ -0,0 +1,191 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterable, Optional, Set
+
+from src.utils.config import shared_config
+
+logger = logging.getLogger(__name__)
+
+# The cache is trimmed to this fraction of its maximum size once it's exceeded,
+# so eviction doesn't run on every write
+EVICTION_TARGET_RATIO = 0.9
+# Number of least recently read transactions evicted per delete
+EVICTION_BATCH_SIZE = 1000
+# Maximum number of signatures bound to a single statement
+MAX_QUERY_PARAMS = 500
+# Number of seconds a write waits on other processes holding the database
+BUSY_TIMEOUT_SEC = 10
+# Reads are recorded in memory and written to the database at most this often,
+# or once this many signatures were read, rather than on every read
+READ_FLUSH_SEC = 60
+MAX_PENDING_READS = 10000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS txs (
+    signature TEXT PRIMARY KEY,
+    data BLOB NOT NULL,
+    read_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS txs_read_at_idx ON txs (read_at);
+"""
+
+
+def _chunks(items, size):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+class SolanaTxCache:
+    """
+    Persistent signature -> transaction response cache, kept in a sqlite database
+    on disk and shared by every process of the node.
+
+    Only finalized transactions are fetched, which never change, so entries are
+    kept until the cache grows past `max_bytes` and the least recently read are
+    evicted, by read times written every READ_FLUSH_SEC. Errors are logged and
+    treated as misses, the cache never fails a fetch.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        # Signatures read since the read times were last written
+        self._pending_reads: Set[str] = set()
+        self._reads_flushed_at = time.time()
+
+    def _get_connection(self) -> sqlite3.Connection:
+        # Connections can't be shared with forked worker processes
+        if self._connection is None or self._pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self.path,
+                timeout=BUSY_TIMEOUT_SEC,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(_SCHEMA)
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
+
+    def get_many(self, tx_sigs: Iterable[str]) -> Dict[str, Any]:
+        """Returns signature -> transaction response of the cached `tx_sigs`"""
+        tx_infos: Dict[str, Any] = {}
+        try:
+            with self._lock:
+                connection = self._get_connection()
+                for chunk in _chunks(set(tx_sigs), MAX_QUERY_PARAMS):
+                    placeholders = ",".join("?" * len(chunk))
+                    rows = connection.execute(
+                        f"SELECT signature, data FROM txs WHERE signature IN ({placeholders})",
+                        chunk,
+                    ).fetchall()
+                    for tx_sig, data in rows:
+                        tx_infos[tx_sig] = json.loads(zlib.decompress(data))
+                self._pending_reads.update(tx_infos)
+                if (
+                    len(self._pending_reads) >= MAX_PENDING_READS
+                    or time.time() - self._reads_flushed_at >= READ_FLUSH_SEC
+                ):
+                    self._flush_reads(connection)
+        except Exception as e:
+            logger.warning(f"solana_tx_cache.py | get_many | {e}")
+        return tx_infos
+
+    def get(self, tx_sig: str) -> Optional[Any]:
+        return self.get_many([tx_sig]).get(tx_sig)
+
+    def put_many(self, tx_infos: Dict[str, Any]):
+        """Caches the signature -> transaction responses of `tx_infos`"""
+        if not tx_infos:
+            return
+        try:
+            read_at = time.time()
+            rows = [
+                (tx_sig, zlib.compress(json.dumps(tx_info).encode("utf-8")), read_at)
+                for tx_sig, tx_info in tx_infos.items()
+            ]
+            with self._lock:
+                connection = self._get_connection()
+                connection.executemany(
+                    "INSERT OR REPLACE INTO txs (signature, data, read_at) VALUES (?, ?, ?)",
+                    rows,
+                )
+                # Transactions read recently aren't evicted
+                self._flush_reads(connection)
+                self._evict(connection)
+        except Exception as e:
+            logger.warning(f"solana_tx_cache.py | put_many | {e}")
+
+    def put(self, tx_sig: str, tx_info: Any):
+        self.put_many({tx_sig: tx_info})
+
+    def size(self) -> int:
+        """Returns the bytes used by the cache's database"""
+        with self._lock:
+            return self._get_size(self._get_connection())
+
+    def _flush_reads(self, connection: sqlite3.Connection):
+        """Writes the read time of the signatures read since the last flush"""
+        read_at = time.time()
+        connection.execute("BEGIN")
+        try:
+            for chunk in _chunks(self._pending_reads, MAX_QUERY_PARAMS):
+                placeholders = ",".join("?" * len(chunk))
+                connection.execute(
+                    f"UPDATE txs SET read_at = ? WHERE signature IN ({placeholders})",
+                    [read_at, *chunk],
+                )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        self._pending_reads.clear()
+        self._reads_flushed_at = read_at
+
+    def _get_size(self, connection: sqlite3.Connection) -> int:
+        page_size = connection.execute("PRAGMA page_size").fetchone()[0]
+        page_count = connection.execute("PRAGMA page_count").fetchone()[0]
+        free_count = connection.execute("PRAGMA freelist_count").fetchone()[0]
+        return (page_count - free_count) * page_size
+
+    def _evict(self, connection: sqlite3.Connection):
+        if self._get_size(connection) <= self.max_bytes:
+            return
+        target_bytes = self.max_bytes * EVICTION_TARGET_RATIO
+        num_evicted = 0
+        while self._get_size(connection) > target_bytes:
+            num_deleted = connection.execute(
+                """
+                DELETE FROM txs WHERE signature IN (
+                    SELECT signature FROM txs ORDER BY read_at LIMIT ?
+                )
+                """,
+                (EVICTION_BATCH_SIZE,),
+            ).rowcount
+            if num_deleted <= 0:
+                break
+            num_evicted += num_deleted
+        logger.info(f"solana_tx_cache.py | evicted {num_evicted} txs")
+
+
+def get_solana_tx_cache() -> Optional[SolanaTxCache]:
+    """Returns the transaction cache configured for this node, None if disabled"""
+    path = shared_config["solana"].get("tx_cache_path", fallback="")
+    max_mb = shared_config["solana"].getint("tx_cache_max_mb", fallback=0)
+    if not path or max_mb <= 0:
+        return None
+    return SolanaTxCache(path, max_mb * 1024 * 1024)
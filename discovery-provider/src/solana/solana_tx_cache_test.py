@@ -0,0 +1,41 @@
+import os
+from unittest import mock
+
+from src.solana.solana_tx_cache import SolanaTxCache
+
+
+@mock.patch("src.solana.solana_tx_cache.EVICTION_BATCH_SIZE", 1)
+def test_solana_tx_cache(tmp_path):
+    cache = SolanaTxCache(str(tmp_path / "cache" / "txs.db"), 1024 * 1024)
+
+    # test that cached transactions are returned and others are missing
+    cache.put_many({"one": {"result": {"slot": 1}}, "two": {"result": {"slot": 2}}})
+    cache.put("three", {"result": {"slot": 3}})
+    assert cache.get_many(["one", "three", "missing"]) == {
+        "one": {"result": {"slot": 1}},
+        "three": {"result": {"slot": 3}},
+    }
+    assert cache.get("missing") is None
+
+    # test that reads are recorded in memory until they're flushed with a write
+    with cache._lock:
+        read_at = dict(
+            cache._get_connection().execute("SELECT signature, read_at FROM txs")
+        )
+    cache.get("two")
+    assert "two" in cache._pending_reads
+    with cache._lock:
+        assert (
+            cache._get_connection()
+            .execute("SELECT read_at FROM txs WHERE signature = 'two'")
+            .fetchone()[0]
+            == read_at["two"]
+        )
+
+    # test that the least recently read transactions are evicted past the max size
+    cache.max_bytes = cache.size() + 16 * 1024
+    for i in range(50):
+        cache.put(f"filler{i}", {"result": {"log": os.urandom(1000).hex()}})
+    assert cache.size() <= cache.max_bytes
+    assert cache.get("one") is None
+    assert cache.get("filler49") is not None
@@ -0,0 +1,98 @@
+import logging
+from datetime import date, datetime
+from typing import Dict, Iterable, Tuple
+
+from sqlalchemy.dialects.postgresql import insert
+from src.models import AggregateDailyReposts, AggregateDailySaves
+
+logger = logging.getLogger(__name__)
+
+# (item_id, item_type, day) -> net change in the count for that day
+DailyCountDeltas = Dict[Tuple[int, str, date], int]
+
+
+def add_daily_count_delta(
+    deltas: DailyCountDeltas, item_id: int, item_type, created_at: datetime, delta
+):
+    key = (item_id, item_type, created_at.date())
+    deltas[key] = deltas.get(key, 0) + delta
+
+
+def record_state_change(
+    deltas: DailyCountDeltas,
+    item_id: int,
+    item_type,
+    invalidated_rows: Iterable,
+    is_delete: bool,
+    created_at: datetime,
+):
+    """
+    Records the bucket changes for a new repost or save row replacing the
+    rows in `invalidated_rows` as the current one.
+
+    A repost or save is counted in the day bucket of its current row's created_at,
+    so the previous row (if it was not a delete) leaves its bucket and the new row
+    (if it is not a delete) enters the bucket for its block day.
+    """
+    for invalidated_row in invalidated_rows:
+        if not invalidated_row.is_delete:
+            add_daily_count_delta(
+                deltas, item_id, item_type, invalidated_row.created_at, -1
+            )
+    if not is_delete:
+        add_daily_count_delta(deltas, item_id, item_type, created_at, 1)
+
+
+def record_revert(
+    deltas: DailyCountDeltas, item_id, item_type, reverted_row, restored_row
+):
+    """
+    Records the bucket changes for reverting `reverted_row` and marking
+    `restored_row` (if any) as the current row again.
+    """
+    if reverted_row.is_current and not reverted_row.is_delete:
+        add_daily_count_delta(deltas, item_id, item_type, reverted_row.created_at, -1)
+    if (
+        restored_row is not None
+        and restored_row is not reverted_row
+        and not restored_row.is_current
+        and not restored_row.is_delete
+    ):
+        add_daily_count_delta(deltas, item_id, item_type, restored_row.created_at, 1)
+
+
+def _upsert_daily_counts(session, model, item_id_col, item_type_col, deltas):
+    rows = [
+        {
+            item_id_col: item_id,
+            item_type_col: item_type,
+            "timestamp": day,
+            "count": delta,
+        }
+        for (item_id, item_type, day), delta in deltas.items()
+        if delta != 0
+    ]
+    if not rows:
+        return
+
+    table = model.__table__
+    statement = insert(table).values(rows)
+    statement = statement.on_conflict_do_update(
+        index_elements=[item_id_col, item_type_col, "timestamp"],
+        set_={"count": table.c.count + statement.excluded.count},
+    )
+    session.execute(statement)
+
+
+def update_daily_repost_counts(session, deltas: DailyCountDeltas):
+    """Applies the accumulated repost deltas to aggregate_daily_reposts in one statement"""
+    _upsert_daily_counts(
+        session, AggregateDailyReposts, "repost_item_id", "repost_type", deltas
+    )
+
+
+def update_daily_save_counts(session, deltas: DailyCountDeltas):
+    """Applies the accumulated save deltas to aggregate_daily_saves in one statement"""
+    _upsert_daily_counts(
+        session, AggregateDailySaves, "save_item_id", "save_type", deltas
+    )
@@ -1,11 +1,11 @@
+import functools
+import json
 import logging
 import time
-from typing import Tuple, TypedDict, List, Optional, Dict, Set
+from typing import Tuple, TypedDict, List, Optional, Dict, Set, Union
 from redis import Redis
 from sqlalchemy import and_
 from sqlalchemy.orm.session import Session
-from spl.token.client import Token
-from solana.rpc.api import Client
 from solana.publickey import PublicKey
 
 from src.utils.session_manager import SessionManager
@@ -16,8 +16,17 @@ from src.queries.get_balances import (
     does_user_balance_need_refresh,
     IMMEDIATE_REFRESH_REDIS_PREFIX,
     LAZY_REFRESH_REDIS_PREFIX,
+    LEGACY_IMMEDIATE_REFRESH_REDIS_KEY,
+    LEGACY_LAZY_REFRESH_REDIS_KEY,
+)
+from src.utils.redis_constants import (
+    eth_provider_stats_redis_key,
+    user_balances_refresh_last_completion_redis_key,
+)
+from src.solana.solana_client_manager import (
+    MAX_MULTIPLE_ACCOUNTS,
+    SolanaClientManager,
 )
-from src.utils.redis_constants import user_balances_refresh_last_completion_redis_key
 from src.solana.solana_helpers import (
     SPL_TOKEN_ID_PK,
     ASSOCIATED_TOKEN_PROGRAM_ID_PK,
@@ -38,7 +47,36 @@ WAUDIO_PROGRAM_PUBKEY = (
 )
 WAUDIO_MINT_PUBKEY = PublicKey(WAUDIO_MINT_ADDRESS) if WAUDIO_MINT_ADDRESS else None
 
-MAX_LAZY_REFRESH_USER_IDS = 100
+# Bounds of the number of users refreshed at once, the batch size grows while
+# batches finish within REFRESH_BATCH_TARGET_SEC and shrinks when they don't
+MIN_REFRESH_BATCH_SIZE = 25
+MAX_REFRESH_BATCH_SIZE = 1000
+REFRESH_BATCH_TARGET_SEC = 10
+
+# Seconds a task run keeps refreshing balances for, polling the queues every
+# REFRESH_POLL_SEC while they're empty
+REFRESH_RUN_SEC = 5 * 60
+REFRESH_POLL_SEC = 1
+
+# Removes the ARGV user id/score pairs from the KEYS[1] queue unless their score
+# changed, i.e. their refresh was requested again
+_REMOVE_REFRESH_ENTRIES_SCRIPT = """
+local removed = 0
+for i = 1, #ARGV, 2 do
+    local score = redis.call('zscore', KEYS[1], ARGV[i])
+    if score and tonumber(score) == tonumber(ARGV[i + 1]) then
+        removed = removed + redis.call('zrem', KEYS[1], ARGV[i])
+    end
+end
+return removed
+"""
+
+# Maximum number of eth_calls sent in a single JSON-RPC batch
+MAX_ETH_CALL_BATCH_SIZE = 500
+
+# Associated token accounts derived from solana wallets, the derivation is costly
+# and never changes for a wallet
+MAX_CACHED_ASSOCIATED_TOKEN_ACCOUNTS = 10000
 
 
 class AssociatedWallets(TypedDict):
@@ -52,10 +90,55 @@ class UserWalletMetadata(TypedDict):
     bank_account: Optional[str]
 
 
-def get_lazy_refresh_user_ids(redis: Redis, session: Session) -> List[int]:
-    redis_user_ids = redis.smembers(LAZY_REFRESH_REDIS_PREFIX)
-    user_ids = [int(user_id.decode()) for user_id in redis_user_ids]
+def drain_legacy_refresh_sets(redis: Redis):
+    """
+    Moves the refreshes still queued in the legacy sets into the sorted sets, due
+    now. Refreshes already in the sorted sets keep their score.
+    """
+    for legacy_key, key in [
+        (LEGACY_LAZY_REFRESH_REDIS_KEY, LAZY_REFRESH_REDIS_PREFIX),
+        (LEGACY_IMMEDIATE_REFRESH_REDIS_KEY, IMMEDIATE_REFRESH_REDIS_PREFIX),
+    ]:
+        user_ids = redis.smembers(legacy_key)
+        if not user_ids:
+            continue
+        now = time.time()
+        redis.zadd(key, {user_id: now for user_id in user_ids}, nx=True)
+        # Only removed once queued, refreshes requested since stay for the next run
+        redis.srem(legacy_key, *user_ids)
+        logger.info(
+            f"cache_user_balance.py | Moved {len(user_ids)} refreshes from {legacy_key} to {key}"
+        )
+
 
+def get_due_lazy_refresh_entries(redis: Redis, limit: int) -> List[Tuple[int, float]]:
+    """Returns the (user id, score) of up to `limit` lazy refreshes due, earliest first"""
+    entries: List[Tuple[bytes, float]] = redis.zrangebyscore(
+        LAZY_REFRESH_REDIS_PREFIX, "-inf", time.time(), 0, limit, withscores=True
+    )
+    return [(int(user_id), score) for user_id, score in entries]
+
+
+def get_immediate_refresh_entries(redis: Redis, limit: int) -> List[Tuple[int, float]]:
+    """Returns the (user id, score) of up to `limit` immediate refreshes, oldest first"""
+    entries: List[Tuple[bytes, float]] = redis.zrange(
+        IMMEDIATE_REFRESH_REDIS_PREFIX, 0, limit - 1, withscores=True
+    )
+    return [(int(user_id), score) for user_id, score in entries]
+
+
+def remove_refresh_entries(redis: Redis, key: str, entries: List[Tuple[int, float]]):
+    """Removes the refreshed `entries` from the `key` queue, unless their refresh was
+    requested again since they were read"""
+    if not entries:
+        return
+    values: List[Union[int, str]] = []
+    for user_id, score in entries:
+        values.extend((user_id, repr(score)))
+    redis.eval(_REMOVE_REFRESH_ENTRIES_SCRIPT, 1, key, *values)
+
+
+def get_lazy_refresh_user_ids(session: Session, user_ids: List[int]) -> List[int]:
     user_balances = (
         (session.query(UserBalance)).filter(UserBalance.user_id.in_(user_ids)).all()
     )
@@ -70,9 +153,124 @@ def get_lazy_refresh_user_ids(redis: Redis, session: Session) -> List[int]:
     return list(needs_refresh)
 
 
-def get_immediate_refresh_user_ids(redis: Redis) -> List[int]:
-    redis_user_ids = redis.smembers(IMMEDIATE_REFRESH_REDIS_PREFIX)
-    return [int(user_id.decode()) for user_id in redis_user_ids]
+@functools.lru_cache(maxsize=MAX_CACHED_ASSOCIATED_TOKEN_ACCOUNTS)
+def get_associated_token_account(wallet: str) -> PublicKey:
+    root_sol_account = PublicKey(wallet)
+    derived_account, _ = PublicKey.find_program_address(
+        [
+            bytes(root_sol_account),
+            bytes(SPL_TOKEN_ID_PK),
+            bytes(WAUDIO_PROGRAM_PUBKEY),  # type: ignore
+        ],
+        ASSOCIATED_TOKEN_PROGRAM_ID_PK,
+    )
+    return derived_account
+
+
+def make_eth_call(eth_web3, key, address, data) -> Optional[Dict]:
+    """Makes a single eth_call, returning None if it failed"""
+    try:
+        return eth_web3.provider.make_request(
+            "eth_call", [{"to": address, "data": data}, "latest"]
+        )
+    except Exception as e:
+        logger.error(
+            f"cache_user_balance.py | Error calling {key[0]} for wallet {key[1]}: {e}"
+        )
+        return None
+
+
+def get_eth_balances(eth_web3, calls) -> Dict[Tuple[str, str], int]:
+    """
+    Calls the (contract, function name, wallet) `calls`, each of a contract function
+    returning a balance, in JSON-RPC batches when the provider supports them.
+
+    Returns (function name, wallet) -> balance, omitting calls that failed.
+    """
+    balances: Dict[Tuple[str, str], int] = {}
+    requests = []
+    for contract, fn_name, wallet in calls:
+        try:
+            data = contract.encodeABI(
+                fn_name=fn_name, args=[eth_web3.toChecksumAddress(wallet)]
+            )
+        except Exception as e:
+            logger.error(
+                f"cache_user_balance.py | Unable to call {fn_name} for wallet {wallet}: {e}"
+            )
+            continue
+        requests.append(((fn_name, wallet), contract.address, data))
+
+    make_batch_request = getattr(eth_web3.provider, "make_batch_request", None)
+    for i in range(0, len(requests), MAX_ETH_CALL_BATCH_SIZE):
+        batch = requests[i : i + MAX_ETH_CALL_BATCH_SIZE]
+        if make_batch_request is None:
+            responses = [
+                make_eth_call(eth_web3, key, address, data)
+                for key, address, data in batch
+            ]
+        else:
+            try:
+                responses = make_batch_request(
+                    [
+                        ("eth_call", [{"to": address, "data": data}, "latest"])
+                        for _, address, data in batch
+                    ]
+                )
+            except Exception as e:
+                logger.error(
+                    f"cache_user_balance.py | Error calling a batch of {len(batch)} balances: {e}"
+                )
+                continue
+        for (key, _, _), response in zip(batch, responses):
+            if not response or "result" not in response:
+                logger.error(
+                    f"cache_user_balance.py | Error calling {key[0]} for wallet {key[1]}: {response}"
+                )
+                continue
+            try:
+                balances[key] = eth_web3.codec.decode_single(
+                    "uint256", bytes.fromhex(response["result"][2:])
+                )
+            except Exception as e:
+                logger.error(
+                    f"cache_user_balance.py | Unable to decode {key[0]} for wallet {key[1]}: {e}"
+                )
+    return balances
+
+
+def get_sol_token_balances(
+    solana_client_manager: SolanaClientManager, accounts: List[PublicKey]
+) -> Dict[str, int]:
+    """
+    Fetches the balances of the token `accounts` with getMultipleAccounts.
+
+    Returns account -> balance, with 0 for accounts that don't exist, omitting
+    accounts that couldn't be fetched.
+    """
+    balances: Dict[str, int] = {}
+    for i in range(0, len(accounts), MAX_MULTIPLE_ACCOUNTS):
+        batch = accounts[i : i + MAX_MULTIPLE_ACCOUNTS]
+        try:
+            account_infos = solana_client_manager.get_multiple_accounts(batch)
+        except Exception as e:
+            logger.error(
+                f"cache_user_balance.py | Error fetching token accounts {batch}: {e}"
+            )
+            continue
+        for account, account_info in zip(batch, account_infos):
+            if account_info is None:
+                balances[str(account)] = 0
+                continue
+            try:
+                balances[str(account)] = int(
+                    account_info["data"]["parsed"]["info"]["tokenAmount"]["amount"]
+                )
+            except Exception as e:
+                logger.error(
+                    f"cache_user_balance.py | Unexpected token account {account}: {e}"
+                )
+    return balances
 
 
 # *Explanation of user balance caching*
@@ -88,18 +286,18 @@ def get_immediate_refresh_user_ids(redis: Redis) -> List[int]:
 # - In Solana UserBank indexing (index_user_bank.py) any transfer operation enqueues
 #       a refresh for both the sender and reciever UserBank addresses
 #
-# In this recurring task:
-#   - Get all enqueued user balance refresh requests. These are stored in a set, so
-#       we don't worry about deduping.
-#   - If a given balance is either
+# In this recurring task, refreshing batches of users until the run ends:
+#   - Get the oldest immediate refresh requests, then the lazy refresh requests that are due.
+#       These are stored in sorted sets keyed by user id, so we don't worry about deduping.
+#   - If a given lazily refreshed balance is either
 #        a) new (created_at == updated_at)
 #        b) not new, but stale: last updated prior to (now - threshold)
 #     we look up said users, adding User_Balance rows, and removing them from Redis.
 #     we check if they have associated_wallets and update those balances as well
 #     we check if they have a user_bank_account and update that balance as well
 #
-#     Enqueued User Ids in Redis that are *not* ready to be refreshed yet are left in the queue
-#     for later.
+#     Lazily refreshed User Ids in Redis that no longer need a refresh are removed too,
+#     they're enqueued again when read once their balance is stale.
 def refresh_user_ids(
     redis: Redis,
     db: SessionManager,
@@ -107,13 +305,27 @@ def refresh_user_ids(
     delegate_manager_contract,
     staking_contract,
     eth_web3,
-    waudio_token,
-):
+    solana_client_manager: SolanaClientManager,
+    batch_size: int,
+) -> int:
+    """Refreshes the balances of up to `batch_size` queued users, immediate refreshes
+    first. Returns the number of queued users taken."""
+    immediate_refresh_entries = get_immediate_refresh_entries(redis, batch_size)
+    lazy_refresh_entries = (
+        get_due_lazy_refresh_entries(redis, batch_size - len(immediate_refresh_entries))
+        if len(immediate_refresh_entries) < batch_size
+        else []
+    )
+    if not immediate_refresh_entries and not lazy_refresh_entries:
+        return 0
+
     with db.scoped_session() as session:
-        lazy_refresh_user_ids = get_lazy_refresh_user_ids(redis, session)[
-            :MAX_LAZY_REFRESH_USER_IDS
+        lazy_refresh_user_ids = get_lazy_refresh_user_ids(
+            session, [user_id for user_id, _ in lazy_refresh_entries]
+        )
+        immediate_refresh_user_ids = [
+            user_id for user_id, _ in immediate_refresh_entries
         ]
-        immediate_refresh_user_ids = get_immediate_refresh_user_ids(redis)
 
         logger.info(
             f"cache_user_balance.py | Starting refresh with {len(lazy_refresh_user_ids)} "
@@ -187,77 +399,79 @@ def refresh_user_ids(
         logger.info(
             f"cache_user_balance.py | fetching for {len(user_associated_wallet_query)} users: {user_ids}"
         )
+        has_solana_config = (
+            WAUDIO_MINT_PUBKEY is not None and WAUDIO_PROGRAM_PUBKEY is not None
+        )
+        if not has_solana_config:
+            logger.error("cache_user_balance.py | Missing Required SPL Confirguration")
+
+        # Fetch the balances of all users' wallets at once
+        eth_calls = []
+        # solana wallet -> its associated wAUDIO token account
+        associated_token_accounts: Dict[str, PublicKey] = {}
+        sol_accounts: List[PublicKey] = []
+        for wallets in user_id_metadata.values():
+            eth_calls.append((token_contract, "balanceOf", wallets["owner_wallet"]))
+            for wallet in wallets["associated_wallets"]["eth"]:
+                eth_calls.extend(
+                    [
+                        (token_contract, "balanceOf", wallet),
+                        (delegate_manager_contract, "getTotalDelegatorStake", wallet),
+                        (staking_contract, "totalStakedFor", wallet),
+                    ]
+                )
+            if not has_solana_config:
+                continue
+            for wallet in wallets["associated_wallets"]["sol"]:
+                try:
+                    account = get_associated_token_account(wallet)
+                    associated_token_accounts[wallet] = account
+                    sol_accounts.append(account)
+                except Exception as e:
+                    logger.error(
+                        f"cache_user_balance.py | Invalid associated solana wallet {wallet}: {e}"
+                    )
+            if wallets["bank_account"] is not None:
+                sol_accounts.append(PublicKey(wallets["bank_account"]))
+
+        eth_balances = get_eth_balances(eth_web3, eth_calls)
+        sol_balances = get_sol_token_balances(
+            solana_client_manager,
+            list({str(account): account for account in sol_accounts}.values()),
+        )
 
-        # Fetch balances
         for user_id, wallets in user_id_metadata.items():
             try:
-                owner_wallet = wallets["owner_wallet"]
-                owner_wallet = eth_web3.toChecksumAddress(owner_wallet)
-                owner_wallet_balance = token_contract.functions.balanceOf(
-                    owner_wallet
-                ).call()
+                owner_wallet_balance = eth_balances[
+                    ("balanceOf", wallets["owner_wallet"])
+                ]
                 associated_balance = 0
                 waudio_balance = "0"
                 associated_sol_balance = 0
 
-                if "associated_wallets" in wallets:
-                    for wallet in wallets["associated_wallets"]["eth"]:
-                        wallet = eth_web3.toChecksumAddress(wallet)
-                        balance = token_contract.functions.balanceOf(wallet).call()
-                        delegation_balance = (
-                            delegate_manager_contract.functions.getTotalDelegatorStake(
-                                wallet
-                            ).call()
-                        )
-                        stake_balance = staking_contract.functions.totalStakedFor(
-                            wallet
-                        ).call()
-                        associated_balance += (
-                            balance + delegation_balance + stake_balance
-                        )
-                    for wallet in wallets["associated_wallets"]["sol"]:
-                        try:
-                            root_sol_account = PublicKey(wallet)
-                            derived_account, _ = PublicKey.find_program_address(
-                                [
-                                    bytes(root_sol_account),
-                                    bytes(SPL_TOKEN_ID_PK),
-                                    bytes(WAUDIO_PROGRAM_PUBKEY),  # type: ignore
-                                ],
-                                ASSOCIATED_TOKEN_PROGRAM_ID_PK,
-                            )
-                            bal_info = waudio_token.get_account_info(derived_account)
-                            associated_waudio_balance: str = bal_info["result"][
-                                "value"
-                            ]["amount"]
-                            associated_sol_balance += int(associated_waudio_balance)
-                        except Exception as e:
-                            logger.error(
-                                " ".join(
-                                    [
-                                        "cache_user_balance.py | Error fetching associated ",
-                                        "wallet balance for user %s, wallet %s: %s",
-                                    ]
-                                ),
-                                user_id,
-                                wallet,
-                                e,
-                            )
-
-                if wallets["bank_account"] is not None:
-                    if waudio_token is None:
+                for wallet in wallets["associated_wallets"]["eth"]:
+                    associated_balance += (
+                        eth_balances[("balanceOf", wallet)]
+                        + eth_balances[("getTotalDelegatorStake", wallet)]
+                        + eth_balances[("totalStakedFor", wallet)]
+                    )
+                for wallet in wallets["associated_wallets"]["sol"]:
+                    account = associated_token_accounts.get(wallet)
+                    if account is None or str(account) not in sol_balances:
                         logger.error(
-                            "cache_user_balance.py | Missing Required SPL Confirguration"
-                        )
-                    else:
-                        bal_info = waudio_token.get_balance(
-                            PublicKey(wallets["bank_account"])
+                            "cache_user_balance.py | Error fetching associated "
+                            f"wallet balance for user {user_id}, wallet {wallet}"
                         )
-                        waudio_balance = bal_info["result"]["value"]["amount"]
+                        continue
+                    associated_sol_balance += sol_balances[str(account)]
+
+                if wallets["bank_account"] is not None and has_solana_config:
+                    bank_account = PublicKey(wallets["bank_account"])
+                    waudio_balance = str(sol_balances[str(bank_account)])
 
                 # update the balance on the user model
                 user_balance = user_balances[user_id]
-                user_balance.balance = owner_wallet_balance
+                user_balance.balance = str(owner_wallet_balance)
                 user_balance.associated_wallets_balance = str(associated_balance)
                 user_balance.waudio = waudio_balance
                 user_balance.associated_sol_wallets_balance = str(
@@ -276,10 +490,13 @@ def refresh_user_ids(
         logger.info(
             f"cache_user_balance.py | Got balances for {len(user_associated_wallet_query)} users, removing from Redis."
         )
-        if lazy_refresh_user_ids:
-            redis.srem(LAZY_REFRESH_REDIS_PREFIX, *lazy_refresh_user_ids)
-        if immediate_refresh_user_ids:
-            redis.srem(IMMEDIATE_REFRESH_REDIS_PREFIX, *immediate_refresh_user_ids)
+        # Lazy refreshes no longer needed are dropped along with the refreshed ones
+        remove_refresh_entries(redis, LAZY_REFRESH_REDIS_PREFIX, lazy_refresh_entries)
+        remove_refresh_entries(
+            redis, IMMEDIATE_REFRESH_REDIS_PREFIX, immediate_refresh_entries
+        )
+
+    return len(immediate_refresh_entries) + len(lazy_refresh_entries)
 
 
 def get_token_address(eth_web3, config):
@@ -348,19 +565,6 @@ def get_staking_contract(eth_web3):
     return staking_instance
 
 
-def get_audio_token(solana_client: Client):
-    if WAUDIO_MINT_PUBKEY is None or WAUDIO_PROGRAM_PUBKEY is None:
-        logger.error("cache_user_balance.py | Missing Required SPL Confirguration")
-        return None
-    waudio_token = Token(
-        conn=solana_client,
-        pubkey=WAUDIO_MINT_PUBKEY,
-        program_id=WAUDIO_PROGRAM_PUBKEY,
-        payer=[],  # not making any txs so payer is not required
-    )
-    return waudio_token
-
-
 @celery.task(name="update_user_balances", bind=True)
 def update_user_balances_task(self):
     """Caches user Audio balances, in wei."""
@@ -384,21 +588,45 @@ def update_user_balances_task(self):
             token_inst = get_token_contract(
                 eth_web3, update_user_balances_task.shared_config
             )
-            waudio_token = get_audio_token(solana_client_manager.get_client())
-            refresh_user_ids(
-                redis,
-                db,
-                token_inst,
-                delegate_manager_inst,
-                staking_inst,
-                eth_web3,
-                waudio_token,
-            )
+            drain_legacy_refresh_sets(redis)
+            # Refresh continuously for the run, sizing batches by how long they take
+            batch_size = MIN_REFRESH_BATCH_SIZE
+            num_refreshed = 0
+            while time.time() - start_time < REFRESH_RUN_SEC:
+                batch_start_time = time.time()
+                num_batch_refreshed = refresh_user_ids(
+                    redis,
+                    db,
+                    token_inst,
+                    delegate_manager_inst,
+                    staking_inst,
+                    eth_web3,
+                    solana_client_manager,
+                    batch_size,
+                )
+                batch_end_time = time.time()
+                redis.set(
+                    user_balances_refresh_last_completion_redis_key,
+                    int(batch_end_time),
+                )
+                redis.set(
+                    eth_provider_stats_redis_key,
+                    json.dumps(eth_web3.provider.get_endpoint_stats()),
+                )
+                num_refreshed += num_batch_refreshed
+
+                if batch_end_time - batch_start_time > REFRESH_BATCH_TARGET_SEC:
+                    batch_size = max(MIN_REFRESH_BATCH_SIZE, batch_size // 2)
+                elif num_batch_refreshed == batch_size:
+                    batch_size = min(MAX_REFRESH_BATCH_SIZE, batch_size * 2)
+                else:
+                    # The queues are drained
+                    time.sleep(REFRESH_POLL_SEC)
 
             end_time = time.time()
-            redis.set(user_balances_refresh_last_completion_redis_key, int(end_time))
             logger.info(
-                f"cache_user_balance.py | Finished cache_user_balance in {end_time - start_time} seconds"
+                f"cache_user_balance.py | Finished cache_user_balance for {num_refreshed} users "
+                f"in {end_time - start_time} seconds"
             )
         else:
             logger.info("cache_user_balance.py | Failed to acquire lock")
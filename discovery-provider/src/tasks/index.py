@@ -1,5 +1,5 @@
 import concurrent.futures
-import logging
+import logging  # pylint: disable=C0302
 
 from sqlalchemy import func
 from src.app import contract_addresses
@@ -26,13 +26,28 @@ from src.queries.get_skipped_transactions import (
     get_indexing_error,
     set_indexing_error,
 )
+from src.queries.get_user_engagement import remove_cached_user_engagements
+from src.tasks.aggregate_daily_counts import (
+    DailyCountDeltas,
+    record_revert,
+    update_daily_repost_counts,
+    update_daily_save_counts,
+)
 from src.tasks.celery_app import celery
+from src.tasks.index_autocomplete import queue_autocomplete_updates
+from src.tasks.notification_log import (
+    revert_notification_log,
+    try_append_notification_log,
+)
 from src.tasks.playlists import playlist_state_update
+from src.tasks.search_dicts import update_search_dicts
 from src.tasks.social_features import social_feature_state_update
 from src.tasks.tracks import track_state_update
 from src.tasks.user_library import user_library_state_update
 from src.tasks.user_replica_set import user_replica_set_state_update
 from src.tasks.users import user_state_update  # pylint: disable=E0611,E0001
+from src.utils.block_cache import poa_block_cache
+from src.utils.indexed_block_watcher import publish_indexed_block
 from src.utils.indexing_errors import IndexingError
 from src.utils.redis_cache import (
     remove_cached_playlist_ids,
@@ -76,7 +91,7 @@ def initialize_blocks_table_if_necessary(db: SessionManager):
 
     target_blockhash = None
     target_blockhash = update_task.shared_config["discprov"]["start_block"]
-    target_block = update_task.web3.eth.getBlock(target_blockhash, True)
+    target_block = poa_block_cache.get_block(update_task.web3, target_blockhash, True)
 
     with db.scoped_session() as session:
         current_block_query_result = session.query(Block).filter_by(is_current=True)
@@ -139,7 +154,9 @@ def get_latest_block(db: SessionManager):
 
         target_latest_block_number = current_block_number + block_processing_window
 
-        latest_block_from_chain = update_task.web3.eth.getBlock("latest", True)
+        latest_block_from_chain = poa_block_cache.get_block(
+            update_task.web3, "latest", True
+        )
         latest_block_number_from_chain = latest_block_from_chain.number
 
         target_latest_block_number = min(
@@ -149,12 +166,16 @@ def get_latest_block(db: SessionManager):
         logger.info(
             f"index.py | get_latest_block | current={current_block_number} target={target_latest_block_number}"
         )
-        latest_block = update_task.web3.eth.getBlock(target_latest_block_number, True)
+        latest_block = poa_block_cache.get_block(
+            update_task.web3, target_latest_block_number, True
+        )
     return latest_block
 
 
 def update_latest_block_redis():
-    latest_block_from_chain = update_task.web3.eth.getBlock("latest", True)
+    latest_block_from_chain = poa_block_cache.get_block(
+        update_task.web3, "latest", True
+    )
     default_indexing_interval_seconds = int(
         update_task.shared_config["discprov"]["block_processing_interval_sec"]
     )
@@ -415,18 +436,19 @@ def index_blocks(self, db, blocks_list):
                     f" track_state_changed={track_state_changed} for block={block_number}"
                 )
 
-                social_feature_state_changed = (  # pylint: disable=W0612
-                    social_feature_state_update(
-                        self,
-                        update_task,
-                        session,
-                        social_feature_factory_txs,
-                        block_number,
-                        block_timestamp,
-                        block_hash,
-                    )
-                    > 0
+                (
+                    total_social_feature_changes,
+                    repost_user_ids,
+                ) = social_feature_state_update(
+                    self,
+                    update_task,
+                    session,
+                    social_feature_factory_txs,
+                    block_number,
+                    block_timestamp,
+                    block_hash,
                 )
+                social_feature_state_changed = total_social_feature_changes > 0
                 logger.info(
                     f"index.py | social_feature_state_update completed"
                     f" social_feature_state_changed={social_feature_state_changed} for block={block_number}"
@@ -468,22 +490,44 @@ def index_blocks(self, db, blocks_list):
                     f" playlist_state_changed={playlist_state_changed} for block={block_number}"
                 )
 
-                user_library_state_changed = (
-                    user_library_state_update(  # pylint: disable=W0612
-                        self,
-                        update_task,
-                        session,
-                        user_library_factory_txs,
-                        block_number,
-                        block_timestamp,
-                        block_hash,
-                    )
+                (
+                    total_user_library_changes,
+                    save_user_ids,
+                ) = user_library_state_update(
+                    self,
+                    update_task,
+                    session,
+                    user_library_factory_txs,
+                    block_number,
+                    block_timestamp,
+                    block_hash,
                 )
+                user_library_state_changed = total_user_library_changes > 0
                 logger.info(
                     f"index.py | user_library_state_update completed"
                     f" user_library_state_changed={user_library_state_changed} for block={block_number}"
                 )
 
+                # Keep the search dictionaries in sync with the changed entities
+                update_search_dicts(
+                    session,
+                    user_ids if user_state_changed else None,
+                    track_ids if track_state_changed else None,
+                    playlist_ids if playlist_state_changed else None,
+                )
+                logger.info(
+                    f"index.py | update_search_dicts completed for block={block_number}"
+                )
+
+                # Append the block's notifications for the notifications route
+                notification_count = try_append_notification_log(
+                    session, redis, block_number, web3.toHex(block_hash)
+                )
+                logger.info(
+                    f"index.py | append_notification_log completed"
+                    f" notification_count={notification_count} for block={block_number}"
+                )
+
                 track_lexeme_state_changed = user_state_changed or track_state_changed
                 session.commit()
                 logger.info(
@@ -503,6 +547,16 @@ def index_blocks(self, db, blocks_list):
                 if playlist_state_changed:
                     if playlist_ids:
                         remove_cached_playlist_ids(redis, playlist_ids)
+                if repost_user_ids or save_user_ids:
+                    remove_cached_user_engagements(
+                        redis, repost_user_ids | save_user_ids
+                    )
+                queue_autocomplete_updates(
+                    redis,
+                    user_ids if user_state_changed else None,
+                    track_ids if track_state_changed else None,
+                    playlist_ids if playlist_state_changed else None,
+                )
                 logger.info(
                     f"index.py | redis cache clean operations complete for block=${block_number}"
                 )
@@ -521,6 +575,8 @@ def index_blocks(self, db, blocks_list):
         # add the block number of the most recently processed block to redis
         redis.set(most_recent_indexed_block_redis_key, block.number)
         redis.set(most_recent_indexed_block_hash_redis_key, block.hash.hex())
+        # Wake requests waiting on this block
+        publish_indexed_block(redis, block.number, block.hash.hex())
         logger.info(
             f"index.py | update most recently processed block complete for block=${block_number}"
         )
@@ -554,9 +610,14 @@ def revert_blocks(self, db, revert_blocks_list):
 
     with db.scoped_session() as session:
 
-        rebuild_playlist_index = False
-        rebuild_track_index = False
-        rebuild_user_index = False
+        reverted_playlist_ids = set()
+        reverted_track_ids = set()
+        reverted_user_ids = set()
+        reverted_engagement_user_ids = set()
+
+        # net changes to the daily repost and save buckets from reverted rows
+        repost_count_deltas: DailyCountDeltas = {}
+        save_count_deltas: DailyCountDeltas = {}
 
         for revert_block in revert_blocks_list:
             # Cache relevant information about current block
@@ -630,6 +691,13 @@ def revert_blocks(self, db, revert_blocks_list):
                     .order_by(Save.blocknumber.desc())
                     .first()
                 )
+                record_revert(
+                    save_count_deltas,
+                    save_item_id,
+                    save_type,
+                    save_to_revert,
+                    previous_save_entry,
+                )
                 if previous_save_entry:
                     previous_save_entry.is_current = True
                 # Remove outdated save item entry
@@ -647,6 +715,13 @@ def revert_blocks(self, db, revert_blocks_list):
                     .order_by(Repost.blocknumber.desc())
                     .first()
                 )
+                record_revert(
+                    repost_count_deltas,
+                    repost_item_id,
+                    repost_type,
+                    repost_to_revert,
+                    previous_repost_entry,
+                )
                 # Update prev repost row (is_delete) to is_current == True
                 if previous_repost_entry:
                     previous_repost_entry.is_current = True
@@ -777,14 +852,39 @@ def revert_blocks(self, db, revert_blocks_list):
                 logger.info(f"Reverting track route {track_route_to_revert}")
                 session.delete(track_route_to_revert)
 
+            revert_notification_log(session, revert_hash)
+
             # Remove outdated block entry
             session.query(Block).filter(Block.blockhash == revert_hash).delete()
 
-            rebuild_playlist_index = rebuild_playlist_index or bool(
-                revert_playlist_entries
+            reverted_playlist_ids.update(
+                playlist.playlist_id for playlist in revert_playlist_entries
             )
-            rebuild_track_index = rebuild_track_index or bool(revert_track_entries)
-            rebuild_user_index = rebuild_user_index or bool(revert_user_entries)
+            reverted_track_ids.update(track.track_id for track in revert_track_entries)
+            reverted_user_ids.update(user.user_id for user in revert_user_entries)
+            reverted_engagement_user_ids.update(
+                save.user_id for save in revert_save_entries
+            )
+            reverted_engagement_user_ids.update(
+                repost.user_id for repost in revert_repost_entries
+            )
+
+        update_daily_repost_counts(session, repost_count_deltas)
+        update_daily_save_counts(session, save_count_deltas)
+
+        # Re-tokenize the search dictionary rows of the reverted entities
+        update_search_dicts(
+            session,
+            reverted_user_ids,
+            reverted_track_ids,
+            reverted_playlist_ids,
+        )
+
+    queue_autocomplete_updates(
+        update_task.redis, reverted_user_ids, reverted_track_ids, reverted_playlist_ids
+    )
+    if reverted_engagement_user_ids:
+        remove_cached_user_engagements(update_task.redis, reverted_engagement_user_ids)
     # TODO - if we enable revert, need to set the most_recent_indexed_block_redis_key key in redis
 
 
@@ -884,7 +984,9 @@ def update_task(self):
                         block_intersection_found = True
                         intersect_block_hash = default_config_start_hash
                     else:
-                        latest_block = web3.eth.getBlock(parent_hash, True)
+                        latest_block = poa_block_cache.get_block(
+                            web3, parent_hash, True
+                        )
                         intersect_block_hash = web3.toHex(latest_block.hash)
 
                 # Determine whether current indexed data (is_current == True) matches the
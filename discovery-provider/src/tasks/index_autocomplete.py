@@ -0,0 +1,210 @@
+import logging
+import time
+from typing import Dict
+
+from src.tasks.celery_app import celery
+from src.tasks.search_dicts import (
+    ALBUM_LEXEME_DICT,
+    PLAYLIST_LEXEME_DICT,
+    TRACK_LEXEME_DICT,
+    USER_LEXEME_DICT,
+)
+from src.utils.autocomplete_index import (
+    AUTOCOMPLETE_KINDS,
+    AutocompleteEntry,
+    get_autocomplete_index_paths,
+    load_autocomplete_index,
+    write_base_snapshot,
+    write_delta_snapshot,
+)
+
+logger = logging.getLogger(__name__)
+
+# How often the base snapshot is rebuilt from the whole lexeme dictionaries,
+# folding in the delta and picking up popularity changes and rows removed by compaction
+FULL_REBUILD_INTERVAL_SEC = 60 * 60
+
+# The base snapshot is rebuilt once the delta grows past this many entities
+MAX_DELTA_ENTITIES = 50000
+
+# Redis sets of the entity ids changed by the indexer since the last update
+autocomplete_dirty_users_redis_key = "autocomplete:dirty:users"
+autocomplete_dirty_tracks_redis_key = "autocomplete:dirty:tracks"
+autocomplete_dirty_playlists_redis_key = "autocomplete:dirty:playlists"
+
+# kind -> (lexeme dictionary, id column, group column, popularity column,
+#          extra lexeme column, dirty ids redis key)
+AUTOCOMPLETE_SOURCES = {
+    "users": (
+        USER_LEXEME_DICT,
+        "user_id",
+        "user_id",
+        "follower_count",
+        "handle",
+        autocomplete_dirty_users_redis_key,
+    ),
+    "tracks": (
+        TRACK_LEXEME_DICT,
+        "track_id",
+        "owner_id",
+        "repost_count",
+        "NULL",
+        autocomplete_dirty_tracks_redis_key,
+    ),
+    "playlists": (
+        PLAYLIST_LEXEME_DICT,
+        "playlist_id",
+        "owner_id",
+        "repost_count",
+        "NULL",
+        autocomplete_dirty_playlists_redis_key,
+    ),
+    "albums": (
+        ALBUM_LEXEME_DICT,
+        "playlist_id",
+        "owner_id",
+        "repost_count",
+        "NULL",
+        autocomplete_dirty_playlists_redis_key,
+    ),
+}
+
+
+def queue_autocomplete_updates(redis, user_ids, track_ids, playlist_ids):
+    """Marks entities changed by the indexer to be re-read into the autocomplete index"""
+    pipeline = redis.pipeline()
+    for key, ids in [
+        (autocomplete_dirty_users_redis_key, user_ids),
+        (autocomplete_dirty_tracks_redis_key, track_ids),
+        (autocomplete_dirty_playlists_redis_key, playlist_ids),
+    ]:
+        if ids:
+            pipeline.sadd(key, *ids)
+    pipeline.execute()
+
+
+def fetch_autocomplete_entries(session, kind, ids=None) -> Dict[int, AutocompleteEntry]:
+    """Reads the entries of `kind` from its lexeme dictionary, restricted to `ids` if given"""
+    table_name, id_col, group_col, score_col, extra_col, _ = AUTOCOMPLETE_SOURCES[kind]
+    rows = session.execute(
+        f"""
+        SELECT {id_col}, {group_col}, {score_col}, word, {extra_col}
+        FROM {table_name}
+        {f"WHERE {id_col} = ANY(:ids)" if ids is not None else ""}
+        """,
+        {"ids": ids},
+    ).fetchall()
+
+    entries: Dict[int, AutocompleteEntry] = {}
+    for entity_id, group_id, score, word, extra_word in rows:
+        if entity_id not in entries:
+            entries[entity_id] = AutocompleteEntry(group_id, score or 0, set())
+        entries[entity_id].words.add(word)
+        if extra_word:
+            entries[entity_id].words.add(extra_word)
+    return entries
+
+
+def _load_index(base_path, delta_path):
+    try:
+        return load_autocomplete_index(base_path, delta_path)
+    except Exception as e:
+        logger.warning(f"index_autocomplete.py | Discarding unreadable snapshot: {e}")
+        return None
+
+
+def rebuild_autocomplete_index(session, base_path, delta_path):
+    """Writes the base snapshot from the whole lexeme dictionaries and empties the delta"""
+    start_time = time.time()
+    entries_by_kind = {
+        kind: fetch_autocomplete_entries(session, kind) for kind in AUTOCOMPLETE_KINDS
+    }
+    write_base_snapshot(base_path, entries_by_kind, full_built_at=start_time)
+    write_delta_snapshot(
+        delta_path, {kind: {} for kind in AUTOCOMPLETE_KINDS}, base_built_at=start_time
+    )
+    logger.info(
+        f"index_autocomplete.py | Rebuilt autocomplete index "
+        f"({sum(len(entries) for entries in entries_by_kind.values())} entries) "
+        f"in {time.time() - start_time} sec."
+    )
+
+
+def update_autocomplete_index(session, redis, base_path, delta_path):
+    """
+    Brings the autocomplete snapshot up to date with the entities changed by the indexer.
+
+    Changed entities are re-read into the delta, so updates only cost as much as
+    the entities changed since the base snapshot. The base is rebuilt when there
+    is none, when it is old or when the delta grows too large.
+    """
+    start_time = time.time()
+    index = _load_index(base_path, delta_path)
+
+    # Ids are read before and removed after the snapshot is written
+    # so changes indexed in between are picked up by the next update
+    dirty_keys = {source[5] for source in AUTOCOMPLETE_SOURCES.values()}
+    dirty_ids = {key: [int(i) for i in redis.smembers(key)] for key in dirty_keys}
+
+    if index is None or start_time - index.built_at > FULL_REBUILD_INTERVAL_SEC:
+        rebuild_autocomplete_index(session, base_path, delta_path)
+    elif any(dirty_ids.values()):
+        changes_by_kind = index.delta_changes()
+        for kind in AUTOCOMPLETE_KINDS:
+            ids = dirty_ids[AUTOCOMPLETE_SOURCES[kind][5]]
+            if ids:
+                entries = fetch_autocomplete_entries(session, kind, ids)
+                for entity_id in ids:
+                    changes_by_kind[kind][entity_id] = entries.get(entity_id)
+
+        num_changes = sum(len(changes) for changes in changes_by_kind.values())
+        if num_changes > MAX_DELTA_ENTITIES:
+            rebuild_autocomplete_index(session, base_path, delta_path)
+        else:
+            write_delta_snapshot(
+                delta_path, changes_by_kind, base_built_at=index.built_at
+            )
+            logger.info(
+                f"index_autocomplete.py | Wrote autocomplete delta "
+                f"({num_changes} entities) in {time.time() - start_time} sec."
+            )
+    else:
+        return
+
+    pipeline = redis.pipeline()
+    for key, ids in dirty_ids.items():
+        if ids:
+            pipeline.srem(key, *ids)
+    pipeline.execute()
+
+
+######## CELERY TASKS ########
+@celery.task(name="index_autocomplete", bind=True)
+def index_autocomplete(self):
+    # Cache custom task class properties
+    # Details regarding custom task context can be found in wiki
+    # Custom Task definition can be found in src/app.py
+    db = index_autocomplete.db
+    redis = index_autocomplete.redis
+    # Define lock acquired boolean
+    have_lock = False
+    # Define redis lock object
+    update_lock = redis.lock("index_autocomplete_lock", timeout=60 * 10)
+    try:
+        # Attempt to acquire lock - do not block if unable to acquire
+        have_lock = update_lock.acquire(blocking=False)
+        if have_lock:
+            with db.scoped_session() as session:
+                update_autocomplete_index(
+                    session, redis, *get_autocomplete_index_paths()
+                )
+        else:
+            logger.info(
+                "index_autocomplete.py | Failed to acquire index_autocomplete_lock"
+            )
+    except Exception as e:
+        logger.error("index_autocomplete.py | Fatal error in main loop", exc_info=True)
+        raise e
+    finally:
+        if have_lock:
+            update_lock.release()
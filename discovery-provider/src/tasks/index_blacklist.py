@@ -3,6 +3,7 @@ from src.app import contract_addresses
 from src.models import IPLDBlacklistBlock, BlacklistedIPLD
 from src.tasks.celery_app import celery
 from src.tasks.ipld_blacklist import ipld_blacklist_state_update
+from src.utils.block_cache import poa_block_cache
 from src.utils.redis_constants import (
     most_recent_indexed_ipld_block_redis_key,
     most_recent_indexed_ipld_block_hash_redis_key,
@@ -25,7 +26,9 @@ def initialize_blacklist_blocks_table_if_necessary(db):
     target_blockhash = update_ipld_blacklist_task.shared_config["discprov"][
         "start_block"
     ]
-    target_block = update_ipld_blacklist_task.web3.eth.getBlock(target_blockhash, True)
+    target_block = poa_block_cache.get_block(
+        update_ipld_blacklist_task.web3, target_blockhash, True
+    )
     with db.scoped_session() as session:
         current_block_query_result = session.query(IPLDBlacklistBlock).filter_by(
             is_current=True
@@ -79,8 +82,8 @@ def get_latest_blacklist_block(db):
 
         target_latest_block_number = current_block_number + block_processing_window
 
-        latest_block_from_chain = update_ipld_blacklist_task.web3.eth.getBlock(
-            "latest", True
+        latest_block_from_chain = poa_block_cache.get_block(
+            update_ipld_blacklist_task.web3, "latest", True
         )
         latest_block_number_from_chain = latest_block_from_chain.number
 
@@ -92,8 +95,8 @@ def get_latest_blacklist_block(db):
             f"IPLDBLACKLIST | get_latest_blacklist_block | "
             f"current={current_block_number} target={target_latest_block_number}"
         )
-        latest_block = update_ipld_blacklist_task.web3.eth.getBlock(
-            target_latest_block_number, True
+        latest_block = poa_block_cache.get_block(
+            update_ipld_blacklist_task.web3, target_latest_block_number, True
         )
     return latest_block
 
@@ -300,7 +303,9 @@ def update_ipld_blacklist_task(self):
                         block_intersection_found = True
                         intersect_block_hash = default_config_start_hash
                     else:
-                        latest_block = web3.eth.getBlock(parent_hash, True)
+                        latest_block = poa_block_cache.get_block(
+                            web3, parent_hash, True
+                        )
                         intersect_block_hash = web3.toHex(latest_block.hash)
 
                 # Determine whether current indexed data (is_current == True) matches the
@@ -1,3 +1,4 @@
+import concurrent.futures
 import logging
 import time
 from src.tasks.celery_app import celery
@@ -6,12 +7,71 @@ from src.utils.redis_constants import challenges_last_processed_event_redis_key
 logger = logging.getLogger(__name__)
 index_challenges_last_event_key = ""
 
+# Number of seconds a task drains the challenge events before handing over to
+# the next scheduled task
+DRAIN_LOOP_SECONDS = 60
+# Number of milliseconds to wait for new events when a challenge has none
+DRAIN_BLOCK_MS = 1000
+# Each challenge's events are processed by the one worker holding its lock
+CHALLENGE_LOCK_TIMEOUT_SECONDS = 7200
 
-def index_challenges(event_bus, db, redis):
-    with db.scoped_session() as session:
-        num_processed = event_bus.process_events(session)
-        if num_processed:
+
+def drain_challenge_events(event_bus, db, redis, challenge_id, deadline):
+    """Processes the events of a challenge as they come in until `deadline`"""
+    while time.time() < deadline:
+        with db.scoped_session() as session:
+            num_processed, _, event_ids = event_bus.process_events_unacked(
+                session, challenge_ids=[challenge_id], block_ms=DRAIN_BLOCK_MS
+            )
+        # Acked once committed, events of a worker dying before are delivered again
+        event_bus.ack_events(event_ids)
+        if num_processed > 0:
             redis.set(challenges_last_processed_event_redis_key, int(time.time()))
+        elif num_processed < 0:
+            # Redis errored, back off instead of retrying right away
+            time.sleep(DRAIN_BLOCK_MS / 1000)
+
+
+def index_challenges(event_bus, db, redis, drain_seconds=DRAIN_LOOP_SECONDS):
+    """
+    Drains the events of each challenge no other worker is draining in parallel,
+    one thread per challenge, for `drain_seconds`
+    """
+    locks = {
+        challenge_id: redis.lock(
+            f"index_challenges:{challenge_id}", timeout=CHALLENGE_LOCK_TIMEOUT_SECONDS
+        )
+        for challenge_id in event_bus.get_challenge_ids()
+    }
+    owned_challenge_ids = [
+        challenge_id
+        for challenge_id, lock in locks.items()
+        if lock.acquire(blocking=False)
+    ]
+    if not owned_challenge_ids:
+        logger.info("index_challenges.py | Every challenge is already being indexed")
+        return
+    try:
+        deadline = time.time() + drain_seconds
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=len(owned_challenge_ids)
+        ) as executor:
+            futures = [
+                executor.submit(
+                    drain_challenge_events,
+                    event_bus,
+                    db,
+                    redis,
+                    challenge_id,
+                    deadline,
+                )
+                for challenge_id in owned_challenge_ids
+            ]
+            for future in concurrent.futures.as_completed(futures):
+                future.result()
+    finally:
+        for challenge_id in owned_challenge_ids:
+            locks[challenge_id].release()
 
 
 @celery.task(name="index_challenges", bind=True)
@@ -19,17 +79,8 @@ def index_challenges_task(self):
     db = index_challenges_task.db
     redis = index_challenges_task.redis
     event_bus = index_challenges_task.challenge_event_bus
-    have_lock = False
-    update_lock = redis.lock("index_challenges", timeout=7200)
     try:
-        have_lock = update_lock.acquire(blocking=False)
-        if have_lock:
-            index_challenges(event_bus, db, redis)
-        else:
-            logger.info("index_challenges.py | Failed to acquire index challenges lock")
+        index_challenges(event_bus, db, redis)
     except Exception as e:
         logger.error("index_challenges.py | Fatal error in main loop", exc_info=True)
         raise e
-    finally:
-        if have_lock:
-            update_lock.release()
@@ -5,7 +5,13 @@ from web3 import Web3
 from web3.providers.rpc import HTTPProvider
 from src.tasks.celery_app import celery
 from src.utils.config import shared_config
-from src.eth_indexing.event_scanner import EventScanner
+from src.eth_indexing.event_scanner import (
+    CHECKPOINT_INTERVAL_SECONDS,
+    MAX_CONCURRENT_REQUESTS,
+    MAX_REQUESTS_PER_SECOND,
+    EventScanner,
+)
+from src.utils.block_cache import eth_block_cache
 from src.utils.helpers import load_eth_abi_values
 from src.utils.redis_constants import index_eth_last_completion_redis_key
 from src.tasks.cache_user_balance import get_token_address
@@ -40,6 +46,17 @@ def index_eth_transfer_events(db, redis):
         contract=AUDIO_TOKEN_CONTRACT,
         event_type=AUDIO_TOKEN_CONTRACT.events.Transfer,
         filters={"address": AUDIO_CHECKSUM_ADDRESS},
+        max_concurrent_requests=shared_config["web3"].getint(
+            "eth_get_logs_max_concurrency", fallback=MAX_CONCURRENT_REQUESTS
+        ),
+        max_requests_per_second=shared_config["web3"].getfloat(
+            "eth_get_logs_max_requests_per_sec", fallback=MAX_REQUESTS_PER_SECOND
+        ),
+        checkpoint_interval_seconds=shared_config["web3"].getfloat(
+            "eth_indexing_checkpoint_interval_sec",
+            fallback=CHECKPOINT_INTERVAL_SECONDS,
+        ),
+        block_cache=eth_block_cache,
     )
     scanner.restore()
 
@@ -64,13 +81,9 @@ def index_eth_transfer_events(db, redis):
     logger.info(f"Scanning events from blocks {start_block} - {end_block}")
     start = time.time()
 
-    # Run the scan
+    # Run the scan, which saves the last scanned block as it goes up to end_block
     result, total_chunks_scanned = scanner.scan(start_block, end_block)
 
-    logger.info(
-        "Reached end block for eth transfer events... saving events to database"
-    )
-    scanner.save(end_block)
     duration = time.time() - start
     logger.info(
         f"Scanned total {len(result)} Transfer events, in {duration} seconds, \
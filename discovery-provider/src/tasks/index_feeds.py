@@ -0,0 +1,225 @@
+import logging
+from collections import defaultdict
+from typing import Dict, List
+
+from src.models import Block, Follow, Playlist, Repost, RepostType, Track
+from src.queries.get_feed import build_stored_feed, get_playlist_release_tracks
+from src.queries.query_helpers import get_followee_user_ids
+from src.tasks.celery_app import celery
+from src.utils.feed_store import (
+    ORIGINAL,
+    PLAYLIST,
+    REPOST,
+    TRACK,
+    add_feed_entry,
+    feed_entry,
+    invalidate_all_feeds,
+    invalidate_feeds,
+    is_feed_store_enabled,
+    pop_feed_warmups,
+    set_playlist_tracks,
+    to_score,
+)
+from src.utils.social_graph import get_social_graph
+
+logger = logging.getLogger(__name__)
+
+# Block the feeds were last fanned out to
+feed_blocknumber_redis_key = "feed:blocknumber"
+feed_blockhash_redis_key = "feed:blockhash"
+
+# Past this many blocks behind every feed is dropped rather than caught up
+MAX_BLOCK_LAG = 1000
+
+# Feeds built per run for users who read their feed while it wasn't stored
+WARMUPS_PER_RUN = 50
+
+
+def _get_followers(session, user_ids) -> Dict[int, List[int]]:
+    social_graph = get_social_graph()
+    if social_graph is not None:
+        return {user_id: social_graph.followers(user_id) for user_id in user_ids}
+    followers = defaultdict(list)
+    if user_ids:
+        follows = session.query(
+            Follow.followee_user_id, Follow.follower_user_id
+        ).filter(
+            Follow.is_current == True,
+            Follow.is_delete == False,
+            Follow.followee_user_id.in_(user_ids),
+        )
+        for followee_user_id, follower_user_id in follows:
+            followers[followee_user_id].append(follower_user_id)
+    return followers
+
+
+def fan_out_feeds(session, redis, from_blocknumber, to_blocknumber):
+    """
+    Adds the tracks and playlists created and reposted in blocks
+    (from_blocknumber, to_blocknumber] to the stored feeds of the followers
+    of their creators and reposters, and drops the feeds of users who followed
+    or unfollowed someone since their feed no longer matches their followees.
+
+    Items deleted or hidden since are left in feeds and filtered out on read.
+    """
+
+    def in_range(model):
+        return model.blocknumber.between(from_blocknumber + 1, to_blocknumber)
+
+    tracks = (
+        session.query(Track.track_id, Track.owner_id, Track.created_at)
+        .filter(
+            Track.is_current == True,
+            Track.is_delete == False,
+            Track.is_unlisted == False,
+            Track.stem_of == None,
+            in_range(Track),
+        )
+        .all()
+    )
+    playlists = (
+        session.query(
+            Playlist.playlist_id,
+            Playlist.playlist_owner_id,
+            Playlist.created_at,
+            Playlist.playlist_contents,
+        )
+        .filter(
+            Playlist.is_current == True,
+            Playlist.is_delete == False,
+            Playlist.is_private == False,
+            in_range(Playlist),
+        )
+        .all()
+    )
+    # Oldest first, feeds keep the first time an item was added to them
+    reposts = (
+        session.query(
+            Repost.user_id,
+            Repost.repost_item_id,
+            Repost.repost_type,
+            Repost.created_at,
+        )
+        .filter(
+            Repost.is_current == True,
+            Repost.is_delete == False,
+            in_range(Repost),
+        )
+        .order_by(Repost.created_at)
+        .all()
+    )
+    follower_user_ids = [
+        follow[0]
+        for follow in session.query(Follow.follower_user_id)
+        .filter(Follow.is_current == True, in_range(Follow))
+        .distinct()
+    ]
+
+    followers = _get_followers(
+        session,
+        list(
+            {track.owner_id for track in tracks}
+            | {playlist.playlist_owner_id for playlist in playlists}
+            | {repost.user_id for repost in reposts}
+        ),
+    )
+
+    # Released tracks are recorded before their playlists are added to feeds
+    set_playlist_tracks(redis, get_playlist_release_tracks(session, playlists))
+    for track in tracks:
+        add_feed_entry(
+            redis,
+            followers[track.owner_id],
+            feed_entry(ORIGINAL, TRACK, track.track_id),
+            to_score(track.created_at),
+        )
+    for playlist in playlists:
+        add_feed_entry(
+            redis,
+            followers[playlist.playlist_owner_id],
+            feed_entry(ORIGINAL, PLAYLIST, playlist.playlist_id),
+            to_score(playlist.created_at),
+        )
+    for repost in reposts:
+        kind = TRACK if repost.repost_type == RepostType.track else PLAYLIST
+        add_feed_entry(
+            redis,
+            followers[repost.user_id],
+            feed_entry(REPOST, kind, repost.repost_item_id),
+            to_score(repost.created_at),
+        )
+    invalidate_feeds(redis, follower_user_ids)
+
+    logger.info(
+        f"index_feeds.py | Fanned out {len(tracks)} tracks, {len(playlists)} playlists, "
+        f"{len(reposts)} reposts from blocks {from_blocknumber + 1}-{to_blocknumber}"
+    )
+
+
+def update_feeds(session, redis):
+    latest_block = session.query(Block).filter(Block.is_current == True).first()
+    if latest_block is None:
+        return
+
+    blocknumber = redis.get(feed_blocknumber_redis_key)
+    blockhash = redis.get(feed_blockhash_redis_key)
+    if blocknumber is not None and blockhash is not None:
+        blocknumber = int(blocknumber)
+        feed_block = (
+            session.query(Block.number)
+            .filter(
+                Block.number == blocknumber,
+                Block.blockhash == blockhash.decode("utf-8"),
+            )
+            .first()
+        )
+        if feed_block is None:
+            logger.info(
+                f"index_feeds.py | Block {blocknumber} was reverted, dropping feeds"
+            )
+            invalidate_all_feeds(redis)
+        elif latest_block.number - blocknumber > MAX_BLOCK_LAG:
+            logger.info(
+                f"index_feeds.py | {latest_block.number - blocknumber} blocks behind, dropping feeds"
+            )
+            invalidate_all_feeds(redis)
+        elif latest_block.number > blocknumber:
+            fan_out_feeds(session, redis, blocknumber, latest_block.number)
+
+    redis.set(feed_blocknumber_redis_key, latest_block.number)
+    redis.set(feed_blockhash_redis_key, latest_block.blockhash)
+
+    for user_id in pop_feed_warmups(redis, WARMUPS_PER_RUN):
+        build_stored_feed(
+            session, redis, user_id, get_followee_user_ids(session, user_id)
+        )
+
+
+######## CELERY TASKS ########
+@celery.task(name="index_feeds", bind=True)
+def index_feeds(self):
+    # Cache custom task class properties
+    # Details regarding custom task context can be found in wiki
+    # Custom Task definition can be found in src/app.py
+    db = index_feeds.db
+    redis = index_feeds.redis
+    if not is_feed_store_enabled():
+        return
+    # Define lock acquired boolean
+    have_lock = False
+    # Define redis lock object
+    update_lock = redis.lock("index_feeds_lock", timeout=60 * 10)
+    try:
+        # Attempt to acquire lock - do not block if unable to acquire
+        have_lock = update_lock.acquire(blocking=False)
+        if have_lock:
+            with db.scoped_session() as session:
+                update_feeds(session, redis)
+        else:
+            logger.info("index_feeds.py | Failed to acquire index_feeds_lock")
+    except Exception as e:
+        logger.error("index_feeds.py | Fatal error in main loop", exc_info=True)
+        raise e
+    finally:
+        if have_lock:
+            update_lock.release()
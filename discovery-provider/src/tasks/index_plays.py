@@ -1,216 +1,259 @@
+import csv
+import datetime
+import io
+import json
 import logging
 import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
 from urllib.parse import urljoin
-import datetime
-import requests
+
 import dateutil.parser
-from sqlalchemy import func, desc, or_, and_
+import requests
+from sqlalchemy import desc, text
+from sqlalchemy.orm.session import Session
 from src.models import Play
 from src.tasks.celery_app import celery
+from src.utils.redis_constants import (
+    index_plays_last_completion_redis_key,
+    index_plays_last_run_timings_redis_key,
+)
 
 logger = logging.getLogger(__name__)
 
 # The number of listens to get per request to identity
 REQUEST_LISTENS_LIMIT = 5000
 
+# Maximum number of seconds a run pages through the identity listens, well within
+# the lock's timeout. The next run continues from the last play inserted.
+MAX_SYNC_SECONDS = 5 * 60
+
 # The name of the job to be printed w/ each log
 JOB = "index-plays"
 
+# Key of a listen, (track_id, user_id, None) for a user's listens of a track or
+# (track_id, None, hour) for the anonymous listens of a track in an hour
+ListenKey = Tuple[int, Optional[int], Optional[datetime.datetime]]
+
 
 def get_time_diff(previous_time):
     # Returns the time difference in milliseconds
     return int((time.time() - previous_time) * 1000)
 
 
+def get_most_recent_play_date(session: Session) -> float:
+    """Returns the updated_at of the latest identity play in the db as a timestamp"""
+    most_recent_play_date = (
+        session.query(Play.updated_at)
+        .filter(Play.signature == None)
+        .order_by(desc(Play.updated_at), desc(Play.id))
+        .first()
+    )
+    if most_recent_play_date is None or most_recent_play_date[0] is None:
+        # Make the date way back in the past to get the first play count onwards
+        return datetime.datetime(2000, 1, 1, 0, 0).timestamp()
+    return most_recent_play_date[0].timestamp()
+
+
+def get_identity_listens(identity_url: str, start_time: float) -> List[Dict]:
+    """Returns a page of the listens updated since `start_time` from identity"""
+    identity_tracks_endpoint = urljoin(identity_url, "listens/bulk")
+    params = {"startTime": start_time, "limit": REQUEST_LISTENS_LIMIT}
+    resp = requests.get(identity_tracks_endpoint, params=params)
+    return resp.json().get("listens", [])
+
+
+def get_listen_key(listen: Dict) -> ListenKey:
+    if "userId" in listen and listen["userId"] != None:
+        return (listen["trackId"], listen["userId"], None)
+    # Since, the anonymous plays are stored by hour,
+    # count all plays in the listen's hour for this track
+    current_hour = dateutil.parser.parse(listen["createdAt"]).replace(
+        microsecond=0, second=0, minute=0, tzinfo=None
+    )
+    return (listen["trackId"], None, current_hour)
+
+
+def copy_rows(session: Session, table: str, columns: List[str], rows):
+    """Loads `rows` into `table` of the session's transaction with COPY"""
+    buffer = io.StringIO()
+    # Empty unquoted CSV values are copied as NULL
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    cursor = session.connection().connection.cursor()
+    cursor.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer
+    )
+
+
+def get_existing_play_counts(
+    session: Session, listen_keys: List[ListenKey]
+) -> Dict[ListenKey, int]:
+    """
+    Returns the number of plays in the db for each listen key, loading the keys
+    into a temporary table joined against the plays once
+    """
+    session.execute(
+        text(
+            """
+            CREATE TEMPORARY TABLE identity_listens (
+                track_id integer NOT NULL,
+                user_id integer,
+                hour timestamp
+            )
+            """
+        )
+    )
+    copy_rows(
+        session,
+        "identity_listens",
+        ["track_id", "user_id", "hour"],
+        listen_keys,
+    )
+    # Temporary tables aren't analyzed automatically
+    session.execute(text("ANALYZE identity_listens"))
+    play_counts = session.execute(
+        text(
+            """
+            SELECT l.track_id, l.user_id, NULL::timestamp AS hour, count(*)
+            FROM (
+                SELECT DISTINCT track_id, user_id
+                FROM identity_listens
+                WHERE user_id IS NOT NULL
+            ) l
+            JOIN plays p ON p.play_item_id = l.track_id AND p.user_id = l.user_id
+            GROUP BY l.track_id, l.user_id
+            UNION ALL
+            SELECT l.track_id, NULL::integer AS user_id, l.hour, count(*)
+            FROM (
+                SELECT DISTINCT track_id, hour
+                FROM identity_listens
+                WHERE user_id IS NULL
+            ) l
+            JOIN plays p
+                ON p.play_item_id = l.track_id
+                AND p.user_id IS NULL
+                AND p.created_at = l.hour
+            GROUP BY l.track_id, l.hour
+            """
+        )
+    ).fetchall()
+    session.execute(text("DROP TABLE identity_listens"))
+    return {
+        (track_id, user_id, hour): count
+        for track_id, user_id, hour, count in play_counts
+    }
+
+
+def insert_listens(session: Session, listens: List[Dict], timings: Dict[str, int]):
+    """
+    Inserts a play for each listen counted by identity and not yet in the db,
+    the difference of the identity play count minus the existing plays.
+
+    Returns the number of plays inserted, adding the time of each phase to `timings`
+    """
+    if not listens:
+        return 0
+
+    listens_query_time = time.time()
+    listen_keys = [get_listen_key(listen) for listen in listens]
+    existing_play_counts = get_existing_play_counts(session, listen_keys)
+    timings["listens_query_time"] += get_time_diff(listens_query_time)
+
+    build_insert_query_time = time.time()
+    plays = []
+    for listen, listen_key in zip(listens, listen_keys):
+        new_play_count = listen["count"] - existing_play_counts.get(listen_key, 0)
+        if new_play_count > 0:
+            play = (
+                listen_key[1],
+                listen["trackId"],
+                listen["createdAt"],
+                listen["updatedAt"],
+            )
+            plays.extend([play] * new_play_count)
+    timings["build_insert_query_time"] += get_time_diff(build_insert_query_time)
+
+    insert_time = time.time()
+    if plays:
+        copy_rows(
+            session,
+            "plays",
+            ["user_id", "play_item_id", "created_at", "updated_at"],
+            plays,
+        )
+    timings["insert_time"] += get_time_diff(insert_time)
+    return len(plays)
+
+
 # Retrieve the play counts from the identity service
 # NOTE: indexing the plays will eventually be a part of `index_blocks`
 
 
-def get_track_plays(self, db, lock):
+def get_track_plays(self, db, lock, redis):
+    """
+    Pages through the listens in identity from the latest play in the db until
+    caught up, inserting the new plays of each page in its own transaction
+    """
     start_time = time.time()
     job_extra_info = {"job": JOB}
+    timings: Dict[str, int] = defaultdict(int)
+    identity_url = update_play_count.shared_config["discprov"]["identity_service_url"]
+
+    most_recent_play_date_time = time.time()
     with db.scoped_session() as session:
         # Get the most retrieved play date in the db to use as an offet for fetching
         # more play counts from identity
-        most_recent_play_date = (
-            session.query(Play.updated_at)
-            .filter(Play.signature == None)
-            .order_by(desc(Play.updated_at), desc(Play.id))
-            .first()
-        )
-        if most_recent_play_date == None:
-            # Make the date way back in the past to get the first play count onwards
-            most_recent_play_date = datetime.datetime(2000, 1, 1, 0, 0).timestamp()
-        else:
-            most_recent_play_date = most_recent_play_date[0].timestamp()
+        listens_start_time = get_most_recent_play_date(session)
+    timings["most_recent_play_date"] = get_time_diff(most_recent_play_date_time)
 
-        job_extra_info["most_recent_play_date"] = get_time_diff(start_time)
-
-        # Create and query identity service endpoint for track play counts
-        identity_url = update_play_count.shared_config["discprov"][
-            "identity_service_url"
-        ]
-        params = {"startTime": most_recent_play_date, "limit": REQUEST_LISTENS_LIMIT}
-        identity_tracks_endpoint = urljoin(identity_url, "listens/bulk")
-
-        track_listens = {}
+    num_pages = 0
+    num_listens = 0
+    num_plays = 0
+    has_lock = lock.owned()
+    while has_lock and time.time() - start_time < MAX_SYNC_SECONDS:
         try:
             identity_response_time = time.time()
-            resp = requests.get(identity_tracks_endpoint, params=params)
-            track_listens = resp.json()
-            job_extra_info["identity_response_time"] = get_time_diff(
-                identity_response_time
-            )
+            listens = get_identity_listens(identity_url, listens_start_time)
+            timings["identity_response_time"] += get_time_diff(identity_response_time)
         except Exception as e:
-            logger.error(
-                f"Error retrieving track play counts - {identity_tracks_endpoint}, {e}"
-            )
+            logger.error(f"Error retrieving track play counts - {identity_url}, {e}")
+            break
 
-        plays = []
-        user_track_listens = []
-        track_hours = []
-        # pylint: disable=W0105
-        """
-        Insert a row for each new count instance in the plays table
-        1.) Loop through the listens to build a list of user_id to track_id pairs
-        and track_id to current_hour for querying
-        2.) Query the plays table for counts for both user-tracks pairs and anonymous
-        listens of track by hour and build a dictionary for each mapping to counts
-        3.) Loop through the listens again and only insert the difference in identity
-        play count minus the existing plays in db
-        """
-        if "listens" in track_listens:
-            # 1.) Get the user_id to track_id pairs and track_id to current hr pairs
-            listens_query_building_time = time.time()
-            for listen in track_listens["listens"]:
-                if "userId" in listen and listen["userId"] != None:
-                    # Add the user_id to track_id mapping
-                    user_track_listens.append(
-                        and_(
-                            Play.play_item_id == listen["trackId"],
-                            Play.user_id == listen["userId"],
-                        )
-                    )
-                else:
-                    # Since, the anonymous plays are stored by hour,
-                    # find all plays in the last hour for this track
-                    current_hour = dateutil.parser.parse(listen["createdAt"]).replace(
-                        microsecond=0, second=0, minute=0
-                    )
-                    track_hours.append(
-                        and_(
-                            Play.user_id == None,
-                            Play.play_item_id == listen["trackId"],
-                            Play.created_at == current_hour,
-                        )
-                    )
-
-            job_extra_info["listens_query_building_time"] = get_time_diff(
-                listens_query_building_time
-            )
-            # 2.) Query the plays and build a dict
-            listens_query_time = time.time()
-
-            # Query the plays for existing user-track listens & build
-            # a dict of { '{user_id}-{track_id}' : listen_count }
-            user_track_plays_dict = {}
-            if user_track_listens:
-                user_track_play_counts = (
-                    session.query(
-                        Play.play_item_id, Play.user_id, func.count(Play.play_item_id)
-                    )
-                    .filter(or_(*user_track_listens))
-                    .group_by(Play.play_item_id, Play.user_id)
-                    .all()
-                )
-
-                user_track_plays_dict = {
-                    f"{play[0]}-{play[1]}": play[2] for play in user_track_play_counts
-                }
-
-            # Query the plays for existing anon-tracks by hour & build
-            # a dict of { '{track_id}-{timestamp}' : listen_count }
-            anon_track_plays_dict = {}
-            if track_hours:
-                track_play_counts = (
-                    session.query(
-                        Play.play_item_id,
-                        func.min(Play.created_at),
-                        func.count(Play.play_item_id),
-                    )
-                    .filter(or_(*track_hours))
-                    .group_by(Play.play_item_id)
-                    .all()
-                )
-                anon_track_plays_dict = {
-                    # pylint: disable=C0301
-                    f"{play[0]}-{play[1].replace(microsecond=0, second=0, minute=0)}": play[
-                        2
-                    ]
-                    for play in track_play_counts
-                }
-            job_extra_info["listens_query_time"] = get_time_diff(listens_query_time)
-            build_insert_query_time = time.time()
-
-            # 3.) Insert new listens - subtracting the identity listens from existsing listens
-            for listen in track_listens["listens"]:
-                if "userId" in listen and listen["userId"] != None:
-                    track_id = listen["trackId"]
-                    user_id = listen["userId"]
-                    user_track_key = f"{track_id}-{user_id}"
-                    # Get the existing listens for the track_id-user_id
-                    user_track_play_count = user_track_plays_dict.get(user_track_key, 0)
-                    new_play_count = listen["count"] - user_track_play_count
-                    if new_play_count > 0:
-                        plays.extend(
-                            [
-                                Play(
-                                    user_id=listen["userId"],
-                                    play_item_id=listen["trackId"],
-                                    updated_at=listen["updatedAt"],
-                                    created_at=listen["createdAt"],
-                                )
-                                for _ in range(new_play_count)
-                            ]
-                        )
-                else:
-                    # For anon track plays, check the current hour play counts
-                    # and only insert new plays for the difference
-                    current_hour = dateutil.parser.parse(listen["createdAt"]).replace(
-                        microsecond=0, second=0, minute=0, tzinfo=None
-                    )
-                    track_id = listen["trackId"]
-                    track_hr_key = f"{track_id}-{current_hour}"
-                    # Get the existing listens from for the track_id-curren_hr
-                    anon_hr_track_play_count = anon_track_plays_dict.get(
-                        track_hr_key, 0
-                    )
-                    new_play_count = listen["count"] - anon_hr_track_play_count
-                    if new_play_count > 0:
-                        plays.extend(
-                            [
-                                Play(
-                                    play_item_id=listen["trackId"],
-                                    updated_at=listen["updatedAt"],
-                                    created_at=listen["createdAt"],
-                                )
-                                for _ in range(new_play_count)
-                            ]
-                        )
-            job_extra_info["build_insert_query_time"] = get_time_diff(
-                build_insert_query_time
+        has_lock = lock.owned()
+        if not has_lock:
+            break
+        with db.scoped_session() as session:
+            num_plays += insert_listens(session, listens, timings)
+        num_pages += 1
+        num_listens += len(listens)
+
+        if len(listens) < REQUEST_LISTENS_LIMIT:
+            break
+        next_start_time = max(
+            dateutil.parser.parse(listen["updatedAt"]).timestamp() for listen in listens
+        )
+        if next_start_time <= listens_start_time:
+            # The whole page was updated at once, the rest is left for later runs
+            logger.warning(
+                f"index_plays.py | get_track_plays | more than {REQUEST_LISTENS_LIMIT} "
+                f"listens updated at {listens_start_time}"
             )
+            break
+        listens_start_time = next_start_time
 
-        insert_refresh_time = time.time()
-        has_lock = lock.owned()
-        if plays and has_lock:
-            session.bulk_save_objects(plays)
+    timings["total_time"] = get_time_diff(start_time)
+    redis.set(index_plays_last_run_timings_redis_key, json.dumps(timings))
+    # Only a run that synced from identity counts as completed for the health check
+    if num_pages > 0:
+        redis.set(index_plays_last_completion_redis_key, int(time.time()))
 
-        job_extra_info["has_lock"] = has_lock
-        job_extra_info["number_rows_insert"] = len(plays)
-        job_extra_info["insert_refresh_time"] = get_time_diff(insert_refresh_time)
-        job_extra_info["total_time"] = get_time_diff(start_time)
-        logger.info("index_plays.py | update_play_count complete", extra=job_extra_info)
+    job_extra_info.update(timings)
+    job_extra_info["has_lock"] = has_lock
+    job_extra_info["number_pages"] = num_pages
+    job_extra_info["number_listens"] = num_listens
+    job_extra_info["number_rows_insert"] = num_plays
+    logger.info("index_plays.py | update_play_count complete", extra=job_extra_info)
 
 
 ######## CELERY TASK ########
@@ -231,7 +274,7 @@ def update_play_count(self):
         # Attempt to acquire lock - do not block if unable to acquire
         have_lock = update_lock.acquire(blocking=False)
         if have_lock:
-            get_track_plays(self, db, update_lock)
+            get_track_plays(self, db, update_lock, redis)
         else:
             logger.error(
                 f"index_plays.py | update_play_count | {self.request.id} | Failed to acquire update_play_count_lock",
@@ -1,14 +1,22 @@
 import logging
+import time
 from typing import Union
 
 from redis import Redis
-from src.queries.get_related_artists import update_related_artist_scores_if_needed
+from src.queries.get_related_artists import (
+    calculate_all_related_artists,
+    update_related_artist_scores_if_needed,
+)
 from src.tasks.celery_app import celery
 from src.utils.session_manager import SessionManager
 
 logger = logging.getLogger(__name__)
 
 INDEX_RELATED_ARTIST_REDIS_QUEUE = "related-artists-calculation-queue"
+# Timestamp of the last completed batch calculation of every user's related artists
+CALCULATE_RELATED_ARTISTS_COMPLETED_KEY = "related-artists-calculation-completed-at"
+# How often every user's related artists are recalculated
+CALCULATE_RELATED_ARTISTS_INTERVAL_SEC = 24 * 60 * 60
 
 
 def queue_related_artist_calculation(redis: Redis, user_id: int):
@@ -60,3 +68,40 @@ def index_related_artists(self):
     finally:
         if have_lock:
             update_lock.release()
+
+
+def calculate_related_artists_if_needed(db: SessionManager, redis: Redis):
+    completed_at = redis.get(CALCULATE_RELATED_ARTISTS_COMPLETED_KEY)
+    if (
+        completed_at
+        and time.time() - float(completed_at) < CALCULATE_RELATED_ARTISTS_INTERVAL_SEC
+    ):
+        return
+    updated_count = calculate_all_related_artists(db)
+    redis.set(CALCULATE_RELATED_ARTISTS_COMPLETED_KEY, time.time())
+    logger.info(
+        f"index_related_artists.py | Calculated related artists for {updated_count} users"
+    )
+
+
+@celery.task(name="calculate_related_artists", bind=True)
+def calculate_related_artists(self):
+    redis = calculate_related_artists.redis
+    db = calculate_related_artists.db
+    have_lock = False
+    # Shares the queue's lock so the two never write the same user's rows at once
+    update_lock = redis.lock("related_artists_lock", timeout=6 * 3600)
+    try:
+        have_lock = update_lock.acquire(blocking=False)
+        if have_lock:
+            calculate_related_artists_if_needed(db, redis)
+        else:
+            logger.info("index_related_artists.py | Failed to acquire lock")
+    except Exception as e:
+        logger.error(
+            "index_related_artists.py | Fatal error in batch calculation", exc_info=True
+        )
+        raise e
+    finally:
+        if have_lock:
+            update_lock.release()
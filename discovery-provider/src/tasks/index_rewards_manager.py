@@ -1,7 +1,7 @@
 import concurrent.futures
 import logging
 import time
-from typing import Callable, List, TypedDict, Optional
+from typing import List, Set, TypedDict, Optional
 from sqlalchemy import desc
 from sqlalchemy.orm.session import Session
 import base58
@@ -11,6 +11,7 @@ from src.tasks.celery_app import celery
 from src.utils.config import shared_config
 from src.utils.session_manager import SessionManager
 from src.solana.solana_client_manager import SolanaClientManager
+from src.solana.solana_history_walker import SolanaHistoryWalker
 from src.solana.solana_transaction_types import (
     ResultMeta,
     TransactionMessage,
@@ -29,12 +30,9 @@ REWARDS_MANAGER_PROGRAM = shared_config["solana"]["rewards_manager_program_addre
 REWARDS_MANAGER_ACCOUNT = shared_config["solana"]["rewards_manager_account"]
 MIN_SLOT = int(shared_config["solana"]["rewards_manager_min_slot"])
 
-# Maximum number of batches to process at once
+# Maximum number of batches to process per run
 TX_SIGNATURES_MAX_BATCHES = 20
 
-# Last N entries present in tx_signatures array during processing
-TX_SIGNATURES_RESIZE_LENGTH = 10
-
 
 def check_valid_rewards_manager_program():
     try:
@@ -145,17 +143,18 @@ class RewardTransferInstruction(TypedDict):
 
 
 def fetch_and_parse_sol_rewards_transfer_instruction(
-    solana_client_manager: SolanaClientManager, tx_sig: str
+    solana_client_manager: SolanaClientManager, tx_sig: str, tx_info=None
 ) -> Optional[RewardTransferInstruction]:
     """Fetches metadata for rewards transfer transactions and parses data
 
-    Fetches the transaction metadata from solana using the tx signature
+    Fetches the transaction metadata from solana using the tx signature, unless given
     Checks the metadata for a transfer instruction
     Decodes and parses the transfer instruction metadata
     Validates the metadata fields
     """
     try:
-        tx_info = solana_client_manager.get_sol_tx_info(tx_sig)
+        if tx_info is None:
+            tx_info = solana_client_manager.get_sol_tx_info(tx_sig)
         result: TransactionInfoResult = tx_info["result"]
         meta = result["meta"]
         if meta["err"]:
@@ -268,108 +267,29 @@ def get_latest_reward_disbursment_slot(session: Session):
     return latest_slot
 
 
-def get_tx_in_db(session: Session, tx_sig: str) -> bool:
-    """Checks if the transaction signature already exists for Challenge Disburements"""
-    tx_sig_db_count = (
-        session.query(ChallengeDisbursement).filter(
-            ChallengeDisbursement.signature == tx_sig
+def get_tx_sigs_in_db(session: Session, tx_sigs: List[str]) -> Set[str]:
+    """Returns the transaction signatures that already exist for Challenge Disbursements"""
+    return {
+        tx_sig
+        for (tx_sig,) in session.query(ChallengeDisbursement.signature).filter(
+            ChallengeDisbursement.signature.in_(tx_sigs)
         )
-    ).count()
-    exists = tx_sig_db_count > 0
-    return exists
-
-
-def get_transaction_signatures(
-    solana_client_manager: SolanaClientManager,
-    db: SessionManager,
-    program: str,
-    get_latest_slot: Callable[[Session], int],
-    check_tx_exists: Callable[[Session, str], bool],
-    min_slot=None,
-):
-    """Fetches next batch of transaction signature offset from the previous latest processed slot
-
-    Fetches the latest processed slot for the rewards manager program
-    Iterates backwards from the current tx until an intersection is found with the latest processed slot
-    Returns the next set of transaction signature from the current offset slot to process
-    """
-    # List of signatures that will be populated as we traverse recent operations
-    transaction_signatures = []
-
-    last_tx_signature = None
-
-    # Loop exit condition
-    intersection_found = False
+    }
 
-    # Query for solana transactions until an intersection is found
-    with db.scoped_session() as session:
-        latest_processed_slot = get_latest_slot(session)
-        while not intersection_found:
-            transactions_history = (
-                solana_client_manager.get_confirmed_signature_for_address2(
-                    program, before=last_tx_signature, limit=100
-                )
-            )
 
-            transactions_array = transactions_history["result"]
-            if not transactions_array:
-                intersection_found = True
-                logger.info(
-                    f"index_rewards_manager.py | No transactions found before {last_tx_signature}"
-                )
-            else:
-                # Current batch of transactions
-                transaction_signature_batch = []
-                for tx_info in transactions_array:
-                    tx_sig = tx_info["signature"]
-                    tx_slot = tx_info["slot"]
-                    logger.info(
-                        f"index_rewards_manager.py | Processing tx={tx_sig} | slot={tx_slot}"
-                    )
-                    if tx_info["slot"] > latest_processed_slot:
-                        transaction_signature_batch.append(tx_sig)
-                    elif tx_info["slot"] <= latest_processed_slot and (
-                        min_slot is None or tx_info["slot"] > min_slot
-                    ):
-                        # Check the tx signature for any txs in the latest batch,
-                        # and if not present in DB, add to processing
-                        logger.info(
-                            f"index_rewards_manager.py | Latest slot re-traversal\
-                            slot={tx_slot}, sig={tx_sig},\
-                            latest_processed_slot(db)={latest_processed_slot}"
-                        )
-                        exists = check_tx_exists(session, tx_sig)
-                        if exists:
-                            intersection_found = True
-                            break
-                        # Ensure this transaction is still processed
-                        transaction_signature_batch.append(tx_sig)
-
-                # Restart processing at the end of this transaction signature batch
-                last_tx = transactions_array[-1]
-                last_tx_signature = last_tx["signature"]
-
-                # Append batch of processed signatures
-                if transaction_signature_batch:
-                    transaction_signatures.append(transaction_signature_batch)
-
-                # Ensure processing does not grow unbounded
-                if len(transaction_signatures) > TX_SIGNATURES_MAX_BATCHES:
-                    # Only take the oldest transaction from the transaction_signatures array
-                    # transaction_signatures is sorted from newest to oldest
-                    transaction_signatures = transaction_signatures[
-                        -TX_SIGNATURES_RESIZE_LENGTH:
-                    ]
-
-    # Reverse batches aggregated so oldest transactions are processed first
-    transaction_signatures.reverse()
-    return transaction_signatures
+rewards_manager_history = SolanaHistoryWalker(
+    "rewards_manager",
+    REWARDS_MANAGER_PROGRAM,
+    get_latest_reward_disbursment_slot,
+    get_tx_sigs_in_db,
+    MIN_SLOT,
+)
 
 
 def process_transaction_signatures(
     solana_client_manager: SolanaClientManager,
     db: SessionManager,
-    transaction_signatures: List[str],
+    transaction_signatures: List[List[str]],
 ):
     """Concurrently processes the transactions to update the DB state for reward transfer instructions"""
     for tx_sig_batch in transaction_signatures:
@@ -377,6 +297,9 @@ def process_transaction_signatures(
         batch_start_time = time.time()
 
         transfer_instructions: List[RewardTransferInstruction] = []
+        # Fetch the batch's transactions together, those not fetched are fetched one
+        # at a time while parsing
+        tx_infos = solana_client_manager.get_sol_tx_infos(tx_sig_batch)
         # Process each batch in parallel
         with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
             parse_sol_tx_futures = {
@@ -384,6 +307,7 @@ def process_transaction_signatures(
                     fetch_and_parse_sol_rewards_transfer_instruction,
                     solana_client_manager,
                     tx_sig,
+                    tx_infos.get(tx_sig),
                 ): tx_sig
                 for tx_sig in tx_sig_batch
             }
@@ -408,7 +332,7 @@ def process_transaction_signatures(
 
 
 def process_solana_rewards_manager(
-    solana_client_manager: SolanaClientManager, db: SessionManager
+    solana_client_manager: SolanaClientManager, db: SessionManager, redis
 ):
     """Fetches the next set of reward manager transactions and updates the DB with Challenge Disbursements"""
     if not is_valid_rewards_manager_program:
@@ -419,18 +343,15 @@ def process_solana_rewards_manager(
     if not REWARDS_MANAGER_ACCOUNT:
         logger.error("index_rewards_manager.py | reward manager account missing")
         return
-    # List of signatures that will be populated as we traverse recent operations
-    transaction_signatures = get_transaction_signatures(
+    rewards_manager_history.run(
         solana_client_manager,
         db,
-        REWARDS_MANAGER_PROGRAM,
-        get_latest_reward_disbursment_slot,
-        get_tx_in_db,
-        MIN_SLOT,
+        redis,
+        lambda tx_sig_batch: process_transaction_signatures(
+            solana_client_manager, db, [tx_sig_batch]
+        ),
+        max_batches=TX_SIGNATURES_MAX_BATCHES,
     )
-    logger.info(f"index_rewards_manager.py | {transaction_signatures}")
-
-    process_transaction_signatures(solana_client_manager, db, transaction_signatures)
 
 
 ######## CELERY TASKS ########
@@ -450,7 +371,7 @@ def index_rewards_manager(self):
         have_lock = update_lock.acquire(blocking=False)
         if have_lock:
             logger.info("index_rewards_manager.py | Acquired lock")
-            process_solana_rewards_manager(solana_client_manager, db)
+            process_solana_rewards_manager(solana_client_manager, db, redis)
         else:
             logger.info("index_rewards_manager.py | Failed to acquire lock")
     except Exception as e:
@@ -0,0 +1,68 @@
+import logging
+import time
+from src.tasks.celery_app import celery
+from src.tasks.search_dicts import SEARCH_DICTS, compact_search_dicts
+
+logger = logging.getLogger(__name__)
+
+# Vacuum can't happen inside a db txn, so we have to acquire
+# a new connection and set it's isolation level to AUTOCOMMIT
+# as per: https://stackoverflow.com/questions/1017463/postgresql-how-to-run-vacuum-from-code-outside-transaction-block
+# (note that connections have their isolation level wiped before being returned
+# to the conn pool: https://docs.sqlalchemy.org/en/14/core/connections.html
+def vacuum_search_dicts(db):
+    logger.info("index_search_dicts.py | Beginning vacuum")
+    vacuum_start = time.time()
+
+    engine = db._engine
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        for table_name in SEARCH_DICTS:
+            connection.execute(f"VACUUM ANALYZE {table_name}")
+
+    logger.info(
+        f"index_search_dicts.py | vacuumed in {time.time() - vacuum_start} sec."
+    )
+
+
+def compact(self, db):
+    # The search dictionaries are kept up to date by the indexer as blocks are
+    # processed, so only the denormalized counts need to be reconciled here
+    start_time = time.time()
+    with db.scoped_session() as session:
+        logger.info("index_search_dicts.py | Compacting search dicts")
+        compact_search_dicts(session)
+
+    vacuum_search_dicts(db)
+
+    logger.info(
+        f"index_search_dicts.py | Finished compacting search dicts in: {time.time() - start_time} sec."
+    )
+
+
+######## CELERY TASKS ########
+@celery.task(name="compact_search_dicts", bind=True)
+def compact_search_dicts_task(self):
+    # Cache custom task class properties
+    # Details regarding custom task context can be found in wiki
+    # Custom Task definition can be found in src/app.py
+    db = compact_search_dicts_task.db
+    redis = compact_search_dicts_task.redis
+    # Define lock acquired boolean
+    have_lock = False
+    # Define redis lock object
+    update_lock = redis.lock("compact_search_dicts_lock", timeout=60 * 10)
+    try:
+        # Attempt to acquire lock - do not block if unable to acquire
+        have_lock = update_lock.acquire(blocking=False)
+        if have_lock:
+            compact(self, db)
+        else:
+            logger.info(
+                "index_search_dicts.py | Failed to acquire compact_search_dicts_lock"
+            )
+    except Exception as e:
+        logger.error("index_search_dicts.py | Fatal error in main loop", exc_info=True)
+        raise e
+    finally:
+        if have_lock:
+            update_lock.release()
@@ -0,0 +1,156 @@
+import logging
+import time
+
+from sqlalchemy import text
+from src.models import Block
+from src.tasks.celery_app import celery
+from src.utils.social_graph import (
+    get_social_graph_paths,
+    load_social_graph,
+    write_base_snapshot,
+    write_delta_snapshot,
+)
+
+logger = logging.getLogger(__name__)
+
+# How often the base snapshot is rebuilt from the follows table
+FULL_REBUILD_INTERVAL_SEC = 24 * 60 * 60
+
+# The base snapshot is rebuilt once the delta grows past this many follows
+MAX_DELTA_FOLLOWS = 200000
+
+
+def _stream_current_follows(session, order_by):
+    # Server side cursor so the follows aren't all held in memory at once
+    connection = session.connection().execution_options(stream_results=True)
+    rows = connection.execute(
+        text(
+            f"""
+            SELECT follower_user_id, followee_user_id FROM follows
+            WHERE is_current = true AND is_delete = false
+            ORDER BY {order_by}
+            """
+        )
+    )
+    for row in rows:
+        yield row[0], row[1]
+
+
+def _stream_reversed(pairs):
+    for follower_user_id, followee_user_id in pairs:
+        yield followee_user_id, follower_user_id
+
+
+def rebuild_social_graph(session, base_path, delta_path, latest_block):
+    start_time = time.time()
+    write_base_snapshot(
+        base_path,
+        _stream_current_follows(session, "follower_user_id, followee_user_id"),
+        _stream_reversed(
+            _stream_current_follows(session, "followee_user_id, follower_user_id")
+        ),
+        built_at=start_time,
+        blocknumber=latest_block.number,
+        blockhash=latest_block.blockhash,
+    )
+    write_delta_snapshot(
+        delta_path,
+        {},
+        base_built_at=start_time,
+        blocknumber=latest_block.number,
+        blockhash=latest_block.blockhash,
+        updated_at=start_time,
+    )
+    logger.info(
+        f"index_social_graph.py | Rebuilt social graph at block {latest_block.number} "
+        f"in {time.time() - start_time} sec."
+    )
+
+
+def update_social_graph(session, base_path, delta_path):
+    """
+    Brings the social graph snapshot up to date with the indexed blocks.
+
+    The follows indexed since the snapshot are folded into its delta. The base
+    is rebuilt when there is none, when it is old or the delta too large, or when
+    the block it was last updated at has been reverted.
+    """
+    latest_block = session.query(Block).filter(Block.is_current == True).first()
+    if latest_block is None:
+        return
+
+    graph = load_social_graph(base_path, delta_path)
+    if graph is None or time.time() - graph.built_at > FULL_REBUILD_INTERVAL_SEC:
+        rebuild_social_graph(session, base_path, delta_path, latest_block)
+        return
+
+    graph_block = (
+        session.query(Block.number)
+        .filter(Block.number == graph.blocknumber, Block.blockhash == graph.blockhash)
+        .first()
+    )
+    if graph_block is None:
+        logger.info(
+            f"index_social_graph.py | Block {graph.blocknumber} was reverted, rebuilding"
+        )
+        rebuild_social_graph(session, base_path, delta_path, latest_block)
+        return
+
+    changes = graph.delta_changes()
+    follows = session.execute(
+        """
+        SELECT follower_user_id, followee_user_id, is_delete FROM follows
+        WHERE is_current = true
+        AND blocknumber > :from_blocknumber AND blocknumber <= :to_blocknumber
+        """,
+        {
+            "from_blocknumber": graph.blocknumber,
+            "to_blocknumber": latest_block.number,
+        },
+    ).fetchall()
+    for follower_user_id, followee_user_id, is_delete in follows:
+        changes[(follower_user_id, followee_user_id)] = not is_delete
+
+    if len(changes) > MAX_DELTA_FOLLOWS:
+        rebuild_social_graph(session, base_path, delta_path, latest_block)
+        return
+
+    write_delta_snapshot(
+        delta_path,
+        changes,
+        base_built_at=graph.built_at,
+        blocknumber=latest_block.number,
+        blockhash=latest_block.blockhash,
+        updated_at=time.time(),
+    )
+
+
+######## CELERY TASKS ########
+@celery.task(name="index_social_graph", bind=True)
+def index_social_graph(self):
+    # Cache custom task class properties
+    # Details regarding custom task context can be found in wiki
+    # Custom Task definition can be found in src/app.py
+    db = index_social_graph.db
+    redis = index_social_graph.redis
+    # Define lock acquired boolean
+    have_lock = False
+    # Define redis lock object
+    update_lock = redis.lock("index_social_graph_lock", timeout=60 * 30)
+    try:
+        # Attempt to acquire lock - do not block if unable to acquire
+        have_lock = update_lock.acquire(blocking=False)
+        if have_lock:
+            base_path, delta_path = get_social_graph_paths()
+            with db.scoped_session() as session:
+                update_social_graph(session, base_path, delta_path)
+        else:
+            logger.info(
+                "index_social_graph.py | Failed to acquire index_social_graph_lock"
+            )
+    except Exception as e:
+        logger.error("index_social_graph.py | Fatal error in main loop", exc_info=True)
+        raise e
+    finally:
+        if have_lock:
+            update_lock.release()
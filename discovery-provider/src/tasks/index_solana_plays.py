@@ -3,7 +3,7 @@ import datetime
 import logging
 import time
 
-from typing import Union, Tuple
+from typing import Dict, List, Set, Union, Tuple
 
 import base58
 from sqlalchemy import desc
@@ -17,17 +17,16 @@ from src.utils.config import shared_config
 from src.utils.redis_cache import pickle_and_set
 from src.utils.redis_constants import latest_sol_play_tx_key
 from src.solana.solana_client_manager import SolanaClientManager
+from src.solana.solana_history_walker import SolanaHistoryWalker
+from src.utils.session_manager import SessionManager
 
 TRACK_LISTEN_PROGRAM = shared_config["solana"]["track_listen_count_address"]
 SIGNER_GROUP = shared_config["solana"]["signer_group_address"]
 SECP_PROGRAM = "KeccakSecp256k11111111111111111111111111111"
 
-# Maximum number of batches to process at once
+# Maximum number of batches to process per run
 TX_SIGNATURES_MAX_BATCHES = 20
 
-# Last N entries present in tx_signatures array during processing
-TX_SIGNATURES_RESIZE_LENGTH = 10
-
 logger = logging.getLogger(__name__)
 
 """
@@ -123,21 +122,22 @@ def is_valid_tx(account_keys):
 
 
 def parse_sol_play_transaction(
-    session: Session, solana_client_manager: SolanaClientManager, tx_sig
-):
+    solana_client_manager: SolanaClientManager, tx_sig, tx_info=None
+) -> List[Dict]:
+    """Returns the plays recorded by a transaction, as rows of the plays table"""
     try:
-        tx_info = solana_client_manager.get_sol_tx_info(tx_sig)
+        if tx_info is None:
+            tx_info = solana_client_manager.get_sol_tx_info(tx_sig)
         logger.info(f"index_solana_plays.py | Got transaction: {tx_sig} | {tx_info}")
         meta = tx_info["result"]["meta"]
         error = meta["err"]
 
-        challenge_bus = index_solana_plays.challenge_event_bus
-
+        plays: List[Dict] = []
         if error:
             logger.info(
                 f"index_solana_plays.py | Skipping error transaction from chain {tx_info}"
             )
-            return
+            return plays
         if is_valid_tx(tx_info["result"]["transaction"]["message"]["accountKeys"]):
             audius_program_index = tx_info["result"]["transaction"]["message"][
                 "accountKeys"
@@ -162,30 +162,21 @@ def parse_sol_play_transaction(
                         f"sig: {tx_sig}"
                     )
 
-                    session.add(
-                        Play(
-                            user_id=user_id,
-                            play_item_id=track_id,
-                            created_at=created_at,
-                            source=source,
-                            slot=tx_slot,
-                            signature=tx_sig,
-                        )
+                    plays.append(
+                        {
+                            "user_id": user_id,
+                            "play_item_id": track_id,
+                            "created_at": created_at,
+                            "source": source,
+                            "slot": tx_slot,
+                            "signature": tx_sig,
+                        }
                     )
-
-                    # Only enqueue a challenge event if it's *not*
-                    # an anonymous listen
-                    if user_id is not None:
-                        challenge_bus.dispatch(
-                            ChallengeEvent.track_listen,
-                            tx_slot,
-                            user_id,
-                            {"created_at": created_at.timestamp()},
-                        )
         else:
             logger.info(
                 f"index_solana_plays.py | tx={tx_sig} Failed to find SECP_PROGRAM"
             )
+        return plays
     except Exception as e:
         logger.error(
             f"index_solana_plays.py | Error processing {tx_sig}, {e}", exc_info=True
@@ -193,19 +184,46 @@ def parse_sol_play_transaction(
         raise e
 
 
+def insert_plays(session: Session, plays: List[Dict]) -> List[Dict]:
+    """Inserts the plays of transactions not yet indexed in a single statement.
+    Returns the plays inserted."""
+    existing_tx_sigs = get_tx_sigs_in_db(
+        session, list({play["signature"] for play in plays})
+    )
+    new_plays = sorted(
+        (play for play in plays if play["signature"] not in existing_tx_sigs),
+        key=lambda play: (play["slot"], play["signature"]),
+    )
+    if new_plays:
+        session.execute(Play.__table__.insert().values(new_plays))
+    return new_plays
+
+
+def dispatch_play_challenge_events(challenge_bus: ChallengeEventBus, plays: List[Dict]):
+    for play in plays:
+        # Only enqueue a challenge event if it's *not*
+        # an anonymous listen
+        if play["user_id"] is not None:
+            challenge_bus.dispatch(
+                ChallengeEvent.track_listen,
+                play["slot"],
+                play["user_id"],
+                {"created_at": play["created_at"].timestamp()},
+            )
+
+
 # Query the highest traversed solana slot
-def get_latest_slot(db):
+def get_latest_slot(session: Session):
     latest_slot = None
-    with db.scoped_session() as session:
-        highest_slot_query = (
-            session.query(Play)
-            .filter(Play.slot != None)
-            .filter(Play.signature != None)
-            .order_by(desc(Play.slot))
-        ).first()
-        # Can be None prior to first write operations
-        if highest_slot_query is not None:
-            latest_slot = highest_slot_query.slot
+    highest_slot_query = (
+        session.query(Play.slot)
+        .filter(Play.slot != None)
+        .filter(Play.signature != None)
+        .order_by(desc(Play.slot))
+    ).first()
+    # Can be None prior to first write operations
+    if highest_slot_query is not None:
+        latest_slot = highest_slot_query[0]
 
     # If no slots have yet been recorded, assume all are valid
     if latest_slot is None:
@@ -215,13 +233,20 @@ def get_latest_slot(db):
     return latest_slot
 
 
-# Query a tx signature and confirm its existence
-def get_tx_in_db(session, tx_sig):
-    exists = False
-    tx_sig_db_count = (session.query(Play).filter(Play.signature == tx_sig)).count()
-    exists = tx_sig_db_count > 0
-    logger.info(f"index_solana_plays.py | {tx_sig} exists={exists}")
-    return exists
+# Query tx signatures and return those that exist
+def get_tx_sigs_in_db(session: Session, tx_sigs: List[str]) -> Set[str]:
+    if not tx_sigs:
+        return set()
+    existing_tx_sigs = {
+        tx_sig
+        for (tx_sig,) in session.query(Play.signature)
+        .filter(Play.signature.in_(tx_sigs))
+        .distinct()
+    }
+    logger.info(
+        f"index_solana_plays.py | {len(existing_tx_sigs)} of {len(tx_sigs)} txs exist"
+    )
+    return existing_tx_sigs
 
 
 # pylint: disable=W0105
@@ -235,74 +260,56 @@ be deployed exactly once to Solana in conjunction with the AudiusEthRegistry
 Each transaction here is signed by a trusted ethereum address authorized within the audius
 protocol.
 
-Monitoring the address is performed by leveraging the `get_confirmed_signature_for_address2`
-function, which accepts 'limit' and 'before' parameters which are key to the logic below.
-This function returns tx signatures processed by the programId in confirmation order,
-with the most recently confirmed returned first.
-
-For example, if there are 1000 transactions and we request with a limit of 1000, the returned
-array will have the following format:
-[1000th, 999th, ..., 3rd, 2nd, 1]
-
-This indexing logic leverages the above to monitor the 'slots' for each transaction, based on
-the highest value currently stored in the discovery database and comparing that with the slots
-of the latest returned transactions until an intersection is explicitly found between the two.
-
-In the startup case, where there are no DB records present an intersection is considered 'found'
-when there are no records remaining - indicating that we have reached the end of the transaction
-history for this particular programId.
-
-For example, given the following state:
-
-latest_processed_slot = 200 <- latest slot stored in database
-
-last_tx_signature = None <- None by design, as we must start querying the most recent chain
-transactions
-
-transactions_history = get_confirmed_signature_for_address_2(before=None) =
-[
-    sig300, slot=230,
-    sig299, slot=230
-    sig298, slot=229
-    ...
-    sig250, slot=210
-]
-Since no intersection has been found, the above is loaded as a single 'batch' into an array of
-tx_signature batches that now has the following state:
-
-tx_batches = [batch_300_to_250]
-
-Now, last_tx_signature = sig250
-transactions_history = get_confirmed_signature_for_address_2(before=None) =
-[
-    sig250, slot=210
-    sig249, slot=209
-    sig248, slot=209
-    ...
-    sig202, slot=201
-    sig201, slot=200 <-- slot intersection
-]
-
-Here, we continue storing each transaction in a new 'batch' array until a tx with a
-slot equal to the latest_processed_slot is found - in this case, 200.
-
-Additionally, once an equivalent slot is found we explicitly validate that sig201 is present in
-the local DB - if not, processing continues until an explicit signature + slot intersection is
-found or no history is remaining
-
-At this point, tx_batches = [batch_300_to_250, batch_250_to_200]
+The program's transaction history is walked by solana_plays_history, see SolanaHistoryWalker.
+New transactions are walked back from the most recently confirmed until the known history,
+then processed oldest first in batches, at most TX_SIGNATURES_MAX_BATCHES per run. Any
+transactions walked but not yet processed are kept in redis and processed by the next runs,
+so no history is lost when a run is interrupted or falls behind.
+"""
 
-tx_batches is reversed in order to apply the oldest transactions first - as follows:
+solana_plays_history = SolanaHistoryWalker(
+    "solana_plays", TRACK_LISTEN_PROGRAM, get_latest_slot, get_tx_sigs_in_db
+)
 
-tx_batches = [batch_250_to_200, batch_300_to_250]
 
-Each batch is then processed in parallel and committed to the local database.
+def process_solana_plays_batch(
+    solana_client_manager: SolanaClientManager, db: SessionManager, tx_sig_batch
+):
+    logger.info(f"index_solana_plays.py | processing {tx_sig_batch}")
+    batch_start_time = time.time()
+    # Fetch the batch's transactions together, those not fetched are fetched one
+    # at a time while parsing
+    tx_infos = solana_client_manager.get_sol_tx_infos(tx_sig_batch)
+    plays: List[Dict] = []
+    # Parse each transaction of the batch in parallel
+    with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
+        parse_sol_tx_futures = {
+            executor.submit(
+                parse_sol_play_transaction,
+                solana_client_manager,
+                tx_sig,
+                tx_infos.get(tx_sig),
+            ): tx_sig
+            for tx_sig in tx_sig_batch
+        }
+        for future in concurrent.futures.as_completed(parse_sol_tx_futures):
+            try:
+                plays.extend(future.result())
+            except Exception as exc:
+                logger.error(f"index_solana_plays.py | {exc}")
+                raise exc
+
+    # Insert the batch's plays in one transaction
+    with db.scoped_session() as session:
+        new_plays = insert_plays(session, plays)
+    challenge_bus: ChallengeEventBus = index_solana_plays.challenge_event_bus
+    dispatch_play_challenge_events(challenge_bus, new_plays)
 
-It is important to note that we also limit the maximum size of tx_batches to ensure that this array
-does not grow unbounded over time and new discovery providers are able to safely recover all information.
-This is performed by simply slicing the tx_batches array and discarding the newest transactions until an intersection
-is found - these limiting parameters are defined as TX_SIGNATURES_MAX_BATCHES, TX_SIGNATURES_RESIZE_LENGTH
-"""
+    batch_end_time = time.time()
+    batch_duration = batch_end_time - batch_start_time
+    logger.info(
+        f"index_solana_plays.py | processed batch {len(tx_sig_batch)} txs, {len(new_plays)} plays in {batch_duration}s"
+    )
 
 
 def process_solana_plays(solana_client_manager: SolanaClientManager, redis):
@@ -317,138 +324,18 @@ def process_solana_plays(solana_client_manager: SolanaClientManager, redis):
 
     db = index_solana_plays.db
 
-    # Highest currently processed slot in the DB
-    latest_processed_slot = get_latest_slot(db)
-    logger.info(f"index_solana_plays.py | latest used slot: {latest_processed_slot}")
-
-    # Loop exit condition
-    intersection_found = False
-
-    # List of signatures that will be populated as we traverse recent operations
-    transaction_signatures = []
-
-    # Current batch of transactions
-    transaction_signature_batch = []
-
-    last_tx_signature = None
-
-    # Current batch
-    page_count = 0
-
-    # Traverse recent records until an intersection is found with existing Plays table
-    while not intersection_found:
-        transactions_history = (
-            solana_client_manager.get_confirmed_signature_for_address2(
-                TRACK_LISTEN_PROGRAM, before=last_tx_signature, limit=100
-            )
-        )
-        transactions_array = transactions_history["result"]
-        if not transactions_array:
-            # This is considered an 'intersection' since there are no further transactions to process but
-            # really represents the end of known history for this ProgramId
-            intersection_found = True
-            logger.info(
-                f"index_solana_plays.py | No transactions found before {last_tx_signature}"
-            )
-        else:
-            # Cache latest transaction from chain
-            if page_count == 0:
-                cache_latest_tx_redis(redis, transactions_array[0])
-            with db.scoped_session() as read_session:
-                for tx in transactions_array:
-                    tx_sig = tx["signature"]
-                    tx_slot = tx["slot"]
-                    logger.info(
-                        f"index_solana_plays.py | Processing tx, sig={tx_sig} slot={tx_slot}"
-                    )
-                    if tx["slot"] > latest_processed_slot:
-                        transaction_signature_batch.append(tx_sig)
-                    elif tx["slot"] <= latest_processed_slot:
-                        # Check the tx signature for any txs in the latest batch,
-                        # and if not present in DB, add to processing
-                        logger.info(
-                            f"index_solana_plays.py | Latest slot re-traversal\
-    slot={tx_slot}, sig={tx_sig},\
-    latest_processed_slot(db)={latest_processed_slot}"
-                        )
-                        exists = get_tx_in_db(read_session, tx_sig)
-                        if exists:
-                            # Exit loop and set terminal condition since this tx has been found in DB
-                            # Transactions are returned with most recently committed first, so we can assume
-                            # subsequent transactions in this batch have already been processed
-                            intersection_found = True
-                            break
-                        # Otherwise, ensure this transaction is still processed
-                        transaction_signature_batch.append(tx_sig)
-                # Restart processing at the end of this transaction signature batch
-                last_tx = transactions_array[-1]
-                last_tx_signature = last_tx["signature"]
-                # Append batch of processed signatures
-                if transaction_signature_batch:
-                    transaction_signatures.append(transaction_signature_batch)
-
-                # Ensure processing does not grow unbounded
-                if len(transaction_signatures) > TX_SIGNATURES_MAX_BATCHES:
-                    logger.info(
-                        f"index_solana_plays.py | slicing tx_sigs from {len(transaction_signatures)} entries"
-                    )
-                    transaction_signatures = transaction_signatures[
-                        -TX_SIGNATURES_RESIZE_LENGTH:
-                    ]
-                    logger.info(
-                        f"index_solana_plays.py | sliced tx_sigs to {len(transaction_signatures)} entries"
-                    )
-
-                # Reset batch state
-                transaction_signature_batch = []
-
-        logger.info(
-            f"index_solana_plays.py | intersection_found={intersection_found},\
-            last_tx_signature={last_tx_signature},\
-            page_count={page_count}"
-        )
-        page_count = page_count + 1
-
-    logger.info(
-        f"index_solana_plays.py | {transaction_signatures}, {len(transaction_signatures)} entries"
+    solana_plays_history.run(
+        solana_client_manager,
+        db,
+        redis,
+        lambda tx_sig_batch: process_solana_plays_batch(
+            solana_client_manager, db, tx_sig_batch
+        ),
+        max_batches=TX_SIGNATURES_MAX_BATCHES,
+        # Cache latest transaction from chain
+        on_latest_tx=lambda tx: cache_latest_tx_redis(redis, tx),
     )
 
-    transaction_signatures.reverse()
-
-    logger.info(f"index_solana_plays.py | {transaction_signatures}")
-
-    num_txs_processed = 0
-
-    for tx_sig_batch in transaction_signatures:
-        logger.info(f"index_solana_plays.py | processing {tx_sig_batch}")
-        batch_start_time = time.time()
-        # Process each batch in parallel
-        with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-            with db.scoped_session() as session:
-                parse_sol_tx_futures = {
-                    executor.submit(
-                        parse_sol_play_transaction,
-                        session,
-                        solana_client_manager,
-                        tx_sig,
-                    ): tx_sig
-                    for tx_sig in tx_sig_batch
-                }
-                for future in concurrent.futures.as_completed(parse_sol_tx_futures):
-                    try:
-                        # No return value expected here so we just ensure all futures are resolved
-                        future.result()
-                        num_txs_processed += 1
-                    except Exception as exc:
-                        logger.error(f"index_solana_plays.py | {exc}")
-                        raise exc
-
-        batch_end_time = time.time()
-        batch_duration = batch_end_time - batch_start_time
-        logger.info(
-            f"index_solana_plays.py | processed batch {len(tx_sig_batch)} txs in {batch_duration}s"
-        )
-
 
 ######## CELERY TASKS ########
 @celery.task(name="index_solana_plays", bind=True)
@@ -2,7 +2,7 @@ import concurrent.futures
 import datetime
 import logging
 import re
-from typing import Tuple, Optional
+from typing import List, Set, Tuple, Optional
 import time
 from redis import Redis
 from sqlalchemy.orm.session import Session
@@ -13,7 +13,9 @@ from src.utils.config import shared_config
 from src.models import User, UserBankTransaction, UserBankAccount
 from src.queries.get_balances import enqueue_immediate_balance_refresh
 from src.solana.solana_client_manager import SolanaClientManager
+from src.solana.solana_history_walker import SolanaHistoryWalker
 from src.solana.solana_helpers import get_address_pair, SPL_TOKEN_ID_PK
+from src.utils.session_manager import SessionManager
 
 logger = logging.getLogger(__name__)
 
@@ -28,12 +30,9 @@ WAUDIO_PROGRAM_PUBKEY = (
 # Used to limit tx history if needed
 MIN_SLOT = int(shared_config["solana"]["user_bank_min_slot"])
 
-# Maximum number of batches to process at once
+# Maximum number of batches to process per run
 TX_SIGNATURES_MAX_BATCHES = 3
 
-# Last N entries present in tx_signatures array during processing
-TX_SIGNATURES_RESIZE_LENGTH = 3
-
 # Recover ethereum public key from bytes array
 # Message formatted as follows:
 # EthereumAddress = [214, 237, 135, 129, 143, 240, 221, 138, 97, 84, 199, 236, 234, 175, 81, 23, 114, 209, 118, 39]
@@ -61,17 +60,23 @@ def get_highest_user_bank_tx_slot(session: Session):
     return slot
 
 
-# Query a tx signature and confirm its existence
-def get_tx_in_db(session: Session, tx_sig: str) -> bool:
-    exists = False
-    tx_sig_db_count = (
-        session.query(UserBankTransaction).filter(
-            UserBankTransaction.signature == tx_sig
+# Query tx signatures and return those that exist
+def get_tx_sigs_in_db(session: Session, tx_sigs: List[str]) -> Set[str]:
+    return {
+        tx_sig
+        for (tx_sig,) in session.query(UserBankTransaction.signature).filter(
+            UserBankTransaction.signature.in_(tx_sigs)
         )
-    ).count()
-    exists = tx_sig_db_count > 0
-    # logger.info(f"index_user_bank.py | {tx_sig} exists={exists}")
-    return exists
+    }
+
+
+user_bank_history = SolanaHistoryWalker(
+    "user_bank",
+    USER_BANK_ADDRESS,
+    get_highest_user_bank_tx_slot,
+    get_tx_sigs_in_db,
+    MIN_SLOT,
+)
 
 
 def refresh_user_balance(session: Session, redis: Redis, user_bank_acct: str):
@@ -145,9 +150,14 @@ def process_user_bank_tx_details(
 
 
 def parse_user_bank_transaction(
-    session: Session, solana_client_manager: SolanaClientManager, tx_sig, redis
+    session: Session,
+    solana_client_manager: SolanaClientManager,
+    tx_sig,
+    redis,
+    tx_info=None,
 ):
-    tx_info = solana_client_manager.get_sol_tx_info(tx_sig)
+    if tx_info is None:
+        tx_info = solana_client_manager.get_sol_tx_info(tx_sig)
     tx_slot = tx_info["result"]["slot"]
     timestamp = tx_info["result"]["blockTime"]
     parsed_timestamp = datetime.datetime.utcfromtimestamp(timestamp)
@@ -177,113 +187,55 @@ def process_user_bank_txs():
         )
         return
 
-    # List of signatures that will be populated as we traverse recent operations
-    transaction_signatures = []
-
-    last_tx_signature = None
-
-    # Loop exit condition
-    intersection_found = False
-
-    # Query for solana transactions until an intersection is found
-    with db.scoped_session() as session:
-        latest_processed_slot = get_highest_user_bank_tx_slot(session)
-        logger.info(f"index_user_bank.py | high tx = {latest_processed_slot}")
-        while not intersection_found:
-            transactions_history = (
-                solana_client_manager.get_confirmed_signature_for_address2(
-                    USER_BANK_ADDRESS, before=last_tx_signature, limit=100
-                )
-            )
-            transactions_array = transactions_history["result"]
-            if not transactions_array:
-                intersection_found = True
-                logger.info(
-                    f"index_user_bank.py | No transactions found before {last_tx_signature}"
-                )
-            else:
-                # Current batch of transactions
-                transaction_signature_batch = []
-                for tx_info in transactions_array:
-                    tx_sig = tx_info["signature"]
-                    tx_slot = tx_info["slot"]
-                    logger.info(
-                        f"index_user_bank.py | Processing tx={tx_sig} | slot={tx_slot}"
-                    )
-                    if tx_info["slot"] > latest_processed_slot:
-                        transaction_signature_batch.append(tx_sig)
-                    elif (
-                        tx_info["slot"] <= latest_processed_slot
-                        and tx_info["slot"] > MIN_SLOT
-                    ):
-                        # Check the tx signature for any txs in the latest batch,
-                        # and if not present in DB, add to processing
-                        logger.info(
-                            f"index_user_bank.py | Latest slot re-traversal\
-                            slot={tx_slot}, sig={tx_sig},\
-                            latest_processed_slot(db)={latest_processed_slot}"
-                        )
-                        exists = get_tx_in_db(session, tx_sig)
-                        if exists:
-                            intersection_found = True
-                            break
-                        # Ensure this transaction is still processed
-                        transaction_signature_batch.append(tx_sig)
-
-                # Restart processing at the end of this transaction signature batch
-                last_tx = transactions_array[-1]
-                last_tx_signature = last_tx["signature"]
-
-                # Append batch of processed signatures
-                if transaction_signature_batch:
-                    transaction_signatures.append(transaction_signature_batch)
-
-                # Ensure processing does not grow unbounded
-                if len(transaction_signatures) > TX_SIGNATURES_MAX_BATCHES:
-                    prev_len = len(transaction_signatures)
-                    # Only take the oldest transaction from the transaction_signatures array
-                    # transaction_signatures is sorted from newest to oldest
-                    transaction_signatures = transaction_signatures[
-                        -TX_SIGNATURES_RESIZE_LENGTH:
-                    ]
-                    logger.info(
-                        f"index_user_bank.py | sliced tx_sigs from {prev_len} to {len(transaction_signatures)} entries"
-                    )
-
-    # Reverse batches aggregated so oldest transactions are processed first
-    transaction_signatures.reverse()
+    user_bank_history.run(
+        solana_client_manager,
+        db,
+        redis,
+        lambda tx_sig_batch: process_user_bank_tx_batch(
+            solana_client_manager, db, redis, tx_sig_batch
+        ),
+        max_batches=TX_SIGNATURES_MAX_BATCHES,
+    )
 
-    num_txs_processed = 0
-    for tx_sig_batch in transaction_signatures:
-        logger.info(f"index_user_bank.py | processing {tx_sig_batch}")
-        batch_start_time = time.time()
-        # Process each batch in parallel
-        with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-            with db.scoped_session() as session:
-                parse_sol_tx_futures = {
-                    executor.submit(
-                        parse_user_bank_transaction,
-                        session,
-                        solana_client_manager,
-                        tx_sig,
-                        redis,
-                    ): tx_sig
-                    for tx_sig in tx_sig_batch
-                }
-                for future in concurrent.futures.as_completed(parse_sol_tx_futures):
-                    try:
-                        # No return value expected here so we just ensure all futures are resolved
-                        future.result()
-                        num_txs_processed += 1
-                    except Exception as exc:
-                        logger.error(f"index_user_bank.py | error {exc}", exc_info=True)
-                        raise
 
-        batch_end_time = time.time()
-        batch_duration = batch_end_time - batch_start_time
-        logger.info(
-            f"index_user_bank.py | processed batch {len(tx_sig_batch)} txs in {batch_duration}s"
-        )
+def process_user_bank_tx_batch(
+    solana_client_manager: SolanaClientManager,
+    db: SessionManager,
+    redis: Redis,
+    tx_sig_batch: List[str],
+):
+    logger.info(f"index_user_bank.py | processing {tx_sig_batch}")
+    batch_start_time = time.time()
+    # Fetch the batch's transactions together, those not fetched are fetched one
+    # at a time while parsing
+    tx_infos = solana_client_manager.get_sol_tx_infos(tx_sig_batch)
+    # Process each batch in parallel
+    with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
+        with db.scoped_session() as session:
+            parse_sol_tx_futures = {
+                executor.submit(
+                    parse_user_bank_transaction,
+                    session,
+                    solana_client_manager,
+                    tx_sig,
+                    redis,
+                    tx_infos.get(tx_sig),
+                ): tx_sig
+                for tx_sig in tx_sig_batch
+            }
+            for future in concurrent.futures.as_completed(parse_sol_tx_futures):
+                try:
+                    # No return value expected here so we just ensure all futures are resolved
+                    future.result()
+                except Exception as exc:
+                    logger.error(f"index_user_bank.py | error {exc}", exc_info=True)
+                    raise
+
+    batch_end_time = time.time()
+    batch_duration = batch_end_time - batch_start_time
+    logger.info(
+        f"index_user_bank.py | processed batch {len(tx_sig_batch)} txs in {batch_duration}s"
+    )
 
 
 ######## CELERY TASKS ########
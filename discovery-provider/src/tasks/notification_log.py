@@ -0,0 +1,105 @@
+import logging
+from datetime import datetime
+from enum import Enum
+
+from src.models import NotificationLog
+from src.queries import response_name_constants as const
+from src.queries.notifications import get_notification_milestone, get_notifications
+from src.utils.redis_constants import notification_log_gap_redis_key
+
+logger = logging.getLogger(__name__)
+
+# Blocks per partition of the notification log
+NOTIFICATION_LOG_PARTITION_BLOCKS = 1000000
+
+
+def _to_json(value):
+    if isinstance(value, dict):
+        return {key: _to_json(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_to_json(item) for item in value]
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, datetime):
+        # As the app's json encoder serves timestamps
+        return value.strftime("%Y-%m-%dT%H:%M:%S Z")
+    return value
+
+
+def _create_partition_if_necessary(session, block_number):
+    start = block_number - block_number % NOTIFICATION_LOG_PARTITION_BLOCKS
+    session.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS notification_log_{start}
+        PARTITION OF notification_log
+        FOR VALUES FROM ({start}) TO ({start + NOTIFICATION_LOG_PARTITION_BLOCKS})
+        """
+    )
+
+
+def append_notification_log(session, block_number, block_hash):
+    """
+    Appends the notifications of the block being indexed to the notification log,
+    along with the milestone count of each notification's target as of the block.
+    Must be called after the block's entities are added to the session.
+    """
+    notifications, milestone_info, _ = get_notifications(
+        session, block_number - 1, block_number
+    )
+    if not notifications:
+        return 0
+
+    _create_partition_if_necessary(session, block_number)
+    rows = []
+    for idx, notification in enumerate(notifications):
+        metadata = _to_json(notification.get(const.notification_metadata))
+        milestone_count = None
+        milestone = get_notification_milestone(
+            {**notification, const.notification_metadata: metadata}
+        )
+        if milestone is not None:
+            milestone_name, entity_key, entity_id = milestone
+            counts = milestone_info[milestone_name]
+            if entity_key is not None:
+                counts = counts[entity_key]
+            milestone_count = counts.get(entity_id)
+        rows.append(
+            {
+                "blocknumber": block_number,
+                "idx": idx,
+                "blockhash": block_hash,
+                "type": notification[const.notification_type],
+                "timestamp": notification[const.notification_timestamp],
+                "initiator": notification[const.notification_initiator],
+                "metadata": metadata,
+                "milestone_count": milestone_count,
+            }
+        )
+    session.execute(NotificationLog.__table__.insert(), rows)
+    return len(rows)
+
+
+def try_append_notification_log(session, redis, block_number, block_hash):
+    """
+    Appends the block's notifications as append_notification_log does, in a savepoint.
+    A block that fails to append is logged and recorded as a gap in the log,
+    so the block is still indexed and reads before it derive the notifications.
+    """
+    # Errors of the block's own entities are left to fail the block
+    session.flush()
+    try:
+        with session.begin_nested():
+            return append_notification_log(session, block_number, block_hash)
+    except Exception as e:
+        logger.error(
+            f"notification_log.py | Unable to append the notifications of block={block_number}: {e}",
+            exc_info=True,
+        )
+        redis.set(notification_log_gap_redis_key, block_number)
+        return 0
+
+
+def revert_notification_log(session, block_hash):
+    session.query(NotificationLog).filter(
+        NotificationLog.blockhash == block_hash
+    ).delete(synchronize_session=False)
@@ -0,0 +1,290 @@
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Names of the search dictionary tables
+USER_LEXEME_DICT = "user_lexeme_dict"
+TRACK_LEXEME_DICT = "track_lexeme_dict"
+PLAYLIST_LEXEME_DICT = "playlist_lexeme_dict"
+ALBUM_LEXEME_DICT = "album_lexeme_dict"
+TAG_TRACK_USER = "tag_track_user"
+
+SEARCH_DICTS = [
+    USER_LEXEME_DICT,
+    TRACK_LEXEME_DICT,
+    PLAYLIST_LEXEME_DICT,
+    ALBUM_LEXEME_DICT,
+    TAG_TRACK_USER,
+]
+
+# Users whose name matches the handle of a different verified user
+# are left out of search to avoid impersonation
+IMPERSONATOR_FILTER = """
+    EXISTS (
+        SELECT 1 FROM users v
+        WHERE v.is_current = true AND v.is_verified = true
+        AND lower(v.handle) = lower(u.name) AND v.user_id != u.user_id
+    )
+"""
+
+# The search dictionary definitions, formerly materialized views.
+# {filter} restricts the rows to the entities being updated.
+USER_LEXEME_DICT_SELECT = f"""
+    SELECT
+        u.user_id,
+        lower(u.name) as user_name,
+        lower(u.handle) as handle,
+        coalesce(a.follower_count, 0) as follower_count,
+        unnest(
+            tsvector_to_array(
+                to_tsvector(
+                    'audius_ts_config',
+                    replace(COALESCE(u.name, ''), '&', 'and')
+                ) ||
+                to_tsvector(
+                    'audius_ts_config',
+                    COALESCE(u.handle, '')
+                )
+            ) || lower(COALESCE(u.name, ''))
+        ) as word
+    FROM
+        users u
+    LEFT OUTER JOIN aggregate_user a on a.user_id = u.user_id
+    WHERE u.is_current = true AND NOT {IMPERSONATOR_FILTER} AND ({{filter}})
+    GROUP BY u.user_id, u.name, u.handle, a.follower_count
+"""
+
+TRACK_LEXEME_DICT_SELECT = f"""
+    SELECT
+        t.track_id,
+        t.owner_id as owner_id,
+        lower(t.title) as track_title,
+        lower(u.handle) as handle,
+        lower(u.name) as user_name,
+        coalesce(a.repost_count, 0) as repost_count,
+        unnest(
+            tsvector_to_array(
+                to_tsvector(
+                    'audius_ts_config',
+                    replace(COALESCE(t."title", ''), '&', 'and')
+                )
+            ) || lower(COALESCE(t."title", ''))
+        ) as word
+    FROM
+        tracks t
+    INNER JOIN users u ON t.owner_id = u.user_id
+    LEFT OUTER JOIN aggregate_track a on a.track_id = t.track_id
+    WHERE t.is_current = true AND t.is_unlisted = false AND t.is_delete = false
+        AND t.stem_of IS NULL AND u.is_current = true
+        AND NOT {IMPERSONATOR_FILTER} AND ({{filter}})
+    GROUP BY t.track_id, t.title, t.owner_id, u.handle, u.name, a.repost_count
+"""
+
+PLAYLIST_LEXEME_DICT_SELECT = f"""
+    SELECT
+        p.playlist_id,
+        lower(p.playlist_name) as playlist_name,
+        p.playlist_owner_id as owner_id,
+        lower(u.handle) as handle,
+        lower(u.name) as user_name,
+        coalesce(a.repost_count, 0) as repost_count,
+        unnest(
+            tsvector_to_array(
+                to_tsvector(
+                    'audius_ts_config',
+                    replace(COALESCE(p.playlist_name, ''), '&', 'and')
+                )
+            ) || lower(COALESCE(p.playlist_name, ''))
+        ) as word
+    FROM
+        playlists p
+    INNER JOIN users u ON p.playlist_owner_id = u.user_id
+    LEFT OUTER JOIN aggregate_playlist a on a.playlist_id = p.playlist_id
+    WHERE p.is_current = true AND p.is_album = {{is_album}} AND p.is_private = false
+        AND p.is_delete = false AND u.is_current = true
+        AND NOT {IMPERSONATOR_FILTER} AND ({{filter}})
+    GROUP BY p.playlist_id, p.playlist_name, p.playlist_owner_id, u.handle, u.name,
+        a.repost_count
+"""
+
+TAG_TRACK_USER_SELECT = """
+    SELECT
+        UNNEST(tags) AS tag,
+        track_id,
+        owner_id
+    FROM
+    (
+        SELECT
+            string_to_array(LOWER(tracks.tags), ',') AS tags,
+            track_id,
+            owner_id
+        FROM
+            tracks
+        WHERE
+            tags <> ''
+            AND tags IS NOT NULL
+            AND is_current IS TRUE
+            AND is_unlisted IS FALSE
+            AND stem_of IS NULL
+            AND ({filter})
+    ) AS t
+    GROUP BY
+        tag,
+        track_id,
+        owner_id
+"""
+
+
+def _replace_rows(session, table_name, delete_filter, select, params):
+    session.execute(f"DELETE FROM {table_name} WHERE {delete_filter}", params)
+    session.execute(f"INSERT INTO {table_name} {select}", params)
+
+
+def update_search_dicts(session, user_ids, track_ids, playlist_ids):
+    """
+    Re-tokenizes the search dictionary rows for the given users, tracks and playlists.
+    Called by the indexer in the same transaction as the block that changed them, so
+    new uploads and edits are searchable as soon as they are indexed.
+
+    User changes also rewrite the rows of their tracks and playlists, which
+    carry the owner's handle and name.
+    """
+    user_ids = list(user_ids or [])
+    track_ids = list(track_ids or [])
+    playlist_ids = list(playlist_ids or [])
+    if not user_ids and not track_ids and not playlist_ids:
+        return
+
+    # The dictionaries are populated with INSERT ... SELECT, so any pending
+    # users, tracks or playlists must be visible to the database first
+    session.flush()
+
+    params = {
+        "user_ids": user_ids,
+        "track_ids": track_ids,
+        "playlist_ids": playlist_ids,
+    }
+
+    if user_ids:
+        _replace_rows(
+            session,
+            USER_LEXEME_DICT,
+            "user_id = ANY(:user_ids)",
+            USER_LEXEME_DICT_SELECT.format(filter="u.user_id = ANY(:user_ids)"),
+            params,
+        )
+
+    if user_ids or track_ids:
+        _replace_rows(
+            session,
+            TRACK_LEXEME_DICT,
+            "track_id = ANY(:track_ids) OR owner_id = ANY(:user_ids)",
+            TRACK_LEXEME_DICT_SELECT.format(
+                filter="t.track_id = ANY(:track_ids) OR t.owner_id = ANY(:user_ids)"
+            ),
+            params,
+        )
+
+    if track_ids:
+        _replace_rows(
+            session,
+            TAG_TRACK_USER,
+            "track_id = ANY(:track_ids)",
+            TAG_TRACK_USER_SELECT.format(filter="track_id = ANY(:track_ids)"),
+            params,
+        )
+
+    if user_ids or playlist_ids:
+        # A playlist can move between the playlist and album dictionaries
+        # so both are always rewritten
+        playlist_filter = (
+            "p.playlist_id = ANY(:playlist_ids) OR p.playlist_owner_id = ANY(:user_ids)"
+        )
+        for table_name, is_album in [
+            (PLAYLIST_LEXEME_DICT, "false"),
+            (ALBUM_LEXEME_DICT, "true"),
+        ]:
+            _replace_rows(
+                session,
+                table_name,
+                "playlist_id = ANY(:playlist_ids) OR owner_id = ANY(:user_ids)",
+                PLAYLIST_LEXEME_DICT_SELECT.format(
+                    filter=playlist_filter, is_album=is_album
+                ),
+                params,
+            )
+
+
+def compact_search_dicts(session):
+    """
+    Reconciles the parts of the search dictionaries that change without their
+    users, tracks or playlists being indexed: the popularity counts copied from
+    the aggregate views, users that became impersonators of a verified handle,
+    and users that stopped being impersonators.
+    """
+    start_time = time.time()
+
+    session.execute(
+        """
+        UPDATE user_lexeme_dict d SET follower_count = a.follower_count
+        FROM aggregate_user a
+        WHERE a.user_id = d.user_id
+        AND d.follower_count IS DISTINCT FROM a.follower_count
+        """
+    )
+    session.execute(
+        """
+        UPDATE track_lexeme_dict d SET repost_count = a.repost_count
+        FROM aggregate_track a
+        WHERE a.track_id = d.track_id
+        AND d.repost_count IS DISTINCT FROM a.repost_count
+        """
+    )
+    for table_name in [PLAYLIST_LEXEME_DICT, ALBUM_LEXEME_DICT]:
+        session.execute(
+            f"""
+            UPDATE {table_name} d SET repost_count = a.repost_count
+            FROM aggregate_playlist a
+            WHERE a.playlist_id = d.playlist_id
+            AND d.repost_count IS DISTINCT FROM a.repost_count
+            """
+        )
+
+    for table_name, owner_col in [
+        (USER_LEXEME_DICT, "user_id"),
+        (TRACK_LEXEME_DICT, "owner_id"),
+        (PLAYLIST_LEXEME_DICT, "owner_id"),
+        (ALBUM_LEXEME_DICT, "owner_id"),
+    ]:
+        session.execute(
+            f"""
+            DELETE FROM {table_name} d USING users u
+            WHERE u.user_id = d.{owner_col} AND u.is_current = true
+            AND {IMPERSONATOR_FILTER}
+            """
+        )
+
+    # Every user left in search has at least one row, so users without any
+    # are the ones that were filtered out and no longer match the filter
+    restored_user_ids = [
+        user_id
+        for (user_id,) in session.execute(
+            f"""
+            SELECT u.user_id FROM users u
+            WHERE u.is_current = true AND NOT {IMPERSONATOR_FILTER}
+            AND NOT EXISTS (
+                SELECT 1 FROM user_lexeme_dict d WHERE d.user_id = u.user_id
+            )
+            """
+        )
+    ]
+    if restored_user_ids:
+        logger.info(
+            f"search_dicts.py | restoring {len(restored_user_ids)} users to search dicts"
+        )
+        update_search_dicts(session, restored_user_ids, [], [])
+
+    logger.info(
+        f"search_dicts.py | compacted search dicts in {time.time() - start_time} sec."
+    )
@@ -1,12 +1,18 @@
 import logging
 from datetime import datetime
-from typing import Dict
+from typing import Dict, Set
 
+from sqlalchemy import update
 from src.app import contract_addresses
 from src.challenges.challenge_event import ChallengeEvent
 from src.challenges.challenge_event_bus import ChallengeEventBus
 from src.database_task import DatabaseTask
 from src.models import Follow, Playlist, Repost, RepostType
+from src.tasks.aggregate_daily_counts import (
+    DailyCountDeltas,
+    record_state_change,
+    update_daily_repost_counts,
+)
 from src.tasks.index_related_artists import queue_related_artist_calculation
 from src.utils.indexing_errors import IndexingError
 
@@ -22,11 +28,14 @@ def social_feature_state_update(
     block_timestamp,
     block_hash,
 ):
-    """Return int representing number of social feature related state changes in this transaction"""
+    """Return tuple of the number of social feature related state changes in this transaction
+    and the ids of the users whose reposts changed"""
 
     num_total_changes = 0
+    # This stores the ids of users whose reposts changed in the set of transactions
+    repost_user_ids: Set[int] = set()
     if not social_feature_factory_txs:
-        return num_total_changes
+        return num_total_changes, repost_user_ids
 
     social_feature_factory_abi = update_task.abi_values["SocialFeatureFactory"]["abi"]
     social_feature_factory_contract = update_task.web3.eth.contract(
@@ -116,29 +125,36 @@ def social_feature_state_update(
 
     # bulk process all repost and follow changes
 
+    # net changes to the daily repost buckets used for windowed repost counts
+    repost_count_deltas: DailyCountDeltas = {}
+
     for repost_user_id, repost_track_ids in track_repost_state_changes.items():
         for repost_track_id in repost_track_ids:
-            invalidate_old_repost(
+            invalidated_reposts = invalidate_old_repost(
                 session, repost_user_id, repost_track_id, RepostType.track
             )
             repost = repost_track_ids[repost_track_id]
+            record_repost_state_change(repost_count_deltas, invalidated_reposts, repost)
             session.add(repost)
             dispatch_challenge_repost(challenge_bus, repost, block_number)
         num_total_changes += len(repost_track_ids)
 
     for repost_user_id, repost_playlist_ids in playlist_repost_state_changes.items():
         for repost_playlist_id in repost_playlist_ids:
-            invalidate_old_repost(
+            invalidated_reposts = invalidate_old_repost(
                 session,
                 repost_user_id,
                 repost_playlist_id,
                 repost_playlist_ids[repost_playlist_id].repost_type,
             )
             repost = repost_playlist_ids[repost_playlist_id]
+            record_repost_state_change(repost_count_deltas, invalidated_reposts, repost)
             session.add(repost)
             dispatch_challenge_repost(challenge_bus, repost, block_number)
         num_total_changes += len(repost_playlist_ids)
 
+    update_daily_repost_counts(session, repost_count_deltas)
+
     for follower_user_id, followee_user_ids in follow_state_changes.items():
         for followee_user_id in followee_user_ids:
             invalidate_old_follow(session, follower_user_id, followee_user_id)
@@ -148,7 +164,9 @@ def social_feature_state_update(
             queue_related_artist_calculation(update_task.redis, followee_user_id)
         num_total_changes += len(followee_user_ids)
 
-    return num_total_changes
+    repost_user_ids.update(track_repost_state_changes)
+    repost_user_ids.update(playlist_repost_state_changes)
+    return num_total_changes, repost_user_ids
 
 
 ######## HELPERS ########
@@ -162,20 +180,33 @@ def dispatch_challenge_follow(bus: ChallengeEventBus, follow, block_number):
     bus.dispatch(ChallengeEvent.follow, block_number, follow.follower_user_id)
 
 
-def invalidate_old_repost(session, repost_user_id, repost_item_id, repost_type):
-    # update existing db entry to is_current = False
-    num_invalidated_repost_entries = (
-        session.query(Repost)
-        .filter(
-            Repost.user_id == repost_user_id,
-            Repost.repost_item_id == repost_item_id,
-            Repost.repost_type == repost_type,
-            Repost.is_current == True,
-        )
-        .update({"is_current": False})
+def record_repost_state_change(
+    repost_count_deltas: DailyCountDeltas, invalidated_reposts, repost
+):
+    record_state_change(
+        repost_count_deltas,
+        repost.repost_item_id,
+        repost.repost_type,
+        invalidated_reposts,
+        repost.is_delete,
+        repost.created_at,
     )
-    # TODO - after on-chain storage is implemented, assert num_invalidated_repost_entries > 0
-    return num_invalidated_repost_entries
+
+
+def invalidate_old_repost(session, repost_user_id, repost_item_id, repost_type):
+    # update existing db entry to is_current = False, returning the invalidated
+    # rows so the daily repost counts can be adjusted
+    invalidated_repost_entries = session.execute(
+        update(Repost.__table__)
+        .where(Repost.user_id == repost_user_id)
+        .where(Repost.repost_item_id == repost_item_id)
+        .where(Repost.repost_type == repost_type)
+        .where(Repost.is_current == True)
+        .values(is_current=False)
+        .returning(Repost.is_delete, Repost.created_at)
+    ).fetchall()
+    # TODO - after on-chain storage is implemented, assert len(invalidated_repost_entries) > 0
+    return invalidated_repost_entries
 
 
 def invalidate_old_follow(session, follower_user_id, followee_user_id):
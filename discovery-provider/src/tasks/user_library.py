@@ -1,12 +1,18 @@
 import logging
 from datetime import datetime
-from typing import Dict
+from typing import Dict, Set
 
+from sqlalchemy import update
 from src.app import contract_addresses
 from src.challenges.challenge_event import ChallengeEvent
 from src.challenges.challenge_event_bus import ChallengeEventBus
 from src.database_task import DatabaseTask
 from src.models import Playlist, Save, SaveType
+from src.tasks.aggregate_daily_counts import (
+    DailyCountDeltas,
+    record_state_change,
+    update_daily_save_counts,
+)
 from src.utils.indexing_errors import IndexingError
 
 logger = logging.getLogger(__name__)
@@ -21,11 +27,14 @@ def user_library_state_update(
     block_timestamp,
     block_hash,
 ):
-    """Return int representing number of User Library model state changes found in transaction."""
+    """Return tuple of the number of User Library model state changes found in transaction
+    and the ids of the users whose saves changed."""
 
     num_total_changes = 0
+    # This stores the ids of users whose saves changed in the set of transactions
+    user_ids: Set[int] = set()
     if not user_library_factory_txs:
-        return num_total_changes
+        return num_total_changes, user_ids
 
     user_library_abi = update_task.abi_values["UserLibraryFactory"]["abi"]
     user_library_contract = update_task.web3.eth.contract(
@@ -90,26 +99,38 @@ def user_library_state_update(
                 "user_library", block_number, blockhash, txhash, str(e)
             ) from e
 
+    # net changes to the daily save buckets used for windowed save counts
+    save_count_deltas: DailyCountDeltas = {}
+
     for user_id, track_ids in track_save_state_changes.items():
         for track_id in track_ids:
-            invalidate_old_save(session, user_id, track_id, SaveType.track)
+            invalidated_saves = invalidate_old_save(
+                session, user_id, track_id, SaveType.track
+            )
             save = track_ids[track_id]
+            record_save_state_change(save_count_deltas, invalidated_saves, save)
             session.add(save)
             dispatch_favorite(challenge_bus, save, block_number)
         num_total_changes += len(track_ids)
 
     for user_id, playlist_ids in playlist_save_state_changes.items():
         for playlist_id in playlist_ids:
-            invalidate_old_save(
+            invalidated_saves = invalidate_old_save(
                 session,
                 user_id,
                 playlist_id,
                 playlist_ids[playlist_id].save_type,
             )
-            session.add(playlist_ids[playlist_id])
+            save = playlist_ids[playlist_id]
+            record_save_state_change(save_count_deltas, invalidated_saves, save)
+            session.add(save)
         num_total_changes += len(playlist_ids)
 
-    return num_total_changes
+    update_daily_save_counts(session, save_count_deltas)
+
+    user_ids.update(track_save_state_changes)
+    user_ids.update(playlist_save_state_changes)
+    return num_total_changes, user_ids
 
 
 ######## HELPERS ########
@@ -119,18 +140,32 @@ def dispatch_favorite(bus: ChallengeEventBus, save, block_number):
     bus.dispatch(ChallengeEvent.favorite, block_number, save.user_id)
 
 
-def invalidate_old_save(session, user_id, playlist_id, save_type):
-    num_invalidated_save_entries = (
-        session.query(Save)
-        .filter(
-            Save.user_id == user_id,
-            Save.save_item_id == playlist_id,
-            Save.save_type == save_type,
-            Save.is_current == True,
-        )
-        .update({"is_current": False})
+def record_save_state_change(
+    save_count_deltas: DailyCountDeltas, invalidated_saves, save
+):
+    record_state_change(
+        save_count_deltas,
+        save.save_item_id,
+        save.save_type,
+        invalidated_saves,
+        save.is_delete,
+        save.created_at,
     )
-    return num_invalidated_save_entries
+
+
+def invalidate_old_save(session, user_id, playlist_id, save_type):
+    # update existing db entry to is_current = False, returning the invalidated
+    # rows so the daily save counts can be adjusted
+    invalidated_save_entries = session.execute(
+        update(Save.__table__)
+        .where(Save.user_id == user_id)
+        .where(Save.save_item_id == playlist_id)
+        .where(Save.save_type == save_type)
+        .where(Save.is_current == True)
+        .values(is_current=False)
+        .returning(Save.is_delete, Save.created_at)
+    ).fetchall()
+    return invalidated_save_entries
 
 
 def add_track_save(
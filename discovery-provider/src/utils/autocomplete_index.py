@@ -0,0 +1,428 @@
+import heapq
+import logging
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Set
+
+from src.utils.config import shared_config
+from src.utils.snapshot_file import SnapshotFile, write_snapshot_file
+
+logger = logging.getLogger(__name__)
+
+# Kinds of entities held by the index, each built from its lexeme dictionary
+AUTOCOMPLETE_KINDS = ["users", "tracks", "playlists", "albums"]
+
+# Prefixes matching more rows than this are not scanned at query time,
+# their top results are precomputed when the snapshot is written instead
+MAX_SCAN_ROWS = 1000
+
+# Number of results precomputed for each of those prefixes
+PREFIX_TOP_K = 100
+
+# How often a process checks whether a newer snapshot was written
+RELOAD_CHECK_INTERVAL_SEC = 5
+
+_BASE_MAGIC = b"AUDACIX1"
+_DELTA_MAGIC = b"AUDACID1"
+
+_NO_IDS: FrozenSet[int] = frozenset()
+
+# No utf-8 encoded string contains this byte, so appending it to a prefix
+# gives an upper bound for every key starting with that prefix
+_PREFIX_END = b"\xff"
+
+
+class AutocompleteEntry(NamedTuple):
+    # Results are de-duplicated by group, e.g. one track per owner
+    group_id: int
+    # Popularity used to rank the entries matching a prefix
+    score: int
+    words: Set[str]
+
+
+def _rank_rows(row_ids, entity_ids, group_ids, scores, count):
+    """
+    Returns up to `count` entity ids for the given rows, most popular first,
+    keeping only the most popular row of each entity and group.
+    """
+    rows = sorted(row_ids, key=lambda i: (-scores[i], entity_ids[i]))
+    seen_groups = set()
+    seen_entities = set()
+    ranked = []
+    for i in rows:
+        if group_ids[i] in seen_groups or entity_ids[i] in seen_entities:
+            continue
+        seen_groups.add(group_ids[i])
+        seen_entities.add(entity_ids[i])
+        ranked.append(i)
+        if len(ranked) == count:
+            break
+    return ranked
+
+
+def _top_rows(lo, hi, entity_ids, group_ids, scores):
+    # Rank an oversampled heap selection first and only sort the whole
+    # range if duplicate entities or groups leave too few results
+    candidates = heapq.nlargest(
+        PREFIX_TOP_K * 4, range(lo, hi), key=lambda i: (scores[i], -entity_ids[i])
+    )
+    ranked = _rank_rows(candidates, entity_ids, group_ids, scores, PREFIX_TOP_K)
+    if len(ranked) < PREFIX_TOP_K and len(candidates) < hi - lo:
+        ranked = _rank_rows(range(lo, hi), entity_ids, group_ids, scores, PREFIX_TOP_K)
+    return ranked
+
+
+def _heavy_prefixes(keys):
+    """Returns (prefix, lo, hi) for every prefix matching more than MAX_SCAN_ROWS keys"""
+    heavy = []
+    stack = [(0, len(keys), 0)]
+    while stack:
+        lo, hi, depth = stack.pop()
+        i = lo
+        # keys equal to the current prefix sort before its extensions
+        while i < hi and len(keys[i]) == depth:
+            i += 1
+        while i < hi:
+            prefix = keys[i][: depth + 1]
+            j = bisect_left(keys, prefix + _PREFIX_END, i, hi)
+            if j - i > MAX_SCAN_ROWS:
+                heavy.append((prefix, i, j))
+                stack.append((i, j, depth + 1))
+            i = j
+    heavy.sort()
+    return heavy
+
+
+def _build_section(entries: Dict[int, AutocompleteEntry]):
+    rows = [
+        (word.encode("utf-8"), entity_id, entry.group_id, entry.score)
+        for entity_id, entry in entries.items()
+        for word in entry.words
+        if word
+    ]
+    rows.sort()
+
+    keys = [row[0] for row in rows]
+    entity_ids = array("q", (row[1] for row in rows))
+    group_ids = array("q", (row[2] for row in rows))
+    scores = array("q", (row[3] for row in rows))
+
+    key_offsets = array("I", [0])
+    for key in keys:
+        key_offsets.append(key_offsets[-1] + len(key))
+
+    prefix_keys = []
+    prefix_offsets = array("I", [0])
+    top_offsets = array("I", [0])
+    top_rows = array("I")
+    for prefix, lo, hi in _heavy_prefixes(keys):
+        prefix_keys.append(prefix)
+        prefix_offsets.append(prefix_offsets[-1] + len(prefix))
+        top_rows.extend(_top_rows(lo, hi, entity_ids, group_ids, scores))
+        top_offsets.append(len(top_rows))
+
+    return {
+        "key_offsets": key_offsets,
+        "keys": array("B", b"".join(keys)),
+        "entity_ids": entity_ids,
+        "group_ids": group_ids,
+        "scores": scores,
+        "prefix_offsets": prefix_offsets,
+        "prefix_keys": array("B", b"".join(prefix_keys)),
+        "top_offsets": top_offsets,
+        "top_rows": top_rows,
+    }
+
+
+def write_base_snapshot(
+    path, entries_by_kind: Dict[str, Dict[int, AutocompleteEntry]], **metadata
+):
+    """Writes the index for `entries_by_kind` to `path`"""
+    arrays = {}
+    for kind, entries in entries_by_kind.items():
+        for name, values in _build_section(entries).items():
+            arrays[f"{kind}.{name}"] = values
+    write_snapshot_file(path, _BASE_MAGIC, arrays, **metadata)
+
+
+def write_delta_snapshot(
+    path,
+    changes_by_kind: Dict[str, Dict[int, Optional[AutocompleteEntry]]],
+    **metadata,
+):
+    """
+    Writes the entities changed since the base snapshot to `path`.
+    `changes_by_kind` maps the id of each changed entity to its current entry,
+    or to None if it no longer has one.
+    """
+    arrays = {}
+    for kind, changes in changes_by_kind.items():
+        entries = {
+            entity_id: entry
+            for entity_id, entry in changes.items()
+            if entry is not None
+        }
+        for name, values in _build_section(entries).items():
+            arrays[f"{kind}.{name}"] = values
+        arrays[f"{kind}.changed_ids"] = array("q", sorted(changes))
+    write_snapshot_file(path, _DELTA_MAGIC, arrays, **metadata)
+
+
+class _Section:
+    def __init__(self, snapshot: SnapshotFile, kind):
+        def part(name):
+            return snapshot.array(f"{kind}.{name}")
+
+        self.key_offsets = part("key_offsets")
+        self.keys = part("keys")
+        self.entity_ids = part("entity_ids")
+        self.group_ids = part("group_ids")
+        self.scores = part("scores")
+        self.prefix_offsets = part("prefix_offsets")
+        self.prefix_keys = part("prefix_keys")
+        self.top_offsets = part("top_offsets")
+        self.top_rows = part("top_rows")
+        self.size = len(self.entity_ids)
+
+    def key(self, i):
+        return bytes(self.keys[self.key_offsets[i] : self.key_offsets[i + 1]])
+
+    def prefix_key(self, i):
+        return bytes(
+            self.prefix_keys[self.prefix_offsets[i] : self.prefix_offsets[i + 1]]
+        )
+
+    def lower_bound(self, target):
+        lo, hi = 0, self.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.key(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def precomputed_rows(self, prefix):
+        lo, hi = 0, len(self.top_offsets) - 1
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.prefix_key(mid) < prefix:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == len(self.top_offsets) - 1 or self.prefix_key(lo) != prefix:
+            return None
+        return self.top_rows[self.top_offsets[lo] : self.top_offsets[lo + 1]]
+
+
+def _section_entries(section: _Section) -> Dict[int, AutocompleteEntry]:
+    entries: Dict[int, AutocompleteEntry] = {}
+    for i in range(section.size):
+        entity_id = section.entity_ids[i]
+        if entity_id not in entries:
+            entries[entity_id] = AutocompleteEntry(
+                section.group_ids[i], section.scores[i], set()
+            )
+        entries[entity_id].words.add(section.key(i).decode("utf-8"))
+    return entries
+
+
+class AutocompleteIndex:
+    """
+    Read only view of an autocomplete snapshot.
+
+    The snapshot is memory mapped, so every process serving search shares the same
+    pages rather than holding its own copy. Each kind is stored as a sorted array
+    of lexemes with the entity, group and popularity of every row, along with the
+    precomputed top results of prefixes too broad to rank at query time.
+
+    The base snapshot is rebuilt from the lexeme dictionaries, and a small delta
+    holds the entities changed since then, overriding their rows in the base.
+    """
+
+    def __init__(self, base: SnapshotFile, delta: Optional[SnapshotFile]):
+        self.metadata = base.metadata
+        self.built_at = base.metadata.get("full_built_at", 0)
+        self._sections = {
+            kind: _Section(base, kind)
+            for kind in AUTOCOMPLETE_KINDS
+            if f"{kind}.keys" in base
+        }
+        self._delta_sections: Dict[str, _Section] = {}
+        self._changed_ids: Dict[str, FrozenSet[int]] = {}
+
+        # A delta written for an older base is ignored until it is rewritten
+        if delta is not None and delta.metadata["base_built_at"] == self.built_at:
+            for kind in AUTOCOMPLETE_KINDS:
+                if f"{kind}.changed_ids" in delta:
+                    self._delta_sections[kind] = _Section(delta, kind)
+                    self._changed_ids[kind] = frozenset(
+                        delta.array(f"{kind}.changed_ids")
+                    )
+
+    def search(self, kind, query, limit, offset) -> Optional[List[int]]:
+        """
+        Returns the ids of the `kind` entities with a lexeme starting with `query`,
+        most popular first and at most one per group. Returns None if the page
+        requested is past the results precomputed for a broad prefix.
+        """
+        section = self._sections.get(kind)
+        if section is None:
+            return None
+        prefix = query.strip().lower().encode("utf-8")
+        if not prefix:
+            return []
+
+        changed_ids = self._changed_ids.get(kind, _NO_IDS)
+        # Sort key of the last row known to be ranked correctly, when rows past
+        # it may be missing from the results
+        last_known = None
+        lo = section.lower_bound(prefix)
+        hi = section.lower_bound(prefix + _PREFIX_END)
+        if hi - lo > MAX_SCAN_ROWS:
+            rows = section.precomputed_rows(prefix)
+            if rows is None:
+                return None
+            if len(rows) == PREFIX_TOP_K:
+                last_known = rows[-1]
+            # The precomputed rows hold one entity per group, so past a row of a
+            # changed entity the next best of its group may be missing
+            for i, row in enumerate(rows):
+                if section.entity_ids[row] in changed_ids:
+                    last_known = row
+                    rows = rows[:i]
+                    break
+        else:
+            rows = _rank_rows(
+                [i for i in range(lo, hi) if section.entity_ids[i] not in changed_ids],
+                section.entity_ids,
+                section.group_ids,
+                section.scores,
+                offset + limit,
+            )
+
+        delta_section = self._delta_sections.get(kind)
+        if delta_section is None:
+            results = [
+                (section.scores[i], section.entity_ids[i], section.group_ids[i])
+                for i in rows
+            ]
+        else:
+            delta_rows = _rank_rows(
+                range(
+                    delta_section.lower_bound(prefix),
+                    delta_section.lower_bound(prefix + _PREFIX_END),
+                ),
+                delta_section.entity_ids,
+                delta_section.group_ids,
+                delta_section.scores,
+                offset + limit,
+            )
+            results = _merge_results(section, rows, delta_section, delta_rows)
+
+        if last_known is not None:
+            last_key = (-section.scores[last_known], section.entity_ids[last_known])
+            results = [
+                result for result in results if (-result[0], result[1]) <= last_key
+            ]
+            if offset + limit > len(results):
+                return None
+        return [result[1] for result in results[offset : offset + limit]]
+
+    def delta_changes(self) -> Dict[str, Dict[int, Optional[AutocompleteEntry]]]:
+        """Returns the entities changed since the base snapshot, used to extend the delta"""
+        changes_by_kind: Dict[str, Dict[int, Optional[AutocompleteEntry]]] = {}
+        for kind in AUTOCOMPLETE_KINDS:
+            changes: Dict[int, Optional[AutocompleteEntry]] = dict.fromkeys(
+                self._changed_ids.get(kind, _NO_IDS)
+            )
+            if kind in self._delta_sections:
+                changes.update(_section_entries(self._delta_sections[kind]))
+            changes_by_kind[kind] = changes
+        return changes_by_kind
+
+
+def _merge_results(section: _Section, rows, delta_section: _Section, delta_rows):
+    """Ranks the base and delta rows together as (score, entity id, group id)"""
+    candidates = [
+        (section.scores[i], section.entity_ids[i], section.group_ids[i]) for i in rows
+    ] + [
+        (
+            delta_section.scores[i],
+            delta_section.entity_ids[i],
+            delta_section.group_ids[i],
+        )
+        for i in delta_rows
+    ]
+    scores, entity_ids, group_ids = (
+        [candidate[j] for candidate in candidates] for j in range(3)
+    )
+    ranked = _rank_rows(
+        range(len(candidates)), entity_ids, group_ids, scores, len(candidates)
+    )
+    return [candidates[i] for i in ranked]
+
+
+def get_autocomplete_index_paths():
+    base_path = shared_config["discprov"]["autocomplete_index_path"]
+    return base_path, f"{base_path}.delta"
+
+
+def load_autocomplete_index(base_path, delta_path) -> Optional[AutocompleteIndex]:
+    try:
+        base = SnapshotFile(base_path, _BASE_MAGIC)
+    except FileNotFoundError:
+        return None
+    delta: Optional[SnapshotFile]
+    try:
+        delta = SnapshotFile(delta_path, _DELTA_MAGIC)
+    except FileNotFoundError:
+        delta = None
+    return AutocompleteIndex(base, delta)
+
+
+class _LoadedIndex:
+    """The snapshots this process has mapped and when their files were last checked"""
+
+    def __init__(self):
+        self.index: Optional[AutocompleteIndex] = None
+        self.mtimes = None
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+
+
+_loaded = _LoadedIndex()
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def get_autocomplete_index() -> Optional[AutocompleteIndex]:
+    """
+    Returns this process's view of the latest autocomplete snapshot, or None if
+    none has been written yet. Remaps the files when the indexer replaces them.
+    """
+    now = time.time()
+    if now - _loaded.checked_at < RELOAD_CHECK_INTERVAL_SEC:
+        return _loaded.index
+
+    with _loaded.lock:
+        if now - _loaded.checked_at < RELOAD_CHECK_INTERVAL_SEC:
+            return _loaded.index
+        _loaded.checked_at = now
+        base_path, delta_path = get_autocomplete_index_paths()
+        mtimes = (_mtime(base_path), _mtime(delta_path))
+        if mtimes != _loaded.mtimes:
+            try:
+                _loaded.index = load_autocomplete_index(base_path, delta_path)
+                _loaded.mtimes = mtimes
+            except Exception as e:
+                logger.error(f"autocomplete_index.py | Unable to load snapshot: {e}")
+        return _loaded.index
@@ -0,0 +1,107 @@
+"""
+Bounded LRU caches of the blocks fetched from a chain, shared by the tasks and
+queries of a process
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from hexbytes import HexBytes
+
+# Maximum number of blocks kept per chain
+MAX_CACHED_BLOCKS = 1000
+# Blocks are only looked up by number once they are this many blocks deep,
+# as a chain reorganisation can replace the blocks closer to the head
+REORG_SAFETY_BLOCKS = 10
+# How long the latest block is reused for
+LATEST_BLOCK_TTL_SEC = 1
+
+
+def _get_block_hash(block_identifier) -> Optional[str]:
+    """Returns the hash of `block_identifier` as hex if it's a block hash"""
+    if isinstance(block_identifier, (bytes, bytearray)) and len(block_identifier) == 32:
+        return HexBytes(block_identifier).hex()
+    if (
+        isinstance(block_identifier, str)
+        and block_identifier.startswith("0x")
+        and len(block_identifier) == 66
+    ):
+        return block_identifier.lower()
+    return None
+
+
+class BlockCache:
+    """
+    Caches blocks by hash, which never change, and by number for blocks at least
+    REORG_SAFETY_BLOCKS below the highest block seen. The latest block is reused
+    for LATEST_BLOCK_TTL_SEC. Blocks fetched with transaction hashes only don't
+    satisfy requests for full transactions.
+    """
+
+    def __init__(self, max_blocks=MAX_CACHED_BLOCKS):
+        self.max_blocks = max_blocks
+        # block hash -> (block, has full transactions)
+        self._blocks: "OrderedDict[str, Tuple[Any, bool]]" = OrderedDict()
+        self._hashes_by_number: Dict[int, str] = {}
+        self._head_number = 0
+        self._latest: Optional[Tuple[Any, bool, float]] = None
+        self._lock = threading.Lock()
+
+    def get_block(self, web3, block_identifier, full_transactions=False):
+        """Drop-in for web3.eth.getBlock, serving the block from the cache if possible"""
+        block = self._get_cached_block(block_identifier, full_transactions)
+        if block is not None:
+            return block
+        block = web3.eth.getBlock(block_identifier, full_transactions)
+        self._add_block(block, full_transactions, block_identifier == "latest")
+        return block
+
+    def _get_cached_block(self, block_identifier, full_transactions):
+        with self._lock:
+            block_hash = _get_block_hash(block_identifier)
+            if block_hash is None and isinstance(block_identifier, int):
+                if block_identifier <= self._head_number - REORG_SAFETY_BLOCKS:
+                    block_hash = self._hashes_by_number.get(block_identifier)
+            if block_hash is not None and block_hash in self._blocks:
+                block, has_full_transactions = self._blocks[block_hash]
+                if has_full_transactions or not full_transactions:
+                    self._blocks.move_to_end(block_hash)
+                    return block
+            if block_identifier == "latest" and self._latest is not None:
+                block, has_full_transactions, fetched_at = self._latest
+                if (has_full_transactions or not full_transactions) and (
+                    time.time() - fetched_at < LATEST_BLOCK_TTL_SEC
+                ):
+                    return block
+            return None
+
+    def _add_block(self, block, full_transactions, is_latest):
+        # Pending blocks have no hash yet
+        if block is None or block.get("hash") is None:
+            return
+        block_hash = HexBytes(block["hash"]).hex()
+        number = block["number"]
+        with self._lock:
+            if is_latest:
+                self._latest = (block, full_transactions, time.time())
+            cached = self._blocks.get(block_hash)
+            if cached is None or full_transactions or not cached[1]:
+                self._blocks[block_hash] = (block, full_transactions)
+            self._blocks.move_to_end(block_hash)
+            self._hashes_by_number[number] = block_hash
+            self._head_number = max(self._head_number, number)
+            while len(self._blocks) > self.max_blocks:
+                _, (evicted_block, _) = self._blocks.popitem(last=False)
+                evicted_number = evicted_block["number"]
+                if (
+                    self._hashes_by_number.get(evicted_number)
+                    == HexBytes(evicted_block["hash"]).hex()
+                ):
+                    del self._hashes_by_number[evicted_number]
+
+
+# The POA chain indexed for entities and the Ethereum chain of the AUDIO token
+poa_block_cache = BlockCache()
+eth_block_cache = BlockCache()
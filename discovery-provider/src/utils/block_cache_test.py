@@ -0,0 +1,66 @@
+from unittest import mock
+
+from hexbytes import HexBytes
+from src.utils.block_cache import REORG_SAFETY_BLOCKS, BlockCache
+
+
+def make_block(number, fork=0):
+    return {
+        "number": number,
+        "hash": HexBytes(bytes([fork]) * 28 + number.to_bytes(4, "big")),
+    }
+
+
+def test_get_block():
+    """Test that blocks are served by hash, and by number only once deep enough"""
+    web3 = mock.Mock()
+    blocks = {}
+
+    def get_block(block_identifier, _):
+        if block_identifier == "latest":
+            return blocks[max(blocks)]
+        if isinstance(block_identifier, int):
+            return blocks[block_identifier]
+        return next(
+            block
+            for block in blocks.values()
+            if block["hash"] == HexBytes(block_identifier)
+        )
+
+    web3.eth.getBlock.side_effect = get_block
+    cache = BlockCache(max_blocks=3)
+
+    blocks[1] = make_block(1)
+    assert cache.get_block(web3, 1) == blocks[1]
+    assert cache.get_block(web3, blocks[1]["hash"].hex()) == blocks[1]
+    assert cache.get_block(web3, blocks[1]["hash"]) == blocks[1]
+    assert web3.eth.getBlock.call_count == 1
+
+    # blocks near the head are fetched by number again, as they may be reorganised
+    blocks[1] = make_block(1, fork=1)
+    assert cache.get_block(web3, 1) == blocks[1]
+    assert web3.eth.getBlock.call_count == 2
+
+    # deep blocks are served by number
+    blocks[1 + REORG_SAFETY_BLOCKS] = make_block(1 + REORG_SAFETY_BLOCKS)
+    assert cache.get_block(web3, "latest") == blocks[1 + REORG_SAFETY_BLOCKS]
+    assert cache.get_block(web3, "latest") == blocks[1 + REORG_SAFETY_BLOCKS]
+    assert cache.get_block(web3, 1) == blocks[1]
+    assert web3.eth.getBlock.call_count == 3
+
+    # blocks with transaction hashes don't serve requests for full transactions
+    assert cache.get_block(web3, 1, True) == blocks[1]
+    assert cache.get_block(web3, 1) == blocks[1]
+    assert web3.eth.getBlock.call_count == 4
+
+    # the least recently used blocks are evicted
+    latest_hash = blocks[1 + REORG_SAFETY_BLOCKS]["hash"]
+    blocks[2] = make_block(2)
+    blocks[3] = make_block(3)
+    cache.get_block(web3, 2)
+    cache.get_block(web3, 3)
+    assert web3.eth.getBlock.call_count == 6
+    cache.get_block(web3, blocks[1]["hash"])
+    assert web3.eth.getBlock.call_count == 6
+    cache.get_block(web3, latest_hash)
+    assert web3.eth.getBlock.call_count == 7
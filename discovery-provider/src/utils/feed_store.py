@@ -0,0 +1,186 @@
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.utils.config import shared_config
+
+logger = logging.getLogger(__name__)
+
+# Redis Key Convention:
+# feed:{generation}:{user_id} - sorted set of the user's feed entries scored by activity time
+# feed:{generation}:playlist-tracks:{period} - hash of the tracks released alongside a
+#   playlist by its owner, track_id -> playlist_id, recorded in that period
+#
+# Entries are "{source}:{kind}:{id}" where source is o (created by a followee)
+# or r (reposted by a followee) and kind is t (track) or p (playlist/album).
+# A feed only exists for users who have read it recently, the indexer only
+# fans out to feeds that exist and everyone else's is built on their next read.
+
+feed_generation_redis_key = "feed:generation"
+# Users whose feed should be built from the database
+feed_warmup_queue_redis_key = "feed:warmup-queue"
+
+# Entries kept per feed, more than a client pages through
+MAX_FEED_ENTRIES = 500
+# Feeds not read for this long expire and are rebuilt on their next read
+FEED_TTL_SEC = 7 * 24 * 60 * 60
+# Released tracks are recorded in a new hash each period and read from the
+# last two, a feed rebuilt from the database records those it still needs
+PLAYLIST_TRACKS_PERIOD_SEC = FEED_TTL_SEC
+
+ORIGINAL = "o"
+REPOST = "r"
+TRACK = "t"
+PLAYLIST = "p"
+
+# Marks a feed as built even when it has no entries, always ranked last
+_WARM_MARKER = "w"
+_WARM_MARKER_SCORE = float("-inf")
+
+# Adds ARGV[1] with score ARGV[2] to each feed in KEYS that exists, keeping the
+# first score an entry was added with and at most ARGV[3] entries
+_ADD_ENTRY_SCRIPT = """
+for i, key in ipairs(KEYS) do
+    if redis.call('exists', key) == 1 then
+        redis.call('zadd', key, 'NX', ARGV[2], ARGV[1])
+        redis.call('zremrangebyrank', key, 1, -(tonumber(ARGV[3]) + 1))
+    end
+end
+return 0
+"""
+
+# Feeds are fanned out to in batches of this many keys per script call
+_FAN_OUT_BATCH_SIZE = 1000
+
+
+def is_feed_store_enabled():
+    return shared_config["discprov"].getboolean("feed_store", fallback=False)
+
+
+def feed_entry(source, kind, item_id) -> str:
+    return f"{source}:{kind}:{item_id}"
+
+
+def parse_feed_entry(entry) -> Tuple[str, str, int]:
+    source, kind, item_id = entry.split(":")
+    return source, kind, int(item_id)
+
+
+def to_score(timestamp: datetime) -> float:
+    # timestamps are stored as naive UTC
+    return timestamp.replace(tzinfo=timezone.utc).timestamp()
+
+
+def _get_generation(redis) -> int:
+    generation = redis.get(feed_generation_redis_key)
+    return int(generation) if generation else 0
+
+
+def _feed_key(generation, user_id):
+    return f"feed:{generation}:{user_id}"
+
+
+def _playlist_tracks_key(generation, period):
+    return f"feed:{generation}:playlist-tracks:{period}"
+
+
+def _get_playlist_tracks_period() -> int:
+    return int(time.time() // PLAYLIST_TRACKS_PERIOD_SEC)
+
+
+def read_feed(redis, user_id) -> Optional[List[Tuple[str, float]]]:
+    """
+    Returns the user's feed entries and their scores, most recent first,
+    or None if the user has no feed built
+    """
+    key = _feed_key(_get_generation(redis), user_id)
+    pipeline = redis.pipeline()
+    pipeline.zrevrange(key, 0, -1, withscores=True)
+    pipeline.expire(key, FEED_TTL_SEC)
+    entries, _ = pipeline.execute()
+    if not entries:
+        return None
+    return [
+        (entry.decode("utf-8"), score)
+        for entry, score in entries
+        if entry != _WARM_MARKER.encode("utf-8")
+    ]
+
+
+def write_feed(redis, user_id, entries: Dict[str, float]):
+    """Replaces the user's feed with the `entries` scored most recent"""
+    key = _feed_key(_get_generation(redis), user_id)
+    top_entries = sorted(entries.items(), key=lambda e: e[1], reverse=True)[
+        :MAX_FEED_ENTRIES
+    ]
+    pipeline = redis.pipeline()
+    pipeline.delete(key)
+    pipeline.zadd(key, {_WARM_MARKER: _WARM_MARKER_SCORE, **dict(top_entries)})
+    pipeline.expire(key, FEED_TTL_SEC)
+    pipeline.execute()
+
+
+def add_feed_entry(redis, user_ids: Iterable[int], entry, score):
+    """Adds `entry` to the feeds of `user_ids` that are built"""
+    generation = _get_generation(redis)
+    add_entry = redis.register_script(_ADD_ENTRY_SCRIPT)
+    keys = [_feed_key(generation, user_id) for user_id in user_ids]
+    for i in range(0, len(keys), _FAN_OUT_BATCH_SIZE):
+        add_entry(
+            keys=keys[i : i + _FAN_OUT_BATCH_SIZE],
+            args=[entry, score, MAX_FEED_ENTRIES],
+        )
+
+
+def invalidate_feeds(redis, user_ids: Iterable[int]):
+    """Drops the feeds of `user_ids`, they are rebuilt on their next read"""
+    generation = _get_generation(redis)
+    keys = [_feed_key(generation, user_id) for user_id in user_ids]
+    if keys:
+        redis.delete(*keys)
+
+
+def invalidate_all_feeds(redis):
+    """Drops every feed, the previous generation's keys are left to expire"""
+    redis.incr(feed_generation_redis_key)
+
+
+def set_playlist_tracks(redis, playlist_tracks: Dict[int, int]):
+    """Records the playlist each track was released alongside in the current period"""
+    if not playlist_tracks:
+        return
+    key = _playlist_tracks_key(_get_generation(redis), _get_playlist_tracks_period())
+    pipeline = redis.pipeline()
+    pipeline.hmset(key, playlist_tracks)
+    # Outlives the next period, when it is still read
+    pipeline.expire(key, 2 * PLAYLIST_TRACKS_PERIOD_SEC)
+    pipeline.execute()
+
+
+def get_playlist_tracks(redis, track_ids: List[int]) -> Dict[int, int]:
+    """Returns the playlist each of `track_ids` was released alongside, if any"""
+    if not track_ids:
+        return {}
+    generation = _get_generation(redis)
+    period = _get_playlist_tracks_period()
+    pipeline = redis.pipeline()
+    pipeline.hmget(_playlist_tracks_key(generation, period - 1), track_ids)
+    pipeline.hmget(_playlist_tracks_key(generation, period), track_ids)
+    previous_playlist_ids, playlist_ids = pipeline.execute()
+    return {
+        track_id: int(playlist_id or previous_playlist_id)
+        for track_id, previous_playlist_id, playlist_id in zip(
+            track_ids, previous_playlist_ids, playlist_ids
+        )
+        if playlist_id is not None or previous_playlist_id is not None
+    }
+
+
+def queue_feed_warmup(redis, user_id):
+    redis.sadd(feed_warmup_queue_redis_key, user_id)
+
+
+def pop_feed_warmups(redis, count) -> List[int]:
+    user_ids = redis.spop(feed_warmup_queue_redis_key, count)
+    return [int(user_id) for user_id in user_ids or []]
@@ -103,10 +103,33 @@ def is_fqdn(endpoint_str):
 
 
 def query_result_to_list(query_result):
-    results = []
-    for row in query_result:
-        results.append(model_to_dictionary(row, None))
-    return results
+    return [model_to_dictionary(row) for row in query_result]
+
+
+@functools.lru_cache(maxsize=None)
+def _get_conversion_plan(model_class, exclude_keys):
+    """Returns the column, property and relationship keys of `model_class` that
+    `model_to_dictionary` includes, computed once per class and excluded keys.
+    """
+    columns = model_class.__table__.columns.keys()
+    relationships = model_class.__mapper__.relationships.keys()
+    properties = []
+    for key in list(set(dir(model_class)) - set(columns) - set(relationships)):
+        attr = getattr(model_class, key)
+        if not callable(attr) and isinstance(attr, property):
+            properties.append(key)
+
+    exclude_keys = exclude_keys.union(getattr(model_class, "exclude_keys", []))
+    assert exclude_keys.issubset(set(properties).union(columns))
+
+    def is_included(key):
+        return key not in exclude_keys and not key.startswith("_")
+
+    return (
+        tuple(filter(is_included, columns)),
+        tuple(filter(is_included, properties)),
+        tuple(filter(is_included, relationships)),
+    )
 
 
 def model_to_dictionary(model, exclude_keys=None):
@@ -119,43 +142,38 @@ def model_to_dictionary(model, exclude_keys=None):
     `exclude_keys` property or attribute.
     - Excludes any property or attribute with a leading underscore.
     """
-    model_dict = {}
-
-    columns = model.__table__.columns.keys()
-    relationships = model.__mapper__.relationships.keys()
-    properties = []
-    for key in list(set(dir(model)) - set(columns) - set(relationships)):
-        if hasattr(type(model), key):
-            attr = getattr(type(model), key)
-            if not callable(attr) and isinstance(attr, property):
-                properties.append(key)
-
-    if exclude_keys is None:
-        exclude_keys = []
-    if hasattr(model, "exclude_keys"):
-        exclude_keys.extend(model.exclude_keys)
-
-    assert set(exclude_keys).issubset(set(properties).union(columns))
+    columns, properties, relationships = _get_conversion_plan(
+        type(model), frozenset(exclude_keys or [])
+    )
 
-    for key in columns:
-        if key not in exclude_keys and not key.startswith("_"):
-            model_dict[key] = getattr(model, key)
+    model_dict = {key: getattr(model, key) for key in columns}
 
     for key in properties:
-        if key not in exclude_keys and not key.startswith("_"):
-            model_dict[key] = getattr(model, key)
+        model_dict[key] = getattr(model, key)
 
     for key in relationships:
-        if key not in exclude_keys and not key.startswith("_"):
-            attr = getattr(model, key)
-            if isinstance(attr, list):
-                model_dict[key] = query_result_to_list(attr)
-            else:
-                model_dict[key] = model_to_dictionary(attr)
+        attr = getattr(model, key)
+        if isinstance(attr, list):
+            model_dict[key] = query_result_to_list(attr)
+        else:
+            model_dict[key] = model_to_dictionary(attr)
 
     return model_dict
 
 
+@functools.lru_cache(maxsize=None)
+def model_columns(model):
+    """Returns the columns of the given SQLAlchemy model, to query rows as
+    tuples that `tuple_to_model_dictionary` converts without loading the model.
+    """
+    return tuple(model.__table__.columns)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_column_keys(model):
+    return tuple(model.__table__.columns.keys())
+
+
 # Convert a tuple of model format into the proper model itself represented as a dictionary.
 # The number of entries in the tuple, must map the model.
 #
@@ -164,12 +182,18 @@ def model_to_dictionary(model, exclude_keys=None):
 # a dictionary with column keys.
 def tuple_to_model_dictionary(t, model):
     """Converts the given tuple into the proper SQLAlchemy model object in dictionary form."""
-    keys = model.__table__.columns.keys()
+    keys = _get_column_keys(model)
     assert len(t) == len(keys)
 
     return dict(zip(keys, t))
 
 
+def query_tuples_to_list(query_result, model):
+    """Converts rows queried with `model_columns(model)` into model dictionaries"""
+    keys = _get_column_keys(model)
+    return [dict(zip(keys, row)) for row in query_result]
+
+
 log_format = {
     "levelno": "levelno",
     "level": "levelname",
@@ -0,0 +1,127 @@
+import json
+import logging
+import os
+import threading
+import time
+
+from src.utils.redis_connection import get_redis
+from src.utils.redis_constants import (
+    indexed_block_channel,
+    most_recent_indexed_block_hash_redis_key,
+    most_recent_indexed_block_redis_key,
+)
+
+logger = logging.getLogger(__name__)
+
+# Longest a request may wait for a block to be indexed
+MAX_WAIT_SEC = 30
+
+# Server threads per process, as set by scripts/prod-server.sh
+GUNICORN_THREADS = int(os.getenv("audius_gunicorn_threads") or 8)
+
+# Requests per process that may wait at once, past this they are answered
+# immediately so waiting can take at most half the server threads
+MAX_WAITERS = max(GUNICORN_THREADS // 2, 1)
+
+RECONNECT_DELAY_SEC = 1
+
+
+def publish_indexed_block(redis, blocknumber, blockhash):
+    redis.publish(
+        indexed_block_channel, json.dumps({"number": blocknumber, "hash": blockhash})
+    )
+
+
+class IndexedBlockWatcher:
+    """
+    Follows the blocks published by the indexer on one pub/sub connection per
+    process, and wakes every request waiting on a block at once when it is indexed.
+    """
+
+    def __init__(self, redis):
+        self._redis = redis
+        self._condition = threading.Condition()
+        self._latest_blocknumber = None
+        self._latest_blockhash = None
+        self._waiters = 0
+        self._thread = None
+
+    def _set_latest(self, blocknumber, blockhash):
+        with self._condition:
+            self._latest_blocknumber = blocknumber
+            self._latest_blockhash = blockhash
+            self._condition.notify_all()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(indexed_block_channel)
+                # Read after subscribing so no block is missed in between
+                blocknumber = self._redis.get(most_recent_indexed_block_redis_key)
+                blockhash = self._redis.get(most_recent_indexed_block_hash_redis_key)
+                if blocknumber is not None:
+                    self._set_latest(
+                        int(blocknumber), blockhash and blockhash.decode("utf-8")
+                    )
+                for message in pubsub.listen():
+                    block = json.loads(message["data"])
+                    self._set_latest(block["number"], block["hash"])
+            except Exception as e:
+                logger.error(
+                    f"indexed_block_watcher.py | Lost indexed block subscription: {e}"
+                )
+                time.sleep(RECONNECT_DELAY_SEC)
+
+    def _start(self):
+        with self._condition:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._listen, name="indexed-block-watcher", daemon=True
+                )
+                self._thread.start()
+
+    def wait_for_block(self, blocknumber, timeout):
+        """
+        Waits up to `timeout` seconds, at most MAX_WAIT_SEC, until a block numbered
+        `blocknumber` or later has been indexed. Returns whether one has.
+        """
+        self._start()
+        deadline = time.monotonic() + min(timeout, MAX_WAIT_SEC)
+        with self._condition:
+            if self._waiters >= MAX_WAITERS:
+                return self._is_indexed(blocknumber)
+            self._waiters += 1
+            try:
+                while not self._is_indexed(blocknumber):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._condition.wait(remaining)
+                return True
+            finally:
+                self._waiters -= 1
+
+    def _is_indexed(self, blocknumber):
+        return (
+            self._latest_blocknumber is not None
+            and self._latest_blocknumber >= blocknumber
+        )
+
+
+class _ProcessWatcher:
+    """The watcher shared by every request of this process, created on first use"""
+
+    def __init__(self):
+        self.watcher = None
+        self.lock = threading.Lock()
+
+
+_process = _ProcessWatcher()
+
+
+def get_indexed_block_watcher():
+    with _process.lock:
+        if _process.watcher is None:
+            _process.watcher = IndexedBlockWatcher(get_redis())
+        return _process.watcher
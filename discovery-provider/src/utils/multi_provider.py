@@ -1,23 +1,248 @@
-import random
+import concurrent.futures
+import json
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List
+
+import requests
 from web3.providers import HTTPProvider, BaseProvider
 
+# Number of seconds before a request times out
+REQUEST_TIMEOUT_SECONDS = 10
+# Weight of the latest request in the moving averages endpoints are ranked by
+ENDPOINT_HEALTH_DECAY = 0.2
+# Number of seconds a failed request counts for when ranking endpoints
+ENDPOINT_ERROR_PENALTY_SECONDS = 10
+# Number of recent request latencies the hedge delay is computed from
+LATENCY_SAMPLES = 100
+# Number of seconds to wait on an endpoint before also sending the request to the
+# next, until it has enough latency samples for a p95
+DEFAULT_HEDGE_DELAY_SECONDS = 1
+# Bounds of the p95 based hedge delay
+MIN_HEDGE_DELAY_SECONDS = 0.05
+MAX_HEDGE_DELAY_SECONDS = 5
+# Number of consecutive failures after which an endpoint's circuit opens
+CIRCUIT_FAILURE_THRESHOLD = 5
+# Number of seconds requests skip an endpoint once its circuit opens. The circuit
+# then half opens, letting a single probe request through at a time, and closes
+# if the probe succeeds or opens again if it fails.
+CIRCUIT_OPEN_SECONDS = 30
+
+
+class EndpointStats:
+    """
+    Moving averages of the latency and error rate of an endpoint's requests, its
+    recent latencies and its circuit breaker
+    """
+
+    def __init__(self) -> None:
+        self.latency = 0.0
+        self.error_rate = 0.0
+        self.latencies: deque = deque(maxlen=LATENCY_SAMPLES)
+        self.num_requests = 0
+        self.num_errors = 0
+        self.consecutive_failures = 0
+        self.circuit_open_until = 0.0
+        # Whether a probe request of the half open circuit is in flight
+        self.is_probing = False
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, is_error: bool):
+        with self._lock:
+            self.is_probing = False
+            self.num_requests += 1
+            self.latency += ENDPOINT_HEALTH_DECAY * (latency - self.latency)
+            self.error_rate += ENDPOINT_HEALTH_DECAY * (
+                float(is_error) - self.error_rate
+            )
+            if is_error:
+                self.num_errors += 1
+                self.consecutive_failures += 1
+                if self.consecutive_failures >= CIRCUIT_FAILURE_THRESHOLD:
+                    self.circuit_open_until = time.time() + CIRCUIT_OPEN_SECONDS
+            else:
+                self.latencies.append(latency)
+                self.consecutive_failures = 0
+                self.circuit_open_until = 0.0
+
+    def record_pending(self, latency: float):
+        """Ranks the endpoint by a request still pending after `latency` seconds,
+        until it completes"""
+        with self._lock:
+            self.latency += ENDPOINT_HEALTH_DECAY * (latency - self.latency)
+
+    def is_circuit_open(self) -> bool:
+        """Whether requests skip the endpoint, while its circuit is open or its half
+        open circuit's probe is in flight"""
+        return time.time() < self.circuit_open_until or self.is_probing
+
+    def try_request(self) -> bool:
+        """Returns whether a request can be sent to the endpoint, claiming the probe
+        request if its circuit is half open"""
+        with self._lock:
+            if time.time() < self.circuit_open_until or self.is_probing:
+                return False
+            if self.consecutive_failures >= CIRCUIT_FAILURE_THRESHOLD:
+                self.is_probing = True
+            return True
+
+    def score(self) -> float:
+        """Expected cost of a request in seconds, healthier endpoints score lower"""
+        return self.latency + self.error_rate * ENDPOINT_ERROR_PENALTY_SECONDS
+
+    def p95_latency(self) -> float:
+        with self._lock:
+            latencies = sorted(self.latencies)
+        if not latencies:
+            return 0.0
+        return latencies[math.ceil(len(latencies) * 0.95) - 1]
+
+    def hedge_delay(self) -> float:
+        """Number of seconds to wait on a request before also sending it elsewhere"""
+        if len(self.latencies) < LATENCY_SAMPLES // 10:
+            return DEFAULT_HEDGE_DELAY_SECONDS
+        return min(
+            max(self.p95_latency(), MIN_HEDGE_DELAY_SECONDS), MAX_HEDGE_DELAY_SECONDS
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "latency": self.latency,
+            "p95_latency": self.p95_latency(),
+            "error_rate": self.error_rate,
+            "num_requests": self.num_requests,
+            "num_errors": self.num_errors,
+            "circuit_open": self.is_circuit_open(),
+        }
+
 
 class MultiProvider(BaseProvider):
     """
-    Implements a custom web3 provider
+    Implements a custom web3 provider, sending each request to the healthiest of
+    several endpoints and hedging it to the next healthiest if it's slow or fails
 
     ref: https://web3py.readthedocs.io/en/stable/internals.html#writing-your-own-provider
     """
 
     def __init__(self, providers):
         self.providers = [HTTPProvider(provider) for provider in providers.split(",")]
+        # keep-alive connections to each endpoint
+        self.sessions = [requests.Session() for _ in self.providers]
+        self.stats = [EndpointStats() for _ in self.providers]
 
     def make_request(self, method, params):
-        for provider in random.sample(self.providers, k=len(self.providers)):
+        def send(index):
+            provider = self.providers[index]
+            raw_response = self._post(
+                index, provider.encode_rpc_request(method, params)
+            )
+            return provider.decode_rpc_response(raw_response)
+
+        return self._make_hedged_request(send)
+
+    def make_batch_request(self, batch):
+        """
+        Sends the (method, params) requests of `batch` in a single JSON-RPC batch and
+        returns their responses in the same order
+        """
+        request_data = json.dumps(
+            [
+                {"jsonrpc": "2.0", "method": method, "params": params, "id": request_id}
+                for request_id, (method, params) in enumerate(batch)
+            ]
+        ).encode("utf-8")
+
+        def send(index):
+            responses = json.loads(self._post(index, request_data))
+            if not isinstance(responses, list):
+                # The whole batch was rejected
+                raise Exception(f"Batch request failed: {responses}")
+            return responses
+
+        responses = self._make_hedged_request(send)
+        responses_by_id = {response.get("id"): response for response in responses}
+        return [responses_by_id.get(request_id) for request_id in range(len(batch))]
+
+    def get_endpoint_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Returns the request statistics of each endpoint by URI"""
+        return {
+            provider.endpoint_uri: stats.to_dict()
+            for provider, stats in zip(self.providers, self.stats)
+        }
+
+    def _post(self, index, request_data: bytes) -> bytes:
+        provider = self.providers[index]
+        request_kwargs = dict(provider.get_request_kwargs())
+        request_kwargs.setdefault("timeout", REQUEST_TIMEOUT_SECONDS)
+        response = self.sessions[index].post(
+            provider.endpoint_uri, data=request_data, **request_kwargs
+        )
+        response.raise_for_status()
+        return response.content
+
+    def _send(self, index, send: Callable[[int], Any]):
+        start_time = time.time()
+        try:
+            result = send(index)
+        except Exception:
+            self.stats[index].record(time.time() - start_time, True)
+            raise
+        self.stats[index].record(time.time() - start_time, False)
+        return result
+
+    def _submit(self, index, send: Callable[[int], Any]) -> concurrent.futures.Future:
+        """
+        Sends a request in its own thread. A pool would have to wait on the requests
+        still in flight after being hedged, which are left to finish on their own.
+        """
+        future: concurrent.futures.Future = concurrent.futures.Future()
+
+        def run():
             try:
-                return provider.make_request(method, params)
-            except Exception:
+                future.set_result(self._send(index, send))
+            except Exception as e:
+                future.set_exception(e)
+
+        threading.Thread(target=run, daemon=True).start()
+        return future
+
+    def _get_endpoints_by_health(self) -> List[int]:
+        return sorted(
+            range(len(self.providers)), key=lambda index: self.stats[index].score()
+        )
+
+    def _make_hedged_request(self, send: Callable[[int], Any]):
+        """Sends a request to the healthiest endpoint, also sending it to the next
+        healthiest each time the last endpoint's hedge delay passes without a
+        successful response or a request fails. Returns the first successful
+        response."""
+        pending: set = set()
+        endpoints = self._get_endpoints_by_health()
+        # Skip endpoints with open circuits unless every circuit is open
+        is_every_circuit_open = all(
+            self.stats[index].is_circuit_open() for index in endpoints
+        )
+        for index in endpoints:
+            if not is_every_circuit_open and not self.stats[index].try_request():
                 continue
+            hedge_delay = self.stats[index].hedge_delay()
+            pending.add(self._submit(index, send))
+            done, pending = concurrent.futures.wait(
+                pending,
+                timeout=hedge_delay,
+                return_when=concurrent.futures.FIRST_COMPLETED,
+            )
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+            if not done:
+                self.stats[index].record_pending(hedge_delay)
+
+        for future in concurrent.futures.as_completed(pending):
+            if future.exception() is None:
+                return future.result()
         raise Exception("All requests failed")
 
     def isConnected(self):
@@ -0,0 +1,120 @@
+import json
+import time
+from unittest import mock
+
+import pytest
+from src.utils.multi_provider import CIRCUIT_FAILURE_THRESHOLD, MultiProvider
+
+
+def mock_session(respond=None, delay=0, error=None):
+    session = mock.Mock()
+
+    def post(_, data, **__):
+        time.sleep(delay)
+        if error:
+            raise error
+        response = mock.Mock()
+        response.content = json.dumps(respond(json.loads(data))).encode("utf-8")
+        return response
+
+    session.post.side_effect = post
+    return session
+
+
+def respond_with_method(request):
+    if isinstance(request, list):
+        return [
+            respond_with_method(request)
+            for request in reversed(request)
+            if request["method"] != "missing"
+        ]
+    return {"jsonrpc": "2.0", "id": request["id"], "result": request["method"]}
+
+
+def test_make_batch_request():
+    """Test that batched responses are returned in the order of their requests"""
+    provider = MultiProvider("http://first,http://second")
+    provider.sessions = [
+        mock_session(error=Exception("unavailable")),
+        mock_session(respond_with_method),
+    ]
+    responses = provider.make_batch_request(
+        [("eth_call", []), ("missing", []), ("eth_blockNumber", [])]
+    )
+    assert [response and response["result"] for response in responses] == [
+        "eth_call",
+        None,
+        "eth_blockNumber",
+    ]
+
+    # test exception raised if the batch is rejected by all providers
+    provider.sessions = [
+        mock_session(lambda _: {"jsonrpc": "2.0", "id": None, "error": {}})
+        for _ in range(2)
+    ]
+    with pytest.raises(Exception):
+        provider.make_batch_request([("eth_call", [])])
+
+
+@mock.patch("src.utils.multi_provider.DEFAULT_HEDGE_DELAY_SECONDS", 0.1)
+def test_make_request():
+    """Test that requests go to the healthiest endpoint and slow ones are hedged"""
+    provider = MultiProvider("http://first,http://second,http://third")
+    provider.sessions = [
+        mock_session(respond_with_method, delay=1),
+        mock_session(error=Exception("unavailable")),
+        mock_session(respond_with_method),
+    ]
+    assert provider.make_request("eth_blockNumber", [])["result"] == "eth_blockNumber"
+    assert provider._get_endpoints_by_health()[0] == 2
+
+    provider.make_request("eth_blockNumber", [])
+    assert provider.sessions[2].post.call_count == 2
+    stats = provider.get_endpoint_stats()
+    assert stats["http://third"]["num_requests"] == 2
+    assert stats["http://second"]["num_errors"] == 1
+
+
+def test_circuit_breaker():
+    """Test that endpoints failing repeatedly are skipped while their circuit is open"""
+    provider = MultiProvider("http://first,http://second")
+    provider.sessions = [
+        mock_session(error=Exception("unavailable")),
+        mock_session(respond_with_method),
+    ]
+    for _ in range(CIRCUIT_FAILURE_THRESHOLD):
+        provider.stats[0].record(0, True)
+    assert provider.get_endpoint_stats()["http://first"]["circuit_open"]
+
+    provider.make_request("eth_blockNumber", [])
+    assert provider.sessions[0].post.call_count == 0
+
+    # test that an endpoint is still tried when every circuit is open
+    for _ in range(CIRCUIT_FAILURE_THRESHOLD):
+        provider.stats[1].record(0, True)
+    assert provider.make_request("eth_blockNumber", [])["result"] == "eth_blockNumber"
+    assert not provider.get_endpoint_stats()["http://second"]["circuit_open"]
+
+
+def test_circuit_half_open():
+    """Test that a single probe request is let through once an open circuit expires"""
+    provider = MultiProvider("http://first,http://second")
+    provider.sessions = [mock_session(respond_with_method) for _ in range(2)]
+    stats = provider.stats[0]
+    for _ in range(CIRCUIT_FAILURE_THRESHOLD):
+        stats.record(0, True)
+    assert not stats.try_request()
+
+    stats.circuit_open_until = 0.0
+    assert stats.try_request()
+    assert stats.is_circuit_open()
+    assert not stats.try_request()
+
+    # test that the circuit opens again if the probe fails and closes if it succeeds
+    stats.record(0, True)
+    assert stats.is_circuit_open()
+    stats.circuit_open_until = 0.0
+    assert stats.try_request()
+    stats.record(0, False)
+    assert not stats.is_circuit_open()
+    assert stats.try_request() and stats.try_request()
@@ -0,0 +1,65 @@
+import time
+from contextlib import contextmanager
+from sqlalchemy.event import listen, remove
+
+
+class QueryStats:
+    """The number of queries run, bytes of rows they returned and seconds they took"""
+
+    def __init__(self):
+        self.num_queries = 0
+        self.num_bytes = 0
+        self.seconds = 0.0
+
+    def __repr__(self):
+        return (
+            f"{self.num_queries} queries, {self.num_bytes} bytes, "
+            f"{round(self.seconds * 1000)} ms"
+        )
+
+
+def get_rows_size(cursor):
+    """
+    Returns the size in bytes of the rows of a query as text, fetching them from the
+    client side cursor and scrolling back for the caller to fetch them again
+    """
+    rows = cursor.fetchall()
+    cursor.scroll(0, mode="absolute")
+    return sum(
+        len(str(value).encode("utf-8"))
+        for row in rows
+        for value in row
+        if value is not None
+    )
+
+
+@contextmanager
+def measure_queries(engine):
+    """
+    Measures the queries run on `engine` within the block, for comparing the cost of
+    list routes before and after a change to what they select
+
+    Usage:
+        with measure_queries(session.get_bind()) as stats:
+            search_track_tags(session, args)
+        logger.info(f"search_track_tags | {stats}")
+    """
+    stats = QueryStats()
+    start_times = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        start_times.append(time.perf_counter())
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, many):
+        stats.seconds += time.perf_counter() - start_times.pop()
+        stats.num_queries += 1
+        if cursor.description is not None:
+            stats.num_bytes += get_rows_size(cursor)
+
+    listen(engine, "before_cursor_execute", before_cursor_execute)
+    listen(engine, "after_cursor_execute", after_cursor_execute)
+    try:
+        yield stats
+    finally:
+        remove(engine, "before_cursor_execute", before_cursor_execute)
+        remove(engine, "after_cursor_execute", after_cursor_execute)
@@ -2,6 +2,8 @@ latest_block_redis_key = "latest_block_from_chain"
 latest_block_hash_redis_key = "latest_blockhash_from_chain"
 most_recent_indexed_block_redis_key = "most_recently_indexed_block_from_db"
 most_recent_indexed_block_hash_redis_key = "most_recently_indexed_block_hash_from_db"
+# Pub/sub channel the number and hash of each indexed block is published to
+indexed_block_channel = "indexed_block"
 most_recent_indexed_ipld_block_redis_key = "most_recent_indexed_ipld_block_redis_key"
 most_recent_indexed_ipld_block_hash_redis_key = (
     "most_recent_indexed_ipld_block_hash_redis_key"
@@ -12,3 +14,9 @@ challenges_last_processed_event_redis_key = "challenges:last-processed-event"
 user_balances_refresh_last_completion_redis_key = "user_balances:last-completion"
 latest_sol_play_tx_key = "latest_sol_play_tx_key"
 index_eth_last_completion_redis_key = "index_eth:last-completion"
+# Latest block the notification log failed to append, it covers the blocks after it
+notification_log_gap_redis_key = "notification_log:gap-blocknumber"
+index_plays_last_completion_redis_key = "index_plays:last-completion"
+index_plays_last_run_timings_redis_key = "index_plays:last-run-timings"
+# Request statistics of each eth provider endpoint, from the user balance task
+eth_provider_stats_redis_key = "eth_provider:endpoint-stats"
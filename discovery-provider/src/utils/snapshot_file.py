@@ -0,0 +1,75 @@
+import json
+import mmap
+import os
+import struct
+from array import array
+from typing import Dict
+
+_HEADER_LEN = struct.Struct("<Q")
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+def write_snapshot_file(path, magic: bytes, arrays: Dict[str, array], **metadata):
+    """
+    Writes `arrays` and `metadata` to `path` in a layout that can be memory mapped
+    by SnapshotFile. The file is written next to `path` and renamed over it, so
+    processes that have the previous snapshot mapped keep reading it until they reload.
+    """
+    sections = {}
+    offset = 0
+    for name, values in arrays.items():
+        length = len(values) * values.itemsize
+        sections[name] = [offset, length, values.typecode]
+        offset = _align(offset + length)
+
+    header_bytes = json.dumps({"metadata": metadata, "sections": sections}).encode(
+        "utf-8"
+    )
+    data_start = _align(len(magic) + _HEADER_LEN.size + len(header_bytes))
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(magic)
+        f.write(_HEADER_LEN.pack(len(header_bytes)))
+        f.write(header_bytes)
+        for name, values in arrays.items():
+            f.seek(data_start + sections[name][0])
+            values.tofile(f)
+    os.replace(tmp_path, path)
+
+
+class SnapshotFile:
+    """
+    Read only, memory mapped view of a file written by write_snapshot_file.
+    Every process mapping the same file shares its pages.
+    """
+
+    def __init__(self, path, magic: bytes):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[: len(magic)] != magic:
+            raise ValueError(f"{path} is not a {magic.decode()} snapshot")
+
+        header_start = len(magic) + _HEADER_LEN.size
+        (header_len,) = _HEADER_LEN.unpack_from(self._mmap, len(magic))
+        header = json.loads(self._mmap[header_start : header_start + header_len])
+
+        self.metadata = header["metadata"]
+        self._sections = header["sections"]
+        self._data_start = _align(header_start + header_len)
+        self._view = memoryview(self._mmap)
+
+    def __contains__(self, name):
+        return name in self._sections
+
+    def array(self, name) -> memoryview:
+        """Returns the array stored as `name`, read directly from the mapped file"""
+        offset, length, typecode = self._sections[name]
+        start = self._data_start + offset
+        return self._view[start : start + length].cast(typecode)
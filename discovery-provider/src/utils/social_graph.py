@@ -0,0 +1,275 @@
+import logging
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.utils.config import shared_config
+from src.utils.snapshot_file import SnapshotFile, write_snapshot_file
+
+logger = logging.getLogger(__name__)
+
+# A graph whose delta was last written longer ago than this is not used,
+# follow queries go to the database until the indexer catches up again
+MAX_SNAPSHOT_AGE_SEC = 60
+
+# How often a process checks whether a newer snapshot was written
+RELOAD_CHECK_INTERVAL_SEC = 2
+
+_BASE_MAGIC = b"AUDSGB01"
+_DELTA_MAGIC = b"AUDSGD01"
+
+_EMPTY = array("i")
+
+
+def _csr_arrays(name, pairs: Iterable[Tuple[int, int]]):
+    """
+    Builds the compressed sparse rows of `pairs`, which must be sorted.
+    keys holds each distinct source and ids[offsets[i]:offsets[i + 1]]
+    the sorted targets of keys[i].
+    """
+    keys = array("i")
+    offsets = array("Q", [0])
+    ids = array("i")
+    for source, target in pairs:
+        if not keys or keys[-1] != source:
+            if keys:
+                offsets.append(len(ids))
+            keys.append(source)
+        ids.append(target)
+    if keys:
+        offsets.append(len(ids))
+    return {f"{name}.keys": keys, f"{name}.offsets": offsets, f"{name}.ids": ids}
+
+
+class _Adjacency:
+    def __init__(self, snapshot: SnapshotFile, name):
+        self.keys = snapshot.array(f"{name}.keys")
+        self.offsets = snapshot.array(f"{name}.offsets")
+        self.ids = snapshot.array(f"{name}.ids")
+
+    def get(self, user_id):
+        i = bisect_left(self.keys, user_id)
+        if i == len(self.keys) or self.keys[i] != user_id:
+            return _EMPTY
+        return self.ids[self.offsets[i] : self.offsets[i + 1]]
+
+    def contains(self, user_id, target):
+        ids = self.get(user_id)
+        i = bisect_left(ids, target)
+        return i < len(ids) and ids[i] == target
+
+    def pairs(self):
+        for i, user_id in enumerate(self.keys):
+            for target in self.ids[self.offsets[i] : self.offsets[i + 1]]:
+                yield user_id, target
+
+
+def write_base_snapshot(
+    path,
+    forward_pairs: Iterable[Tuple[int, int]],
+    reverse_pairs: Iterable[Tuple[int, int]],
+    **metadata,
+):
+    """
+    Writes the current follows to `path`. `forward_pairs` are (follower, followee)
+    sorted by follower then followee, `reverse_pairs` are (followee, follower)
+    sorted by followee then follower.
+    """
+    arrays = _csr_arrays("forward", forward_pairs)
+    arrays.update(_csr_arrays("reverse", reverse_pairs))
+    write_snapshot_file(path, _BASE_MAGIC, arrays, **metadata)
+
+
+def write_delta_snapshot(path, changes: Dict[Tuple[int, int], bool], **metadata):
+    """
+    Writes the follows changed since the base snapshot to `path`.
+    `changes` maps (follower, followee) to whether the follow is now current.
+    """
+    added = sorted(pair for pair, is_following in changes.items() if is_following)
+    removed = sorted(pair for pair, is_following in changes.items() if not is_following)
+
+    arrays = _csr_arrays("added_forward", added)
+    arrays.update(_csr_arrays("added_reverse", sorted((b, a) for a, b in added)))
+    arrays.update(_csr_arrays("removed_forward", removed))
+    arrays.update(_csr_arrays("removed_reverse", sorted((b, a) for a, b in removed)))
+    write_snapshot_file(path, _DELTA_MAGIC, arrays, **metadata)
+
+
+class SocialGraph:
+    """
+    Read only view of the current follows, for answering follow queries without
+    scanning the follows history.
+
+    The follows are held as compressed sparse rows in both directions, in a base
+    snapshot rebuilt from the database, plus a small delta of the follows indexed
+    since then. Both are memory mapped, so every process shares the same pages.
+    """
+
+    def __init__(self, base: SnapshotFile, delta: Optional[SnapshotFile]):
+        self.built_at = base.metadata["built_at"]
+        self.blocknumber = base.metadata["blocknumber"]
+        self.blockhash = base.metadata["blockhash"]
+        self.updated_at = self.built_at
+
+        self._followees = _Adjacency(base, "forward")
+        self._followers = _Adjacency(base, "reverse")
+        self._delta = None
+
+        # A delta written for an older base is ignored until it is rewritten
+        if delta is not None and delta.metadata["base_built_at"] == self.built_at:
+            self.blocknumber = delta.metadata["blocknumber"]
+            self.blockhash = delta.metadata["blockhash"]
+            self.updated_at = delta.metadata["updated_at"]
+            self._delta = {
+                name: _Adjacency(delta, name)
+                for name in [
+                    "added_forward",
+                    "added_reverse",
+                    "removed_forward",
+                    "removed_reverse",
+                ]
+            }
+
+    def _merged(self, base: _Adjacency, direction, user_id):
+        ids = base.get(user_id)
+        if self._delta is None:
+            return ids
+        added = self._delta[f"added_{direction}"].get(user_id)
+        removed = self._delta[f"removed_{direction}"].get(user_id)
+        if not added and not removed:
+            return ids
+        merged = set(ids)
+        merged.difference_update(removed)
+        merged.update(added)
+        return sorted(merged)
+
+    def followees(self, user_id) -> List[int]:
+        """Returns the ids of the users `user_id` follows, in ascending order"""
+        return list(self._merged(self._followees, "forward", user_id))
+
+    def followers(self, user_id) -> List[int]:
+        """Returns the ids of the users following `user_id`, in ascending order"""
+        return list(self._merged(self._followers, "reverse", user_id))
+
+    def is_following(self, follower_user_id, followee_user_id) -> bool:
+        if self._delta is not None:
+            if self._delta["added_forward"].contains(
+                follower_user_id, followee_user_id
+            ):
+                return True
+            if self._delta["removed_forward"].contains(
+                follower_user_id, followee_user_id
+            ):
+                return False
+        return self._followees.contains(follower_user_id, followee_user_id)
+
+    def follow_intersection(self, followee_user_id, follower_user_id) -> List[int]:
+        """Returns the ids of the users following `followee_user_id` that `follower_user_id` follows"""
+        followers = self._merged(self._followers, "reverse", followee_user_id)
+        followees = self._merged(self._followees, "forward", follower_user_id)
+        if len(followers) > len(followees):
+            followers, followees = followees, followers
+        other = set(followees)
+        return [user_id for user_id in followers if user_id in other]
+
+    def followee_follow_counts(self, follower_user_id, user_ids) -> Dict[int, int]:
+        """
+        Returns, for each of `user_ids`, how many of the users that `follower_user_id`
+        follows also follow them.
+        """
+        followees = self.followees(follower_user_id)
+        followee_set = set(followees)
+        counts = {}
+        for user_id in user_ids:
+            followers = self._merged(self._followers, "reverse", user_id)
+            # Probe from whichever side is smaller
+            if len(followees) < len(followers):
+                count = sum(
+                    1
+                    for followee_id in followees
+                    if self.is_following(followee_id, user_id)
+                )
+            else:
+                count = sum(
+                    1 for follower_id in followers if follower_id in followee_set
+                )
+            if count:
+                counts[user_id] = count
+        return counts
+
+    def delta_changes(self) -> Dict[Tuple[int, int], bool]:
+        """Returns the follows changed since the base snapshot, used to extend the delta"""
+        changes: Dict[Tuple[int, int], bool] = {}
+        if self._delta is not None:
+            for pair in self._delta["added_forward"].pairs():
+                changes[pair] = True
+            for pair in self._delta["removed_forward"].pairs():
+                changes[pair] = False
+        return changes
+
+
+def get_social_graph_paths():
+    base_path = shared_config["discprov"]["social_graph_path"]
+    return base_path, f"{base_path}.delta"
+
+
+def load_social_graph(base_path, delta_path) -> Optional[SocialGraph]:
+    try:
+        base = SnapshotFile(base_path, _BASE_MAGIC)
+    except FileNotFoundError:
+        return None
+    delta: Optional[SnapshotFile]
+    try:
+        delta = SnapshotFile(delta_path, _DELTA_MAGIC)
+    except FileNotFoundError:
+        delta = None
+    return SocialGraph(base, delta)
+
+
+class _LoadedGraph:
+    """The snapshots this process has mapped and when their files were last checked"""
+
+    def __init__(self):
+        self.graph: Optional[SocialGraph] = None
+        self.mtimes = None
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+
+
+_loaded = _LoadedGraph()
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def get_social_graph() -> Optional[SocialGraph]:
+    """
+    Returns this process's view of the latest social graph snapshot, or None if
+    there is none or it is too far behind, in which case callers query the database.
+    """
+    now = time.time()
+    if now - _loaded.checked_at >= RELOAD_CHECK_INTERVAL_SEC:
+        with _loaded.lock:
+            if now - _loaded.checked_at >= RELOAD_CHECK_INTERVAL_SEC:
+                _loaded.checked_at = now
+                base_path, delta_path = get_social_graph_paths()
+                mtimes = (_mtime(base_path), _mtime(delta_path))
+                if mtimes != _loaded.mtimes:
+                    try:
+                        _loaded.graph = load_social_graph(base_path, delta_path)
+                        _loaded.mtimes = mtimes
+                    except Exception as e:
+                        logger.error(f"social_graph.py | Unable to load snapshot: {e}")
+                        _loaded.graph = None
+
+    graph = _loaded.graph
+    if graph is None or now - graph.updated_at > MAX_SNAPSHOT_AGE_SEC:
+        return None
+    return graph
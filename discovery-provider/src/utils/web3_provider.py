@@ -2,12 +2,16 @@
 Interface for using a web3 provider
 """
 
+from functools import lru_cache
+
 from web3 import HTTPProvider, Web3
 from src.utils import helpers
 from src.utils.config import shared_config
 
 
+@lru_cache(maxsize=None)
 def get_web3():
+    """Returns the process' Web3 instance, whose provider keeps its connections alive"""
     web3endpoint = helpers.get_web3_endpoint(shared_config)
     web3 = Web3(HTTPProvider(web3endpoint))
     return web3
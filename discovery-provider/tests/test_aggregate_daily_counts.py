@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta
+
+from src.models import Repost, RepostType, Save, SaveType
+from src.queries.query_helpers import get_repost_counts, get_save_counts
+from src.tasks.aggregate_daily_counts import (
+    record_revert,
+    record_state_change,
+    update_daily_repost_counts,
+    update_daily_save_counts,
+)
+from src.utils.db_session import get_db
+
+
+def make_repost(repost_item_id, created_at, is_delete=False, is_current=True):
+    return Repost(
+        user_id=1,
+        repost_item_id=repost_item_id,
+        repost_type=RepostType.track,
+        is_current=is_current,
+        is_delete=is_delete,
+        created_at=created_at,
+    )
+
+
+def make_save(save_item_id, created_at, is_delete=False, is_current=True):
+    return Save(
+        user_id=1,
+        save_item_id=save_item_id,
+        save_type=SaveType.track,
+        is_current=is_current,
+        is_delete=is_delete,
+        created_at=created_at,
+    )
+
+
+def test_windowed_repost_counts(app):
+    with app.app_context():
+        db = get_db()
+
+    now = datetime.utcnow()
+    two_weeks_ago = now - timedelta(weeks=2)
+
+    with db.scoped_session() as session:
+        deltas = {}
+        # track 1 reposted today, and reposted two weeks ago
+        record_state_change(deltas, 1, RepostType.track, [], False, now)
+        record_state_change(deltas, 1, RepostType.track, [], False, two_weeks_ago)
+        # track 2 reposted two weeks ago, then re-reposted today
+        record_state_change(deltas, 2, RepostType.track, [], False, two_weeks_ago)
+        record_state_change(
+            deltas, 2, RepostType.track, [make_repost(2, two_weeks_ago)], False, now
+        )
+        # track 3 reposted today, then un-reposted today
+        record_state_change(deltas, 3, RepostType.track, [], False, now)
+        record_state_change(
+            deltas, 3, RepostType.track, [make_repost(3, now)], True, now
+        )
+        update_daily_repost_counts(session, deltas)
+
+    with db.scoped_session() as session:
+        week_counts = dict(
+            get_repost_counts(
+                session, False, False, [1, 2, 3], [RepostType.track], None, "week"
+            )
+        )
+        assert week_counts == {1: 1, 2: 1}
+
+        month_counts = dict(
+            get_repost_counts(
+                session, False, False, [1, 2, 3], [RepostType.track], None, "month"
+            )
+        )
+        assert month_counts == {1: 2, 2: 1}
+
+    with db.scoped_session() as session:
+        # revert the re-repost of track 2, restoring the repost from two weeks ago
+        deltas = {}
+        record_revert(
+            deltas,
+            2,
+            RepostType.track,
+            make_repost(2, now),
+            make_repost(2, two_weeks_ago, is_current=False),
+        )
+        update_daily_repost_counts(session, deltas)
+
+    with db.scoped_session() as session:
+        week_counts = dict(
+            get_repost_counts(
+                session, False, False, [1, 2, 3], [RepostType.track], None, "week"
+            )
+        )
+        assert week_counts == {1: 1}
+
+
+def test_windowed_save_counts(app):
+    with app.app_context():
+        db = get_db()
+
+    now = datetime.utcnow()
+    two_days_ago = now - timedelta(days=2)
+
+    with db.scoped_session() as session:
+        deltas = {}
+        record_state_change(deltas, 1, SaveType.track, [], False, now)
+        record_state_change(deltas, 1, SaveType.track, [], False, two_days_ago)
+        record_state_change(deltas, 2, SaveType.track, [], False, two_days_ago)
+        record_state_change(
+            deltas, 2, SaveType.track, [make_save(2, two_days_ago)], True, now
+        )
+        update_daily_save_counts(session, deltas)
+
+    with db.scoped_session() as session:
+        week_counts = get_save_counts(session, False, True, [1, 2], None, None, "week")
+        assert week_counts == [(1, 2, SaveType.track)]
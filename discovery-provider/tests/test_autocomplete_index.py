@@ -0,0 +1,125 @@
+from src.utils import autocomplete_index
+from src.utils.autocomplete_index import (
+    AutocompleteEntry,
+    load_autocomplete_index,
+    write_base_snapshot,
+    write_delta_snapshot,
+)
+
+
+def make_entries():
+    return {
+        "users": {
+            1: AutocompleteEntry(1, 10, {"daft", "punk", "daft punk", "daftpunk"}),
+            2: AutocompleteEntry(2, 500, {"dave"}),
+            3: AutocompleteEntry(3, 50, {"david", "bowie", "david bowie"}),
+        },
+        "tracks": {
+            # tracks 10 and 11 share an owner, only the most popular is returned
+            10: AutocompleteEntry(1, 5, {"da", "funk", "da funk"}),
+            11: AutocompleteEntry(1, 30, {"digital", "love", "digital love"}),
+            12: AutocompleteEntry(3, 20, {"heroes"}),
+            13: AutocompleteEntry(2, 1, {"dance"}),
+        },
+    }
+
+
+def test_autocomplete_index_search(tmp_path):
+    path = str(tmp_path / "autocomplete_index")
+    write_base_snapshot(path, make_entries(), full_built_at=123)
+    index = load_autocomplete_index(path, f"{path}.delta")
+
+    assert index.metadata == {"full_built_at": 123}
+
+    # Ranked by popularity, one result per entity
+    assert index.search("users", "da", 10, 0) == [2, 3, 1]
+    assert index.search("users", "Dav", 10, 0) == [2, 3]
+    assert index.search("users", "daft p", 10, 0) == [1]
+    assert index.search("users", "da", 1, 1) == [3]
+    assert index.search("users", "zz", 10, 0) == []
+
+    # One result per owner
+    assert index.search("tracks", "d", 10, 0) == [11, 13]
+    assert index.search("tracks", "h", 10, 0) == [12]
+
+    assert index.search("playlists", "d", 10, 0) is None
+
+
+def test_autocomplete_index_precomputed_prefixes(tmp_path, monkeypatch):
+    monkeypatch.setattr(autocomplete_index, "MAX_SCAN_ROWS", 2)
+    monkeypatch.setattr(autocomplete_index, "PREFIX_TOP_K", 2)
+
+    path = str(tmp_path / "autocomplete_index")
+    write_base_snapshot(path, make_entries())
+    index = load_autocomplete_index(path, f"{path}.delta")
+
+    # "da" matches more rows than are scanned so its top results are precomputed
+    assert index.search("users", "da", 2, 0) == [2, 3]
+    # Pages past the precomputed results can't be answered from the index
+    assert index.search("users", "da", 2, 1) is None
+    # Narrow prefixes are still ranked at query time
+    assert index.search("users", "david", 10, 0) == [3]
+
+
+def test_autocomplete_index_delta(tmp_path):
+    path = str(tmp_path / "autocomplete_index")
+    delta_path = f"{path}.delta"
+    write_base_snapshot(path, make_entries(), full_built_at=123)
+    changes = {
+        "users": {
+            # renamed, removed and added since the base snapshot
+            2: AutocompleteEntry(2, 500, {"zed"}),
+            3: None,
+            4: AutocompleteEntry(4, 20, {"dalia"}),
+        },
+        # track 11 lost its reposts so its owner's track 10 is returned instead
+        "tracks": {11: AutocompleteEntry(1, 0, {"digital"})},
+    }
+    write_delta_snapshot(delta_path, changes, base_built_at=123)
+    index = load_autocomplete_index(path, delta_path)
+
+    assert index.search("users", "da", 10, 0) == [4, 1]
+    assert index.search("users", "z", 10, 0) == [2]
+    assert index.search("users", "bowie", 10, 0) == []
+    assert index.search("tracks", "d", 10, 0) == [10, 13]
+
+    delta_changes = index.delta_changes()
+    assert delta_changes["users"] == changes["users"]
+    assert delta_changes["tracks"] == changes["tracks"]
+    assert delta_changes["albums"] == {}
+
+    # A delta written for an older base is ignored
+    write_base_snapshot(path, make_entries(), full_built_at=456)
+    index = load_autocomplete_index(path, delta_path)
+    assert index.search("users", "da", 10, 0) == [2, 3, 1]
+    assert index.delta_changes()["users"] == {}
+
+
+def test_autocomplete_index_delta_precomputed_prefixes(tmp_path, monkeypatch):
+    monkeypatch.setattr(autocomplete_index, "MAX_SCAN_ROWS", 2)
+    monkeypatch.setattr(autocomplete_index, "PREFIX_TOP_K", 2)
+
+    path = str(tmp_path / "autocomplete_index")
+    delta_path = f"{path}.delta"
+    write_base_snapshot(path, make_entries(), full_built_at=123)
+
+    # Precomputed results ranked above a changed entity are still used
+    write_delta_snapshot(
+        delta_path,
+        {"users": {3: AutocompleteEntry(3, 5, {"david"})}},
+        base_built_at=123,
+    )
+    index = load_autocomplete_index(path, delta_path)
+    assert index.search("users", "da", 1, 0) == [2]
+    # The results below it may be missing from the precomputed rows
+    assert index.search("users", "da", 2, 0) is None
+
+    # Changed entities ranked above the precomputed results are merged in
+    write_delta_snapshot(
+        delta_path,
+        {"users": {4: AutocompleteEntry(4, 1000, {"dalia"})}},
+        base_built_at=123,
+    )
+    index = load_autocomplete_index(path, delta_path)
+    assert index.search("users", "da", 3, 0) == [4, 2, 3]
+    assert index.search("users", "da", 3, 1) is None
@@ -0,0 +1,99 @@
+from src.queries import get_balances
+from src.queries.get_balances import (
+    IMMEDIATE_REFRESH_REDIS_PREFIX,
+    LAZY_REFRESH_REDIS_PREFIX,
+    LEGACY_IMMEDIATE_REFRESH_REDIS_KEY,
+    LEGACY_LAZY_REFRESH_REDIS_KEY,
+    enqueue_immediate_balance_refresh,
+    enqueue_lazy_balance_refresh,
+)
+from src.tasks.cache_user_balance import (
+    drain_legacy_refresh_sets,
+    get_due_lazy_refresh_entries,
+    get_immediate_refresh_entries,
+    remove_refresh_entries,
+)
+from src.utils.redis_connection import get_redis
+
+
+def enqueue_lazy_refresh(redis, user_ids, **kwargs):
+    # Bypass the per process dedupe of lazy refreshes
+    get_balances._lazy_refresh_enqueued_until.clear()
+    enqueue_lazy_balance_refresh(redis, user_ids, **kwargs)
+
+
+def test_balance_refresh_queue(app):
+    """Tests balance refreshes are due by how often they're read and removed once done"""
+    with app.app_context():
+        redis = get_redis()
+    redis.delete(LAZY_REFRESH_REDIS_PREFIX, IMMEDIATE_REFRESH_REDIS_PREFIX)
+
+    enqueue_lazy_refresh(redis, [1, 2])
+    assert get_due_lazy_refresh_entries(redis, 10) == []
+
+    # Further reads move a refresh earlier until it's due
+    enqueue_lazy_refresh(redis, [2])
+    assert redis.zscore(LAZY_REFRESH_REDIS_PREFIX, 2) < redis.zscore(
+        LAZY_REFRESH_REDIS_PREFIX, 1
+    )
+    for _ in range(
+        get_balances.LAZY_REFRESH_MAX_DELAY_SEC
+        // get_balances.LAZY_REFRESH_READ_WEIGHT_SEC
+    ):
+        enqueue_lazy_refresh(redis, [2])
+    lazy_entries = get_due_lazy_refresh_entries(redis, 10)
+    assert [user_id for user_id, _ in lazy_entries] == [2]
+
+    remove_refresh_entries(redis, LAZY_REFRESH_REDIS_PREFIX, lazy_entries)
+    assert redis.zscore(LAZY_REFRESH_REDIS_PREFIX, 2) is None
+    assert redis.zscore(LAZY_REFRESH_REDIS_PREFIX, 1) is not None
+
+    # Immediate refreshes requested again while refreshing stay queued
+    enqueue_immediate_balance_refresh(redis, [3, 4])
+    immediate_entries = get_immediate_refresh_entries(redis, 1)
+    assert len(immediate_entries) == 1
+    user_id = immediate_entries[0][0]
+
+    redis.zadd(IMMEDIATE_REFRESH_REDIS_PREFIX, {user_id: immediate_entries[0][1] + 1})
+    remove_refresh_entries(redis, IMMEDIATE_REFRESH_REDIS_PREFIX, immediate_entries)
+    assert redis.zcard(IMMEDIATE_REFRESH_REDIS_PREFIX) == 2
+
+    immediate_entries = get_immediate_refresh_entries(redis, 10)
+    remove_refresh_entries(redis, IMMEDIATE_REFRESH_REDIS_PREFIX, immediate_entries)
+    assert redis.zcard(IMMEDIATE_REFRESH_REDIS_PREFIX) == 0
+
+
+def test_first_balance_refresh_due_now(app):
+    """Tests balances never fetched before are due as soon as they're read"""
+    with app.app_context():
+        redis = get_redis()
+    redis.delete(LAZY_REFRESH_REDIS_PREFIX, IMMEDIATE_REFRESH_REDIS_PREFIX)
+
+    enqueue_lazy_refresh(redis, [1], max_delay_sec=0)
+    enqueue_lazy_refresh(redis, [2])
+    assert [user_id for user_id, _ in get_due_lazy_refresh_entries(redis, 10)] == [1]
+
+    # A refresh already scheduled later is moved up
+    enqueue_lazy_refresh(redis, [2], max_delay_sec=0)
+    lazy_entries = get_due_lazy_refresh_entries(redis, 10)
+    assert sorted(user_id for user_id, _ in lazy_entries) == [1, 2]
+
+
+def test_drain_legacy_refresh_sets(app):
+    """Tests refreshes queued in the legacy sets are moved to the sorted sets"""
+    with app.app_context():
+        redis = get_redis()
+    redis.delete(LAZY_REFRESH_REDIS_PREFIX, IMMEDIATE_REFRESH_REDIS_PREFIX)
+
+    enqueue_immediate_balance_refresh(redis, [2])
+    score = redis.zscore(IMMEDIATE_REFRESH_REDIS_PREFIX, 2)
+    redis.sadd(LEGACY_LAZY_REFRESH_REDIS_KEY, 1)
+    redis.sadd(LEGACY_IMMEDIATE_REFRESH_REDIS_KEY, 2, 3)
+    drain_legacy_refresh_sets(redis)
+
+    assert [user_id for user_id, _ in get_due_lazy_refresh_entries(redis, 10)] == [1]
+    assert redis.zcard(IMMEDIATE_REFRESH_REDIS_PREFIX) == 2
+    # Queued refreshes keep their place
+    assert redis.zscore(IMMEDIATE_REFRESH_REDIS_PREFIX, 2) == score
+    assert not redis.exists(LEGACY_LAZY_REFRESH_REDIS_KEY)
+    assert not redis.exists(LEGACY_IMMEDIATE_REFRESH_REDIS_KEY)
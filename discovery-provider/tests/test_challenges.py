@@ -1,5 +1,7 @@
+import json
 import logging
 from typing import Dict, List, Optional
+from unittest import mock
 
 from sqlalchemy.orm.session import Session
 import redis
@@ -16,7 +18,13 @@ from src.challenges.challenge import (
     FullEventMetadata,
 )
 from src.utils.helpers import model_to_dictionary
-from src.challenges.challenge_event_bus import ChallengeEventBus
+from src.challenges.challenge_event_bus import (
+    CONSUMER_NAME,
+    REDIS_QUEUE_PREFIX,
+    REDIS_STREAM_KEY,
+    ChallengeEventBus,
+    get_challenge_event_queue_stats,
+)
 from src.utils.config import shared_config
 from src.queries.get_challenges import get_challenges
 
@@ -488,3 +496,102 @@ def test_catches_exceptions_in_single_processor(app):
         # Make sure broken manager didn't do anything
         challenge_2_state = broken_manager.get_user_challenge_state(session, ["1"])
         assert len(challenge_2_state) == 0
+
+
+def test_unacked_events_are_redelivered(app):
+    """Tests events read by a worker that died before processing them are processed
+    again, and events left in the old queue are moved to the stream"""
+    setup_challenges(app)
+    with app.app_context():
+        db = get_db()
+
+    redis_conn = redis.Redis.from_url(url=REDIS_URL)
+
+    bus = ChallengeEventBus(redis_conn)
+    TEST_EVENT = "TEST_EVENT"
+    mgr_1 = ChallengeManager("test_challenge_1", DefaultUpdater())
+    mgr_2 = ChallengeManager("test_challenge_2", DefaultUpdater())
+    bus.register_listener(TEST_EVENT, mgr_1)
+    bus.register_listener(TEST_EVENT, mgr_2)
+    redis_conn.rpush(
+        REDIS_QUEUE_PREFIX,
+        json.dumps(
+            {"event": TEST_EVENT, "block_number": 100, "user_id": 1, "extra": {}}
+        ),
+    )
+    with bus.use_scoped_dispatch_queue():
+        bus.dispatch(TEST_EVENT, 100, 3)
+
+    with db.scoped_session() as session:
+        (count, did_error) = bus.process_events(
+            session, challenge_ids=["test_challenge_2"]
+        )
+        assert (count, did_error) == (2, False)
+    assert not redis_conn.exists(REDIS_QUEUE_PREFIX)
+
+    # Read test_challenge_1's events without processing them
+    redis_conn.xreadgroup(
+        "test_challenge_1", CONSUMER_NAME, {REDIS_STREAM_KEY: ">"}, count=10
+    )
+    stats = get_challenge_event_queue_stats(redis_conn)
+    assert stats["test_challenge_1"]["depth"] == 2
+    assert stats["test_challenge_1"]["pending"] == 2
+    assert stats["test_challenge_1"]["oldest_event_age_sec"] >= 0
+    assert stats["test_challenge_2"] == {
+        "depth": 0,
+        "pending": 0,
+        "oldest_event_age_sec": None,
+    }
+
+    with db.scoped_session() as session:
+        (count, did_error) = bus.process_events(session)
+        assert (count, did_error) == (2, False)
+        state = mgr_1.get_user_challenge_state(session, ["1", "3"])
+        assert {uc.specifier: uc.current_step_count for uc in state} == {
+            "1": 2,
+            "3": 3,
+        }
+        assert bus.process_events(session) == (0, False)
+    assert get_challenge_event_queue_stats(redis_conn)["test_challenge_1"]["depth"] == 0
+
+
+def test_events_acked_once_processed(app):
+    """Tests events are acked once their processing is committed, and events a
+    manager errored on are delivered again"""
+    setup_challenges(app)
+    with app.app_context():
+        db = get_db()
+
+    redis_conn = redis.Redis.from_url(url=REDIS_URL)
+
+    bus = ChallengeEventBus(redis_conn)
+    TEST_EVENT = "TEST_EVENT"
+    mgr = ChallengeManager("test_challenge_1", DefaultUpdater())
+    bus.register_listener(TEST_EVENT, mgr)
+
+    def get_num_pending():
+        return get_challenge_event_queue_stats(redis_conn)["test_challenge_1"][
+            "pending"
+        ]
+
+    with bus.use_scoped_dispatch_queue():
+        bus.dispatch(TEST_EVENT, 100, 1)
+    with db.scoped_session() as session:
+        (count, did_error, event_ids) = bus.process_events_unacked(session)
+        assert (count, did_error) == (1, False)
+    assert get_num_pending() == 1
+    assert bus.ack_events(event_ids)
+    assert get_num_pending() == 0
+
+    with bus.use_scoped_dispatch_queue():
+        bus.dispatch(TEST_EVENT, 100, 1)
+    with db.scoped_session() as session:
+        with mock.patch.object(mgr, "process", side_effect=Exception("broken")):
+            assert bus.process_events(session) == (0, True)
+    assert get_num_pending() == 1
+
+    with db.scoped_session() as session:
+        assert bus.process_events(session) == (1, False)
+        state = mgr.get_user_challenge_state(session, ["1"])
+        assert state[0].current_step_count == 3
+    assert get_num_pending() == 0
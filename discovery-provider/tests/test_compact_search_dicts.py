@@ -0,0 +1,44 @@
+from src.models import User
+from src.tasks.search_dicts import compact_search_dicts, update_search_dicts
+from src.utils.db_session import get_db
+from tests.utils import populate_mock_db
+
+
+def get_dict_ids(session, table_name, id_col):
+    return {
+        row_id
+        for (row_id,) in session.execute(f"SELECT DISTINCT {id_col} FROM {table_name}")
+    }
+
+
+def test_compact_search_dicts_restores_users(app):
+    """Tests users are removed from search while impersonating a verified handle and
+    restored once they stop"""
+    with app.app_context():
+        db = get_db()
+
+    populate_mock_db(
+        db,
+        {
+            "users": [
+                {"user_id": 1, "handle": "realartist"},
+                {"user_id": 2, "handle": "copycat"},
+            ],
+            "tracks": [{"track_id": 1, "owner_id": 2}],
+        },
+    )
+
+    with db.scoped_session() as session:
+        update_search_dicts(session, [1, 2], [1], [])
+        assert get_dict_ids(session, "user_lexeme_dict", "user_id") == {1, 2}
+
+        session.query(User).filter(User.user_id == 1).update({"is_verified": True})
+        session.query(User).filter(User.user_id == 2).update({"name": "RealArtist"})
+        compact_search_dicts(session)
+        assert get_dict_ids(session, "user_lexeme_dict", "user_id") == {1}
+        assert get_dict_ids(session, "track_lexeme_dict", "track_id") == set()
+
+        session.query(User).filter(User.user_id == 2).update({"name": "Copycat"})
+        compact_search_dicts(session)
+        assert get_dict_ids(session, "user_lexeme_dict", "user_id") == {1, 2}
+        assert get_dict_ids(session, "track_lexeme_dict", "track_id") == {1}
@@ -0,0 +1,58 @@
+from src.queries.get_followees_for_user import get_followees_for_user_page
+from src.queries.get_followers_for_user import get_followers_for_user_page
+from src.queries.get_reposters_for_track import get_reposters_for_track_page
+from src.queries.get_savers_for_track import get_savers_for_track_page
+from src.utils.db_session import get_db
+from tests.utils import populate_mock_db
+
+ENTITIES = {
+    "users": [{}] * 5,
+    "tracks": [{"track_id": 0, "owner_id": 0}],
+    "follows": [
+        {"follower_user_id": 1, "followee_user_id": 0, "blocknumber": 1},
+        {"follower_user_id": 2, "followee_user_id": 0, "blocknumber": 3},
+        {"follower_user_id": 3, "followee_user_id": 0, "blocknumber": 3},
+        {"follower_user_id": 4, "followee_user_id": 0, "blocknumber": 2},
+        {"follower_user_id": 0, "followee_user_id": 1, "blocknumber": 1},
+        {"follower_user_id": 0, "followee_user_id": 2, "blocknumber": 4},
+        {"follower_user_id": 0, "followee_user_id": 3, "blocknumber": 2},
+    ],
+    "reposts": [
+        {"user_id": 1, "repost_item_id": 0, "blocknumber": 1},
+        {"user_id": 2, "repost_item_id": 0, "blocknumber": 2},
+        {"user_id": 3, "repost_item_id": 0, "blocknumber": 2},
+    ],
+    "saves": [
+        {"user_id": 1, "save_item_id": 0, "blocknumber": 3},
+        {"user_id": 2, "save_item_id": 0, "blocknumber": 1},
+        {"user_id": 3, "save_item_id": 0, "blocknumber": 2},
+    ],
+}
+
+
+def get_all_user_ids(get_page, args):
+    """Pages through `get_page` by cursor two users at a time"""
+    user_ids = []
+    cursor = ""
+    while cursor is not None:
+        users, cursor = get_page(
+            {**args, "current_user_id": None, "limit": 2, "cursor": cursor}
+        )
+        user_ids.extend(user["user_id"] for user in users)
+    return user_ids
+
+
+def test_cursor_pagination(app):
+    """Tests paging through followers, followees, reposters and savers by cursor,
+    most recent first then by user id"""
+    with app.app_context():
+        db = get_db()
+        populate_mock_db(db, ENTITIES)
+
+        for get_page, args, expected_user_ids in [
+            (get_followers_for_user_page, {"followee_user_id": 0}, [3, 2, 4, 1]),
+            (get_followees_for_user_page, {"follower_user_id": 0}, [2, 3, 1]),
+            (get_reposters_for_track_page, {"repost_track_id": 0}, [3, 2, 1]),
+            (get_savers_for_track_page, {"save_track_id": 0}, [1, 3, 2]),
+        ]:
+            assert get_all_user_ids(get_page, args) == expected_user_ids
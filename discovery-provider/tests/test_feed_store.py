@@ -0,0 +1,150 @@
+from datetime import datetime, timedelta
+from unittest import mock
+
+from src.models import Block, Follow, Track
+from src.queries.get_feed import build_stored_feed, get_stored_feed_entries
+from src.tasks.index_feeds import (
+    feed_blockhash_redis_key,
+    feed_blocknumber_redis_key,
+    update_feeds,
+)
+from src.utils.db_session import get_db
+from src.utils import feed_store
+from src.utils.feed_store import get_playlist_tracks, read_feed, set_playlist_tracks
+from src.utils.redis_connection import get_redis
+from tests.utils import populate_mock_db
+
+now = datetime.now()
+
+
+def get_feed_ids(session, redis, feed_filter, tracks_only=False):
+    tracks, playlists, _, _ = get_stored_feed_entries(
+        session, redis, 1, [2, 3], feed_filter, tracks_only, 10
+    )
+    return (
+        [track.track_id for track in tracks],
+        [playlist.playlist_id for playlist in playlists],
+    )
+
+
+def test_stored_feed(app):
+    """Tests the stored feed matches the filters of the feed queried at read time"""
+    with app.app_context():
+        db = get_db()
+    redis = get_redis()
+
+    populate_mock_db(
+        db,
+        {
+            "users": [{}] * 5,
+            # user 1 follows 2 and 3
+            "follows": [
+                {"follower_user_id": 1, "followee_user_id": 2, "blocknumber": 0},
+                {"follower_user_id": 1, "followee_user_id": 3, "blocknumber": 0},
+            ],
+            "tracks": [
+                {"owner_id": 2, "created_at": now - timedelta(minutes=60)},
+                # released alongside playlist 0
+                {"owner_id": 2, "created_at": now - timedelta(minutes=30)},
+                {"owner_id": 4, "created_at": now - timedelta(minutes=20)},
+                {"owner_id": 3, "created_at": now - timedelta(minutes=5)},
+            ],
+            "playlists": [
+                {
+                    "playlist_owner_id": 2,
+                    "playlist_contents": {"track_ids": [{"track": 1, "time": 0}]},
+                    "created_at": now - timedelta(minutes=25),
+                }
+            ],
+            "reposts": [
+                {
+                    "user_id": 3,
+                    "repost_item_id": 2,
+                    "blocknumber": 0,
+                    "created_at": now - timedelta(minutes=10),
+                },
+                # created by a followee, only shown as created in case of "all" filter
+                {
+                    "user_id": 3,
+                    "repost_item_id": 0,
+                    "blocknumber": 0,
+                    "created_at": now - timedelta(minutes=15),
+                },
+            ],
+        },
+    )
+
+    with db.scoped_session() as session:
+        assert read_feed(redis, 1) is None
+        build_stored_feed(session, redis, 1, [2, 3])
+
+        assert get_feed_ids(session, redis, "all") == ([3, 2, 0], [0])
+        assert get_feed_ids(session, redis, "all", tracks_only=True) == (
+            [3, 2, 1, 0],
+            [],
+        )
+        assert get_feed_ids(session, redis, "original") == ([3, 0], [0])
+        assert get_feed_ids(session, redis, "repost") == ([2, 0], [])
+
+    # Track 4 by user 3 is indexed
+    redis.set(feed_blocknumber_redis_key, 4)
+    redis.set(feed_blockhash_redis_key, hex(4))
+    with db.scoped_session() as session:
+        session.query(Block).update({"is_current": False})
+        session.add(
+            Block(blockhash="0x10", parenthash=hex(4), number=10, is_current=True)
+        )
+        session.add(
+            Track(
+                blockhash="0x10",
+                blocknumber=10,
+                track_id=4,
+                is_current=True,
+                is_delete=False,
+                owner_id=3,
+                route_id="",
+                track_segments=[],
+                genre="",
+                updated_at=now,
+                created_at=now,
+                is_unlisted=False,
+            )
+        )
+    with db.scoped_session() as session:
+        update_feeds(session, redis)
+        assert get_feed_ids(session, redis, "original") == ([4, 3, 0], [0])
+
+    # User 1 follows user 4, their feed is rebuilt on its next read
+    with db.scoped_session() as session:
+        session.query(Block).update({"is_current": False})
+        session.add(
+            Block(blockhash="0x11", parenthash="0x10", number=11, is_current=True)
+        )
+        session.add(
+            Follow(
+                blockhash="0x11",
+                blocknumber=11,
+                follower_user_id=1,
+                followee_user_id=4,
+                is_current=True,
+                is_delete=False,
+                created_at=now,
+            )
+        )
+    with db.scoped_session() as session:
+        update_feeds(session, redis)
+        assert read_feed(redis, 1) is None
+
+
+def test_playlist_tracks_rotate(app):
+    """Tests released tracks are read for two periods after they are recorded"""
+    with app.app_context():
+        redis = get_redis()
+
+    with mock.patch.object(feed_store, "_get_playlist_tracks_period", return_value=1):
+        set_playlist_tracks(redis, {1: 10})
+    with mock.patch.object(feed_store, "_get_playlist_tracks_period", return_value=2):
+        set_playlist_tracks(redis, {2: 20})
+        assert get_playlist_tracks(redis, [1, 2, 3]) == {1: 10, 2: 20}
+    with mock.patch.object(feed_store, "_get_playlist_tracks_period", return_value=3):
+        assert get_playlist_tracks(redis, [1, 2, 3]) == {2: 20}
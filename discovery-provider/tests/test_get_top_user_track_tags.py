@@ -1,5 +1,6 @@
 from src.queries.get_top_user_track_tags import _get_top_user_track_tags
 from src.utils.db_session import get_db
+from src.tasks.search_dicts import update_search_dicts
 from tests.utils import populate_mock_db
 
 
@@ -21,7 +22,9 @@ def test_get_top_user_track_tags(app):
     populate_mock_db(db, test_entities)
 
     with db.scoped_session() as session:
-        session.execute("REFRESH MATERIALIZED VIEW tag_track_user")
+        update_search_dicts(
+            session, [], [track["track_id"] for track in test_entities["tracks"]], []
+        )
         user_1_tags = _get_top_user_track_tags(session, {"user_id": 1})
         user_2_tags = _get_top_user_track_tags(session, {"user_id": 2})
 
@@ -1,7 +1,7 @@
 from datetime import datetime
 
 from src.queries.get_remixable_tracks import get_remixable_tracks
-from src.queries.get_tracks import _get_tracks
+from src.queries.get_tracks import _get_tracks, _get_tracks_page
 from src.utils.db_session import get_db
 
 from tests.utils import populate_mock_db
@@ -125,6 +125,27 @@ def test_get_tracks_by_date(app):
         assert tracks[4]["permalink"] == "/some-test-user/track-2"
 
 
+def test_get_tracks_by_date_cursor(app):
+    """Test paging through tracks ordered by date by cursor"""
+
+    with app.app_context():
+        db = get_db()
+
+    populate_tracks(db)
+
+    with db.scoped_session() as session:
+        track_ids = []
+        cursor = ""
+        while cursor is not None:
+            tracks, cursor = _get_tracks_page(
+                session,
+                {"user_id": 1287289, "limit": 2, "sort": "date", "cursor": cursor},
+            )
+            track_ids.extend(track["track_id"] for track in tracks)
+
+        assert track_ids == [1, 3, 5, 4, 2]
+
+
 def test_get_track_by_handle_slug(app):
     """Test getting track by user handle and slug for route resolution"""
     with app.app_context():
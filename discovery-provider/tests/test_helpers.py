@@ -0,0 +1,37 @@
+from src.models import Track, User
+from src.utils import helpers
+from src.utils.db_session import get_db
+from tests.utils import populate_mock_db
+
+
+def test_model_to_dictionary(app):
+    """Tests models convert to dictionaries of their columns, properties and relationships"""
+    with app.app_context():
+        db = get_db()
+
+    populate_mock_db(
+        db,
+        {
+            "users": [{"handle": "artist"}],
+            "tracks": [{"track_id": 1, "owner_id": 0}],
+            "track_routes": [{"slug": "track", "track_id": 1, "owner_id": 0}],
+        },
+    )
+
+    with db.scoped_session() as session:
+        track = session.query(Track).filter(Track.track_id == 1).one()
+        track_dict = helpers.model_to_dictionary(track)
+
+        assert set(Track.__table__.columns.keys()).issubset(track_dict.keys())
+        assert track_dict["permalink"] == "/artist/track"
+        assert track_dict["user"][0]["handle"] == "artist"
+        assert "_routes" not in track_dict
+        assert "_slug" not in track_dict
+
+        track_dict = helpers.model_to_dictionary(track, ["permalink"])
+        assert "permalink" not in track_dict
+
+        users = helpers.query_result_to_list(session.query(User).all())
+        user_tuples = session.query(*helpers.model_columns(User)).all()
+        assert helpers.query_tuples_to_list(user_tuples, User) == users
+        assert helpers.tuple_to_model_dictionary(user_tuples[0], User) == users[0]
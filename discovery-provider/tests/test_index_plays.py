@@ -0,0 +1,132 @@
+from collections import Counter, defaultdict
+from datetime import datetime
+from unittest import mock
+
+import dateutil.parser
+
+from src.models import Play
+from src.tasks import index_plays
+from src.tasks.index_plays import get_track_plays, insert_listens
+from src.utils.db_session import get_db
+from src.utils.redis_connection import get_redis
+from src.utils.redis_constants import (
+    index_plays_last_completion_redis_key,
+    index_plays_last_run_timings_redis_key,
+)
+
+
+def make_listen(track_id, user_id, count, created_at, updated_at=None):
+    return {
+        "trackId": track_id,
+        "userId": user_id,
+        "count": count,
+        "createdAt": created_at,
+        "updatedAt": updated_at or created_at,
+    }
+
+
+def test_insert_listens(app):
+    """Tests only the plays identity counted beyond those in the db are inserted"""
+    with app.app_context():
+        db = get_db()
+
+    with db.scoped_session() as session:
+        session.add_all(
+            [
+                Play(user_id=1, play_item_id=1, created_at=datetime(2021, 9, 1)),
+                Play(play_item_id=1, created_at=datetime(2021, 9, 8, 10)),
+                Play(play_item_id=1, created_at=datetime(2021, 9, 8, 11)),
+            ]
+        )
+
+    listens = [
+        # One new play of track 1 by user 1
+        make_listen(1, 1, 2, "2021-09-08T10:30:00.000Z"),
+        make_listen(2, 1, 1, "2021-09-08T10:30:00.000Z"),
+        # One new anonymous play of track 1 in the 10th hour
+        make_listen(1, None, 2, "2021-09-08T10:00:00.000Z"),
+        make_listen(1, None, 1, "2021-09-08T11:00:00.000Z"),
+    ]
+    timings = defaultdict(int)
+    with db.scoped_session() as session:
+        assert insert_listens(session, listens, timings) == 3
+        assert insert_listens(session, [], timings) == 0
+    assert set(timings) == {
+        "listens_query_time",
+        "build_insert_query_time",
+        "insert_time",
+    }
+
+    with db.scoped_session() as session:
+        assert insert_listens(session, listens, timings) == 0
+        play_counts = Counter(session.query(Play.play_item_id, Play.user_id).all())
+        assert play_counts == {(1, 1): 2, (2, 1): 1, (1, None): 3}
+
+
+@mock.patch("src.tasks.index_plays.REQUEST_LISTENS_LIMIT", 2)
+def test_get_track_plays_pages_until_caught_up(app):
+    """Tests the listens are synced page by page in one run"""
+    with app.app_context():
+        db = get_db()
+        redis = get_redis()
+
+    listens = [
+        make_listen(track_id, 1, 1, f"2021-09-08T1{track_id}:00:00.000Z")
+        for track_id in range(5)
+    ]
+    start_times = []
+
+    def get_identity_listens(_, start_time):
+        start_times.append(start_time)
+        return [
+            listen
+            for listen in listens
+            if dateutil.parser.parse(listen["updatedAt"]).timestamp() >= start_time
+        ][:2]
+
+    lock = mock.Mock()
+    lock.owned.return_value = True
+    redis.delete(index_plays_last_completion_redis_key)
+    with mock.patch.object(
+        index_plays, "get_identity_listens", get_identity_listens
+    ), mock.patch.object(
+        index_plays.update_play_count,
+        "shared_config",
+        {"discprov": {"identity_service_url": "http://identity"}},
+        create=True,
+    ):
+        get_track_plays(None, db, lock, redis)
+
+    # Pages overlap on the last listen of the previous page, until a partial page
+    assert len(start_times) == 5
+    with db.scoped_session() as session:
+        assert sorted(
+            play_item_id for (play_item_id,) in session.query(Play.play_item_id)
+        ) == [0, 1, 2, 3, 4]
+    assert redis.get(index_plays_last_run_timings_redis_key) is not None
+    assert redis.get(index_plays_last_completion_redis_key) is not None
+
+
+def test_get_track_plays_identity_unavailable(app):
+    """Tests a run that can't reach identity isn't recorded as completed"""
+    with app.app_context():
+        db = get_db()
+        redis = get_redis()
+
+    lock = mock.Mock()
+    lock.owned.return_value = True
+    redis.delete(index_plays_last_completion_redis_key)
+    with mock.patch.object(
+        index_plays,
+        "get_identity_listens",
+        mock.Mock(side_effect=Exception("unavailable")),
+    ), mock.patch.object(
+        index_plays.update_play_count,
+        "shared_config",
+        {"discprov": {"identity_service_url": "http://identity"}},
+        create=True,
+    ):
+        get_track_plays(None, db, lock, redis)
+
+    assert redis.get(index_plays_last_run_timings_redis_key) is not None
+    assert redis.get(index_plays_last_completion_redis_key) is None
@@ -0,0 +1,36 @@
+from datetime import datetime
+
+from src.models import Play
+from src.tasks.index_solana_plays import get_tx_sigs_in_db, insert_plays
+from src.utils.db_session import get_db
+
+
+def make_play(signature, slot, user_id=1):
+    return {
+        "user_id": user_id,
+        "play_item_id": 1,
+        "created_at": datetime(2021, 9, 8),
+        "source": "relay",
+        "slot": slot,
+        "signature": signature,
+    }
+
+
+def test_insert_plays(app):
+    """Tests plays are inserted in bulk and only once per transaction"""
+    with app.app_context():
+        db = get_db()
+
+    with db.scoped_session() as session:
+        new_plays = insert_plays(
+            session,
+            [make_play("sig2", 2), make_play("sig1", 1), make_play("sig1", 1, None)],
+        )
+        assert [play["signature"] for play in new_plays] == ["sig1", "sig1", "sig2"]
+
+    with db.scoped_session() as session:
+        new_plays = insert_plays(session, [make_play("sig2", 2), make_play("sig3", 3)])
+        assert [play["signature"] for play in new_plays] == ["sig3"]
+        assert get_tx_sigs_in_db(session, ["sig1", "sig3", "sig4"]) == {"sig1", "sig3"}
+        assert session.query(Play).count() == 4
+        assert insert_plays(session, []) == []
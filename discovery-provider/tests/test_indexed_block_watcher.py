@@ -0,0 +1,20 @@
+import threading
+
+from src.utils.indexed_block_watcher import IndexedBlockWatcher, publish_indexed_block
+from src.utils.redis_connection import get_redis
+from src.utils.redis_constants import most_recent_indexed_block_redis_key
+
+
+def test_wait_for_block(app):
+    """Tests waiting requests are woken by the blocks published by the indexer"""
+    redis = get_redis()
+    redis.set(most_recent_indexed_block_redis_key, 10)
+    watcher = IndexedBlockWatcher(redis)
+
+    assert watcher.wait_for_block(10, 1)
+    assert not watcher.wait_for_block(11, 1)
+
+    publisher = threading.Timer(0.5, publish_indexed_block, (redis, 11, "0x11"))
+    publisher.start()
+    assert watcher.wait_for_block(11, 10)
+    publisher.join()
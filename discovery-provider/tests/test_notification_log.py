@@ -0,0 +1,117 @@
+from datetime import datetime
+from unittest import mock
+
+from src.models import NotificationLog
+from src.queries.notifications import (
+    get_logged_notifications,
+    get_notifications,
+    is_notification_log_complete,
+)
+from src.tasks.notification_log import (
+    append_notification_log,
+    revert_notification_log,
+    try_append_notification_log,
+)
+from src.utils.db_session import get_db
+from src.utils.redis_connection import get_redis
+from src.utils.redis_constants import notification_log_gap_redis_key
+from tests.utils import populate_mock_db
+
+
+def test_notification_log(app):
+    """Tests the notifications appended per block match those derived for a block range"""
+    with app.app_context():
+        db = get_db()
+    redis = get_redis()
+    redis.delete(notification_log_gap_redis_key)
+
+    now = datetime.now()
+    populate_mock_db(
+        db,
+        {
+            "users": [{}] * 4,
+            "tracks": [
+                {"owner_id": 1, "created_at": now, "updated_at": now},
+                {"owner_id": 2, "created_at": now, "updated_at": now},
+            ],
+            "follows": [
+                {"follower_user_id": 2, "followee_user_id": 1},
+                {"follower_user_id": 3, "followee_user_id": 1},
+            ],
+            "saves": [
+                {"user_id": 2, "save_item_id": 0, "blocknumber": 2},
+                {"user_id": 3, "save_item_id": 0, "blocknumber": 3},
+            ],
+            "reposts": [{"user_id": 3, "repost_item_id": 1, "blocknumber": 2}],
+        },
+    )
+
+    with db.scoped_session() as session:
+        assert not is_notification_log_complete(session, redis, 0)
+        for block_number in range(0, 4):
+            append_notification_log(session, block_number, hex(block_number))
+
+    with db.scoped_session() as session:
+        assert is_notification_log_complete(session, redis, 0)
+        assert not is_notification_log_complete(session, redis, -1)
+
+        notifications, milestones, owners = get_logged_notifications(session, 0, 3)
+        (
+            derived_notifications,
+            derived_milestones,
+            derived_owners,
+        ) = get_notifications(session, 0, 3)
+
+        assert notifications == sorted(
+            derived_notifications, key=lambda n: n["blocknumber"]
+        )
+        assert [n["type"] for n in notifications] == [
+            "Follow",
+            "Create",
+            "Favorite",
+            "Repost",
+            "Favorite",
+        ]
+        assert milestones == derived_milestones
+        assert milestones["follower_counts"] == {1: 2}
+        assert milestones["favorite_counts"]["tracks"] == {0: 2}
+        assert owners == derived_owners
+
+        revert_notification_log(session, hex(3))
+        assert (
+            session.query(NotificationLog)
+            .filter(NotificationLog.blocknumber == 3)
+            .count()
+            == 0
+        )
+
+
+def test_try_append_notification_log(app):
+    """Tests a block that fails to append is indexed and leaves a gap in the log"""
+    with app.app_context():
+        db = get_db()
+    redis = get_redis()
+    redis.delete(notification_log_gap_redis_key)
+
+    populate_mock_db(
+        db,
+        {
+            "users": [{}] * 2,
+            "follows": [{"follower_user_id": 0, "followee_user_id": 1}],
+        },
+    )
+
+    with db.scoped_session() as session:
+        assert try_append_notification_log(session, redis, 0, hex(0)) == 1
+        assert is_notification_log_complete(session, redis, 0)
+
+    with db.scoped_session() as session, mock.patch(
+        "src.tasks.notification_log.get_notifications", side_effect=Exception
+    ):
+        assert try_append_notification_log(session, redis, 1, hex(1)) == 0
+        # The block's transaction can still be committed
+        session.query(NotificationLog).count()
+
+    with db.scoped_session() as session:
+        assert not is_notification_log_complete(session, redis, 0)
+        assert is_notification_log_complete(session, redis, 1)
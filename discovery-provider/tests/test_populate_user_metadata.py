@@ -1,4 +1,7 @@
 import logging
+import time
+
+from sqlalchemy import event
 from src.queries import response_name_constants
 from src.queries.query_helpers import populate_user_metadata
 from src.utils.db_session import get_db
@@ -148,3 +151,53 @@ def test_populate_user_metadata(app):
         assert users[2][response_name_constants.current_user_followee_follow_count] == 1
         assert users[2][response_name_constants.balance] == "0"
         assert users[2][response_name_constants.associated_wallets_balance] == "0"
+
+
+def test_populate_user_metadata_benchmark(app):
+    """Times populate_user_metadata over growing numbers of users, in one query each"""
+    with app.app_context():
+        db = get_db()
+
+    populate_mock_db(
+        db,
+        {
+            "users": [{}] * 1000,
+            "tracks": [{"owner_id": user_id} for user_id in range(0, 1000, 3)],
+            "follows": [
+                {"follower_user_id": 1000, "followee_user_id": user_id}
+                for user_id in range(1, 1000, 2)
+            ],
+        },
+    )
+
+    with db.scoped_session() as session:
+        session.execute("REFRESH MATERIALIZED VIEW aggregate_user")
+        statements = []
+
+        def record_statement(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(session.get_bind(), "before_cursor_execute", record_statement)
+        try:
+            for num_users in [1, 10, 100, 1000]:
+                user_ids = list(range(num_users))
+                users = [{"user_id": user_id} for user_id in user_ids]
+                statements.clear()
+                start = time.perf_counter()
+                users = populate_user_metadata(session, user_ids, users, 1000)
+                elapsed = time.perf_counter() - start
+                logger.info(
+                    f"populate_user_metadata | {num_users} users in {elapsed * 1000:.1f}ms"
+                )
+
+                assert len(statements) == 1
+                assert [
+                    user[response_name_constants.does_current_user_follow]
+                    for user in users
+                ] == [user_id % 2 == 1 for user_id in user_ids]
+                assert [
+                    user[response_name_constants.track_blocknumber] >= 0
+                    for user in users
+                ] == [user_id % 3 == 0 for user_id in user_ids]
+        finally:
+            event.remove(session.get_bind(), "before_cursor_execute", record_statement)
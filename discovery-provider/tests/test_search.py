@@ -1,7 +1,8 @@
 from datetime import datetime
 from src.models import Track, Block, User
-from src.queries.search_queries import track_search_query
+from src.queries.search_queries import combined_search_query, track_search_query
 from src.utils.db_session import get_db
+from src.tasks.search_dicts import update_search_dicts
 
 
 def setup_search(db):
@@ -122,9 +123,9 @@ def setup_search(db):
             session.add(user)
             session.flush()
 
-        # Refresh the lexeme matview
+        # Populate the track lexeme dict
         session.execute("REFRESH MATERIALIZED VIEW aggregate_track;")
-        session.execute("REFRESH MATERIALIZED VIEW track_lexeme_dict;")
+        update_search_dicts(session, [], [1, 2, 3], [])
 
 
 def test_gets_all_results(app):
@@ -145,3 +146,33 @@ def test_gets_downloadable_results(app):
     with db.scoped_session() as session:
         res = track_search_query(session, "the track", 10, 0, False, False, None, True)
         assert len(res) == 1
+
+
+def test_combined_search_query(app):
+    """Tests all search kinds can be queried in a single statement"""
+    with app.app_context():
+        db = get_db()
+    setup_search(db)
+    with db.scoped_session() as session:
+        tracks = track_search_query(
+            session, "the track", 10, 0, False, False, None, False
+        )
+        res = combined_search_query(
+            session,
+            ["tracks", "saved_tracks", "users", "playlists", "albums"],
+            {
+                "search_str": "the track",
+                "limit": 10,
+                "offset": 0,
+                "is_auto_complete": False,
+                "current_user_id": None,
+                "only_downloadable": False,
+            },
+        )
+        assert [track["track_id"] for track in res["tracks"]] == [
+            track["track_id"] for track in tracks
+        ]
+        assert res["saved_tracks"] == []
+        assert res["users"] == []
+        assert res["playlists"] == []
+        assert res["albums"] == []
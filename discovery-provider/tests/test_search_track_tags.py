@@ -1,5 +1,8 @@
 from src.queries.search_track_tags import search_track_tags
 from src.utils.db_session import get_db
+from src.utils.query_stats import measure_queries
+from src.utils.redis_connection import get_redis
+from src.tasks.search_dicts import update_search_dicts
 from tests.utils import populate_mock_db
 
 
@@ -32,7 +35,9 @@ def test_search_track_tags(app):
     populate_mock_db(db, test_entities)
 
     with db.scoped_session() as session:
-        session.execute("REFRESH MATERIALIZED VIEW tag_track_user")
+        update_search_dicts(
+            session, [], [track["track_id"] for track in test_entities["tracks"]], []
+        )
         session.execute("REFRESH MATERIALIZED VIEW aggregate_plays")
         args = {"search_str": "pop", "current_user_id": None, "limit": 10, "offset": 0}
         tracks = search_track_tags(session, args)
@@ -43,3 +48,40 @@ def test_search_track_tags(app):
         assert tracks[2]["track_id"] == 4  # Third w/ 1 plays
 
         # Track id 6 does not appear b/c kpop and pop are not exact matches
+
+
+def test_search_track_tags_loads_page(app):
+    """Tests that only the tracks on the page are loaded in full"""
+    with app.app_context():
+        db = get_db()
+        redis = get_redis()
+
+    populate_mock_db(
+        db,
+        {
+            "tracks": [
+                {"track_id": track_id, "owner_id": 1, "tags": "pop"}
+                for track_id in range(1, 6)
+            ]
+        },
+    )
+
+    with db.scoped_session() as session:
+        update_search_dicts(session, [], list(range(1, 6)), [])
+        session.execute("REFRESH MATERIALIZED VIEW aggregate_plays")
+        num_bytes = {}
+        for limit in [1, 5]:
+            # Load the page from the db rather than the track cache
+            redis.flushall()
+            args = {
+                "search_str": "pop",
+                "current_user_id": None,
+                "limit": limit,
+                "offset": 0,
+            }
+            with measure_queries(session.get_bind()) as stats:
+                tracks = search_track_tags(session, args)
+            assert len(tracks) == limit
+            num_bytes[limit] = stats.num_bytes
+
+        assert num_bytes[1] < num_bytes[5]
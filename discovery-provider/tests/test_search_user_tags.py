@@ -1,5 +1,6 @@
 from src.queries.search_user_tags import search_user_tags
 from src.utils.db_session import get_db
+from src.tasks.search_dicts import update_search_dicts
 from tests.utils import populate_mock_db
 
 
@@ -34,7 +35,9 @@ def test_search_user_tags(app):
     populate_mock_db(db, test_entities)
 
     with db.scoped_session() as session:
-        session.execute("REFRESH MATERIALIZED VIEW tag_track_user")
+        update_search_dicts(
+            session, [], [track["track_id"] for track in test_entities["tracks"]], []
+        )
         session.execute("REFRESH MATERIALIZED VIEW aggregate_plays")
         session.execute("REFRESH MATERIALIZED VIEW aggregate_user")
         args = {
@@ -0,0 +1,123 @@
+from datetime import datetime
+from src.models import Block, Follow
+from src.tasks.index_social_graph import update_social_graph
+from src.utils.db_session import get_db
+from src.utils.social_graph import (
+    load_social_graph,
+    write_base_snapshot,
+    write_delta_snapshot,
+)
+from tests.utils import populate_mock_db
+
+# (follower, followee)
+BASE_FOLLOWS = [(1, 2), (1, 3), (2, 3), (3, 1), (4, 3), (4, 2)]
+
+
+def write_graph(tmp_path, changes):
+    base_path = str(tmp_path / "social_graph")
+    delta_path = f"{base_path}.delta"
+    write_base_snapshot(
+        base_path,
+        sorted(BASE_FOLLOWS),
+        sorted((b, a) for a, b in BASE_FOLLOWS),
+        built_at=1,
+        blocknumber=1,
+        blockhash="0x1",
+    )
+    write_delta_snapshot(
+        delta_path,
+        changes,
+        base_built_at=1,
+        blocknumber=2,
+        blockhash="0x2",
+        updated_at=2,
+    )
+    return load_social_graph(base_path, delta_path)
+
+
+def test_social_graph(tmp_path):
+    graph = write_graph(tmp_path, {})
+
+    assert graph.followees(1) == [2, 3]
+    assert graph.followers(3) == [1, 2, 4]
+    assert graph.followers(5) == []
+    assert graph.is_following(4, 2)
+    assert not graph.is_following(2, 4)
+    # users following 3 that 1 follows
+    assert graph.follow_intersection(3, 1) == [2]
+    # of the users 1 follows, how many follow 3, 1 and 5
+    assert graph.followee_follow_counts(1, [3, 1, 5]) == {3: 1, 1: 1}
+
+
+def test_social_graph_delta(tmp_path):
+    # 1 unfollows 2 and follows 4, 5 follows 3
+    graph = write_graph(tmp_path, {(1, 2): False, (1, 4): True, (5, 3): True})
+
+    assert graph.blocknumber == 2
+    assert graph.followees(1) == [3, 4]
+    assert graph.followers(2) == [4]
+    assert graph.followers(3) == [1, 2, 4, 5]
+    assert not graph.is_following(1, 2)
+    assert graph.is_following(1, 4)
+    assert graph.follow_intersection(3, 1) == [4]
+    assert graph.followee_follow_counts(1, [3, 2]) == {3: 1, 2: 1}
+    assert graph.delta_changes() == {(1, 2): False, (1, 4): True, (5, 3): True}
+
+
+def test_update_social_graph(app, tmp_path):
+    """Tests the graph is rebuilt from the follows table and follows indexed after are added to the delta"""
+    with app.app_context():
+        db = get_db()
+
+    populate_mock_db(
+        db,
+        {
+            "follows": [
+                {"follower_user_id": 1, "followee_user_id": 2},
+                {"follower_user_id": 1, "followee_user_id": 3},
+                {"follower_user_id": 2, "followee_user_id": 3},
+                # no longer current
+                {"follower_user_id": 3, "followee_user_id": 1, "is_current": False},
+            ]
+        },
+    )
+
+    base_path = str(tmp_path / "social_graph")
+    delta_path = f"{base_path}.delta"
+    with db.scoped_session() as session:
+        update_social_graph(session, base_path, delta_path)
+
+    graph = load_social_graph(base_path, delta_path)
+    assert graph.followees(1) == [2, 3]
+    assert graph.followers(3) == [1, 2]
+    assert graph.followees(3) == []
+
+    with db.scoped_session() as session:
+        session.query(Block).update({"is_current": False})
+        session.add(
+            Block(blockhash="0x10", parenthash="0x3", number=10, is_current=True)
+        )
+        session.query(Follow).filter(
+            Follow.follower_user_id == 1, Follow.followee_user_id == 2
+        ).update({"is_current": False})
+        for followee_user_id, is_delete in [(2, True), (4, False)]:
+            session.add(
+                Follow(
+                    blockhash="0x10",
+                    blocknumber=10,
+                    follower_user_id=1,
+                    followee_user_id=followee_user_id,
+                    is_current=True,
+                    is_delete=is_delete,
+                    created_at=datetime.now(),
+                )
+            )
+
+    with db.scoped_session() as session:
+        update_social_graph(session, base_path, delta_path)
+
+    updated_graph = load_social_graph(base_path, delta_path)
+    assert updated_graph.built_at == graph.built_at
+    assert updated_graph.blocknumber == 10
+    assert updated_graph.followees(1) == [3, 4]
+    assert updated_graph.followers(2) == []
@@ -0,0 +1,121 @@
+from unittest import mock
+
+import pytest
+from src.solana.solana_history_walker import SolanaHistoryWalker
+from src.utils.db_session import get_db
+from src.utils.redis_connection import get_redis
+
+
+def make_history(num_txs):
+    # Most recent first, as returned by get_confirmed_signature_for_address2
+    return [{"signature": f"sig{i}", "slot": i} for i in reversed(range(num_txs))]
+
+
+def mock_solana_client_manager(history, fail_before=None):
+    solana_client_manager = mock.Mock()
+
+    def get_confirmed_signature_for_address2(_, before=None, limit=None):
+        if before is not None and before == fail_before:
+            raise Exception("unavailable")
+        sigs = [tx["signature"] for tx in history]
+        start = sigs.index(before) + 1 if before else 0
+        return {"result": history[start : start + limit]}
+
+    solana_client_manager.get_confirmed_signature_for_address2.side_effect = (
+        get_confirmed_signature_for_address2
+    )
+    return solana_client_manager
+
+
+@mock.patch("src.solana.solana_history_walker.PROCESS_BATCH_SIZE", 2)
+@mock.patch("src.solana.solana_history_walker.SIGNATURES_PAGE_SIZE", 3)
+def test_solana_history_walker(app):
+    """Tests history is processed oldest first across runs without losing any"""
+    with app.app_context():
+        db = get_db()
+        redis = get_redis()
+
+    walker = SolanaHistoryWalker(
+        "test",
+        "program",
+        lambda _: 3,
+        lambda _, tx_sigs: {tx_sig for tx_sig in tx_sigs if int(tx_sig[3:]) <= 3},
+    )
+    redis.delete(walker.backlog_key, walker.walk_key, walker.state_key)
+    processed = []
+
+    def process_batch(tx_sig_batch):
+        processed.extend(tx_sig_batch)
+
+    # test that the walk stops at the transactions processed in the database
+    # and that the rest of the walked history is kept for the next run
+    history = make_history(10)
+    walker.run(
+        mock_solana_client_manager(history), db, redis, process_batch, max_batches=2
+    )
+    assert processed == ["sig4", "sig5", "sig6", "sig7"]
+
+    # test that an interrupted walk resumes where it stopped
+    history = make_history(20)
+    with pytest.raises(Exception):
+        walker.run(
+            mock_solana_client_manager(history, fail_before="sig14"),
+            db,
+            redis,
+            process_batch,
+        )
+    assert processed == ["sig4", "sig5", "sig6", "sig7", "sig8", "sig9"]
+
+    latest_txs = []
+    walker.run(
+        mock_solana_client_manager(history),
+        db,
+        redis,
+        process_batch,
+        on_latest_tx=latest_txs.append,
+    )
+    assert processed == [f"sig{i}" for i in range(4, 20)]
+    # the latest transaction is only seen by walks from the most recent one
+    assert latest_txs == []
+
+    walker.run(
+        mock_solana_client_manager(make_history(21)),
+        db,
+        redis,
+        process_batch,
+        on_latest_tx=latest_txs.append,
+    )
+    assert processed == [f"sig{i}" for i in range(4, 21)]
+    assert latest_txs == [{"signature": "sig20", "slot": 20}]
+
+
+@mock.patch("src.solana.solana_history_walker.PROCESS_BATCH_SIZE", 2)
+def test_solana_history_walker_reprocessed_batch(app):
+    """Tests a batch processed by an interrupted run isn't processed again"""
+    with app.app_context():
+        db = get_db()
+        redis = get_redis()
+
+    db_tx_sigs = set()
+    walker = SolanaHistoryWalker(
+        "test",
+        "program",
+        lambda _: 0,
+        lambda _, tx_sigs: db_tx_sigs.intersection(tx_sigs),
+    )
+    redis.delete(walker.backlog_key, walker.walk_key, walker.state_key)
+    processed = []
+
+    def process_batch(tx_sig_batch):
+        processed.extend(tx_sig_batch)
+        db_tx_sigs.update(tx_sig_batch)
+
+    solana_client_manager = mock_solana_client_manager(make_history(4))
+    # The run is interrupted after processing its first batch
+    with mock.patch.object(redis, "ltrim", side_effect=Exception("interrupted")):
+        with pytest.raises(Exception):
+            walker.run(solana_client_manager, db, redis, process_batch)
+    assert processed == ["sig0", "sig1"]
+
+    walker.run(solana_client_manager, db, redis, process_batch)
+    assert processed == ["sig0", "sig1", "sig2", "sig3"]
@@ -2,6 +2,7 @@ from sqlalchemy import asc
 
 from src.models import TagTrackUserMatview
 from src.utils.db_session import get_db
+from src.tasks.search_dicts import update_search_dicts
 from tests.utils import populate_mock_db
 
 
@@ -24,7 +25,9 @@ def test_track_tag_mat_view(app):
     populate_mock_db(db, test_entities)
 
     with db.scoped_session() as session:
-        session.execute("REFRESH MATERIALIZED VIEW tag_track_user")
+        update_search_dicts(
+            session, [], [track["track_id"] for track in test_entities["tracks"]], []
+        )
         user_1_tags = (
             session.query(TagTrackUserMatview)
             .filter(TagTrackUserMatview.owner_id == 1)
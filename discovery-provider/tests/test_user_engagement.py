@@ -0,0 +1,54 @@
+from src.models import RepostType, SaveType
+from src.queries.get_user_engagement import (
+    get_user_engagement,
+    get_user_engagement_cache_key,
+    remove_cached_user_engagements,
+)
+from src.utils.db_session import get_db
+from src.utils.redis_connection import get_redis
+from tests.utils import populate_mock_db
+
+
+def test_user_engagement(app):
+    """Tests the cached engagement of a user matches their saves and reposts"""
+    with app.app_context():
+        db = get_db()
+    redis = get_redis()
+
+    populate_mock_db(
+        db,
+        {
+            "users": [{}] * 3,
+            "saves": [
+                {"user_id": 1, "save_item_id": 3, "save_type": "track"},
+                {"user_id": 1, "save_item_id": 1, "save_type": "track"},
+                {"user_id": 1, "save_item_id": 2, "save_type": "album"},
+                {"user_id": 2, "save_item_id": 4, "save_type": "track"},
+            ],
+            "reposts": [
+                {"user_id": 1, "repost_item_id": 5, "repost_type": "playlist"},
+            ],
+        },
+    )
+
+    with db.scoped_session() as session:
+        for _ in range(2):
+            engagement = get_user_engagement(session, redis, 1)
+            assert redis.exists(get_user_engagement_cache_key(1))
+
+            assert engagement.has_saved([SaveType.track], 1)
+            assert engagement.has_saved([SaveType.track], 3)
+            assert not engagement.has_saved([SaveType.track], 4)
+            assert not engagement.has_saved([SaveType.playlist], 2)
+            assert engagement.has_saved([SaveType.playlist, SaveType.album], 2)
+            assert engagement.has_reposted([RepostType.playlist], 5)
+            assert not engagement.has_reposted([RepostType.track], 5)
+
+        # Not read or refilled until the change has replicated
+        remove_cached_user_engagements(redis, [1])
+        assert get_user_engagement(session, redis, 1) is None
+        assert not redis.exists(get_user_engagement_cache_key(1))
+
+        engagement = get_user_engagement(session, redis, 3)
+        assert not engagement.has_saved([SaveType.track], 1)
+        assert redis.exists(get_user_engagement_cache_key(3))